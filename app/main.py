@@ -9,6 +9,7 @@ import logging  # Système de logs Python
 import os  # Interface avec le système d'exploitation
 import shutil  # Utilitaires pour manipulation de fichiers/dossiers
 import subprocess  # Exécution de processus externes (psql)
+import time  # Chronométrage des étapes de démarrage
 from datetime import datetime, timezone  # Gestion des dates et heures
 from pathlib import Path  # Manipulation des chemins de fichiers
 
@@ -21,13 +22,19 @@ from fastapi.staticfiles import StaticFiles  # Servir les fichiers statiques
 from fastapi.templating import Jinja2Templates  # Moteur de templates
 
 # === IMPORTS INTERNES - CONFIGURATION ===
+from app_lia_web.core.startup_profiler import startup_profiler  # Chronométrage du démarrage (importé en premier)
+from app_lia_web.core.template_cache import fragment_cache, render_stats  # Cache et temps de rendu des templates
 from app_lia_web.core.config import settings, BASE_DIR  # Configuration globale de l'app
 from app_lia_web.core.path_config import path_config  # Configuration centralisée des chemins
 from app_lia_web.core.enum_middleware import add_enum_validation_middleware  # Validation des enums
-from app_lia_web.core.database import create_db_and_tables, test_db_connection  # Gestion DB
+from app_lia_web.core.database import create_db_and_tables, test_db_connection, engine  # Gestion DB
 from app_lia_web.core.middleware import setup_all_middlewares  # Middlewares personnalisés
+from app_lia_web.core.metrics import marquer_processus_termine  # Métriques Prometheus (multi-processus)
 from app_lia_web.app.services import UserService  # Service de gestion des utilisateurs
 from app_lia_web.app.services.database_migration import DatabaseMigrationService  # Migrations DB
+from app_lia_web.app.services.elearning_progress_buffer import progress_buffer  # Écriture différée des progressions e-learning
+from app_lia_web.app.services.emargement_live import diffuseur as diffuseur_emargement  # Écoute LISTEN de l'émargement en direct
+from app_lia_web.core.gr_code import arreter_pool as arreter_pool_qr  # Pool de processus des QR codes
 from app_lia_web.app.routers import router_configs  # Configuration des routes
 from app_lia_web.core.program_schema_integration import setup_program_schemas, ProgramSchemaManager  # Schémas par programme
 
@@ -111,8 +118,8 @@ setup_all_middlewares(
 )
 
 # Ajout du middleware de validation des enums au démarrage
-# Ce middleware valide automatiquement les valeurs d'enum dans les requêtes
-enum_middleware = add_enum_validation_middleware(app)
+# La validation (scans SELECT DISTINCT) n'est plus exécutée à l'import mais dans on_startup
+enum_middleware = add_enum_validation_middleware(app, defer=True)
 
 # ============================================================================
 # CONFIGURATION CORS (Cross-Origin Resource Sharing)
@@ -301,9 +308,8 @@ async def serve_uploaded_file(file_path: str):
     Cette route gère la sécurité et le type MIME des fichiers.
     """
     from pathlib import Path
-    from fastapi.responses import FileResponse
     from fastapi import HTTPException
-    import mimetypes
+    from app_lia_web.core.file_delivery import reponse_fichier
     
     # Construire le chemin complet vers le fichier
     full_path = Path(settings.UPLOAD_DIR) / file_path
@@ -319,15 +325,8 @@ async def serve_uploaded_file(file_path: str):
     except ValueError:
         raise HTTPException(status_code=403, detail="Accès non autorisé")
     
-    # Déterminer le type MIME du fichier
-    mime_type, _ = mimetypes.guess_type(str(full_path))
-    
-    # Retourner le fichier avec le bon type MIME
-    return FileResponse(
-        path=str(full_path),
-        media_type=mime_type or "application/octet-stream",
-        filename=full_path.name
-    )
+    # Type MIME deviné d'après le nom ; envoi délégué au serveur frontal si FILE_OFFLOAD est configuré
+    return reponse_fichier(full_path)
 
 # ============================================================================
 # GESTION DU CYCLE DE VIE DE L'APPLICATION (STARTUP)
@@ -344,66 +343,100 @@ async def on_startup():
     4. Migration automatique
     5. Vérification administrateur
     6. Création des schémas par programme
+    7. Validation des enums
+    
+    Chaque étape est chronométrée (voir /health). En mode FAST_BOOT, les étapes 3 et 4
+    sont sautées si la version de schéma enregistrée est inchangée, et la validation
+    des enums part en tâche de fond une fois le serveur prêt.
     """
     print("=" * 60)
     print("🚀 DÉMARRAGE DE L'APPLICATION")
     print("=" * 60)
+    startup_profiler.fast_boot = settings.FAST_BOOT
+    startup_profiler.record_since_start("imports_et_configuration")
     
     # === ÉTAPE 1: BOOTSTRAP SQL AVANT LA CRÉATION DES TABLES ORM ===
     print("📋 ÉTAPE 1: Bootstrap SQL")
-    maybe_bootstrap_database()  # Exécuter le script SQL d'initialisation
+    with startup_profiler.stage("bootstrap_sql"):
+        maybe_bootstrap_database()  # Exécuter le script SQL d'initialisation
     print("✅ ÉTAPE 1 TERMINÉE: Bootstrap SQL")
 
     # === ÉTAPE 2: TEST DE CONNEXION À LA BASE DE DONNÉES ===
     print("📋 ÉTAPE 2: Test de connexion DB")
     print("✅", settings.DATABASE_URL)  # Afficher l'URL de connexion
     try:
-        test_db_connection()  # Tester la connexion à PostgreSQL
+        with startup_profiler.stage("connexion_db"):
+            test_db_connection()  # Tester la connexion à PostgreSQL
         print("✅ ÉTAPE 2 TERMINÉE: Connexion DB OK")
     except Exception as e:
         print(f"❌ ÉTAPE 2 ÉCHEC: Connexion DB - {e}")
         pass  # Continuer même en cas d'erreur
 
+    # === VERSION DE SCHÉMA (FAST BOOT) ===
+    schema_version = DatabaseMigrationService.current_schema_version()
+    schema_up_to_date = False
+    if settings.FAST_BOOT:
+        with startup_profiler.stage("version_schema"):
+            with Session(engine) as version_session:
+                stored_version = DatabaseMigrationService(version_session).get_stored_schema_version()
+        schema_up_to_date = stored_version == schema_version
+        print(f"⚡ Fast boot: version de schéma {'inchangée' if schema_up_to_date else 'modifiée'}")
+
     # === ÉTAPE 3: CRÉATION DES TABLES ORM DANS LE SCHÉMA PUBLIC ===
-    print("📋 ÉTAPE 3: Création des tables ORM")
-    create_db_and_tables()  # Créer toutes les tables SQLModel
-    print("✅ ÉTAPE 3 TERMINÉE: Tables ORM créées")
+    if schema_up_to_date:
+        startup_profiler.skip("tables_orm", "version de schéma inchangée")
+    else:
+        print("📋 ÉTAPE 3: Création des tables ORM")
+        with startup_profiler.stage("tables_orm"):
+            create_db_and_tables()  # Créer toutes les tables SQLModel
+        print("✅ ÉTAPE 3 TERMINÉE: Tables ORM créées")
     
     # === ÉTAPE 4: MIGRATION AUTOMATIQUE DE LA BASE DE DONNÉES ===
-    print("📋 ÉTAPE 4: Migration automatique")
-    try:
-        # Créer une session et le service de migration
-        session = next(get_session())
-        migration_service = DatabaseMigrationService(session)
-        
-        # Effectuer la migration automatique
-        migration_results = migration_service.migrate_database()
-        
-        # Afficher les résultats de la migration
-        if migration_results["enums_updated"]:
-            print(f"📝 Enums mis à jour: {migration_results['enums_updated']}")
-        if migration_results["tables_created"]:
-            print(f"📋 Tables créées: {migration_results['tables_created']}")
-        if migration_results["columns_added"]:
-            print(f"🔧 Colonnes ajoutées: {migration_results['columns_added']}")
-        if migration_results["errors"]:
-            print(f"⚠️ Erreurs de migration: {migration_results['errors']}")
-        else:
-            print("✅ Migration automatique terminée avec succès")
-            
-        print("✅ ÉTAPE 4 TERMINÉE: Migration automatique")
-            
-    except Exception as e:
-        print(f"❌ ÉTAPE 4 ÉCHEC: Migration automatique - {e}")
-        pass  # Continuer même en cas d'erreur
+    if schema_up_to_date:
+        startup_profiler.skip("migration", "version de schéma inchangée")
+    else:
+        print("📋 ÉTAPE 4: Migration automatique")
+        try:
+            with startup_profiler.stage("migration"):
+                # Créer une session et le service de migration
+                session = next(get_session())
+                migration_service = DatabaseMigrationService(session)
+                
+                # Effectuer la migration automatique
+                migration_results = migration_service.migrate_database()
+                
+                # Afficher les résultats de la migration
+                if migration_results["enums_updated"]:
+                    print(f"📝 Enums mis à jour: {migration_results['enums_updated']}")
+                if migration_results["tables_created"]:
+                    print(f"📋 Tables créées: {migration_results['tables_created']}")
+                if migration_results["columns_added"]:
+                    print(f"🔧 Colonnes ajoutées: {migration_results['columns_added']}")
+                if migration_results["constraints_added"]:
+                    print(f"🔒 Contraintes ajoutées: {migration_results['constraints_added']}")
+                if migration_results["errors"]:
+                    print(f"⚠️ Erreurs de migration: {migration_results['errors']}")
+                else:
+                    # Mémoriser la version pour les prochains démarrages rapides
+                    migration_service.store_schema_version(schema_version)
+                    print("✅ Migration automatique terminée avec succès")
+                session.close()
+                
+            print("✅ ÉTAPE 4 TERMINÉE: Migration automatique")
+                
+        except Exception as e:
+            print(f"❌ ÉTAPE 4 ÉCHEC: Migration automatique - {e}")
+            pass  # Continuer même en cas d'erreur
     
     # === ÉTAPE 5: VÉRIFICATION ET CRÉATION DE L'ADMINISTRATEUR ===
     print("📋 ÉTAPE 5: Vérification administrateur")
-    ensure_admin_user()  # S'assurer qu'un admin existe
+    with startup_profiler.stage("administrateur"):
+        ensure_admin_user()  # S'assurer qu'un admin existe
     print("✅ ÉTAPE 5 TERMINÉE: Administrateur vérifié")
     
     # === ÉTAPE 6: CRÉATION DES SCHÉMAS PAR PROGRAMME ===
     print("📋 ÉTAPE 6: Création des schémas par programme")
+    schemas_started = time.perf_counter()
     try:
         print("🚀 Début de l'initialisation des schémas par programme")
         
@@ -424,27 +457,15 @@ async def on_startup():
         print(f"📋 Programmes trouvés: {[p.code for p in programmes]}")
         print("✅ ÉTAPE 6.2 TERMINÉE: Programmes récupérés")
         
-        # ÉTAPE 6.3: Créer les schémas pour chaque programme
-        print("📋 ÉTAPE 6.3: Création des schémas individuels")
-        for programme in programmes:
-            print(f"🔍 Traitement du programme: {programme.code}")
-            
-            # ÉTAPE 6.3.1: Vérifier si le schéma existe
-            print(f"📋 ÉTAPE 6.3.1: Vérification existence schéma {programme.code}")
-            schema_exists = manager.schema_exists(programme.code)
-            
-            if not schema_exists:
-                print(f"🔨 Création du schéma pour le programme {programme.code}")
-                success = manager.create_program_schema(programme.code)
-                if success:
-                    print(f"✅ Schéma {programme.code} créé avec succès")
-                else:
-                    print(f"❌ Échec de création du schéma {programme.code}")
-            else:
-                print(f"ℹ️ Schéma {programme.code} existe déjà")
-                print(f"🔨 Vérification et création des tables dans le schéma {programme.code}")
-                # Créer les tables même si le schéma existe déjà
-                manager._create_tables_in_schema(programme.code.lower())
+        # ÉTAPE 6.3: Provisionner les schémas (seuls ceux dont l'empreinte a changé)
+        print("📋 ÉTAPE 6.3: Provisionnement des schémas individuels")
+        report = manager.provision_program_schemas([p.code for p in programmes])
+        print(f"ℹ️ Schémas déjà à jour: {report['up_to_date']}")
+        for schema_name, statements in report["provisioned"].items():
+            print(f"✅ Schéma {schema_name} provisionné ({statements} instructions DDL)")
+        for schema_name, errors in report["errors"].items():
+            print(f"❌ Erreurs de provisionnement du schéma {schema_name}: {errors}")
+        print(f"⏱️ Provisionnement des schémas: {report['duration_ms']} ms")
         
         print("✅ ÉTAPE 6.3 TERMINÉE: Schémas individuels traités")
         
@@ -461,10 +482,50 @@ async def on_startup():
         import traceback
         print(traceback.format_exc())
     
+    startup_profiler.record("schemas_programmes", (time.perf_counter() - schemas_started) * 1000)
+    
+    # === ÉTAPE 7: VALIDATION DES ENUMS (NON CRITIQUE) ===
+    if settings.FAST_BOOT:
+        print("⚡ ÉTAPE 7: Validation des enums lancée en tâche de fond")
+        startup_profiler.run_in_background("validation_enums", enum_middleware.validate)
+    else:
+        print("📋 ÉTAPE 7: Validation des enums")
+        with startup_profiler.stage("validation_enums"):
+            enum_middleware.validate()
+        print("✅ ÉTAPE 7 TERMINÉE: Validation des enums")
+    
+    # === ÉTAPE 8: TAMPON DES PROGRESSIONS E-LEARNING ===
+    progress_buffer.start()
+    
+    # === ÉTAPE 9: NETTOYAGE PLANIFIÉ (FICHIERS TEMPORAIRES, UPLOADS ABANDONNÉS) ===
+    try:
+        from app_lia_web.core.cleanup_scheduler import start_cleanup_scheduler
+        start_cleanup_scheduler()
+        print("✅ ÉTAPE 9 TERMINÉE: Scheduler de nettoyage lancé")
+    except ImportError as e:
+        print(f"⚠️ ÉTAPE 9 IGNORÉE: Scheduler de nettoyage indisponible - {e}")
+    
+    startup_profiler.finish()
+    
     print("=" * 60)
     print("🎉 DÉMARRAGE DE L'APPLICATION TERMINÉ")
     print("=" * 60)
 
+
+@app.on_event("shutdown")
+def on_shutdown():
+    """Écrit les progressions e-learning encore en mémoire, ferme l'écoute d'émargement, arrête le nettoyage planifié et le pool des QR codes"""
+    progress_buffer.stop()
+    diffuseur_emargement.arreter()
+    arreter_pool_qr()
+    try:
+        from app_lia_web.core.cleanup_scheduler import stop_cleanup_scheduler
+        stop_cleanup_scheduler()
+    except ImportError:
+        pass
+    # Multi-processus : les jauges de ce worker ne sont plus comptées
+    marquer_processus_termine()
+
 # ============================================================================
 # ROUTES PRINCIPALES DE L'APPLICATION
 # ============================================================================
@@ -677,6 +738,9 @@ async def health_check():
         "version": settings.VERSION,
         "environment": settings.ENVIRONMENT,
         "time": datetime.now(timezone.utc).isoformat() + "Z",
+        "startup": startup_profiler.report(),  # Durée de chaque étape de démarrage
+        "templates": {"render": render_stats.report(), "fragments": fragment_cache.stats()},
+        "elearning_progress": progress_buffer.stats(),
     }
 
 # ============================================================================
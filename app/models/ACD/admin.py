@@ -6,4 +6,14 @@ class AppSetting(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     key: str = Field(index=True, unique=True)
     value: str
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
\ No newline at end of file
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class VersionCache(SQLModel, table=True):
+    """Compteur incrémenté à chaque invalidation d'un cache en mémoire (une ligne par cache)
+
+    Chaque worker compare ce compteur à celui de son cache pour recharger après
+    une modification faite dans un autre worker (voir app/services/cache_version.py).
+    """
+    cle: str = Field(primary_key=True)
+    version: int = Field(default=0)
+    modifie_le: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
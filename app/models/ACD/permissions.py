@@ -55,3 +55,13 @@ class LogPermission(SQLModel, table=True):
     nouvelle_permission: Optional[NiveauPermission] = None
     raison: Optional[str] = None
     cree_le: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class VersionPermissions(SQLModel, table=True):
+    """Compteur incrémenté à chaque modification de permissions (une seule ligne, id = 1)
+
+    Chaque worker compare ce compteur à celui de sa matrice compilée, une fois
+    par requête, pour recompiler après un octroi / une révocation faits ailleurs.
+    """
+    id: int = Field(default=1, primary_key=True)
+    version: int = Field(default=0)
+    modifie_le: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -1,5 +1,6 @@
 # app/models/base.py
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, UniqueConstraint, func
 from typing import Optional, List
 from datetime import date, datetime, timezone
 from .password_recovery import PasswordRecoveryCode
@@ -121,10 +122,19 @@ class Candidat(SQLModel, table=True):
     inscriptions: List["Inscription"] = Relationship(back_populates="candidat")
     documents: List["Document"] = Relationship(back_populates="candidat")
 
+# Recherche par préfixe insensible à la casse (lower(col) LIKE 'saisie%') : index utilisables
+# par PostgreSQL quelle que soit la collation grâce à text_pattern_ops
+for _colonne in ("nom", "prenom", "email"):
+    Index(
+        f"ix_candidat_{_colonne}_prefixe",
+        func.lower(Candidat.__table__.c[_colonne]).label(_colonne),
+        postgresql_ops={_colonne: "text_pattern_ops"},
+    )
+
 class Entreprise(SQLModel, table=True):
     """Entreprise du candidat"""
     id: Optional[int] = Field(default=None, primary_key=True)
-    candidat_id: int = Field(foreign_key="candidat.id")
+    candidat_id: int = Field(foreign_key="candidat.id", index=True)
     siret: Optional[str] = None
     siren: Optional[str] = None
     raison_sociale: Optional[str] = None
@@ -151,11 +161,11 @@ class Preinscription(SQLModel, table=True):
     """Préinscription d'un candidat"""
     id: Optional[int] = Field(default=None, primary_key=True)
     programme_id: int = Field(foreign_key="programme.id")
-    candidat_id: int = Field(foreign_key="candidat.id")
+    candidat_id: int = Field(foreign_key="candidat.id", index=True)
     source: Optional[str] = None  # "formulaire", "import", etc.
     donnees_brutes_json: Optional[str] = None  # données du formulaire
     statut: StatutDossier = StatutDossier.SOUMIS
-    cree_le: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    cree_le: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
     
     # Relations
     programme: Programme = Relationship(back_populates="preinscriptions")
@@ -181,6 +191,11 @@ class Document(SQLModel, table=True):
 
 class Eligibilite(SQLModel, table=True):
     """Calcul d'éligibilité d'une préinscription"""
+    # Une seule éligibilité par préinscription : cible des recalculs en masse (ON CONFLICT)
+    __table_args__ = (
+        UniqueConstraint("preinscription_id", name="uq_eligibilite_preinscription"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     preinscription_id: int = Field(foreign_key="preinscription.id")
     ca_seuil_ok: Optional[bool] = None
@@ -199,7 +214,7 @@ class Inscription(SQLModel, table=True):
     """Inscription validée d'un candidat"""
     id: Optional[int] = Field(default=None, primary_key=True)
     programme_id: int = Field(foreign_key="programme.id")
-    candidat_id: int = Field(foreign_key="candidat.id")
+    candidat_id: int = Field(foreign_key="candidat.id", index=True)
     promotion_id: Optional[int] = Field(foreign_key="promotion.id")
     groupe_id: Optional[int] = None
     conseiller_id: Optional[int] = Field(foreign_key="user.id")
@@ -207,7 +222,7 @@ class Inscription(SQLModel, table=True):
     statut: StatutDossier = StatutDossier.EN_EXAMEN
     date_decision: Optional[datetime] = None
     email_confirmation_envoye: bool = False
-    cree_le: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    cree_le: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
     
     # Relations
     programme: Programme = Relationship(back_populates="inscriptions")
@@ -393,6 +408,22 @@ class SuiviMensuel(SQLModel, table=True):
 
     inscription: "Inscription" = Relationship()
 
+class SuiviMensuelRollup(SQLModel, table=True):
+    """Agrégats mensuels des suivis par programme (maintenus par SuiviMensuelService)"""
+    programme_id: int = Field(foreign_key="programme.id", primary_key=True)
+    mois: date = Field(primary_key=True)                 # 1er du mois
+    nb_suivis: int = 0
+    nb_avec_commentaire: int = 0
+    nb_scores: int = 0                                   # suivis ayant un score
+    somme_scores: float = 0
+    nb_ca: int = 0                                       # suivis ayant un chiffre d'affaires
+    somme_ca: float = 0
+    total_employes: int = 0
+    montant_subventions_total: float = 0
+    montant_dettes_total: float = 0
+    montant_equity_total: float = 0
+    maj_le: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
 class Partenaire(SQLModel, table=True):
     """Partenaires pour la réorientation des candidats"""
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -423,7 +454,7 @@ class DecisionJuryCandidat(SQLModel, table=True):
     envoyer_mail_candidat: bool = Field(default=False)
     envoyer_mail_conseiller: bool = Field(default=False)
     envoyer_mail_partenaire: bool = Field(default=False)
-    date_decision: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    date_decision: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
     cree_le: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     
     # Relations
@@ -434,6 +465,15 @@ class DecisionJuryCandidat(SQLModel, table=True):
     promotion: Optional["Promotion"] = Relationship()
     partenaire: Optional["Partenaire"] = Relationship()
 
+    __table_args__ = (
+        # Une décision par candidat et par jury (cible des INSERT ... ON CONFLICT des décisions par lot)
+        UniqueConstraint("candidat_id", "jury_id", name="uq_decisionjurycandidat_candidat_jury"),
+        # Pagination par curseur (date_decision, id), globale ou filtrée par jury / décision
+        Index("ix_decisionjurycandidat_date_id", "date_decision", "id"),
+        Index("ix_decisionjurycandidat_jury_date_id", "jury_id", "date_decision", "id"),
+        Index("ix_decisionjurycandidat_decision_date_id", "decision", "date_decision", "id"),
+    )
+
 class ReorientationCandidat(SQLModel, table=True):
     """Historique des réorientations"""
     id: Optional[int] = Field(default=None, primary_key=True)
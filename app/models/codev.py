@@ -43,6 +43,7 @@ class PresentationCodev(SQLModel, table=True):
     delai_engagement: Optional[date] = None  # Date limite pour tester
     statut: str = Field(default="en_attente", max_length=20)
     notes_candidat: Optional[str] = None  # Notes du candidat après test
+    dernier_ordre_contribution: Optional[int] = None  # Compteur d'ordre des contributions (incrément atomique)
     cree_le: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     
     # Relations
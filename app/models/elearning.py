@@ -1,5 +1,6 @@
 # app/models/elearning.py
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import UniqueConstraint
 from typing import Optional, List
 from datetime import datetime, timezone
 from .enums import *
@@ -85,6 +86,11 @@ class ProgressionElearning(SQLModel, table=True):
     module: "ModuleElearning" = Relationship(back_populates="progressions")
     ressource: "RessourceElearning" = Relationship(back_populates="progressions")
 
+    __table_args__ = (
+        # Une progression par candidat et par ressource (cible de l'upsert des heartbeats)
+        UniqueConstraint("inscription_id", "ressource_id", name="uq_progressionelearning_inscription_ressource"),
+    )
+
 class ObjectifElearning(SQLModel, table=True):
     """Objectifs e-learning obligatoires par programme"""
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -156,3 +162,44 @@ class ModuleRessource(SQLModel, table=True):
     ressource_id: int = Field(foreign_key="ressourceelearning.id", primary_key=True)
     ordre: int = Field(default=0)
     obligatoire: bool = Field(default=True)
+
+# === AGRÉGATS PRÉCALCULÉS (ROLLUPS) ===
+# Maintenus par app/services/elearning_rollup.py à chaque écriture de progression,
+# reconstructibles à tout moment depuis ProgressionElearning.
+
+class RollupElearningInscription(SQLModel, table=True):
+    """Statistiques e-learning précalculées par inscription"""
+    inscription_id: int = Field(foreign_key="inscription.id", primary_key=True, ondelete="CASCADE")
+    programme_id: int = Field(foreign_key="programme.id", index=True)
+    temps_total_minutes: int = Field(default=0)
+    ressources_commencees: int = Field(default=0)
+    ressources_terminees: int = Field(default=0)
+    modules_termines: int = Field(default=0)
+    # Ressources terminées par type ("video", "document", "quiz", "lien", "audio")
+    terminees_video: int = Field(default=0)
+    terminees_document: int = Field(default=0)
+    terminees_quiz: int = Field(default=0)
+    terminees_lien: int = Field(default=0)
+    terminees_audio: int = Field(default=0)
+    score_moyen: Optional[float] = None
+    derniere_activite: Optional[datetime] = None
+    objectifs_total: int = Field(default=0)
+    objectifs_atteints: int = Field(default=0)
+    maj_le: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class RollupElearningProgramme(SQLModel, table=True):
+    """Statistiques e-learning précalculées par programme"""
+    programme_id: int = Field(foreign_key="programme.id", primary_key=True, ondelete="CASCADE")
+    candidats_actifs: int = Field(default=0)
+    candidats_objectifs_atteints: int = Field(default=0)
+    temps_total_minutes: int = Field(default=0)
+    temps_moyen_minutes: float = Field(default=0)
+    ressources_terminees: int = Field(default=0)
+    modules_termines: int = Field(default=0)  # Modules distincts terminés par au moins un candidat
+    terminees_video: int = Field(default=0)
+    terminees_document: int = Field(default=0)
+    terminees_quiz: int = Field(default=0)
+    terminees_lien: int = Field(default=0)
+    terminees_audio: int = Field(default=0)
+    score_moyen: Optional[float] = None
+    maj_le: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import UniqueConstraint
 from datetime import datetime, date
 from typing import Optional, List
 from enum import Enum
@@ -73,6 +74,10 @@ class InvitationEvent(SQLModel, table=True):
 
 class PresenceEvent(SQLModel, table=True):
     __tablename__ = "presence_events"
+    __table_args__ = (
+        # Une seule présence par participant (jointure invitations ⟕ présences sans doublon)
+        UniqueConstraint("event_id", "inscription_id", name="uq_presence_events_event_inscription"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     presence: str = Field(default="absent")
     methode_signature: Optional[MethodeSignatureEvent] = Field(default=None)
@@ -1,5 +1,6 @@
 # app/models/seminaire.py
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import UniqueConstraint
 from typing import Optional, List
 from datetime import datetime, timezone, date
 from .enums import TypeSession, StatutPresence, StatutSeminaire, TypeInvitation
@@ -137,6 +138,11 @@ class PresenceSeminaire(SQLModel, table=True):
     session: SessionSeminaire = Relationship(back_populates="participants")
     inscription: Inscription = Relationship()
 
+    __table_args__ = (
+        # Une seule présence par candidat et par session (cible des INSERT ... ON CONFLICT)
+        UniqueConstraint("session_id", "inscription_id", name="uq_presenceseminaire_session_inscription"),
+    )
+
 class LivrableSeminaire(SQLModel, table=True):
     """Livrables à rendre à la fin du séminaire"""
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -6,7 +6,8 @@ import time
 from sqlalchemy import func, delete
 from typing import Optional, Literal
 
-from fastapi import APIRouter, Depends, Form, HTTPException, Query, Request, File, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, Form, HTTPException, Query, Request, File, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy import func, and_
@@ -29,9 +30,12 @@ from app_lia_web.app.models.enums import UserRole as UserRoleEnum
 from app_lia_web.app.models.ACD.admin import AppSetting
 from app_lia_web.app.models.ACD.permissions import PermissionRole, PermissionUtilisateur, LogPermission, NiveauPermission, TypeRessource
 from app_lia_web.app.models.ACD.archive import Archive, TypeArchive, StatutArchive, RegleNettoyage, LogNettoyage
-from app_lia_web.app.services.ACD.permissions import PermissionService
+from app_lia_web.app.services.ACD.permissions import PermissionService, permission_resolver
 from app_lia_web.app.services.ACD.archive import ArchiveService
 from app_lia_web.app.services.database_migration import DatabaseMigrationService
+from app_lia_web.app.services.programme_service import programme_registry
+from app_lia_web.app.services.eligibilite_service import recalculer_programme_en_arriere_plan, seuils
+from app_lia_web.app.services.jury_decision_service import references_jury
 from app_lia_web.app.services.ACD.audit import log_activity
 from app_lia_web.app.models.ACD.activity import ActivityLog
 
@@ -56,7 +60,7 @@ async def save_profile_photo(photo: UploadFile, user_id: int, old_photo_path: st
     # Supprimer l'ancienne photo si elle existe
     if old_photo_path:
         try:
-            FileUploadService.delete_file(old_photo_path)
+            await run_in_threadpool(FileUploadService.delete_file, old_photo_path)
             print(f"🗑️ [DEBUG] Ancienne photo supprimée: {old_photo_path}")
         except Exception as e:
             print(f"❌ [DEBUG] Erreur lors de la suppression de l'ancienne photo: {e}")
@@ -80,6 +84,22 @@ async def save_profile_photo(photo: UploadFile, user_id: int, old_photo_path: st
         print(f"❌ [DEBUG] Erreur lors de la sauvegarde: {e}")
         raise e
 
+
+def _enregistrer_utilisateur(session: Session, current_user: User, u: User, action: str, activity_data: dict, request: Request) -> None:
+    """Journalise l'action sur l'utilisateur et valide la transaction (routes async : appelé via run_in_threadpool)"""
+    log_activity(session, user=current_user, action=action, entity="User", entity_id=u.id,
+                 activity_data=activity_data, request=request)
+    session.commit()
+
+
+def _email_utilise(session: Session, email: str) -> bool:
+    return session.exec(select(User.id).where(User.email == email)).first() is not None
+
+
+def _creer_utilisateur(session: Session, u: User) -> None:
+    session.add(u)
+    session.flush()  # Pour obtenir l'ID de l'utilisateur
+
 # -------- RBAC --------
 def admin_required(user: User):
     allowed = {UserRoleEnum.ADMINISTRATEUR.value, UserRoleEnum.DIRECTEUR_GENERAL.value}
@@ -318,6 +338,7 @@ def admin_programme_save(
                  entity="Programme", entity_id=prog.id,
                  activity_data={"code": prog.code, "nom": prog.nom}, request=request)
     session.commit()
+    programme_registry.invalidate()
     print(f"✅ [DEBUG] Programme sauvegardé avec succès")
     
     timestamp = int(time.time())
@@ -328,6 +349,7 @@ def admin_programme_save(
 def admin_programme_update(
     prog_id: int,
     request: Request,
+    background_tasks: BackgroundTasks,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
     code: str = Form(...),
@@ -353,6 +375,7 @@ def admin_programme_update(
         try: return float(s.replace(" ", "").replace(",", "."))
         except: return None
 
+    seuils_avant = seuils(prog)
     prog.code = code.strip()
     prog.nom = nom.strip()
     prog.objectif = objectif
@@ -373,7 +396,12 @@ def admin_programme_update(
                  action="PROGRAMME_UPDATE",
                  entity="Programme", entity_id=prog.id,
                  activity_data={"code": prog.code, "nom": prog.nom}, request=request)
+    seuils_modifies = seuils(prog) != seuils_avant
     session.commit()
+    programme_registry.invalidate()
+    if seuils_modifies:
+        # Toutes les éligibilités du programme sont périmées : recalcul après la réponse
+        background_tasks.add_task(recalculer_programme_en_arriere_plan, prog_id)
     timestamp = int(time.time())
     return RedirectResponse(url=f"/admin/programmes?success=1&action=update&t={timestamp}", status_code=303)
 
@@ -404,6 +432,7 @@ def admin_programme_delete(
                  entity="Programme", entity_id=prog_id,
                  activity_data={"code": prog.code, "nom": prog.nom}, request=request)
     session.commit()
+    programme_registry.invalidate()
     timestamp = int(time.time())
     return RedirectResponse(url=f"/admin/programmes?success=1&action=delete&t={timestamp}", status_code=303)
 
@@ -566,7 +595,7 @@ async def admin_users_add(
 ):
     admin_required(current_user)
     from app_lia_web.core.security import get_password_hash
-    if session.exec(select(User).where(User.email==email)).first():
+    if await run_in_threadpool(_email_utilise, session, email):
         raise HTTPException(status_code=400, detail="Email déjà utilisé")
     
     try: 
@@ -597,10 +626,9 @@ async def admin_users_add(
         telephone=telephone,
         role=role_value, 
         type_utilisateur=t,
-        mot_de_passe_hash=get_password_hash(password)
+        mot_de_passe_hash=await run_in_threadpool(get_password_hash, password)
     )
-    session.add(u)
-    session.flush()  # Pour obtenir l'ID de l'utilisateur
+    await run_in_threadpool(_creer_utilisateur, session, u)
     
     # Sauvegarder la photo de profil si fournie
     if photo_profil and photo_profil.filename:
@@ -611,9 +639,8 @@ async def admin_users_add(
             # En cas d'erreur, continuer sans photo
             pass
     
-    log_activity(session, user=current_user, action="USER_CREATE", entity="User", entity_id=u.id,
-                 activity_data={"email": u.email, "nom_complet": u.nom_complet, "role": u.role}, request=request)
-    session.commit()
+    await run_in_threadpool(_enregistrer_utilisateur, session, current_user, u, "USER_CREATE",
+                            {"email": u.email, "nom_complet": u.nom_complet, "role": u.role}, request)
     # Redirection avec message de succès
     timestamp = int(datetime.now(timezone.utc).timestamp())
     return RedirectResponse(url=f"/admin/users?success=1&action=add&t={timestamp}", status_code=303)
@@ -767,6 +794,7 @@ def admin_jurys_add(programme_id: int = Form(...), session_date: str = Form(...)
     log_activity(session, user=current_user, action="JURY_ADD", entity="Jury", entity_id=None,
                  activity_data={"programme_id": prog.id, "session_le": dt.isoformat(), "lieu": lieu, "statut": statut}, request=request)
     session.commit()
+    references_jury.invalidate()
     return RedirectResponse(url=request.url_for("admin_jurys"), status_code=303)
 
 @router.post("/jurys/{jury_id}/update")
@@ -797,6 +825,7 @@ def admin_jury_update(jury_id: int,
     
     session.add(jury)
     session.commit()
+    references_jury.invalidate()
     
     log_activity(session, user=current_user, action="JURY_UPDATE", entity="Jury", entity_id=jury_id,
                  activity_data={"programme_id": programme_id, "session_le": session_le, "statut": statut}, request=request)
@@ -816,6 +845,7 @@ def admin_jury_delete(jury_id: int, request: Request, session: Session = Depends
     # Puis supprimer le jury
     session.delete(jury)
     session.commit()
+    references_jury.invalidate()
     
     log_activity(session, user=current_user, action="JURY_DELETE", entity="Jury", entity_id=jury_id,
                  activity_data={"programme_id": jury.programme_id}, request=request)
@@ -1019,6 +1049,35 @@ def admin_update_role_permission(
         print(f"❌ Erreur lors de la mise à jour de permission de rôle: {e}")
         return RedirectResponse(url=request.url_for("admin_permissions") + "?error=role_permission_update_failed", status_code=303)
 
+@router.get("/permissions/debug", name="admin_permissions_debug")
+def admin_permissions_debug(
+    user_id: Optional[int] = Query(None),
+    refresh: bool = Query(False),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Dump de la matrice de permissions compilée (audit / débogage)"""
+    admin_required(current_user)
+    
+    if refresh:
+        permission_resolver.invalidate()
+    permission_resolver.ensure_compiled(session)
+    
+    data = permission_resolver.dump()
+    if user_id is not None:
+        target = session.get(User, user_id)
+        if not target:
+            raise HTTPException(status_code=404, detail="Utilisateur introuvable")
+        data["utilisateur"] = {
+            "id": target.id,
+            "role": target.role,
+            "permissions": {
+                resource.value: level.value
+                for resource, level in permission_resolver.effective_permissions(target).items()
+            }
+        }
+    return data
+
 @router.get("/database-status", response_class=HTMLResponse, name="admin_database_status")
 def admin_database_status(request: Request, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
     admin_required(current_user)
@@ -1292,7 +1351,7 @@ async def admin_users_photo(
     admin_required(current_user)
     
     print(f"🔍 [DEBUG] Recherche de l'utilisateur avec id={uid}")
-    u = session.get(User, uid)
+    u = await run_in_threadpool(session.get, User, uid)
     if not u: 
         print(f"❌ [DEBUG] Utilisateur introuvable avec id={uid}")
         raise HTTPException(status_code=404, detail="Utilisateur introuvable")
@@ -1307,12 +1366,9 @@ async def admin_users_photo(
         
         u.photo_profil = photo_path
         print(f"💾 [DEBUG] Mise à jour du champ photo_profil dans la base")
-        session.commit()
-        print(f"✅ [DEBUG] Commit réussi")
-        
-        log_activity(session, user=current_user, action="USER_PHOTO_UPDATE", entity="User", entity_id=u.id,
-                     activity_data={"user_email": u.email}, request=request)
-        print(f"📝 [DEBUG] Activité loggée")
+        await run_in_threadpool(_enregistrer_utilisateur, session, current_user, u, "USER_PHOTO_UPDATE",
+                                {"user_email": u.email}, request)
+        print(f"✅ [DEBUG] Commit réussi, activité loggée")
         
     except Exception as e:
         print(f"❌ [DEBUG] Erreur dans admin_users_photo: {e}")
@@ -1488,6 +1544,7 @@ def admin_partenaires_add(
     log_activity(session, user=current_user, action="PARTENAIRE_CREATE", entity="Partenaire", entity_id=partenaire.id,
                  activity_data={"nom": partenaire.nom, "email": partenaire.email}, request=request)
     session.commit()
+    references_jury.invalidate()
     
     timestamp = int(datetime.now(timezone.utc).timestamp())
     return RedirectResponse(url=f"/admin/partenaires?success=1&action=add&t={timestamp}", status_code=303)
@@ -1552,6 +1609,7 @@ def admin_partenaires_update(
                      "actif": partenaire.actif
                  }}, request=request)
     session.commit()
+    references_jury.invalidate()
     
     timestamp = int(datetime.now(timezone.utc).timestamp())
     return RedirectResponse(url=f"/admin/partenaires?success=1&action=update&t={timestamp}", status_code=303)
@@ -1567,6 +1625,7 @@ def admin_partenaires_toggle(partenaire_id: int, request: Request, session: Sess
     log_activity(session, user=current_user, action="PARTENAIRE_TOGGLE", entity="Partenaire", entity_id=partenaire.id,
                 activity_data={"nom": partenaire.nom, "actif": partenaire.actif}, request=request)
     session.commit()
+    references_jury.invalidate()
     
     timestamp = int(datetime.now(timezone.utc).timestamp())
     return RedirectResponse(url=f"/admin/partenaires?success=1&action=toggle&t={timestamp}", status_code=303)
@@ -1600,6 +1659,7 @@ def admin_partenaires_delete(
     try:
         session.delete(partenaire)
         session.commit()
+        references_jury.invalidate()
         
         log_activity(session, user=current_user, action="PARTENAIRE_DELETE", entity="Partenaire", entity_id=partenaire_id,
                      activity_data={"deleted_partenaire_nom": partenaire_nom, "deleted_partenaire_email": partenaire_email}, request=request)
@@ -1676,6 +1736,7 @@ def admin_promotions_add(
     log_activity(session, user=current_user, action="PROMOTION_CREATE", entity="Promotion", entity_id=promotion.id,
                  activity_data={"libelle": promotion.libelle, "programme_id": programme_id}, request=request)
     session.commit()
+    references_jury.invalidate()
     
     timestamp = int(datetime.now(timezone.utc).timestamp())
     return RedirectResponse(url=f"/admin/promotions?success=1&action=add&t={timestamp}", status_code=303)
@@ -1741,6 +1802,7 @@ def admin_promotions_update(
                      "actif": promotion.actif
                  }}, request=request)
     session.commit()
+    references_jury.invalidate()
     
     timestamp = int(datetime.now(timezone.utc).timestamp())
     return RedirectResponse(url=f"/admin/promotions?success=1&action=update&t={timestamp}", status_code=303)
@@ -1756,6 +1818,7 @@ def admin_promotions_toggle(promotion_id: int, request: Request, session: Sessio
     log_activity(session, user=current_user, action="PROMOTION_TOGGLE", entity="Promotion", entity_id=promotion.id,
                 activity_data={"libelle": promotion.libelle, "actif": promotion.actif}, request=request)
     session.commit()
+    references_jury.invalidate()
     
     timestamp = int(datetime.now(timezone.utc).timestamp())
     return RedirectResponse(url=f"/admin/promotions?success=1&action=toggle&t={timestamp}", status_code=303)
@@ -1797,6 +1860,7 @@ def admin_promotions_delete(
     try:
         session.delete(promotion)
         session.commit()
+        references_jury.invalidate()
         
         log_activity(session, user=current_user, action="PROMOTION_DELETE", entity="Promotion", entity_id=promotion_id,
                      activity_data={"deleted_promotion_libelle": promotion_libelle, "deleted_promotion_programme_id": promotion_programme_id}, request=request)
@@ -5,24 +5,31 @@ from datetime import datetime, timezone
 from typing import Optional, List
 from fastapi import APIRouter, Depends, Form, HTTPException, Request, Query
 from fastapi.responses import HTMLResponse, RedirectResponse
+from sqlalchemy import delete
 from sqlmodel import Session, select
 
 from app_lia_web.core.database import get_session
 from app_lia_web.core.config import settings
 from app_lia_web.core.security import get_current_user
+from app_lia_web.core.sql_budget import budget_sql
 from app_lia_web.app.templates import templates
 
 from app_lia_web.app.models.base import (
-    Candidat, Jury, DecisionJuryCandidat, Partenaire, User, Promotion,
-    ReorientationCandidat
+    Candidat, Jury, DecisionJuryCandidat, ReorientationCandidat
+)
+from app_lia_web.app.models.enums import DecisionJury
+from app_lia_web.app.services.ACD.audit import log_activity
+from app_lia_web.app.services.jury_decision_service import (
+    DECISIONS_LOT_MAX, DECISIONS_PAGE, DECISIONS_PAGE_MAX,
+    appliquer_decision_lot, champs_decision, page_decisions, references_jury,
 )
-from app_lia_web.app.models.enums import DecisionJury, UserRole
 
 router = APIRouter()
 
 
 # --------- GESTION DES DÉCISIONS DU JURY ---------
 @router.get("/jury-decisions", name="jury_decisions_list", response_class=HTMLResponse)
+@budget_sql(6)
 def jury_decisions_list(
     request: Request,
     session: Session = Depends(get_session),
@@ -30,45 +37,24 @@ def jury_decisions_list(
     jury_id: Optional[int] = Query(None),
     decision: Optional[str] = Query(None),
     q: Optional[str] = Query(None),
+    curseur: Optional[str] = Query(None),
+    limite: int = Query(DECISIONS_PAGE, ge=1, le=DECISIONS_PAGE_MAX),
 ):
-    """Liste des décisions du jury"""
-    
-    # Récupérer les jurys actifs
-    jurys = session.exec(select(Jury).where(Jury.actif == True)).all()
-    
-    # Construire la requête
-    stmt = (
-        select(DecisionJuryCandidat, Candidat, Jury, User, Promotion, Partenaire)
-        .join(Candidat, Candidat.id == DecisionJuryCandidat.candidat_id)
-        .join(Jury, Jury.id == DecisionJuryCandidat.jury_id)
-        .outerjoin(User, User.id == DecisionJuryCandidat.conseiller_id)
-        .outerjoin(Promotion, Promotion.id == DecisionJuryCandidat.promotion_id)
-        .outerjoin(Partenaire, Partenaire.id == DecisionJuryCandidat.partenaire_id)
-    )
-    
-    # Filtres
-    if jury_id:
-        stmt = stmt.where(DecisionJuryCandidat.jury_id == jury_id)
-    if decision:
-        stmt = stmt.where(DecisionJuryCandidat.decision == decision)
-    if q:
-        like = f"%{q}%"
-        stmt = stmt.where(
-            (Candidat.nom.ilike(like)) |
-            (Candidat.prenom.ilike(like)) |
-            (Candidat.email.ilike(like))
+    """Liste des décisions du jury, paginée par curseur (date_decision, id)"""
+    try:
+        page = page_decisions(
+            session,
+            jury_id=jury_id,
+            decision=DecisionJury(decision) if decision else None,
+            q=q,
+            curseur=curseur,
+            limite=limite,
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    decisions = session.exec(stmt.order_by(DecisionJuryCandidat.date_decision.desc())).all()
-    
-    # Récupérer les partenaires actifs
-    partenaires = session.exec(select(Partenaire).where(Partenaire.actif == True)).all()
-    
-    # Récupérer les conseillers
-    conseillers = session.exec(select(User).where(User.role == UserRole.CONSEILLER.value)).all()
-    
-    # Récupérer les promotions
-    promotions = session.exec(select(Promotion)).all()
+    # Jurys actifs, partenaires, conseillers et promotions : listes en cache
+    references = references_jury.get()
     
     return templates.TemplateResponse(
         "admin/jury_decisions.html",
@@ -76,14 +62,18 @@ def jury_decisions_list(
             "request": request,
             "settings": settings,
             "utilisateur": current_user,
-            "decisions": decisions,
-            "jurys": jurys,
-            "partenaires": partenaires,
-            "conseillers": conseillers,
-            "promotions": promotions,
+            "decisions": page.lignes,
+            "curseur_suivant": page.curseur_suivant,
+            "premiere_page": curseur is None,
+            "jurys": references.jurys,
+            "partenaires": references.partenaires,
+            "conseillers": references.conseillers,
+            "promotions": references.promotions,
             "current_jury_id": jury_id,
             "current_decision": decision,
             "q": q or "",
+            "limite": limite,
+            "lot_max": DECISIONS_LOT_MAX,
             "decision_enum": DecisionJury,
         },
     )
@@ -91,12 +81,12 @@ def jury_decisions_list(
 
 @router.post("/jury-decisions/create")
 def create_jury_decision(
+    request: Request,
     candidat_id: int = Form(...),
     jury_id: int = Form(...),
     decision: str = Form(...),
     commentaires: Optional[str] = Form(None),
     conseiller_id: Optional[int] = Form(None),
-    groupe_codev: Optional[str] = Form(None),
     promotion_id: Optional[int] = Form(None),
     partenaire_id: Optional[int] = Form(None),
     envoyer_mail_candidat: bool = Form(False),
@@ -119,7 +109,7 @@ def create_jury_decision(
     
     # Vérifier qu'il n'y a pas déjà une décision pour ce candidat et ce jury
     existing = session.exec(
-        select(DecisionJuryCandidat).where(
+        select(DecisionJuryCandidat.id).where(
             (DecisionJuryCandidat.candidat_id == candidat_id) &
             (DecisionJuryCandidat.jury_id == jury_id)
         )
@@ -129,19 +119,11 @@ def create_jury_decision(
         raise HTTPException(status_code=400, detail="Une décision existe déjà pour ce candidat et ce jury")
     
     # Créer la décision
-    decision_obj = DecisionJuryCandidat(
-        candidat_id=candidat_id,
-        jury_id=jury_id,
-        decision=DecisionJury(decision),
-        commentaires=commentaires,
-        conseiller_id=conseiller_id if decision == DecisionJury.VALIDE.value else None,
-        groupe_codev=groupe_codev if decision == DecisionJury.VALIDE.value else None,
-        promotion_id=promotion_id if decision == DecisionJury.VALIDE.value else None,
-        partenaire_id=partenaire_id if decision == DecisionJury.REORIENTE.value else None,
-        envoyer_mail_candidat=envoyer_mail_candidat,
-        envoyer_mail_conseiller=envoyer_mail_conseiller,
-        envoyer_mail_partenaire=envoyer_mail_partenaire,
+    champs = champs_decision(
+        DecisionJury(decision), commentaires, conseiller_id, promotion_id, partenaire_id,
+        envoyer_mail_candidat, envoyer_mail_conseiller, envoyer_mail_partenaire,
     )
+    decision_obj = DecisionJuryCandidat(candidat_id=candidat_id, jury_id=jury_id, **champs)
     
     session.add(decision_obj)
     session.flush()
@@ -159,15 +141,7 @@ def create_jury_decision(
         )
         session.add(reorientation)
     
-    session.commit()
-    
-    # TODO: Envoyer les emails selon les cases cochées
-    if envoyer_mail_candidat or envoyer_mail_conseiller or envoyer_mail_partenaire:
-        # Logique d'envoi d'emails à implémenter
-        pass
-    
-    # Log de l'activité
-    from app_lia_web.app.services.ACD.audit import log_activity
+    # Log de l'activité (dans la même transaction que la décision)
     log_activity(
         session=session,
         user=current_user,
@@ -183,19 +157,65 @@ def create_jury_decision(
                 "conseiller": envoyer_mail_conseiller,
                 "partenaire": envoyer_mail_partenaire,
             }
-        }
+        },
+        request=request,
     )
+    session.commit()
+    
+    # TODO: Envoyer les emails selon les cases cochées
+    if envoyer_mail_candidat or envoyer_mail_conseiller or envoyer_mail_partenaire:
+        # Logique d'envoi d'emails à implémenter
+        pass
     
     return RedirectResponse(url=f"{request.url_for('jury_decisions_list')}?jury_id={jury_id}&success=decision_created", status_code=303)
 
 
+@router.post("/jury-decisions/bulk", name="jury_decisions_bulk")
+def bulk_jury_decision(
+    request: Request,
+    jury_id: int = Form(...),
+    decision: str = Form(...),
+    candidat_ids: List[int] = Form(...),
+    commentaires: Optional[str] = Form(None),
+    conseiller_id: Optional[int] = Form(None),
+    promotion_id: Optional[int] = Form(None),
+    partenaire_id: Optional[int] = Form(None),
+    envoyer_mail_candidat: bool = Form(False),
+    envoyer_mail_conseiller: bool = Form(False),
+    envoyer_mail_partenaire: bool = Form(False),
+    session: Session = Depends(get_session),
+    current_user=Depends(get_current_user),
+):
+    """Appliquer une même décision à plusieurs candidats (création ou mise à jour, une requête)"""
+    
+    if not session.get(Jury, jury_id):
+        raise HTTPException(status_code=404, detail="Jury introuvable")
+    try:
+        champs = champs_decision(
+            DecisionJury(decision), commentaires, conseiller_id, promotion_id, partenaire_id,
+            envoyer_mail_candidat, envoyer_mail_conseiller, envoyer_mail_partenaire,
+        )
+        resultat = appliquer_decision_lot(
+            session, user=current_user, jury_id=jury_id, candidat_ids=candidat_ids, champs=champs, request=request,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if "application/json" in request.headers.get("accept", ""):
+        return resultat
+    return RedirectResponse(
+        url=f"{request.url_for('jury_decisions_list')}?jury_id={jury_id}&success=decisions_bulk&nb={len(resultat['decisions'])}",
+        status_code=303,
+    )
+
+
 @router.post("/jury-decisions/{decision_id}/update")
 def update_jury_decision(
+    request: Request,
     decision_id: int,
     decision: str = Form(...),
     commentaires: Optional[str] = Form(None),
     conseiller_id: Optional[int] = Form(None),
-    groupe_codev: Optional[str] = Form(None),
     promotion_id: Optional[int] = Form(None),
     partenaire_id: Optional[int] = Form(None),
     envoyer_mail_candidat: bool = Form(False),
@@ -211,15 +231,12 @@ def update_jury_decision(
         raise HTTPException(status_code=404, detail="Décision introuvable")
     
     # Mettre à jour les champs
-    decision_obj.decision = DecisionJury(decision)
-    decision_obj.commentaires = commentaires
-    decision_obj.conseiller_id = conseiller_id if decision == DecisionJury.VALIDE.value else None
-    decision_obj.groupe_codev = groupe_codev if decision == DecisionJury.VALIDE.value else None
-    decision_obj.promotion_id = promotion_id if decision == DecisionJury.VALIDE.value else None
-    decision_obj.partenaire_id = partenaire_id if decision == DecisionJury.REORIENTE.value else None
-    decision_obj.envoyer_mail_candidat = envoyer_mail_candidat
-    decision_obj.envoyer_mail_conseiller = envoyer_mail_conseiller
-    decision_obj.envoyer_mail_partenaire = envoyer_mail_partenaire
+    champs = champs_decision(
+        DecisionJury(decision), commentaires, conseiller_id, promotion_id, partenaire_id,
+        envoyer_mail_candidat, envoyer_mail_conseiller, envoyer_mail_partenaire,
+    )
+    for champ, valeur in champs.items():
+        setattr(decision_obj, champ, valeur)
     decision_obj.date_decision = datetime.now(timezone.utc)
     
     # Mettre à jour le statut du candidat
@@ -227,10 +244,7 @@ def update_jury_decision(
     if candidat:
         candidat.statut = decision
     
-    session.commit()
-    
     # Log de l'activité
-    from app_lia_web.app.services.ACD.audit import log_activity
     log_activity(
         session=session,
         user=current_user,
@@ -244,14 +258,17 @@ def update_jury_decision(
                 "conseiller": envoyer_mail_conseiller,
                 "partenaire": envoyer_mail_partenaire,
             }
-        }
+        },
+        request=request,
     )
+    session.commit()
     
     return RedirectResponse(url=f"{request.url_for('jury_decisions_list')}?jury_id={decision_obj.jury_id}&success=decision_updated", status_code=303)
 
 
 @router.post("/jury-decisions/{decision_id}/delete")
 def delete_jury_decision(
+    request: Request,
     decision_id: int,
     session: Session = Depends(get_session),
     current_user=Depends(get_current_user),
@@ -263,24 +280,21 @@ def delete_jury_decision(
         raise HTTPException(status_code=404, detail="Décision introuvable")
     
     jury_id = decision_obj.jury_id
+    candidat_id = decision_obj.candidat_id
     
     # Remettre le candidat en attente
-    candidat = session.get(Candidat, decision_obj.candidat_id)
+    candidat = session.get(Candidat, candidat_id)
     if candidat:
         candidat.statut = DecisionJury.EN_ATTENTE.value
     
     # Supprimer les réorientations associées
-    session.exec(
-        select(ReorientationCandidat).where(
-            ReorientationCandidat.decision_jury_id == decision_id
-        )
+    session.execute(
+        delete(ReorientationCandidat).where(ReorientationCandidat.decision_jury_id == decision_id)
     )
     
     session.delete(decision_obj)
-    session.commit()
     
     # Log de l'activité
-    from app_lia_web.app.services.ACD.audit import log_activity
     log_activity(
         session=session,
         user=current_user,
@@ -288,9 +302,11 @@ def delete_jury_decision(
         entity="DecisionJuryCandidat",
         entity_id=decision_id,
         activity_data={
-            "candidat_id": decision_obj.candidat_id,
+            "candidat_id": candidat_id,
             "jury_id": jury_id,
-        }
+        },
+        request=request,
     )
+    session.commit()
     
     return RedirectResponse(url=f"{request.url_for('jury_decisions_list')}?jury_id={jury_id}&success=decision_deleted", status_code=303)
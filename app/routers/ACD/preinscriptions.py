@@ -9,9 +9,10 @@ from pathlib import Path
 from typing import Optional, Set
 
 from fastapi import (
-    APIRouter, Request, Depends, Form, HTTPException,
+    APIRouter, BackgroundTasks, Request, Depends, Form, HTTPException,
     Query, UploadFile, File
 )
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy import func
 from sqlmodel import Session, select
@@ -40,6 +41,7 @@ except Exception:
 from app_lia_web.app.services.geocoding import geocode_one
 from app_lia_web.app.services.ACD.eligibilite import evaluate_eligibilite, entreprise_age_annees
 from app_lia_web.app.services.uploads import validate_upload  # limites taille/type
+from app_lia_web.app.services import preinscription_import_service as import_service
 
 router = APIRouter()
 
@@ -188,6 +190,80 @@ def preinscriptions(
         },
     )
 
+# --------- IMPORT EN MASSE (CSV / XLSX) ---------
+def _import_context(request: Request, session: Session, current_user, programme_code: Optional[str], **extra):
+    progs = session.exec(select(Programme).where(Programme.actif.is_(True))).all()
+    return {
+        "request": request,
+        "settings": settings,
+        "utilisateur": current_user,
+        "progs": progs,
+        "current_programme": programme_code or "ACD",
+        "colonnes": import_service.COLONNES,
+        "colonnes_obligatoires": import_service.COLONNES_OBLIGATOIRES,
+        "lignes_max": import_service.IMPORT_LIGNES_MAX,
+        "taille_max_mo": import_service.IMPORT_TAILLE_MAX_MO,
+        **extra,
+    }
+
+
+@router.get("/preinscriptions/import", name="preinscriptions_import_form", response_class=HTMLResponse)
+def preinscriptions_import_form(
+    request: Request,
+    session: Session = Depends(get_session),
+    programme: Optional[str] = Query(None),
+    current_user=Depends(get_current_user),
+):
+    return templates.TemplateResponse(
+        "programme/preinscriptions_import.html",
+        _import_context(request, session, current_user, programme),
+    )
+
+
+@router.post("/preinscriptions/import", name="preinscriptions_import")
+def preinscriptions_import(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    programme_code: str = Form(...),
+    fichier: UploadFile = File(...),
+    session: Session = Depends(get_session),
+    current_user=Depends(get_current_user),
+):
+    """Import d'un fichier de préinscriptions ; éligibilité et géocodage en tâche de fond"""
+    # Les navigateurs annoncent le CSV sous des types variés : seule l'extension est contrôlée
+    validate_upload(fichier, allowed_mime_types=(), max_mb=import_service.IMPORT_TAILLE_MAX_MO, field_name="fichier")
+    prog = session.exec(select(Programme).where(Programme.code == programme_code)).first()
+    if not prog:
+        raise HTTPException(status_code=404, detail=f"Programme {programme_code} introuvable")
+
+    try:
+        rapport = import_service.importer_preinscriptions(session, prog, fichier.file, fichier.filename)
+    except ValueError as e:
+        session.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if rapport.preinscription_ids:
+        background_tasks.add_task(
+            import_service.traiter_en_arriere_plan, rapport.preinscription_ids, rapport.entreprise_ids
+        )
+
+    if "application/json" in request.headers.get("accept", ""):
+        return rapport.to_dict()
+    return templates.TemplateResponse(
+        "programme/preinscriptions_import.html",
+        _import_context(request, session, current_user, programme_code, rapport=rapport),
+    )
+
+
+def _ajouter(session: Session, obj, commit: bool = False) -> None:
+    """Ajoute obj à la session puis flush (id disponible) ou commit"""
+    session.add(obj)
+    if commit:
+        session.commit()
+    else:
+        session.flush()
+
+
 # --------- SOUMISSION PUBLIQUE (sans token) AVEC UPLOAD PHOTO + DOCS ---------
 @router.post("/preinscriptions/submit")
 async def preinscription_public_submit(
@@ -221,31 +297,6 @@ async def preinscription_public_submit(
         print(f"   - adresse_personnelle: {adresse_personnelle}")
         print(f"   - photo_profil: {photo_profil.filename if photo_profil else 'Aucune'}")
     
-    prog = session.exec(select(Programme).where(Programme.code == programme_code)).first()
-    if not prog:
-        if settings.DEBUG:
-            print(f"❌ [DEBUG] Programme '{programme_code}' introuvable")
-        
-        # Récupérer tous les programmes actifs pour la liste déroulante
-        programmes_actifs = session.exec(select(Programme).where(Programme.actif.is_(True)).order_by(Programme.code)).all()
-        
-        # Retourner une page d'erreur claire au lieu d'une exception
-        return templates.TemplateResponse(
-            "programme/preinscription_public_form.html",
-            {
-                "request": request,
-                "settings": settings,
-                "programme": None,
-                "error": f"Le programme '{programme_code}' n'existe pas dans notre base de données. Veuillez contacter l'administrateur ou choisir un autre programme.",
-                "doc_types": DOC_TYPES_DEFAULT,
-                "programmes_actifs": programmes_actifs,  # Programmes disponibles
-            },
-            status_code=400
-        )
-    
-    if settings.DEBUG:
-        print(f"✅ [DEBUG] Programme trouvé: {prog.code} - {prog.nom}")
-
     dn = _date.fromisoformat(date_naissance)
     dce = _date.fromisoformat(date_creation_entreprise) if date_creation_entreprise else None
     # Le chiffre d'affaires est un intervalle (string), pas un nombre
@@ -253,96 +304,129 @@ async def preinscription_public_submit(
     if settings.DEBUG:
         print(f"💰 [DEBUG] Chiffre d'affaires (intervalle): {ca_string}")
 
-    cand = session.exec(select(Candidat).where(Candidat.email == email)).first()
-    if not cand:
-        if settings.DEBUG:
-            print(f"🆕 [DEBUG] Création nouveau candidat: {email}")
-        cand = Candidat(email=email, nom=nom, prenom=prenom)
-        session.add(cand)
-        session.flush()
-    else:
+    # Route async (géocodage, fichiers, QPV) : les accès base passent par le pool de threads
+    def _charger_candidat():
+        """Programme, candidat et entreprise à jour ; réponse d'erreur si la préinscription est refusée"""
+        prog = session.exec(select(Programme).where(Programme.code == programme_code)).first()
+        if not prog:
+            if settings.DEBUG:
+                print(f"❌ [DEBUG] Programme '{programme_code}' introuvable")
+        
+            # Récupérer tous les programmes actifs pour la liste déroulante
+            programmes_actifs = session.exec(select(Programme).where(Programme.actif.is_(True)).order_by(Programme.code)).all()
+        
+            # Retourner une page d'erreur claire au lieu d'une exception
+            return templates.TemplateResponse(
+                "programme/preinscription_public_form.html",
+                {
+                    "request": request,
+                    "settings": settings,
+                    "programme": None,
+                    "error": f"Le programme '{programme_code}' n'existe pas dans notre base de données. Veuillez contacter l'administrateur ou choisir un autre programme.",
+                    "doc_types": DOC_TYPES_DEFAULT,
+                    "programmes_actifs": programmes_actifs,  # Programmes disponibles
+                },
+                status_code=400
+            ), None, None, None
+    
         if settings.DEBUG:
-            print(f"🔄 [DEBUG] Candidat existant mis à jour: {email}")
+            print(f"✅ [DEBUG] Programme trouvé: {prog.code} - {prog.nom}")
+
+        cand = session.exec(select(Candidat).where(Candidat.email == email)).first()
+        if not cand:
+            if settings.DEBUG:
+                print(f"🆕 [DEBUG] Création nouveau candidat: {email}")
+            cand = Candidat(email=email, nom=nom, prenom=prenom)
+            session.add(cand)
+            session.flush()
+        else:
+            if settings.DEBUG:
+                print(f"🔄 [DEBUG] Candidat existant mis à jour: {email}")
     
-    # Vérifier si le candidat est déjà inscrit à ce programme
-    existing_inscription = session.exec(
-        select(Inscription).where(
-            (Inscription.candidat_id == cand.id) & 
-            (Inscription.programme_id == prog.id)
-        )
-    ).first()
+        # Vérifier si le candidat est déjà inscrit à ce programme
+        existing_inscription = session.exec(
+            select(Inscription).where(
+                (Inscription.candidat_id == cand.id) & 
+                (Inscription.programme_id == prog.id)
+            )
+        ).first()
     
-    if existing_inscription:
-        if settings.DEBUG:
-            print(f"⚠️ [DEBUG] Candidat déjà inscrit au programme {prog.code}")
+        if existing_inscription:
+            if settings.DEBUG:
+                print(f"⚠️ [DEBUG] Candidat déjà inscrit au programme {prog.code}")
         
-        # Retourner une erreur claire
-        programmes_actifs = session.exec(select(Programme).where(Programme.actif.is_(True)).order_by(Programme.code)).all()
-        return templates.TemplateResponse(
-            "programme/preinscription_public_form.html",
-            {
-                "request": request,
-                "settings": settings,
-                "programme": prog,
-                "error": f"Vous êtes déjà inscrit au programme '{prog.code} - {prog.nom}'. Vous ne pouvez vous inscrire qu'une seule fois par programme.",
-                "doc_types": DOC_TYPES_DEFAULT,
-                "programmes_actifs": programmes_actifs,
-            },
-            status_code=400
-        )
+            # Retourner une erreur claire
+            programmes_actifs = session.exec(select(Programme).where(Programme.actif.is_(True)).order_by(Programme.code)).all()
+            return templates.TemplateResponse(
+                "programme/preinscription_public_form.html",
+                {
+                    "request": request,
+                    "settings": settings,
+                    "programme": prog,
+                    "error": f"Vous êtes déjà inscrit au programme '{prog.code} - {prog.nom}'. Vous ne pouvez vous inscrire qu'une seule fois par programme.",
+                    "doc_types": DOC_TYPES_DEFAULT,
+                    "programmes_actifs": programmes_actifs,
+                },
+                status_code=400
+            ), None, None, None
     
-    # Vérifier si le candidat est déjà préinscrit à ce programme
-    existing_preinscription = session.exec(
-        select(Preinscription).where(
-            (Preinscription.candidat_id == cand.id) & 
-            (Preinscription.programme_id == prog.id)
-        )
-    ).first()
+        # Vérifier si le candidat est déjà préinscrit à ce programme
+        existing_preinscription = session.exec(
+            select(Preinscription).where(
+                (Preinscription.candidat_id == cand.id) & 
+                (Preinscription.programme_id == prog.id)
+            )
+        ).first()
     
-    if existing_preinscription:
-        if settings.DEBUG:
-            print(f"⚠️ [DEBUG] Candidat déjà préinscrit au programme {prog.code}")
+        if existing_preinscription:
+            if settings.DEBUG:
+                print(f"⚠️ [DEBUG] Candidat déjà préinscrit au programme {prog.code}")
         
-        # Retourner une erreur claire
-        programmes_actifs = session.exec(select(Programme).where(Programme.actif.is_(True)).order_by(Programme.code)).all()
-        return templates.TemplateResponse(
-            "programme/preinscription_public_form.html",
-            {
-                "request": request,
-                "settings": settings,
-                "programme": prog,
-                "error": f"Vous êtes déjà préinscrit au programme '{prog.code} - {prog.nom}'. Vous ne pouvez vous préinscrire qu'une seule fois par programme.",
-                "doc_types": DOC_TYPES_DEFAULT,
-                "programmes_actifs": programmes_actifs,
-            },
-            status_code=400
-        )
+            # Retourner une erreur claire
+            programmes_actifs = session.exec(select(Programme).where(Programme.actif.is_(True)).order_by(Programme.code)).all()
+            return templates.TemplateResponse(
+                "programme/preinscription_public_form.html",
+                {
+                    "request": request,
+                    "settings": settings,
+                    "programme": prog,
+                    "error": f"Vous êtes déjà préinscrit au programme '{prog.code} - {prog.nom}'. Vous ne pouvez vous préinscrire qu'une seule fois par programme.",
+                    "doc_types": DOC_TYPES_DEFAULT,
+                    "programmes_actifs": programmes_actifs,
+                },
+                status_code=400
+            ), None, None, None
     
-    cand.civilite = civilite
-    cand.date_naissance = dn
-    cand.telephone = telephone
-    cand.adresse_personnelle = adresse_personnelle
-    cand.niveau_etudes = niveau_etudes
-    cand.secteur_activite = secteur_activite
-
-    ent = session.exec(select(Entreprise).where(Entreprise.candidat_id == cand.id)).first()
-    if not ent:
-        if settings.DEBUG:
-            print(f"🏢 [DEBUG] Création nouvelle entreprise pour candidat {cand.id}")
-        ent = Entreprise(candidat_id=cand.id)
-        session.add(ent)
-        session.flush()
-    else:
-        if settings.DEBUG:
-            print(f"🏢 [DEBUG] Entreprise existante mise à jour pour candidat {cand.id}")
+        cand.civilite = civilite
+        cand.date_naissance = dn
+        cand.telephone = telephone
+        cand.adresse_personnelle = adresse_personnelle
+        cand.niveau_etudes = niveau_etudes
+        cand.secteur_activite = secteur_activite
+
+        ent = session.exec(select(Entreprise).where(Entreprise.candidat_id == cand.id)).first()
+        if not ent:
+            if settings.DEBUG:
+                print(f"🏢 [DEBUG] Création nouvelle entreprise pour candidat {cand.id}")
+            ent = Entreprise(candidat_id=cand.id)
+            session.add(ent)
+            session.flush()
+        else:
+            if settings.DEBUG:
+                print(f"🏢 [DEBUG] Entreprise existante mise à jour pour candidat {cand.id}")
     
-    ent.adresse = adresse_entreprise
-    ent.date_creation = dce
-    ent.siret = siret
-    ent.chiffre_affaires = ca_string
+        ent.adresse = adresse_entreprise
+        ent.date_creation = dce
+        ent.siret = siret
+        ent.chiffre_affaires = ca_string
     
-    if settings.DEBUG:
-        print(f"🏢 [DEBUG] Entreprise mise à jour - CA: {ent.chiffre_affaires}, SIRET: {ent.siret}")
+        if settings.DEBUG:
+            print(f"🏢 [DEBUG] Entreprise mise à jour - CA: {ent.chiffre_affaires}, SIRET: {ent.siret}")
+        return None, prog, cand, ent
+
+    erreur, prog, cand, ent = await run_in_threadpool(_charger_candidat)
+    if erreur is not None:
+        return erreur
 
     addr_for_geo = adresse_entreprise or adresse_personnelle
     if addr_for_geo:
@@ -358,13 +442,12 @@ async def preinscription_public_submit(
                 print(f"⚠️ [DEBUG] Géocodage échoué pour: {addr_for_geo}")
 
     pre = Preinscription(programme_id=prog.id, candidat_id=cand.id, source="formulaire")
-    session.add(pre)
-    session.flush()
+    await run_in_threadpool(_ajouter, session, pre)
     
     if settings.DEBUG:
         print(f"📝 [DEBUG] Préinscription créée avec ID: {pre.id}")
 
-    media_root = ensure_media_root()
+    media_root = await run_in_threadpool(ensure_media_root)
     base_dir = media_root / "Preinscrits" / (prog.code or "UNK") / str(pre.id)
     
     if settings.DEBUG:
@@ -438,8 +521,7 @@ async def preinscription_public_submit(
             taille_octets=None,
             depose_par_id=None,
         )
-        session.add(doc)
-        session.flush()
+        await run_in_threadpool(_ajouter, session, doc)
 
         ext = os.path.splitext(file.filename)[1].lower() or ""
         safe_title = safe_name(title or os.path.splitext(file.filename)[0])
@@ -476,8 +558,7 @@ async def preinscription_public_submit(
         anciennete_annees=details.get("anciennete_annees"),
         verdict=verdict,
     )
-    session.add(el)
-    session.commit()
+    await run_in_threadpool(_ajouter, session, el, True)
 
     # 🔍 RECHERCHE QPV AUTOMATIQUE après création de la préinscription
     try:
@@ -532,8 +613,7 @@ async def preinscription_public_submit(
         import json
         el.qpv_ok = qpv_found
         el.details_json = json.dumps(details_qpv)
-        session.add(el)
-        session.commit()
+        await run_in_threadpool(_ajouter, session, el, True)
         
         print(f"✅ [QPV] Recherche automatique terminée - QPV trouvé: {qpv_found}")
         
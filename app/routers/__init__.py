@@ -36,6 +36,8 @@ from .codev import router as codev_router
 from .elearning import router as elearning_router
 from .suivi_mensuel import router as suivi_mensuel_router
 from .admin_schemas import router as admin_schemas_router
+from .fichiers import router as fichiers_router
+from .metrics import router as metrics_router
 
 # Configuration des routers avec préfixes et tags
 router_configs = [
@@ -78,6 +80,8 @@ router_configs = [
     (video_router, "", ["video"]),
     (emargement_router, "", ["emargement"]),
     (password_recovery_router, "", ["password_recovery"]),
+    (fichiers_router, "", ["fichiers"]),
+    (metrics_router, "", ["metrics"]),
 ]
 
 # Export des routers individuels pour utilisation spécifique
@@ -105,5 +109,7 @@ __all__ = [
     "elearning_router",
     "suivi_mensuel_router",
     "admin_schemas_router",
+    "fichiers_router",
+    "metrics_router",
     "router_configs",
 ]
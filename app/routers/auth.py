@@ -2,6 +2,7 @@
 Router pour l'authentification et les utilisateurs
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Form, File, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import Session, select
 from typing import List, Optional
@@ -26,7 +27,7 @@ router = APIRouter()
 
 
 @router.post("/users", response_model=UserResponse)
-async def create_user(
+def create_user(
     user_data: UserCreate,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -57,7 +58,7 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 
 
 @router.get("/users", response_model=List[UserResponse])
-async def get_users(
+def get_users(
     role: str = None,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -78,7 +79,7 @@ async def get_users(
 
 
 @router.put("/users/{user_id}", response_model=UserResponse)
-async def update_user(
+def update_user(
     user_id: int,
     user_data: UserUpdate,
     session: Session = Depends(get_session),
@@ -103,7 +104,7 @@ async def update_user(
 
 
 @router.delete("/users/{user_id}")
-async def delete_user(
+def delete_user(
     user_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -150,7 +151,7 @@ async def profil_page(
 
 
 @router.post("/profil/update", name="profil_update")
-async def profil_update(
+def profil_update(
     request: Request,
     nom_complet: str = Form(...),
     email: str = Form(...),
@@ -193,7 +194,7 @@ async def profil_update(
 
 
 @router.post("/profil/change-password", name="profil_change_password")
-async def profil_change_password(
+def profil_change_password(
     request: Request,
     current_password: str = Form(...),
     new_password: str = Form(...),
@@ -253,39 +254,13 @@ async def profil_photo(
                 status_code=303
             )
         
-        # Sauvegarder l'ancienne photo pour la supprimer après
-        old_photo_path = current_user.photo_profil
-        
         # Générer un nom de fichier unique
         ext = os.path.splitext(photo_profil.filename)[1].lower() or ".jpg"
         filename = f"user_{current_user.id}_profile{ext}"
+        content = await photo_profil.read()
         
-        # Sauvegarder le fichier
-        from app_lia_web.core.path_config import path_config
-        upload_dir = path_config.UPLOAD_DIR / "profiles"
-        upload_dir.mkdir(exist_ok=True)
-        
-        file_path = upload_dir / filename
-        
-        with open(file_path, "wb") as buffer:
-            content = await photo_profil.read()
-            buffer.write(content)
-        
-        # Mettre à jour le chemin dans la base
-        relative_path = f"/profiles/{filename}"
-        current_user.photo_profil = relative_path
-        current_user.modifie_le = datetime.now(timezone.utc)
-        
-        session.commit()
-        
-        # Supprimer l'ancienne photo si elle existe
-        if old_photo_path:
-            try:
-                old_path = Path("." + old_photo_path)
-                if old_path.exists():
-                    old_path.unlink()
-            except Exception as e:
-                print(f"⚠️ Impossible de supprimer l'ancienne photo: {e}")
+        # Écriture du fichier et mise à jour en base dans le pool de threads
+        await run_in_threadpool(_enregistrer_photo_profil, session, current_user, filename, content)
         
         return RedirectResponse(
             url=f"/auth/profil?success=photo_updated", 
@@ -298,3 +273,35 @@ async def profil_photo(
             url=f"/auth/profil?error=photo_update_failed", 
             status_code=303
         )
+
+
+def _enregistrer_photo_profil(session: Session, current_user: User, filename: str, content: bytes) -> None:
+    """Écrit la nouvelle photo, met à jour l'utilisateur et supprime l'ancienne photo"""
+    # Sauvegarder l'ancienne photo pour la supprimer après
+    old_photo_path = current_user.photo_profil
+    
+    # Sauvegarder le fichier
+    from app_lia_web.core.path_config import path_config
+    upload_dir = path_config.UPLOAD_DIR / "profiles"
+    upload_dir.mkdir(exist_ok=True)
+    
+    file_path = upload_dir / filename
+    
+    with open(file_path, "wb") as buffer:
+        buffer.write(content)
+    
+    # Mettre à jour le chemin dans la base
+    relative_path = f"/profiles/{filename}"
+    current_user.photo_profil = relative_path
+    current_user.modifie_le = datetime.now(timezone.utc)
+    
+    session.commit()
+    
+    # Supprimer l'ancienne photo si elle existe
+    if old_photo_path:
+        try:
+            old_path = Path("." + old_photo_path)
+            if old_path.exists():
+                old_path.unlink()
+        except Exception as e:
+            print(f"⚠️ Impossible de supprimer l'ancienne photo: {e}")
@@ -19,7 +19,7 @@ from app_lia_web.app.services import CandidatService, EntrepriseService
 router = APIRouter()
 
 @router.post("/candidats", response_model=CandidatResponse)
-async def create_candidat(
+def create_candidat(
     candidat_data: CandidatCreate,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -38,7 +38,7 @@ async def create_candidat(
 
 
 @router.get("/candidats", response_model=PaginatedResponse)
-async def get_candidats(
+def get_candidats(
     programme_id: Optional[int] = Query(None, description="Filtrer par programme"),
     statut: Optional[StatutDossier] = Query(None, description="Filtrer par statut"),
     handicap: Optional[bool] = Query(None, description="Filtrer par handicap"),
@@ -69,7 +69,7 @@ async def get_candidats(
 
 
 @router.get("/candidats/{candidat_id}", response_model=CandidatResponse)
-async def get_candidat(
+def get_candidat(
     candidat_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -86,7 +86,7 @@ async def get_candidat(
 
 
 @router.put("/candidats/{candidat_id}", response_model=CandidatResponse)
-async def update_candidat(
+def update_candidat(
     candidat_id: int,
     candidat_data: CandidatUpdate,
     session: Session = Depends(get_session),
@@ -111,7 +111,7 @@ async def update_candidat(
 
 
 @router.post("/candidats/{candidat_id}/entreprise", response_model=EntrepriseResponse)
-async def create_entreprise(
+def create_entreprise(
     candidat_id: int,
     entreprise_data: EntrepriseCreate,
     session: Session = Depends(get_session),
@@ -140,7 +140,7 @@ async def create_entreprise(
 
 
 @router.get("/candidats/{candidat_id}/entreprise", response_model=EntrepriseResponse)
-async def get_entreprise(
+def get_entreprise(
     candidat_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -157,7 +157,7 @@ async def get_entreprise(
 
 
 @router.put("/candidats/{candidat_id}/entreprise", response_model=EntrepriseResponse)
-async def update_entreprise(
+def update_entreprise(
     candidat_id: int,
     entreprise_data: EntrepriseUpdate,
     session: Session = Depends(get_session),
@@ -184,7 +184,7 @@ async def update_entreprise(
 
 
 @router.post("/candidats/{candidat_id}/entreprise/pappers")
-async def update_entreprise_from_pappers(
+def update_entreprise_from_pappers(
     candidat_id: int,
     siret: str,
     session: Session = Depends(get_session),
@@ -209,7 +209,7 @@ async def update_entreprise_from_pappers(
 
 
 @router.post("/candidats/{candidat_id}/entreprise/qpv")
-async def check_qpv_status(
+def check_qpv_status(
     candidat_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -232,7 +232,7 @@ async def check_qpv_status(
 
 
 @router.get("/candidats/{candidat_id}/preinscriptions")
-async def get_candidat_preinscriptions(
+def get_candidat_preinscriptions(
     candidat_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -46,7 +46,7 @@ def codev_access_required(current_user: User):
 # ===== ROUTES WEB =====
 
 @router.get("/", name="codev_dashboard", response_class=HTMLResponse)
-async def codev_dashboard(
+def codev_dashboard(
     request: Request,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
@@ -86,7 +86,7 @@ async def codev_dashboard(
     )
 
 @router.get("/cycles", response_class=HTMLResponse)
-async def codev_cycles(
+def codev_cycles(
     request: Request,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
@@ -119,7 +119,7 @@ async def codev_cycles(
     )
 
 @router.get("/cycles/creer", response_class=HTMLResponse)
-async def codev_cycles_creer(
+def codev_cycles_creer(
     request: Request,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -156,7 +156,7 @@ async def codev_cycles_creer(
     )
 
 @router.post("/cycles/creer")
-async def codev_cycles_creer_post(
+def codev_cycles_creer_post(
     request: Request,
     nom: str = Form(...),
     description: Optional[str] = Form(None),
@@ -203,7 +203,7 @@ async def codev_cycles_creer_post(
         )
 
 @router.get("/cycles/{cycle_id}", response_class=HTMLResponse)
-async def codev_cycle_detail(
+def codev_cycle_detail(
     cycle_id: int,
     request: Request,
     session: Session = Depends(get_session),
@@ -237,7 +237,7 @@ async def codev_cycle_detail(
     )
 
 @router.get("/groupes", response_class=HTMLResponse)
-async def codev_groupes(
+def codev_groupes(
     request: Request,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
@@ -268,7 +268,7 @@ async def codev_groupes(
     )
 
 @router.get("/groupes/creer", response_class=HTMLResponse)
-async def codev_groupes_creer(
+def codev_groupes_creer(
     request: Request,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
@@ -308,7 +308,7 @@ async def codev_groupes_creer(
     )
 
 @router.post("/groupes/creer")
-async def codev_groupes_creer_post(
+def codev_groupes_creer_post(
     request: Request,
     cycle_id: int = Form(...),
     groupe_id: int = Form(...),
@@ -344,7 +344,7 @@ async def codev_groupes_creer_post(
         )
 
 @router.get("/statistiques", response_class=HTMLResponse)
-async def codev_statistiques(
+def codev_statistiques(
     request: Request,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -352,36 +352,8 @@ async def codev_statistiques(
     """Statistiques du système de codéveloppement"""
     codev_access_required(current_user)
     
-    # Statistiques générales
-    nb_cycles = session.exec(select(func.count()).select_from(CycleCodev)).one()
-    nb_groupes = session.exec(select(func.count()).select_from(GroupeCodev)).one()
-    nb_membres = session.exec(select(func.count()).select_from(MembreGroupeCodev)).one()
-    nb_seances = session.exec(select(func.count()).select_from(SeanceCodev)).one()
-    nb_presentations = session.exec(select(func.count()).select_from(PresentationCodev)).one()
-    
-    # Cycles par statut
-    cycles_par_statut = session.exec(
-        select(CycleCodev.statut, func.count())
-        .group_by(CycleCodev.statut)
-    ).all()
-    
-    # Groupes par statut
-    groupes_par_statut = session.exec(
-        select(GroupeCodev.statut, func.count())
-        .group_by(GroupeCodev.statut)
-    ).all()
-    
-    # Séances par statut
-    seances_par_statut = session.exec(
-        select(SeanceCodev.statut, func.count())
-        .group_by(SeanceCodev.statut)
-    ).all()
-    
-    # Présentations par statut
-    presentations_par_statut = session.exec(
-        select(PresentationCodev.statut, func.count())
-        .group_by(PresentationCodev.statut)
-    ).all()
+    # Totaux et répartitions par statut : une seule requête
+    stats = CodevService.get_statistiques_globales(session)
     
     # Cycles récents
     cycles_recents = session.exec(
@@ -405,15 +377,7 @@ async def codev_statistiques(
         {
             "request": request,
             "utilisateur": current_user,
-            "nb_cycles": nb_cycles,
-            "nb_groupes": nb_groupes,
-            "nb_membres": nb_membres,
-            "nb_seances": nb_seances,
-            "nb_presentations": nb_presentations,
-            "cycles_par_statut": cycles_par_statut,
-            "groupes_par_statut": groupes_par_statut,
-            "seances_par_statut": seances_par_statut,
-            "presentations_par_statut": presentations_par_statut,
+            **stats,
             "cycles_recents": cycles_recents,
             "groupes_populaires": groupes_populaires,
             "settings": settings
@@ -421,7 +385,7 @@ async def codev_statistiques(
     )
 
 @router.get("/seances", response_class=HTMLResponse)
-async def codev_seances(
+def codev_seances(
     request: Request,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
@@ -456,7 +420,7 @@ async def codev_seances(
     )
 
 @router.get("/seances/creer", response_class=HTMLResponse)
-async def codev_seance_creer_form(
+def codev_seance_creer_form(
     request: Request,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -489,7 +453,7 @@ async def codev_seance_creer_form(
     )
 
 @router.post("/seances/creer")
-async def codev_seance_creer(
+def codev_seance_creer(
     request: Request,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
@@ -535,7 +499,7 @@ async def codev_seance_creer(
         )
 
 @router.get("/presentations/{presentation_id}", response_class=HTMLResponse)
-async def codev_presentation_detail(
+def codev_presentation_detail(
     presentation_id: int,
     request: Request,
     session: Session = Depends(get_session),
@@ -569,7 +533,7 @@ async def codev_presentation_detail(
 # ===== ROUTES API =====
 
 @router.get("/api/codev/cycles", response_model=List[CycleCodevResponse])
-async def api_cycles(
+def api_cycles(
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
     statut: Optional[StatutCycleCodev] = Query(None)
@@ -585,7 +549,7 @@ async def api_cycles(
     return cycles
 
 @router.post("/api/codev/cycles", response_model=CycleCodevResponse)
-async def api_create_cycle(
+def api_create_cycle(
     cycle_data: CycleCodevCreate,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -607,7 +571,7 @@ async def api_create_cycle(
     return cycle
 
 @router.get("/api/codev/cycles/{cycle_id}/statistiques", response_model=StatistiquesCycleCodev)
-async def api_cycle_stats(
+def api_cycle_stats(
     cycle_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -619,7 +583,7 @@ async def api_cycle_stats(
     return stats
 
 @router.post("/api/codev/seances/{seance_id}/planifier")
-async def api_planifier_seance(
+def api_planifier_seance(
     seance_id: int,
     planification: PlanificationSeance,
     session: Session = Depends(get_session),
@@ -628,17 +592,20 @@ async def api_planifier_seance(
     """API: Planifier les présentations d'une séance"""
     codev_access_required(current_user)
     
-    presentations = CodevService.planifier_presentations_seance(
-        session=session,
-        seance_id=seance_id,
-        candidats_ids=planification.candidats_ids,
-        ordre_presentations=planification.ordre_presentations
-    )
+    try:
+        presentations = CodevService.planifier_presentations_seance(
+            session=session,
+            seance_id=seance_id,
+            candidats_ids=planification.candidats_ids,
+            ordre_presentations=planification.ordre_presentations
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
     return {"message": f"{len(presentations)} présentations planifiées"}
 
 @router.post("/api/codev/presentations/{presentation_id}/engagement")
-async def api_prendre_engagement(
+def api_prendre_engagement(
     presentation_id: int,
     engagement: EngagementCandidat,
     session: Session = Depends(get_session),
@@ -657,7 +624,7 @@ async def api_prendre_engagement(
     return {"message": "Engagement pris avec succès"}
 
 @router.post("/api/codev/presentations/{presentation_id}/retour")
-async def api_ajouter_retour(
+def api_ajouter_retour(
     presentation_id: int,
     retour: RetourExperience,
     session: Session = Depends(get_session),
@@ -1,23 +1,25 @@
 """
 Router pour le tableau de bord et les statistiques
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlmodel import Session, select, func
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timezone, timedelta
 
 from app_lia_web.core.database import get_session
 from app_lia_web.core.security import get_current_user
+from app_lia_web.core.sql_budget import budget_sql
 from app_lia_web.app.models.base import User, Preinscription, Inscription, Programme, Jury, Candidat
 from app_lia_web.app.models.enums import UserRole, StatutDossier
 from app_lia_web.app.schemas import StatistiquesResponse
 from app_lia_web.app.services import StatistiquesService
+from app_lia_web.app.services.activity_feed_service import ActivityFeedService, FEED_PAGE_MAX
 
 router = APIRouter()
 
 
 @router.get("/dashboard/stats", response_model=StatistiquesResponse)
-async def get_dashboard_stats(
+def get_dashboard_stats(
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
@@ -27,7 +29,7 @@ async def get_dashboard_stats(
 
 
 @router.get("/dashboard/stats-detaillees")
-async def get_detailed_stats(
+def get_detailed_stats(
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
@@ -99,77 +101,24 @@ async def get_detailed_stats(
 
 
 @router.get("/dashboard/actions-recentes")
-async def get_recent_actions(
-    limit: int = 10,
+@budget_sql(2)
+def get_recent_actions(
+    limit: int = Query(10, ge=1, le=FEED_PAGE_MAX),
+    curseur: Optional[str] = None,
+    programme_id: Optional[int] = None,
+    types: Optional[List[str]] = Query(None),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    """Récupère les actions récentes pour le tableau de bord"""
-    actions = []
-    
-    # Préinscriptions récentes
-    recent_preinscriptions = session.exec(
-        select(Preinscription)
-        .order_by(Preinscription.cree_le.desc())
-        .limit(limit)
-    ).all()
-    
-    for preinscription in recent_preinscriptions:
-        candidat = session.get(Candidat, preinscription.candidat_id)
-        programme = session.get(Programme, preinscription.programme_id)
-        
-        actions.append({
-            "type": "preinscription",
-            "date": preinscription.cree_le,
-            "description": f"Nouvelle préinscription de {candidat.nom} {candidat.prenom} pour {programme.nom}",
-            "statut": preinscription.statut.value,
-            "id": preinscription.id
-        })
-    
-    # Inscriptions récentes
-    recent_inscriptions = session.exec(
-        select(Inscription)
-        .order_by(Inscription.cree_le.desc())
-        .limit(limit)
-    ).all()
-    
-    for inscription in recent_inscriptions:
-        candidat = session.get(Candidat, inscription.candidat_id)
-        programme = session.get(Programme, inscription.programme_id)
-        
-        actions.append({
-            "type": "inscription",
-            "date": inscription.cree_le,
-            "description": f"Nouvelle inscription de {candidat.nom} {candidat.prenom} pour {programme.nom}",
-            "statut": inscription.statut.value,
-            "id": inscription.id
-        })
-    
-    # Jurys récents
-    recent_jurys = session.exec(
-        select(Jury)
-        .order_by(Jury.session_le.desc())
-        .limit(limit)
-    ).all()
-    
-    for jury in recent_jurys:
-        programme = session.get(Programme, jury.programme_id)
-        
-        actions.append({
-            "type": "jury",
-            "date": jury.session_le,
-            "description": f"Session de jury programmée pour {programme.nom}",
-            "statut": jury.statut,
-            "id": jury.id
-        })
-    
-    # Trier par date et limiter
-    actions.sort(key=lambda x: x["date"], reverse=True)
-    return actions[:limit]
+    """Fil d'activité du tableau de bord (défilement infini : passer `next_cursor` en `curseur`)"""
+    try:
+        return ActivityFeedService.get_feed(session, limit=limit, curseur=curseur, programme_id=programme_id, types=types)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.get("/dashboard/alerts")
-async def get_dashboard_alerts(
+def get_dashboard_alerts(
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
@@ -230,7 +179,7 @@ async def get_dashboard_alerts(
 
 
 @router.get("/dashboard/user-stats")
-async def get_user_stats(
+def get_user_stats(
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
@@ -2,7 +2,7 @@
 Router pour la gestion des documents
 """
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
-from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session, select
 from typing import List, Optional
 import os
@@ -17,6 +17,7 @@ from app_lia_web.app.models.enums import UserRole, TypeDocument
 from app_lia_web.app.schemas import DocumentResponse
 from app_lia_web.core.config import settings
 from app_lia_web.core.path_config import path_config
+from app_lia_web.core.file_delivery import reponse_fichier, signer_fichier
 from app_lia_web.app.services.file_upload_service import FileUploadService
 
 router = APIRouter()
@@ -39,8 +40,8 @@ async def upload_document(
             detail="Permissions insuffisantes"
         )
     
-    # Vérifier que le candidat existe
-    candidat = session.get(Candidat, candidat_id)
+    # Route async (écriture du fichier en aiofiles) : les accès base passent par le pool de threads
+    candidat = await run_in_threadpool(session.get, Candidat, candidat_id)
     if not candidat:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -48,9 +49,6 @@ async def upload_document(
         )
     
     # Vérifier le type de fichier
-    from app_lia_web.core.config import Settings
-    settings = Settings()
-    
     if not FileUtils.is_allowed_file(file.filename, settings.ALLOWED_DOC_EXTENSIONS):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -100,15 +98,19 @@ async def upload_document(
         depose_le=datetime.now(timezone.utc)
     )
     
+    document = await run_in_threadpool(_enregistrer_document, session, document)
+    return DocumentResponse.from_orm(document)
+
+
+def _enregistrer_document(session: Session, document: Document) -> Document:
     session.add(document)
     session.commit()
     session.refresh(document)
-    
-    return DocumentResponse.from_orm(document)
+    return document
 
 
 @router.get("/documents", response_model=List[DocumentResponse])
-async def get_documents(
+def get_documents(
     candidat_id: Optional[int] = Query(None, description="Filtrer par candidat"),
     type_document: Optional[TypeDocument] = Query(None, description="Filtrer par type de document"),
     session: Session = Depends(get_session),
@@ -129,7 +131,7 @@ async def get_documents(
 
 
 @router.get("/documents/{document_id}", response_model=DocumentResponse)
-async def get_document(
+def get_document(
     document_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -146,7 +148,7 @@ async def get_document(
 
 
 @router.get("/documents/{document_id}/download")
-async def download_document(
+def download_document(
     document_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -167,15 +169,35 @@ async def download_document(
             detail="Fichier non trouvé sur le serveur"
         )
     
-    return FileResponse(
-        path=str(file_path),
-        filename=document.nom_fichier,
-        media_type=document.mimetype
-    )
+    return reponse_fichier(file_path, filename=document.nom_fichier, media_type=document.mimetype)
+
+
+@router.get("/documents/{document_id}/lien")
+def document_signed_link(
+    document_id: int,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Lien de téléchargement signé et temporaire (servi sans session, par nginx si configuré)"""
+    document = session.get(Document, document_id)
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document non trouvé"
+        )
+    
+    file_path = path_config.get_physical_path("media", document.chemin_fichier)
+    if not file_path.exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Fichier non trouvé sur le serveur"
+        )
+    
+    return {"url": signer_fichier(file_path), "expire_dans": settings.SIGNED_URL_TTL_SECONDS}
 
 
 @router.delete("/documents/{document_id}")
-async def delete_document(
+def delete_document(
     document_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -212,7 +234,7 @@ async def delete_document(
 
 
 @router.put("/documents/{document_id}")
-async def update_document(
+def update_document(
     document_id: int,
     titre: Optional[str] = None,
     type_document: Optional[TypeDocument] = None,
@@ -249,7 +271,7 @@ async def update_document(
 
 
 @router.get("/candidats/{candidat_id}/documents")
-async def get_candidat_documents(
+def get_candidat_documents(
     candidat_id: int,
     type_document: Optional[TypeDocument] = Query(None, description="Filtrer par type de document"),
     session: Session = Depends(get_session),
@@ -1,6 +1,7 @@
 # app/routers/elearning.py
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, JSONResponse, Response
 from fastapi import UploadFile, File, Form
 from sqlmodel import Session, select
 from typing import List, Optional
@@ -16,7 +17,9 @@ from app_lia_web.app.models.elearning import (
     ModuleRessource
 )
 from app_lia_web.app.services.elearning_service import ElearningService
+from app_lia_web.app.services import elearning_rollup
 from app_lia_web.app.services.file_upload_service import FileUploadService
+from app_lia_web.app.services.chunked_upload_service import ChunkedUploadService, CHUNKED_RESOURCE_TYPES
 from app_lia_web.app.schemas.elearning import (
     RessourceElearningCreate, RessourceElearningUpdate,
     ModuleElearningCreate, ModuleElearningUpdate,
@@ -32,10 +35,30 @@ from app_lia_web.app.templates import templates
 
 router = APIRouter()
 
+
+def _programmes_actifs(session: Session) -> List[Programme]:
+    return session.exec(select(Programme).where(Programme.actif == True)).all()
+
+
+def _creer_ressource(session: Session, ressource_data: RessourceElearningCreate, user_id: int,
+                     module_id: Optional[int], ordre: int, obligatoire: bool) -> tuple:
+    """Crée la ressource puis l'associe au module ; renvoie (ressource, erreur d'association ou None)"""
+    res = ElearningService.create_ressource(session, ressource_data, user_id)
+    if module_id is None:
+        return res, None
+    try:
+        print(f"🔗 Association au module {module_id}...")
+        ElearningService.add_ressource_to_module(session, module_id, res.id, ordre=ordre, obligatoire=obligatoire)
+        print(f"✅ Ressource {res.id} associée au module {module_id}")
+        return res, None
+    except Exception as e:
+        print(f"⚠️ Erreur association module: {e}")
+        return res, str(e)
+
 # === ROUTES WEB ===
 
 @router.get("/", response_class=HTMLResponse)
-async def elearning_dashboard(
+def elearning_dashboard(
     request: Request,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
@@ -59,20 +82,10 @@ async def elearning_dashboard(
         programmes_to_process = programmes
         print(f"🔍 DEBUG: Affichage de tous les programmes")
     
-    stats_programmes = []
-    for programme in programmes_to_process:
-        try:
-            print(f"🔍 DEBUG: Calcul des stats pour programme {programme.id} ({programme.nom})")
-            stats = ElearningService.get_statistiques_programme(session, programme.id)
-            print(f"✅ DEBUG: Stats calculées - inscrits: {stats.candidats_inscrits}, actifs: {stats.candidats_actifs}, completion: {stats.taux_completion}%")
-            stats_programmes.append(stats)
-        except Exception as e:
-            print(f"❌ DEBUG: Erreur pour programme {programme.id}: {e}")
-            import traceback
-            traceback.print_exc()
-            continue
-    
-    print(f"🔍 DEBUG: {len(stats_programmes)} programmes avec stats valides")
+    # Statistiques lues dans les rollups : même nombre de requêtes quel que soit le nombre de programmes
+    stats_programmes = ElearningService.get_statistiques_programmes(
+        session, [programme.id for programme in programmes_to_process]
+    )
     
     return templates.TemplateResponse(
         "elearning/dashboard.html",
@@ -86,7 +99,7 @@ async def elearning_dashboard(
     )
 
 @router.get("/modules", response_class=HTMLResponse, name="elearning_modules")
-async def elearning_modules(
+def elearning_modules(
     request: Request,
     programme_id: Optional[int] = None,
     statut: Optional[str] = None,
@@ -138,7 +151,7 @@ async def elearning_modules(
     )
 
 @router.get("/modules/creer", response_class=HTMLResponse)
-async def elearning_module_creer_form(
+def elearning_module_creer_form(
     request: Request,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -157,7 +170,7 @@ async def elearning_module_creer_form(
     )
 
 @router.get("/modules/{module_id}/edit", response_class=HTMLResponse, name="elearning_module_edit_form")
-async def elearning_module_edit_form(
+def elearning_module_edit_form(
     module_id: int,
     request: Request,
     current_user: User = Depends(get_current_user),
@@ -192,7 +205,7 @@ async def elearning_module_edit(
         raise HTTPException(status_code=403, detail="Accès refusé")
     
     # Vérifier que le module existe
-    module = session.get(ModuleElearning, module_id)
+    module = await run_in_threadpool(session.get, ModuleElearning, module_id)
     if not module:
         raise HTTPException(status_code=404, detail="Module non trouvé")
     
@@ -214,12 +227,12 @@ async def elearning_module_edit(
     )
     
     try:
-        updated_module = ElearningService.update_module(session, module_id, module_data)
+        updated_module = await run_in_threadpool(ElearningService.update_module, session, module_id, module_data)
         # Rediriger vers la liste des modules
         return RedirectResponse(url="/elearning/modules", status_code=303)
     except Exception as e:
         # En cas d'erreur, retourner au formulaire avec un message d'erreur
-        programmes = session.exec(select(Programme).where(Programme.actif == True)).all()
+        programmes = await run_in_threadpool(_programmes_actifs, session)
         return templates.TemplateResponse(
             "elearning/module_form.html",
             {
@@ -259,12 +272,12 @@ async def elearning_module_creer(
     )
     
     try:
-        module = ElearningService.create_module(session, module_data, current_user.id)
+        module = await run_in_threadpool(ElearningService.create_module, session, module_data, current_user.id)
         # Rediriger vers la liste des modules
         return RedirectResponse(url="/elearning/modules", status_code=303)
     except Exception as e:
         # En cas d'erreur, retourner au formulaire avec un message d'erreur
-        programmes = session.exec(select(Programme).where(Programme.actif == True)).all()
+        programmes = await run_in_threadpool(_programmes_actifs, session)
         return templates.TemplateResponse(
             "elearning/module_form.html",
             {
@@ -277,7 +290,7 @@ async def elearning_module_creer(
         )
 
 @router.get("/modules/{module_id}", response_class=HTMLResponse, name="elearning_module_detail")
-async def elearning_module_detail(
+def elearning_module_detail(
     module_id: int,
     request: Request,
     current_user: User = Depends(get_current_user),
@@ -344,8 +357,101 @@ async def elearning_module_detail(
         }
     )
 
+# Durée maximale acceptée pour un heartbeat du lecteur (secondes)
+HEARTBEAT_MAX_SECONDES = 300
+
+@router.post("/api/progression/heartbeat", status_code=status.HTTP_202_ACCEPTED)
+def progression_heartbeat(
+    inscription_id: int = Form(...),
+    ressource_id: int = Form(...),
+    secondes: int = Form(...),
+    module_id: Optional[int] = Form(None),
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """Heartbeat du lecteur : le temps est cumulé en mémoire puis écrit par lots"""
+    # L'inscription doit appartenir à l'utilisateur connecté (même règle que start_ressource)
+    inscription_id = session.exec(
+        select(Inscription.id).where(Inscription.id == inscription_id, Inscription.candidat_id == current_user.id)
+    ).first()
+    if inscription_id is None:
+        raise HTTPException(status_code=404, detail="Inscription non trouvée")
+    ElearningService.record_heartbeat(
+        inscription_id, ressource_id, min(max(secondes, 0), HEARTBEAT_MAX_SECONDES), module_id
+    )
+    return {"status": "accepted"}
+
+# === UPLOADS PAR MORCEAUX (VIDÉO / AUDIO) ===
+
+ROLES_EDITION_RESSOURCES = {"administrateur", "responsable_programme", "formateur"}
+
+def _check_upload_role(current_user: User):
+    if current_user.role not in ROLES_EDITION_RESSOURCES:
+        raise HTTPException(status_code=403, detail="Accès refusé")
+
+def _upload_headers(upload_status: dict) -> dict:
+    return {
+        "Upload-Offset": str(upload_status["offset"]),
+        "Upload-Length": str(upload_status["length"]),
+        "Cache-Control": "no-store",
+    }
+
+@router.post("/api/uploads", status_code=status.HTTP_201_CREATED)
+def create_chunked_upload(
+    request: Request,
+    filename: str = Form(...),
+    resource_type: str = Form(...),
+    taille: int = Form(...),
+    current_user: User = Depends(get_current_user)
+):
+    """Ouvrir une session d'upload par morceaux ; les morceaux sont ensuite envoyés en PATCH"""
+    _check_upload_role(current_user)
+    meta = ChunkedUploadService.create_upload(filename, resource_type, taille, current_user.id)
+    upload_status = ChunkedUploadService.status(meta["upload_id"])
+    location = str(request.url_for("chunked_upload_status", upload_id=meta["upload_id"]))
+    return JSONResponse(
+        content={**upload_status, "url": location},
+        status_code=status.HTTP_201_CREATED,
+        headers={**_upload_headers(upload_status), "Location": location},
+    )
+
+@router.head("/api/uploads/{upload_id}")
+def chunked_upload_offset(upload_id: str, current_user: User = Depends(get_current_user)):
+    """Offset contigu déjà reçu (reprise séquentielle)"""
+    return Response(status_code=status.HTTP_200_OK, headers=_upload_headers(ChunkedUploadService.status(upload_id, current_user.id)))
+
+@router.get("/api/uploads/{upload_id}", name="chunked_upload_status")
+def chunked_upload_status(upload_id: str, current_user: User = Depends(get_current_user)):
+    """Plages reçues (reprise d'un envoi parallèle)"""
+    return ChunkedUploadService.status(upload_id, current_user.id)
+
+@router.patch("/api/uploads/{upload_id}")
+async def chunked_upload_patch(
+    upload_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Écrire un morceau à l'offset Upload-Offset, vérifié par l'en-tête Upload-Checksum"""
+    if request.headers.get("content-type") != "application/offset+octet-stream":
+        raise HTTPException(status_code=415, detail="Content-Type attendu: application/offset+octet-stream")
+    try:
+        offset = int(request.headers["upload-offset"])
+        length = int(request.headers["content-length"])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="En-têtes Upload-Offset et Content-Length requis")
+    upload_status = await ChunkedUploadService.write_chunk(
+        upload_id, current_user.id, offset, length, request.headers.get("upload-checksum"), request.stream()
+    )
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=_upload_headers(upload_status))
+
+@router.delete("/api/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+def chunked_upload_abort(upload_id: str, current_user: User = Depends(get_current_user)):
+    """Abandonner une session d'upload"""
+    ChunkedUploadService.abort(upload_id, current_user.id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 @router.get("/ressources/{ressource_id}/start", response_class=HTMLResponse)
-async def start_ressource(
+def start_ressource(
     ressource_id: int,
     request: Request,
     current_user: User = Depends(get_current_user),
@@ -468,6 +574,7 @@ async def elearning_ressource_creer(
     print("🔍 Analyse des champs présents...")
     presence = {}
     uploaded_files = {}
+    chunked_uploads = {}  # Fichiers déjà envoyés par morceaux : 'upload_id_{type}'
     urls_candidates = {}
 
     for t in TYPES:
@@ -478,6 +585,7 @@ async def elearning_ressource_creer(
         has_file = bool(getattr(upload, "filename", None))
         url_val = (form_data.get(u_key) or "").strip()
         has_url = bool(url_val)
+        upload_id = (form_data.get(f"upload_id_{t}") or "").strip() if t in CHUNKED_RESOURCE_TYPES else ""
         
         print(f"  📁 {t}: fichier={has_file}, URL={has_url}")
         print(f"    🔍 Champ fichier '{f_key}': {upload}")
@@ -487,10 +595,12 @@ async def elearning_ressource_creer(
         if has_url:
             print(f"    🔗 URL: {url_val}")
 
-        if has_file or has_url:
+        if has_file or has_url or upload_id:
             presence[t] = True
             if has_file:
                 uploaded_files[t] = upload
+            elif upload_id:
+                chunked_uploads[t] = upload_id
             if has_url:
                 urls_candidates[t] = url_val
 
@@ -561,6 +671,19 @@ async def elearning_ressource_creer(
             except Exception as e:
                 print(f"❌ Erreur upload {t}: {str(e)}")
                 errors.append(f"Fichier {t}: {str(e)}")
+        elif t in chunked_uploads:
+            try:
+                file_info = await run_in_threadpool(
+                    ChunkedUploadService.finalize, chunked_uploads[t], current_user.id, t, "elearning", module_id
+                )
+                fichiers_info[t] = {
+                    "path": file_info["relative_path"],
+                    "nom_original": file_info["original_filename"]
+                }
+                print(f"✅ Fichier {t} assemblé depuis l'upload par morceaux: {file_info['relative_path']}")
+            except HTTPException as e:
+                print(f"❌ Erreur upload {t}: {e.detail}")
+                errors.append(f"Fichier {t}: {e.detail}")
 
     # Si aucun fichier n'a pu être uploadé, on arrête
     if not fichiers_info and not urls_candidates:
@@ -619,7 +742,7 @@ async def elearning_ressource_creer(
         for t, info in fichiers_info.items():
             try:
                 print(f"🧹 Nettoyage fichier {t}: {info['path']}")
-                FileUploadService.delete_file(info["path"])
+                await run_in_threadpool(FileUploadService.delete_file, info["path"])
             except Exception:
                 pass
         errors.append(f"Préparation ressource: {str(e)}")
@@ -637,25 +760,14 @@ async def elearning_ressource_creer(
 
     try:
         print(f"💾 Sauvegarde en base de données...")
-        res = ElearningService.create_ressource(session, ressource_data, current_user.id)
+        # Création et association au module si demandé
+        res, erreur_association = await run_in_threadpool(
+            _creer_ressource, session, ressource_data, current_user.id, module_id, ordre, obligatoire
+        )
         created_id = res.id
         print(f"✅ Ressource créée avec l'ID: {created_id}")
-
-        # Association au module si demandé
-        if module_id is not None:
-            try:
-                print(f"🔗 Association au module {module_id}...")
-                ElearningService.add_ressource_to_module(
-                    session,
-                    module_id,
-                    res.id,
-                    ordre=ordre,
-                    obligatoire=obligatoire,
-                )
-                print(f"✅ Ressource {res.id} associée au module {module_id}")
-            except Exception as e:
-                print(f"⚠️ Erreur association module: {e}")
-                errors.append(f"Association module: {str(e)}")
+        if erreur_association:
+            errors.append(f"Association module: {erreur_association}")
 
     except Exception as e:
         print(f"❌ Erreur création ressource: {str(e)}")
@@ -663,7 +775,7 @@ async def elearning_ressource_creer(
         for t, info in fichiers_info.items():
             try:
                 print(f"🧹 Nettoyage fichier échoué {t}: {info['path']}")
-                FileUploadService.delete_file(info["path"])
+                await run_in_threadpool(FileUploadService.delete_file, info["path"])
             except Exception:
                 pass
         errors.append(f"Création ressource: {str(e)}")
@@ -712,7 +824,7 @@ async def elearning_ressource_creer(
     return RedirectResponse(url=target, status_code=303)
 
 @router.get("/modules/{module_id}/ressources/{ressource_id}/remove")
-async def remove_ressource_from_module(
+def remove_ressource_from_module(
     module_id: int,
     ressource_id: int,
     current_user: User = Depends(get_current_user),
@@ -729,7 +841,7 @@ async def remove_ressource_from_module(
         raise HTTPException(status_code=500, detail=f"Erreur lors de la suppression: {str(e)}")
 
 @router.get("/ressources/{ressource_id}/edit", response_class=HTMLResponse)
-async def elearning_ressource_edit_form(
+def elearning_ressource_edit_form(
     ressource_id: int,
     request: Request,
     current_user: User = Depends(get_current_user),
@@ -763,7 +875,7 @@ async def elearning_ressource_edit(
     if current_user.role not in ["administrateur", "responsable_programme", "formateur"]:
         raise HTTPException(status_code=403, detail="Accès refusé")
     
-    ressource = session.get(RessourceElearning, ressource_id)
+    ressource = await run_in_threadpool(session.get, RessourceElearning, ressource_id)
     if not ressource:
         raise HTTPException(status_code=404, detail="Ressource non trouvée")
     
@@ -776,11 +888,11 @@ async def elearning_ressource_edit(
     
     # Vérifier les fichiers uploadés en priorité
     fichiers_presents = []
-    if "fichier_video" in form_data and getattr(form_data.get("fichier_video"), "filename", None):
+    if ("fichier_video" in form_data and getattr(form_data.get("fichier_video"), "filename", None)) or form_data.get("upload_id_video"):
         fichiers_presents.append("video")
     if "fichier_document" in form_data and getattr(form_data.get("fichier_document"), "filename", None):
         fichiers_presents.append("document")
-    if "fichier_audio" in form_data and getattr(form_data.get("fichier_audio"), "filename", None):
+    if ("fichier_audio" in form_data and getattr(form_data.get("fichier_audio"), "filename", None)) or form_data.get("upload_id_audio"):
         fichiers_presents.append("audio")
     
     # Si plusieurs fichiers, utiliser le premier trouvé
@@ -838,6 +950,34 @@ async def elearning_ressource_edit(
                             "error": f"Erreur de fichier {file_type}: {e.detail}"
                         }
                     )
+        
+        # Fichier déjà envoyé par morceaux (voir /api/uploads)
+        upload_id = form_data.get(f"upload_id_{file_type}")
+        if upload_id and file_type in CHUNKED_RESOURCE_TYPES and not any(f["type"] == file_type for f in fichiers_info):
+            module_id = form_data.get("module_id")
+            try:
+                file_info = await run_in_threadpool(
+                    ChunkedUploadService.finalize,
+                    upload_id, current_user.id, file_type, "elearning", int(module_id) if module_id else None
+                )
+            except HTTPException as e:
+                print(f"❌ Erreur de fichier {file_type}: {e.detail}")
+                return templates.TemplateResponse(
+                    "elearning/ressource_form.html",
+                    {
+                        "request": request,
+                        "utilisateur": current_user,
+                        "ressource": ressource,
+                        "module_id": module_id,
+                        "return_url": form_data.get("return_url"),
+                        "error": f"Erreur de fichier {file_type}: {e.detail}"
+                    }
+                )
+            fichiers_info.append({
+                "type": file_type,
+                "filename": file_info["original_filename"],
+                "path": file_info["relative_path"]
+            })
     
     # Sélectionner l'URL pertinente selon le type détecté
     url_contenu_selected = None
@@ -902,12 +1042,12 @@ async def elearning_ressource_edit(
     )
     
     try:
-        updated_ressource = ElearningService.update_ressource(session, ressource_id, ressource_data)
+        updated_ressource = await run_in_threadpool(ElearningService.update_ressource, session, ressource_id, ressource_data)
         # Rediriger vers la liste des modules
         return RedirectResponse(url="/elearning/modules", status_code=303)
     except Exception as e:
         # En cas d'erreur, faire un rollback de la session
-        session.rollback()
+        await run_in_threadpool(session.rollback)
         # Retourner au formulaire avec un message d'erreur
         return templates.TemplateResponse(
             "elearning/ressource_form.html",
@@ -921,7 +1061,7 @@ async def elearning_ressource_edit(
 
 # Route pour les statistiques e-learning
 @router.get("/statistiques", response_class=HTMLResponse)
-async def elearning_statistiques(
+def elearning_statistiques(
     request: Request,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -936,16 +1076,16 @@ async def elearning_statistiques(
     # Récupérer les statistiques par programme
     programmes = session.exec(select(Programme).where(Programme.actif == True)).all()
     stats_par_programme = []
-    for programme in programmes:
-        stats_prog = ElearningService.get_statistiques_programme(session, programme.id)
+    stats_programmes = ElearningService.get_statistiques_programmes(session, [programme.id for programme in programmes])
+    for programme, stats_prog in zip(programmes, stats_programmes):
         stats_par_programme.append({
             "programme": programme,
             "nb_modules": stats_prog.nb_modules,
             "nb_ressources": stats_prog.nb_ressources,
-            "nb_candidats": stats_prog.nb_candidats,
-            "temps_moyen": stats_prog.temps_moyen_minutes,
-            "taux_completion": stats_prog.taux_completion,
-            "score_moyen": stats_prog.score_moyen
+            "nb_candidats": stats_prog.candidats_inscrits,
+            "temps_moyen": round(stats_prog.temps_moyen_minutes, 1),
+            "taux_completion": round(stats_prog.taux_completion, 1),
+            "score_moyen": round(stats_prog.score_moyen or 0, 1)
         })
     
     # Top modules et candidats
@@ -969,8 +1109,22 @@ async def elearning_statistiques(
         }
     )
 
+@router.post("/api/statistiques/rollups/rebuild")
+def rebuild_rollups_elearning(
+    programme_id: Optional[int] = None,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """Reconstruire les statistiques précalculées (tous les programmes ou un seul)"""
+    if current_user.role != "administrateur":
+        raise HTTPException(status_code=403, detail="Accès refusé")
+    
+    result = elearning_rollup.rebuild(session, [programme_id] if programme_id else None)
+    session.commit()
+    return {"status": "ok", **result}
+
 @router.get("/candidat/{inscription_id}", response_class=HTMLResponse)
-async def elearning_candidat_progression(
+def elearning_candidat_progression(
     inscription_id: int,
     request: Request,
     current_user: User = Depends(get_current_user),
@@ -1,5 +1,6 @@
 # app/routers/elearning.py
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
 from fastapi import UploadFile, File, Form
 from sqlmodel import Session, select
@@ -32,10 +33,30 @@ from app_lia_web.app.templates import templates
 
 router = APIRouter()
 
+
+def _programmes_actifs(session: Session) -> List[Programme]:
+    return session.exec(select(Programme).where(Programme.actif == True)).all()
+
+
+def _creer_ressource(session: Session, ressource_data: RessourceElearningCreate, user_id: int,
+                     module_id: Optional[int], ordre: int, obligatoire: bool) -> tuple:
+    """Crée la ressource puis l'associe au module ; renvoie (ressource, erreur d'association ou None)"""
+    res = ElearningService.create_ressource(session, ressource_data, user_id)
+    if module_id is None:
+        return res, None
+    try:
+        print(f"🔗 Association au module {module_id}...")
+        ElearningService.add_ressource_to_module(session, module_id, res.id, ordre=ordre, obligatoire=obligatoire)
+        print(f"✅ Ressource {res.id} associée au module {module_id}")
+        return res, None
+    except Exception as e:
+        print(f"⚠️ Erreur association module: {e}")
+        return res, str(e)
+
 # === ROUTES WEB ===
 
 @router.get("/", response_class=HTMLResponse)
-async def elearning_dashboard(
+def elearning_dashboard(
     request: Request,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -75,7 +96,7 @@ async def elearning_dashboard(
     )
 
 @router.get("/modules", response_class=HTMLResponse)
-async def elearning_modules(
+def elearning_modules(
     request: Request,
     programme_id: Optional[int] = None,
     current_user: User = Depends(get_current_user),
@@ -97,7 +118,7 @@ async def elearning_modules(
     )
 
 @router.get("/modules/creer", response_class=HTMLResponse)
-async def elearning_module_creer_form(
+def elearning_module_creer_form(
     request: Request,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -116,7 +137,7 @@ async def elearning_module_creer_form(
     )
 
 @router.get("/modules/{module_id}/edit", response_class=HTMLResponse, name="elearning_module_edit_form")
-async def elearning_module_edit_form(
+def elearning_module_edit_form(
     module_id: int,
     request: Request,
     current_user: User = Depends(get_current_user),
@@ -151,7 +172,7 @@ async def elearning_module_edit(
         raise HTTPException(status_code=403, detail="Accès refusé")
     
     # Vérifier que le module existe
-    module = session.get(ModuleElearning, module_id)
+    module = await run_in_threadpool(session.get, ModuleElearning, module_id)
     if not module:
         raise HTTPException(status_code=404, detail="Module non trouvé")
     
@@ -173,12 +194,12 @@ async def elearning_module_edit(
     )
     
     try:
-        updated_module = ElearningService.update_module(session, module_id, module_data)
+        updated_module = await run_in_threadpool(ElearningService.update_module, session, module_id, module_data)
         # Rediriger vers la liste des modules
         return RedirectResponse(url="/elearning/modules", status_code=303)
     except Exception as e:
         # En cas d'erreur, retourner au formulaire avec un message d'erreur
-        programmes = session.exec(select(Programme).where(Programme.actif == True)).all()
+        programmes = await run_in_threadpool(_programmes_actifs, session)
         return templates.TemplateResponse(
             "elearning/module_form.html",
             {
@@ -218,12 +239,12 @@ async def elearning_module_creer(
     )
     
     try:
-        module = ElearningService.create_module(session, module_data, current_user.id)
+        module = await run_in_threadpool(ElearningService.create_module, session, module_data, current_user.id)
         # Rediriger vers la liste des modules
         return RedirectResponse(url="/elearning/modules", status_code=303)
     except Exception as e:
         # En cas d'erreur, retourner au formulaire avec un message d'erreur
-        programmes = session.exec(select(Programme).where(Programme.actif == True)).all()
+        programmes = await run_in_threadpool(_programmes_actifs, session)
         return templates.TemplateResponse(
             "elearning/module_form.html",
             {
@@ -236,7 +257,7 @@ async def elearning_module_creer(
         )
 
 @router.get("/modules/{module_id}", response_class=HTMLResponse)
-async def elearning_module_detail(
+def elearning_module_detail(
     module_id: int,
     request: Request,
     current_user: User = Depends(get_current_user),
@@ -290,7 +311,7 @@ async def elearning_module_detail(
     )
 
 @router.get("/ressources/{ressource_id}/start", response_class=HTMLResponse)
-async def start_ressource(
+def start_ressource(
     ressource_id: int,
     request: Request,
     current_user: User = Depends(get_current_user),
@@ -434,22 +455,13 @@ async def elearning_ressource_creer(
     )
     
     try:
-        ressource = ElearningService.create_ressource(session, ressource_data, current_user.id)
-        
         # Si un module_id est fourni, associer automatiquement la ressource au module
+        # (si l'association échoue, on continue quand même)
         module_id = form_data.get("module_id")
-        if module_id:
-            try:
-                ElearningService.add_ressource_to_module(
-                    session, 
-                    int(module_id), 
-                    ressource.id, 
-                    ordre=int(form_data.get("ordre", 0)),
-                    obligatoire=form_data.get("obligatoire") == "on"
-                )
-            except Exception as e:
-                # Si l'association échoue, on continue quand même
-                pass
+        ressource, _ = await run_in_threadpool(
+            _creer_ressource, session, ressource_data, current_user.id,
+            int(module_id) if module_id else None, int(form_data.get("ordre", 0)), form_data.get("obligatoire") == "on"
+        )
         
         # Rediriger vers l'URL de retour ou la liste des modules
         return_url = form_data.get("return_url")
@@ -461,7 +473,7 @@ async def elearning_ressource_creer(
     except Exception as e:
         # En cas d'erreur, supprimer le fichier uploadé s'il existe
         if file_info:
-            FileUploadService.delete_file(file_info["relative_path"])
+            await run_in_threadpool(FileUploadService.delete_file, file_info["relative_path"])
         
         # Retourner au formulaire avec un message d'erreur
         return templates.TemplateResponse(
@@ -477,7 +489,7 @@ async def elearning_ressource_creer(
         )
 
 @router.get("/ressources/{ressource_id}/edit", response_class=HTMLResponse)
-async def elearning_ressource_edit_form(
+def elearning_ressource_edit_form(
     ressource_id: int,
     request: Request,
     current_user: User = Depends(get_current_user),
@@ -511,7 +523,7 @@ async def elearning_ressource_edit(
     if current_user.role not in ["administrateur", "responsable_programme", "formateur"]:
         raise HTTPException(status_code=403, detail="Accès refusé")
     
-    ressource = session.get(RessourceElearning, ressource_id)
+    ressource = await run_in_threadpool(session.get, RessourceElearning, ressource_id)
     if not ressource:
         raise HTTPException(status_code=404, detail="Ressource non trouvée")
     
@@ -532,7 +544,7 @@ async def elearning_ressource_edit(
     )
     
     try:
-        updated_ressource = ElearningService.update_ressource(session, ressource_id, ressource_data)
+        updated_ressource = await run_in_threadpool(ElearningService.update_ressource, session, ressource_id, ressource_data)
         # Rediriger vers la liste des modules
         return RedirectResponse(url="/elearning/modules", status_code=303)
     except Exception as e:
@@ -549,7 +561,7 @@ async def elearning_ressource_edit(
 
 # Route pour les statistiques e-learning
 @router.get("/statistiques", response_class=HTMLResponse)
-async def elearning_statistiques(
+def elearning_statistiques(
     request: Request,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -598,7 +610,7 @@ async def elearning_statistiques(
     )
 
 @router.get("/candidat/{inscription_id}", response_class=HTMLResponse)
-async def elearning_candidat_progression(
+def elearning_candidat_progression(
     inscription_id: int,
     request: Request,
     current_user: User = Depends(get_current_user),
@@ -633,7 +645,7 @@ async def elearning_candidat_progression(
 
 # Ressources
 @router.post("/api/ressources", response_model=RessourceElearningResponse)
-async def create_ressource(
+def create_ressource(
     ressource_data: RessourceElearningCreate,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -645,7 +657,7 @@ async def create_ressource(
     return ElearningService.create_ressource(session, ressource_data, current_user.id)
 
 @router.get("/api/ressources", response_model=List[RessourceElearningResponse])
-async def get_ressources(
+def get_ressources(
     programme_id: Optional[int] = None,
     actif_only: bool = True,
     session: Session = Depends(get_session)
@@ -654,7 +666,7 @@ async def get_ressources(
     return ElearningService.get_ressources(session, programme_id, actif_only)
 
 @router.put("/api/ressources/{ressource_id}", response_model=RessourceElearningResponse)
-async def update_ressource(
+def update_ressource(
     ressource_id: int,
     ressource_data: RessourceElearningUpdate,
     current_user: User = Depends(get_current_user),
@@ -672,7 +684,7 @@ async def update_ressource(
 
 # Modules
 @router.post("/api/modules", response_model=ModuleElearningResponse)
-async def create_module(
+def create_module(
     module_data: ModuleElearningCreate,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -684,7 +696,7 @@ async def create_module(
     return ElearningService.create_module(session, module_data, current_user.id)
 
 @router.get("/api/modules", response_model=List[ModuleElearningResponse])
-async def get_modules(
+def get_modules(
     programme_id: Optional[int] = None,
     statut: Optional[str] = None,
     session: Session = Depends(get_session)
@@ -693,7 +705,7 @@ async def get_modules(
     return ElearningService.get_modules(session, programme_id, statut)
 
 @router.post("/api/modules/{module_id}/ressources/{ressource_id}")
-async def add_ressource_to_module(
+def add_ressource_to_module(
     module_id: int,
     ressource_id: int,
     ordre: int = 0,
@@ -712,7 +724,7 @@ async def add_ressource_to_module(
     return {"message": "Ressource ajoutée au module"}
 
 @router.delete("/api/modules/{module_id}/ressources/{ressource_id}")
-async def remove_ressource_from_module(
+def remove_ressource_from_module(
     module_id: int,
     ressource_id: int,
     current_user: User = Depends(get_current_user),
@@ -730,7 +742,7 @@ async def remove_ressource_from_module(
 
 # Progression
 @router.post("/api/progression/start")
-async def start_ressource(
+def start_ressource(
     inscription_id: int,
     ressource_id: int,
     current_user: User = Depends(get_current_user),
@@ -744,7 +756,7 @@ async def start_ressource(
     return progression
 
 @router.put("/api/progression/{progression_id}")
-async def update_progression(
+def update_progression(
     progression_id: int,
     temps_ajoute: int,
     notes: Optional[str] = None,
@@ -759,7 +771,7 @@ async def update_progression(
     return progression
 
 @router.post("/api/progression/{progression_id}/complete")
-async def complete_ressource(
+def complete_ressource(
     progression_id: int,
     score: Optional[float] = None,
     current_user: User = Depends(get_current_user),
@@ -773,7 +785,7 @@ async def complete_ressource(
     return progression
 
 @router.get("/api/progression/candidat/{inscription_id}", response_model=List[ProgressionElearningResponse])
-async def get_candidat_progression(
+def get_candidat_progression(
     inscription_id: int,
     session: Session = Depends(get_session)
 ):
@@ -782,7 +794,7 @@ async def get_candidat_progression(
 
 # Quiz
 @router.post("/api/quiz", response_model=QuizElearningResponse)
-async def create_quiz(
+def create_quiz(
     quiz_data: QuizElearningCreate,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -794,7 +806,7 @@ async def create_quiz(
     return ElearningService.create_quiz(session, quiz_data)
 
 @router.post("/api/quiz/reponse", response_model=ReponseQuizResponse)
-async def submit_quiz_response(
+def submit_quiz_response(
     reponse_data: ReponseQuizCreate,
     session: Session = Depends(get_session)
 ):
@@ -806,7 +818,7 @@ async def submit_quiz_response(
 
 # Objectifs
 @router.post("/api/objectifs", response_model=ObjectifElearningResponse)
-async def create_objectif(
+def create_objectif(
     objectif_data: ObjectifElearningCreate,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -818,7 +830,7 @@ async def create_objectif(
     return ElearningService.create_objectif(session, objectif_data)
 
 @router.get("/api/objectifs/check/{inscription_id}/{objectif_id}")
-async def check_objectif_atteint(
+def check_objectif_atteint(
     inscription_id: int,
     objectif_id: int,
     session: Session = Depends(get_session)
@@ -829,7 +841,7 @@ async def check_objectif_atteint(
 
 # Statistiques
 @router.get("/api/statistiques/candidat/{inscription_id}", response_model=StatistiquesElearningCandidat)
-async def get_statistiques_candidat(
+def get_statistiques_candidat(
     inscription_id: int,
     session: Session = Depends(get_session)
 ):
@@ -840,7 +852,7 @@ async def get_statistiques_candidat(
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.get("/api/statistiques/programme/{programme_id}", response_model=StatistiquesElearningProgramme)
-async def get_statistiques_programme(
+def get_statistiques_programme(
     programme_id: int,
     session: Session = Depends(get_session)
 ):
@@ -852,7 +864,7 @@ async def get_statistiques_programme(
 
 # Certificats
 @router.post("/api/certificats", response_model=CertificatElearningResponse)
-async def generate_certificat(
+def generate_certificat(
     inscription_id: int,
     module_id: Optional[int] = None,
     current_user: User = Depends(get_current_user),
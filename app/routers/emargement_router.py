@@ -1,7 +1,9 @@
 # app/routers/emargement_router.py
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlmodel import Session, select
-from typing import Optional
+from typing import List, Optional
 import logging
 from datetime import datetime, timezone
 import json
@@ -12,14 +14,18 @@ from app_lia_web.app.models.base import User, RendezVous, EmargementRDV, Candida
 from app_lia_web.core.config import settings
 from app_lia_web.core.utils import EmailUtils
 from app_lia_web.app.templates import templates
+from app_lia_web.app.services.feuille_emargement_service import etat_travail, reponse_en_cours
+from app_lia_web.app.services.emargement_live import ENTETES_SSE, STATUT_RDV_ABSENT, canal, diffuseur, flux_sse, statut_rdv
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+MAX_RDV_FLUX = 200
+
 
 @router.get("/emargement/{rdv_id}/candidat/{token}")
-async def page_emargement_candidat(
+def page_emargement_candidat(
     request: Request,
     rdv_id: int,
     token: str,
@@ -89,7 +95,7 @@ async def page_emargement_candidat(
         raise HTTPException(status_code=500, detail=f"Erreur interne: {str(e)}")
 
 @router.post("/emargement/{rdv_id}/signer")
-async def signer_emargement_conseiller(
+def signer_emargement_conseiller(
     request: Request,
     rdv_id: int,
     signature_data: dict,
@@ -140,7 +146,7 @@ async def signer_emargement_conseiller(
         raise HTTPException(status_code=500, detail=f"Erreur interne: {str(e)}")
 
 @router.post("/emargement/{rdv_id}/candidat/signer")
-async def signer_emargement_candidat(
+def signer_emargement_candidat(
     request: Request,
     rdv_id: int,
     signature_data: dict,
@@ -200,8 +206,65 @@ async def signer_emargement_candidat(
         logger.error(f"💥 Erreur inattendue dans signer_emargement_candidat: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur interne: {str(e)}")
 
+
+def _statut(emargement: EmargementRDV) -> dict:
+    return statut_rdv(
+        emargement.date_signature_conseiller,
+        emargement.date_signature_candidat,
+        bool(emargement.signature_conseiller),
+        bool(emargement.signature_candidat),
+    )
+
+
+def _statuts_initiaux(session: Session, rdv_ids: List[int]) -> List[dict]:
+    """Statut de chaque RDV en une requête, puis libération de la connexion avant le flux"""
+    try:
+        emargements = {}
+        for emargement in session.exec(
+            select(EmargementRDV).where(EmargementRDV.rdv_id.in_(rdv_ids)).order_by(EmargementRDV.id)
+        ):
+            emargements.setdefault(emargement.rdv_id, emargement)
+        return [
+            {"type": "statut", "rdv_id": rdv_id, **(_statut(emargements[rdv_id]) if rdv_id in emargements else STATUT_RDV_ABSENT)}
+            for rdv_id in rdv_ids
+        ]
+    finally:
+        session.close()
+
+
+@router.get("/emargement/flux")
+async def flux_statut_emargement(
+    rdv_ids: List[int] = Query(...),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Flux SSE du statut d'émargement des RDV affichés (état initial puis chaque signature)"""
+    rdv_ids = list(dict.fromkeys(rdv_ids))[:MAX_RDV_FLUX]
+    logger.info(f"📡 Flux émargement - {len(rdv_ids)} RDV")
+    etat_initial = await run_in_threadpool(_statuts_initiaux, session, rdv_ids)
+    return StreamingResponse(
+        flux_sse(diffuseur, [canal("rdv", rdv_id) for rdv_id in rdv_ids], etat_initial),
+        media_type="text/event-stream",
+        headers=ENTETES_SSE,
+    )
+
+
+@router.get("/emargement/feuilles/{travail}")
+def telecharger_feuilles_emargement(
+    travail: str,
+    current_user: User = Depends(get_current_user)
+):
+    """PDF d'émargement généré en tâche de fond (202 tant qu'il n'est pas prêt)"""
+    etat, chemin = etat_travail(travail)
+    if etat == "termine":
+        return FileResponse(chemin, media_type="application/pdf", filename="feuilles_emargement.pdf")
+    if etat == "en_cours":
+        return reponse_en_cours(travail)
+    raise HTTPException(status_code=404, detail="Feuilles introuvables ou génération échouée")
+
+
 @router.get("/emargement/{rdv_id}/statut")
-async def get_statut_emargement(
+def get_statut_emargement(
     rdv_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -215,32 +278,16 @@ async def get_statut_emargement(
         emargement = session.exec(emargement_query).first()
         
         if not emargement:
-            return {
-                "status": "not_found",
-                "conseiller_signe": False,
-                "candidat_signe": False,
-                "peut_commencer": False
-            }
-        
-        conseiller_signe = bool(emargement.signature_conseiller and emargement.date_signature_conseiller)
-        candidat_signe = bool(emargement.signature_candidat and emargement.date_signature_candidat)
-        peut_commencer = conseiller_signe and candidat_signe
+            return dict(STATUT_RDV_ABSENT)
         
-        return {
-            "status": "found",
-            "conseiller_signe": conseiller_signe,
-            "candidat_signe": candidat_signe,
-            "peut_commencer": peut_commencer,
-            "date_signature_conseiller": emargement.date_signature_conseiller.isoformat() if emargement.date_signature_conseiller else None,
-            "date_signature_candidat": emargement.date_signature_candidat.isoformat() if emargement.date_signature_candidat else None
-        }
+        return _statut(emargement)
         
     except Exception as e:
         logger.error(f"💥 Erreur dans get_statut_emargement: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur interne: {str(e)}")
 
 @router.post("/emargement/{rdv_id}/envoyer-lien-candidat")
-async def envoyer_lien_emargement_candidat(
+def envoyer_lien_emargement_candidat(
     rdv_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
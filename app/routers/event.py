@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Form
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from sqlmodel import Session, select
 from datetime import datetime, date, timezone
 from typing import List, Optional
@@ -11,8 +12,12 @@ from app_lia_web.app.models.base import User, Programme, Inscription
 from app_lia_web.app.models.event import Event, InvitationEvent, PresenceEvent
 from app_lia_web.app.schemas.event_schemas import EventCreate, EventUpdate, InvitationEventCreate, PresenceEventCreate
 from app_lia_web.app.services.event_service import EventService
+from app_lia_web.app.services.feuille_emargement_service import feuilles_event, servir_feuilles
+from app_lia_web.app.services.emargement_live import ENTETES_SSE, canal, diffuseur, existe_puis_liberer, flux_sse
 from app_lia_web.core.security import get_current_user
+from app_lia_web.core.sql_budget import budget_sql
 from app_lia_web.app.templates import templates
+from app_lia_web.core.gr_code import generate_qr_batch, png_depuis_data_url
 
 router = APIRouter()
 event_service = EventService()
@@ -20,7 +25,7 @@ event_service = EventService()
 # === ROUTES PRINCIPALES ===
 
 @router.get("/", name="liste_events", response_class=HTMLResponse)
-async def liste_events(
+def liste_events(
     request: Request,
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
@@ -41,7 +46,7 @@ async def liste_events(
     })
 
 @router.get("/nouveau", name="form_event", response_class=HTMLResponse)
-async def form_event(
+def form_event(
     request: Request,
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -56,7 +61,7 @@ async def form_event(
     })
 
 @router.post("/nouveau", name="creer_event")
-async def creer_event(
+def creer_event(
     request: Request,
     titre: str = Form(...),
     description: str = Form(""),
@@ -100,8 +105,7 @@ async def creer_event(
     
     event = event_service.create_event(event_data, db)
     
-    presences_data = event_service.get_presences_with_combined_status(event.id, db)
-    stats = event_service.get_presence_stats_with_invitations(event.id, db)
+    presences_data, stats = event_service.get_event_roster(event.id, db)
     
     return templates.TemplateResponse("events/detail.html", {
         "request": request,
@@ -112,7 +116,8 @@ async def creer_event(
     })
 
 @router.get("/{event_id}", name="detail_event", response_class=HTMLResponse)
-async def detail_event(
+@budget_sql(5)
+def detail_event(
     event_id: int,
     request: Request,
     db: Session = Depends(get_session),
@@ -123,8 +128,7 @@ async def detail_event(
     if not event:
         raise HTTPException(status_code=404, detail="Événement non trouvé")
     
-    presences_data = event_service.get_presences_with_combined_status(event_id, db)
-    stats = event_service.get_presence_stats_with_invitations(event_id, db)
+    presences_data, stats = event_service.get_event_roster(event_id, db)
     
     return templates.TemplateResponse("events/detail.html", {
         "request": request,
@@ -135,7 +139,7 @@ async def detail_event(
     })
 
 @router.get("/{event_id}/edit", name="edit_event", response_class=HTMLResponse)
-async def edit_event(
+def edit_event(
     event_id: int,
     request: Request,
     db: Session = Depends(get_session),
@@ -156,7 +160,7 @@ async def edit_event(
     })
 
 @router.post("/{event_id}/update", name="update_event")
-async def update_event(
+def update_event(
     event_id: int,
     request: Request,
     titre: str = Form(...),
@@ -214,7 +218,7 @@ async def update_event(
 # === ROUTES D'ÉMARGEMENT ===
 
 @router.get("/{event_id}/emargement", name="emargement_event", response_class=HTMLResponse)
-async def emargement_event(
+def emargement_event(
     event_id: int,
     request: Request,
     db: Session = Depends(get_session),
@@ -236,8 +240,36 @@ async def emargement_event(
         "utilisateur": current_user
     })
 
+@router.get("/{event_id}/emargement.pdf", name="feuille_emargement_event")
+def feuille_emargement_event(
+    event_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Feuille d'émargement PDF de l'événement"""
+    feuilles = feuilles_event(db, event_id)
+    if not feuilles:
+        raise HTTPException(status_code=404, detail="Événement non trouvé")
+    return servir_feuilles(feuilles, background_tasks, f"emargement_event_{event_id}.pdf")
+
+@router.get("/{event_id}/emargement/flux", name="flux_emargement_event")
+async def flux_emargement_event(
+    event_id: int,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Flux SSE des présences de l'événement (une ligne par signature ou pointage)"""
+    if not await run_in_threadpool(existe_puis_liberer, db, Event, event_id):
+        raise HTTPException(status_code=404, detail="Événement non trouvé")
+    return StreamingResponse(
+        flux_sse(diffuseur, [canal("event", event_id)]),
+        media_type="text/event-stream",
+        headers=ENTETES_SSE,
+    )
+
 @router.get("/{event_id}/emargement-direct", name="emargement_direct_event", response_class=HTMLResponse)
-async def emargement_direct_event(
+def emargement_direct_event(
     event_id: int,
     request: Request,
     db: Session = Depends(get_session),
@@ -258,7 +290,7 @@ async def emargement_direct_event(
     })
 
 @router.get("/{event_id}/invitations", name="invitations_event", response_class=HTMLResponse)
-async def invitations_event(
+def invitations_event(
     event_id: int,
     request: Request,
     db: Session = Depends(get_session),
@@ -289,7 +321,7 @@ async def invitations_event(
     })
 
 @router.post("/{event_id}/invitations/envoyer", name="envoyer_invitations_event")
-async def envoyer_invitations_event(
+def envoyer_invitations_event(
     event_id: int,
     request: Request,
     type_invitation: str = Form(...),
@@ -307,7 +339,7 @@ async def envoyer_invitations_event(
 
 
 @router.post("/{event_id}/emargement-direct", name="marquer_presence_event_direct")
-async def marquer_presence_event_direct(
+def marquer_presence_event_direct(
     event_id: int,
     request: Request,
     inscription_id: int = Form(...),
@@ -344,7 +376,7 @@ async def marquer_presence_event_direct(
 # === ROUTES D'ÉMARGEMENT PAR LIEN (MODE DISTANCE) ===
 
 @router.get("/{event_id}/emargement/liens", name="generer_liens_emargement_event", response_class=HTMLResponse)
-async def generer_liens_emargement_event(
+def generer_liens_emargement_event(
     event_id: int,
     request: Request,
     db: Session = Depends(get_session),
@@ -367,7 +399,7 @@ async def generer_liens_emargement_event(
     })
 
 @router.post("/{event_id}/emargement/liens/envoyer", name="envoyer_liens_emargement_event")
-async def envoyer_liens_emargement_event(
+def envoyer_liens_emargement_event(
     event_id: int,
     request: Request,
     invitation_ids: List[int] = Form(...),
@@ -387,14 +419,17 @@ async def envoyer_liens_emargement_event(
         if invitation and invitation.event_id == event_id:
             invitations.append(invitation)
     
+    # Liens d'émargement et leurs QR codes, générés en un appel pour toute la liste
+    from app_lia_web.core.config import settings
+    base_url = settings.get_base_url_for_email()
+    liens = {invitation.id: f"{base_url}/events/{event_id}/emargement/lien/{invitation.token_invitation}" for invitation in invitations}
+    qr_codes = generate_qr_batch(liens.values())
+    
     # Envoyer les emails avec les liens d'émargement
     sent_count = 0
     for invitation in invitations:
         try:
-            # Générer le lien d'émargement
-            from app_lia_web.core.config import settings
-            base_url = settings.get_base_url_for_email()
-            emargement_url = f"{base_url}/events/{event_id}/emargement/lien/{invitation.token_invitation}"
+            emargement_url = liens[invitation.id]
             
             # Préparer l'email
             subject = f"Lien d'émargement - {event.titre}"
@@ -404,6 +439,7 @@ async def envoyer_liens_emargement_event(
                 'date_event': event.date_debut.strftime('%d/%m/%Y'),
                 'lieu': event.lieu or "À définir",
                 'emargement_url': emargement_url,
+                'qr_cid': 'qr_emargement',
                 'base_url': base_url
             }
             
@@ -412,7 +448,8 @@ async def envoyer_liens_emargement_event(
                 to_email=invitation.inscription.candidat.email,
                 subject=subject,
                 template="event_emargement_lien",
-                data=template_data
+                data=template_data,
+                images={'qr_emargement': png_depuis_data_url(qr_codes[emargement_url])}
             )
             sent_count += 1
             
@@ -422,7 +459,7 @@ async def envoyer_liens_emargement_event(
     return RedirectResponse(url=f"/events/{event_id}/emargement", status_code=303)
 
 @router.get("/{event_id}/emargement/lien/{token}", name="emargement_lien_event", response_class=HTMLResponse)
-async def emargement_lien_event(
+def emargement_lien_event(
     event_id: int,
     token: str,
     request: Request,
@@ -454,7 +491,7 @@ async def emargement_lien_event(
     })
 
 @router.post("/{event_id}/emargement/lien/{token}", name="signer_emargement_lien_event")
-async def signer_emargement_lien_event(
+def signer_emargement_lien_event(
     event_id: int,
     token: str,
     request: Request,
@@ -510,7 +547,7 @@ async def signer_emargement_lien_event(
 # === ROUTES PUBLIQUES (pour les invitations) ===
 
 @router.get("/invitation/{token}", name="invitation_event_page", response_class=HTMLResponse)
-async def invitation_event_page(
+def invitation_event_page(
     token: str,
     request: Request,
     db: Session = Depends(get_session)
@@ -532,7 +569,7 @@ async def invitation_event_page(
     })
 
 @router.get("/invitation/{token}/accepter", name="accepter_invitation_event", response_class=HTMLResponse)
-async def accepter_invitation_event(
+def accepter_invitation_event(
     token: str,
     request: Request,
     db: Session = Depends(get_session)
@@ -552,7 +589,7 @@ async def accepter_invitation_event(
     })
 
 @router.get("/invitation/{token}/refuser", name="refuser_invitation_event", response_class=HTMLResponse)
-async def refuser_invitation_event(
+def refuser_invitation_event(
     token: str,
     request: Request,
     db: Session = Depends(get_session)
@@ -572,7 +609,7 @@ async def refuser_invitation_event(
     })
 
 @router.post("/{event_id}/participant/{inscription_id}/supprimer", name="supprimer_participant_event")
-async def supprimer_participant_event(
+def supprimer_participant_event(
     event_id: int,
     inscription_id: int,
     request: Request,
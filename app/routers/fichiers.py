@@ -0,0 +1,41 @@
+"""
+Routeur des liens de téléchargement signés
+
+Utilisé quand le serveur frontal ne traite pas lui-même /fichiers-signes/...
+(développement, déploiement sans nginx) : la signature et l'expiration sont
+vérifiées sans session ni requête en base, puis le fichier est envoyé par
+core/file_delivery.reponse_fichier (ou délégué au serveur frontal).
+"""
+from fastapi import APIRouter, HTTPException, Query
+
+from app_lia_web.core import file_delivery
+
+router = APIRouter()
+
+
+@router.get(file_delivery.PREFIXE_URL_SIGNEE + "/{racine}/{chemin:path}", name="fichier_signe")
+def fichier_signe(
+    racine: str,
+    chemin: str,
+    expires: int = Query(...),
+    st: str = Query(...),
+):
+    """Télécharge un fichier via un lien signé et non expiré"""
+    refus = file_delivery.verifier_signature(f"{file_delivery.PREFIXE_URL_SIGNEE}/{racine}/{chemin}", expires, st)
+    if refus == "signature":
+        raise HTTPException(status_code=403, detail="Lien invalide")
+    if refus == "expire":
+        raise HTTPException(status_code=410, detail="Lien expiré")
+
+    dossier = file_delivery.racines().get(racine)
+    if dossier is None:
+        raise HTTPException(status_code=404, detail="Fichier non trouvé")
+    fichier = dossier / chemin
+    # Le lien signé ne doit pas permettre de sortir de sa racine
+    try:
+        fichier.resolve().relative_to(dossier.resolve())
+    except ValueError:
+        raise HTTPException(status_code=403, detail="Accès non autorisé")
+    if not fichier.is_file():
+        raise HTTPException(status_code=404, detail="Fichier non trouvé")
+    return file_delivery.reponse_fichier(fichier)
@@ -6,6 +6,7 @@ from datetime import date as _date, datetime, timezone
 from typing import Optional
 
 from fastapi import APIRouter, Depends, Form, HTTPException, Query, Request, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from sqlmodel import Session, select
 from sqlalchemy import func
@@ -13,6 +14,7 @@ from sqlalchemy import func
 from app_lia_web.core.database import get_session
 from app_lia_web.core.config import settings
 from app_lia_web.core.security import get_current_user
+from app_lia_web.core.sql_budget import budget_sql
 from app_lia_web.core.path_config import path_config
 from app_lia_web.core.program_schema_integration import (
     get_program_schema_from_request,
@@ -29,7 +31,7 @@ from app_lia_web.app.models.base import (
     ReorientationCandidat, Document
 )
 from app_lia_web.app.models.enums import TypeDocument, DecisionJury, UserRole, GroupeCodev, TypePromotion
-from app_lia_web.app.services.ACD.eligibilite import evaluate_eligibilite, entreprise_age_annees
+from app_lia_web.app.services.eligibilite_service import recalculer_eligibilites
 from app_lia_web.app.services.ACD.service_qpv import verif_qpv
 from app_lia_web.app.services.ACD.service_siret_pappers import get_entreprise_process
 from app_lia_web.app.schemas.ACD.schema_qpv import Adresse
@@ -302,27 +304,8 @@ async def update_infos(
     session: Session = Depends(get_session),
     current_user=Depends(get_current_user),
 ):
-    pre = session.get(Preinscription, pre_id)
-    if not pre:
-        raise HTTPException(status_code=404, detail="Préinscription introuvable")
-    cand = session.get(Candidat, pre.candidat_id)
-    # Charger les documents du candidat
-    if cand:
-        from app_lia_web.app.models.base import Document
-        cand.documents = session.exec(select(Document).where(Document.candidat_id == cand.id)).all()
-        print(f"📋 [INSCRIPTION] Documents chargés pour candidat {cand.id}: {len(cand.documents)} documents")
-        for doc in cand.documents:
-            print(f"   - {doc.nom_fichier} ({doc.type_document})")
-        
-        # Vérification supplémentaire : tous les documents en base pour ce candidat
-        all_docs = session.exec(select(Document).where(Document.candidat_id == cand.id)).all()
-        print(f"🔍 [INSCRIPTION] Vérification directe en base: {len(all_docs)} documents trouvés")
-        for doc in all_docs:
-            print(f"   - ID: {doc.id}, Nom: {doc.nom_fichier}, Type: {doc.type_document}")
-    ent = session.exec(select(Entreprise).where(Entreprise.candidat_id==cand.id)).first()
-    if not ent:
-        ent = Entreprise(candidat_id=cand.id)
-        session.add(ent); session.flush()
+    # Route async (écriture de la photo) : les accès base passent par le pool de threads
+    pre, cand, ent = await run_in_threadpool(_charger_infos_candidat, session, pre_id)
 
     # Mise à jour des informations personnelles
     if civilite:
@@ -360,7 +343,7 @@ async def update_infos(
             # Supprimer l'ancienne photo si elle existe
             if cand.photo_profil:
                 try:
-                    FileUploadService.delete_file(cand.photo_profil)
+                    await run_in_threadpool(FileUploadService.delete_file, cand.photo_profil)
                     if settings.DEBUG:
                         print(f"🗑️ [DEBUG] Ancienne photo supprimée: {cand.photo_profil}")
                 except Exception as e:
@@ -368,7 +351,7 @@ async def update_infos(
                         print(f"⚠️ [DEBUG] Erreur lors de la suppression de l'ancienne photo: {e}")
             
             # Créer le dossier de destination
-            prog = session.get(Programme, pre.programme_id)
+            prog = await run_in_threadpool(session.get, Programme, pre.programme_id)
             subfolder = f"Preinscrits/{prog.code or 'UNK'}/{pre.id}"
             
             # Nom de fichier unique avec ID de préinscription
@@ -444,6 +427,39 @@ async def update_infos(
     if adresse_entreprise is not None:
         ent.adresse = adresse_entreprise
 
+    code_programme = await run_in_threadpool(_enregistrer_infos_candidat, session, current_user, pre, cand)
+    return RedirectResponse(url=f"{request.url_for('form_inscriptions_display')}?programme={code_programme}&pre_id={pre_id}&success=infos_updated", status_code=303)
+
+
+def _charger_infos_candidat(session: Session, pre_id: int) -> tuple:
+    """Préinscription, candidat (documents chargés) et entreprise à mettre à jour"""
+    pre = session.get(Preinscription, pre_id)
+    if not pre:
+        raise HTTPException(status_code=404, detail="Préinscription introuvable")
+    cand = session.get(Candidat, pre.candidat_id)
+    # Charger les documents du candidat
+    if cand:
+        from app_lia_web.app.models.base import Document
+        cand.documents = session.exec(select(Document).where(Document.candidat_id == cand.id)).all()
+        print(f"📋 [INSCRIPTION] Documents chargés pour candidat {cand.id}: {len(cand.documents)} documents")
+        for doc in cand.documents:
+            print(f"   - {doc.nom_fichier} ({doc.type_document})")
+        
+        # Vérification supplémentaire : tous les documents en base pour ce candidat
+        all_docs = session.exec(select(Document).where(Document.candidat_id == cand.id)).all()
+        print(f"🔍 [INSCRIPTION] Vérification directe en base: {len(all_docs)} documents trouvés")
+        for doc in all_docs:
+            print(f"   - ID: {doc.id}, Nom: {doc.nom_fichier}, Type: {doc.type_document}")
+    ent = session.exec(select(Entreprise).where(Entreprise.candidat_id==cand.id)).first()
+    if not ent:
+        ent = Entreprise(candidat_id=cand.id)
+        session.add(ent); session.flush()
+    return pre, cand, ent
+
+
+def _enregistrer_infos_candidat(session: Session, current_user, pre: Preinscription, cand: Candidat) -> str:
+    """Valide la mise à jour, la journalise et renvoie le code du programme pour la redirection"""
+    pre_id = pre.id
     session.commit()
     
     # Log de l'activité
@@ -467,11 +483,12 @@ async def update_infos(
     )
     
     prog = session.get(Programme, pre.programme_id)
-    return RedirectResponse(url=f"{request.url_for('form_inscriptions_display')}?programme={prog.code}&pre_id={pre.id}&success=infos_updated", status_code=303)
+    return prog.code
 
 
 # Recalcul eligibilité
 @router.post("/eligibilite/recalc", name="eligibilite_recalc")
+@budget_sql(5)
 def elig_recalc(
     request: Request,
     pre_id: int = Form(...),
@@ -479,70 +496,25 @@ def elig_recalc(
     session: Session = Depends(get_session),
     current_user=Depends(get_current_user),
 ):
-    try:
-        print(f"🔄 [RECALC] Début recalcul éligibilité pour préinscription {pre_id}")
-        pre = session.get(Preinscription, pre_id)
-        
-        if not pre:
-            print(f"❌ [RECALC] Préinscription {pre_id} introuvable")
-            raise HTTPException(status_code=404, detail="Préinscription introuvable")
-        
-        prog = session.get(Programme, pre.programme_id)
-        if not prog:
-            print(f"❌ [RECALC] Programme {pre.programme_id} introuvable")
-            raise HTTPException(status_code=404, detail="Programme introuvable")
-        
-        cand = session.get(Candidat, pre.candidat_id)
-        if not cand:
-            print(f"❌ [RECALC] Candidat {pre.candidat_id} introuvable")
-            raise HTTPException(status_code=404, detail="Candidat introuvable")
-        
-        ent = session.exec(select(Entreprise).where(Entreprise.candidat_id==cand.id)).first()
-        if not ent:
-            print(f"❌ [RECALC] Entreprise pour candidat {cand.id} introuvable")
-            raise HTTPException(status_code=404, detail="Entreprise introuvable")
+    print(f"🔄 [RECALC] Début recalcul éligibilité pour préinscription {pre_id}")
+    code_programme = session.exec(
+        select(Programme.code).join(Preinscription, Preinscription.programme_id == Programme.id).where(Preinscription.id == pre_id)
+    ).first()
+    if not code_programme:
+        print(f"❌ [RECALC] Préinscription {pre_id} introuvable")
+        raise HTTPException(status_code=404, detail="Préinscription introuvable")
 
-        print(f"📊 [RECALC] Données trouvées - CA: {ent.chiffre_affaires}, Date création: {ent.date_creation}")
-        
-        ca = ent.chiffre_affaires
-        anc = entreprise_age_annees(ent.date_creation)
-        
-        print(f"🔍 [RECALC] Calcul ancienneté: {anc} ans")
-        
-        verdict, details = evaluate_eligibilite(
-            adresse_perso=cand.adresse_personnelle,
-            adresse_entreprise=ent.adresse,
-            chiffre_affaires=ca,
-            anciennete_annees=anc,
-            ca_min=prog.ca_seuil_min,
-            ca_max=prog.ca_seuil_max,
-            anciennete_min_annees=prog.anciennete_min_annees
-        )
-        
-        print(f"✅ [RECALC] Évaluation terminée - Verdict: {verdict}, Details: {details}")
-        
-        elig = session.exec(select(Eligibilite).where(Eligibilite.preinscription_id==pre.id)).first()
-        if not elig:
-            print(f"🆕 [RECALC] Création nouvelle éligibilité")
-            elig = Eligibilite(preinscription_id=pre.id)
-            session.add(elig)
-        
-        elig.ca_seuil_ok = details.get("ca_ok")
-        elig.ca_score = None  # Pas de valeur numérique unique pour les intervalles
-        elig.qpv_ok = details.get("qpv_ok")
-        elig.anciennete_ok = details.get("anciennete_ok")
-        elig.anciennete_annees = details.get("anciennete_annees")
-        elig.verdict = verdict
-        session.commit()
-        
-        print(f"🎉 [RECALC] Recalcul terminé avec succès")
-        return RedirectResponse(url=f"{request.url_for('form_inscriptions_display')}?programme={prog.code}&pre_id={pre.id}", status_code=303)
-        
+    try:
+        # Même moteur que le recalcul en masse : une jointure, un upsert
+        recalculer_eligibilites(session, preinscription_ids=[pre_id])
     except Exception as e:
         print(f"❌ [RECALC] Erreur lors du recalcul: {e}")
         session.rollback()
         raise HTTPException(status_code=500, detail=f"Erreur lors du recalcul: {str(e)}")
 
+    print(f"🎉 [RECALC] Recalcul terminé avec succès")
+    return RedirectResponse(url=f"{request.url_for('form_inscriptions_display')}?programme={code_programme}&pre_id={pre_id}", status_code=303)
+
 
 # Ajouter un document
 @router.post("/add-document", name="add_document_inscription")
@@ -560,7 +532,7 @@ async def add_document(
         print(f"📄 [DOC] Ajout document pour candidat {candidat_id}")
         
         # Vérifier que le candidat existe
-        candidat = session.get(Candidat, candidat_id)
+        candidat = await run_in_threadpool(session.get, Candidat, candidat_id)
         if not candidat:
             raise HTTPException(status_code=404, detail="Candidat introuvable")
         
@@ -569,7 +541,8 @@ async def add_document(
             raise HTTPException(status_code=400, detail="Aucun fichier sélectionné")
         
         # Vérifier la taille (10MB max)
-        file_content = document_file.file.read()
+        file_content = await document_file.read()
+        await document_file.seek(0)
         if len(file_content) > 10 * 1024 * 1024:  # 10MB
             raise HTTPException(status_code=400, detail="Fichier trop volumineux (max 10MB)")
         
@@ -610,28 +583,36 @@ async def add_document(
             date_upload=datetime.now(timezone.utc)
         )
         
-        session.add(doc)
-        session.commit()
+        code_programme, pre_id = await run_in_threadpool(_enregistrer_document_candidat, session, doc)
         
         print(f"✅ [DOC] Document ajouté avec succès: {file_info['relative_path']}")
         
         # Rediriger vers la page avec un message de succès
-        preinscription = session.exec(select(Preinscription).where(Preinscription.candidat_id == candidat_id)).first()
-        if preinscription:
-            programme = session.get(Programme, preinscription.programme_id)
+        if pre_id:
             return RedirectResponse(
-                url=f"{request.url_for('form_inscriptions_display')}?programme={programme.code}&pre_id={preinscription.id}&success=document_added",
+                url=f"{request.url_for('form_inscriptions_display')}?programme={code_programme}&pre_id={pre_id}&success=document_added",
                 status_code=303
             )
         else:
-            return RedirectResponse(url=f"{request.url_for('form_inscriptions_display')}?programme={prog.code}&success=document_added", status_code=303)
+            return RedirectResponse(url=f"{request.url_for('form_inscriptions_display')}?programme={programme}&success=document_added", status_code=303)
             
     except Exception as e:
         print(f"❌ [DOC] Erreur lors de l'ajout: {e}")
-        session.rollback()
+        await run_in_threadpool(session.rollback)
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'ajout du document: {str(e)}")
 
 
+def _enregistrer_document_candidat(session: Session, doc) -> tuple:
+    """Enregistre le document ; renvoie (code programme, id préinscription) pour la redirection"""
+    session.add(doc)
+    session.commit()
+    preinscription = session.exec(select(Preinscription).where(Preinscription.candidat_id == doc.candidat_id)).first()
+    if not preinscription:
+        return None, None
+    programme = session.get(Programme, preinscription.programme_id)
+    return programme.code, preinscription.id
+
+
 # Supprimer un document
 @router.post("/delete-document", name="delete_document_inscription")
 def delete_document(
@@ -923,6 +904,101 @@ async def check_qpv_candidate(
 ):
     """Vérifier le statut QPV pour un candidat en analysant son adresse personnelle et celle de l'entreprise"""
     
+    # Lectures en base dans le pool de threads : la route n'attend ensuite que l'API QPV
+    adresse_personnelle, adresse_entreprise, cache = await run_in_threadpool(
+        _lire_qpv_candidat, session, candidat_id, adresse_personnelle, adresse_entreprise
+    )
+    if cache is not None:
+        return cache
+    
+    # Si pas de données existantes ou adresses différentes, lancer la recherche
+    print(f"🔍 [QPV] Lancement nouvelle recherche pour candidat {candidat_id}")
+    
+    results = {
+        "candidat_id": candidat_id,
+        "adresses_analysees": [],
+        "statut_qpv_final": "NON_QPV",
+        "details": {}
+    }
+    
+    # Analyser l'adresse personnelle du candidat si disponible
+    print(f"🔍 [QPV] Adresse personnelle reçue: '{adresse_personnelle}'")
+    if adresse_personnelle and adresse_personnelle.strip():
+        try:
+            print(f"🔍 [QPV] Analyse adresse personnelle: {adresse_personnelle}")
+            qpv_personnelle = await verif_qpv({"address": adresse_personnelle}, request)
+            results["adresses_analysees"].append({
+                "type": "personnelle",
+                "adresse": adresse_personnelle,
+                "resultat": qpv_personnelle
+            })
+            results["details"]["personnelle"] = qpv_personnelle
+            print(f"✅ [QPV] Adresse personnelle analysée avec succès")
+        except Exception as e:
+            print(f"❌ [QPV] Erreur analyse adresse personnelle: {e}")
+            results["adresses_analysees"].append({
+                "type": "personnelle",
+                "adresse": adresse_personnelle,
+                "erreur": str(e)
+            })
+    else:
+        print(f"⚠️ [QPV] Adresse personnelle vide ou non fournie")
+        results["adresses_analysees"].append({
+            "type": "personnelle",
+            "adresse": "Non disponible",
+            "non_disponible": True
+        })
+    
+    # Analyser l'adresse de l'entreprise si disponible
+    print(f"🔍 [QPV] Adresse entreprise reçue: '{adresse_entreprise}'")
+    if adresse_entreprise and adresse_entreprise.strip():
+        try:
+            print(f"🔍 [QPV] Analyse adresse entreprise: {adresse_entreprise}")
+            qpv_entreprise = await verif_qpv({"address": adresse_entreprise}, request)
+            results["adresses_analysees"].append({
+                "type": "entreprise",
+                "adresse": adresse_entreprise,
+                "resultat": qpv_entreprise
+            })
+            results["details"]["entreprise"] = qpv_entreprise
+            print(f"✅ [QPV] Adresse entreprise analysée avec succès")
+        except Exception as e:
+            print(f"❌ [QPV] Erreur analyse entreprise: {e}")
+            results["adresses_analysees"].append({
+                "type": "entreprise",
+                "adresse": adresse_entreprise,
+                "erreur": str(e)
+            })
+    else:
+        print(f"⚠️ [QPV] Adresse entreprise vide ou non fournie")
+        results["adresses_analysees"].append({
+            "type": "entreprise",
+            "adresse": "Non disponible",
+            "non_disponible": True
+        })
+    
+    # Déterminer le statut QPV final
+    qpv_found = False
+    for analyse in results["adresses_analysees"]:
+        if "resultat" in analyse:
+            nom_qp = analyse["resultat"].get("nom_qp", "")
+            if "QPV:" in nom_qp or "QPV limit:" in nom_qp:
+                qpv_found = True
+                results["statut_qpv_final"] = "QPV"
+                break
+    
+    await run_in_threadpool(_enregistrer_qpv_candidat, session, current_user, candidat_id, results, qpv_found)
+    
+    print(f"🔍 [QPV] Résultat final: {len(results['adresses_analysees'])} adresses analysées")
+    print(f"🔍 [QPV] Statut final: {results['statut_qpv_final']}")
+    
+    return results
+
+
+def _lire_qpv_candidat(session: Session, candidat_id: int, adresse_personnelle: Optional[str],
+                       adresse_entreprise: Optional[str]) -> tuple:
+    """Adresses à analyser et résultat QPV en cache (None si une nouvelle recherche est nécessaire)"""
+    
     candidat = session.get(Candidat, candidat_id)
     if not candidat:
         raise HTTPException(status_code=404, detail="Candidat introuvable")
@@ -990,7 +1066,7 @@ async def check_qpv_candidate(
                     
                     if perso_match and ent_match:
                         print(f"✅ [QPV] Utilisation des données existantes pour candidat {candidat_id}")
-                        return {
+                        return adresse_personnelle, adresse_entreprise, {
                             "candidat_id": candidat_id,
                             "adresses_analysees": adresses_existantes,
                             "statut_qpv_final": "QPV" if eligibilite.qpv_ok else "NON_QPV",
@@ -1007,105 +1083,33 @@ async def check_qpv_candidate(
         else:
             print(f"⚠️ [QPV] Pas de données en cache - eligibilite: {bool(eligibilite)}, qpv_ok: {eligibilite.qpv_ok if eligibilite else None}")
     
-    # Si pas de données existantes ou adresses différentes, lancer la recherche
-    print(f"🔍 [QPV] Lancement nouvelle recherche pour candidat {candidat_id}")
-    
-    results = {
-        "candidat_id": candidat_id,
-        "adresses_analysees": [],
-        "statut_qpv_final": "NON_QPV",
-        "details": {}
-    }
-    
-    # Analyser l'adresse personnelle du candidat si disponible
-    print(f"🔍 [QPV] Adresse personnelle reçue: '{adresse_personnelle}'")
-    if adresse_personnelle and adresse_personnelle.strip():
-        try:
-            print(f"🔍 [QPV] Analyse adresse personnelle: {adresse_personnelle}")
-            qpv_personnelle = await verif_qpv({"address": adresse_personnelle}, request)
-            results["adresses_analysees"].append({
-                "type": "personnelle",
-                "adresse": adresse_personnelle,
-                "resultat": qpv_personnelle
-            })
-            results["details"]["personnelle"] = qpv_personnelle
-            print(f"✅ [QPV] Adresse personnelle analysée avec succès")
-        except Exception as e:
-            print(f"❌ [QPV] Erreur analyse adresse personnelle: {e}")
-            results["adresses_analysees"].append({
-                "type": "personnelle",
-                "adresse": adresse_personnelle,
-                "erreur": str(e)
-            })
-    else:
-        print(f"⚠️ [QPV] Adresse personnelle vide ou non fournie")
-        results["adresses_analysees"].append({
-            "type": "personnelle",
-            "adresse": "Non disponible",
-            "non_disponible": True
-        })
-    
-    # Analyser l'adresse de l'entreprise si disponible
-    print(f"🔍 [QPV] Adresse entreprise reçue: '{adresse_entreprise}'")
-    if adresse_entreprise and adresse_entreprise.strip():
-        try:
-            print(f"🔍 [QPV] Analyse adresse entreprise: {adresse_entreprise}")
-            qpv_entreprise = await verif_qpv({"address": adresse_entreprise}, request)
-            results["adresses_analysees"].append({
-                "type": "entreprise",
-                "adresse": adresse_entreprise,
-                "resultat": qpv_entreprise
-            })
-            results["details"]["entreprise"] = qpv_entreprise
-            print(f"✅ [QPV] Adresse entreprise analysée avec succès")
-        except Exception as e:
-            print(f"❌ [QPV] Erreur analyse entreprise: {e}")
-            results["adresses_analysees"].append({
-                "type": "entreprise",
-                "adresse": adresse_entreprise,
-                "erreur": str(e)
-            })
-    else:
-        print(f"⚠️ [QPV] Adresse entreprise vide ou non fournie")
-        results["adresses_analysees"].append({
-            "type": "entreprise",
-            "adresse": "Non disponible",
-            "non_disponible": True
-        })
-    
-    # Déterminer le statut QPV final
-    qpv_found = False
-    for analyse in results["adresses_analysees"]:
-        if "resultat" in analyse:
-            nom_qp = analyse["resultat"].get("nom_qp", "")
-            if "QPV:" in nom_qp or "QPV limit:" in nom_qp:
-                qpv_found = True
-                results["statut_qpv_final"] = "QPV"
-                break
-    
+    return adresse_personnelle, adresse_entreprise, None
+
+
+def _enregistrer_qpv_candidat(session: Session, current_user, candidat_id: int, results: dict, qpv_found: bool) -> None:
+    """Enregistre le résultat QPV dans l'éligibilité du candidat et journalise la vérification"""
     # Mettre à jour l'éligibilité du candidat
-    if candidat:
-        preinscription = session.exec(
-            select(Preinscription).where(Preinscription.candidat_id == candidat_id)
+    preinscription = session.exec(
+        select(Preinscription).where(Preinscription.candidat_id == candidat_id)
+    ).first()
+    
+    if preinscription:
+        eligibilite = session.exec(
+            select(Eligibilite).where(Eligibilite.preinscription_id == preinscription.id)
         ).first()
         
-        if preinscription:
-            eligibilite = session.exec(
-                select(Eligibilite).where(Eligibilite.preinscription_id == preinscription.id)
-            ).first()
-            
-            if not eligibilite:
-                eligibilite = Eligibilite(preinscription_id=preinscription.id)
-                session.add(eligibilite)
-            
-            import json
-            eligibilite.qpv_ok = qpv_found
-            eligibilite.details_json = json.dumps(results)  # Sauvegarder results complet, pas seulement details
+        if not eligibilite:
+            eligibilite = Eligibilite(preinscription_id=preinscription.id)
             session.add(eligibilite)
-            session.commit()
-            
-            print(f"✅ [QPV] Éligibilité mise à jour - QPV: {qpv_found}")
-    
+        
+        import json
+        eligibilite.qpv_ok = qpv_found
+        eligibilite.details_json = json.dumps(results)  # Sauvegarder results complet, pas seulement details
+        session.add(eligibilite)
+        session.commit()
+        
+        print(f"✅ [QPV] Éligibilité mise à jour - QPV: {qpv_found}")
+
     # Log de l'activité
     from app_lia_web.app.services.ACD.audit import log_activity
     log_activity(
@@ -1120,11 +1124,6 @@ async def check_qpv_candidate(
             "details": results["details"]
         }
     )
-    
-    print(f"🔍 [QPV] Résultat final: {len(results['adresses_analysees'])} adresses analysées")
-    print(f"🔍 [QPV] Statut final: {results['statut_qpv_final']}")
-    
-    return results
 
 
 @router.post("/siret-check", name="check_siret_candidate_inscription")
@@ -1138,7 +1137,7 @@ async def check_siret_candidate(
 ):
     """Vérifier les informations SIRET pour un candidat"""
     
-    candidat = session.get(Candidat, candidat_id)
+    candidat = await run_in_threadpool(session.get, Candidat, candidat_id)
     if not candidat:
         raise HTTPException(status_code=404, detail="Candidat introuvable")
     
@@ -1150,51 +1149,7 @@ async def check_siret_candidate(
         
         # Appeler le service SIRET
         siret_info = await get_entreprise_process(siret_request.numero_siret[:9], request)
-        
-        # Mettre à jour les informations de l'entreprise
-        entreprise = session.exec(
-            select(Entreprise).where(Entreprise.candidat_id == candidat_id)
-        ).first()
-        
-        if not entreprise:
-            entreprise = Entreprise(candidat_id=candidat_id)
-            session.add(entreprise)
-        
-        if siret_info.get("entreprise_data"):
-            data = siret_info["entreprise_data"]
-            
-            # Mettre à jour les champs de l'entreprise
-            entreprise.siret = data.get("siege", {}).get("siret")
-            entreprise.siren = data.get("siren")
-            entreprise.raison_sociale = data.get("nom_entreprise")  # Utiliser raison_sociale au lieu de nom_entreprise
-            entreprise.code_naf = data.get("code_naf")
-            entreprise.date_creation = data.get("date_creation")
-            
-            # Mettre à jour l'adresse du siège
-            siege = data.get("siege", {})
-            entreprise.adresse = siege.get("adresse")
-            entreprise.lat = siege.get("latitude")
-            entreprise.lng = siege.get("longitude")
-            
-            session.add(entreprise)
-            session.commit()
-            
-            print(f"✅ [SIRET] Informations entreprise mises à jour")
-        
-        # Log de l'activité
-        from app_lia_web.app.services.ACD.audit import log_activity
-        log_activity(
-            session=session,
-            user=current_user,
-            action="Vérification SIRET candidat",
-            entity="Candidat",
-            entity_id=candidat_id,
-            activity_data={
-                "numero_siret": numero_siret,
-                "entreprise_trouvee": bool(siret_info.get("entreprise_data")),
-                "status_code": siret_info.get("status_code")
-            }
-        )
+        await run_in_threadpool(_enregistrer_siret_candidat, session, current_user, candidat_id, numero_siret, siret_info)
         
         return {
             "candidat_id": candidat_id,
@@ -1208,6 +1163,54 @@ async def check_siret_candidate(
         raise HTTPException(status_code=500, detail=f"Erreur lors de la vérification SIRET: {str(e)}")
 
 
+def _enregistrer_siret_candidat(session: Session, current_user, candidat_id: int, numero_siret: str, siret_info: dict) -> None:
+    """Met à jour l'entreprise du candidat avec les données SIRET et journalise la vérification"""
+    # Mettre à jour les informations de l'entreprise
+    entreprise = session.exec(
+        select(Entreprise).where(Entreprise.candidat_id == candidat_id)
+    ).first()
+    
+    if not entreprise:
+        entreprise = Entreprise(candidat_id=candidat_id)
+        session.add(entreprise)
+    
+    if siret_info.get("entreprise_data"):
+        data = siret_info["entreprise_data"]
+        
+        # Mettre à jour les champs de l'entreprise
+        entreprise.siret = data.get("siege", {}).get("siret")
+        entreprise.siren = data.get("siren")
+        entreprise.raison_sociale = data.get("nom_entreprise")  # Utiliser raison_sociale au lieu de nom_entreprise
+        entreprise.code_naf = data.get("code_naf")
+        entreprise.date_creation = data.get("date_creation")
+        
+        # Mettre à jour l'adresse du siège
+        siege = data.get("siege", {})
+        entreprise.adresse = siege.get("adresse")
+        entreprise.lat = siege.get("latitude")
+        entreprise.lng = siege.get("longitude")
+        
+        session.add(entreprise)
+        session.commit()
+        
+        print(f"✅ [SIRET] Informations entreprise mises à jour")
+    
+    # Log de l'activité
+    from app_lia_web.app.services.ACD.audit import log_activity
+    log_activity(
+        session=session,
+        user=current_user,
+        action="Vérification SIRET candidat",
+        entity="Candidat",
+        entity_id=candidat_id,
+        activity_data={
+            "numero_siret": numero_siret,
+            "entreprise_trouvee": bool(siret_info.get("entreprise_data")),
+            "status_code": siret_info.get("status_code")
+        }
+    )
+
+
 @router.get("/qpv-status/{candidat_id}", name="get_qpv_status_inscription")
 def get_qpv_status(
     candidat_id: int,
@@ -1251,6 +1254,18 @@ async def download_siret_document(
     """Télécharge un document depuis l'API SIRET et l'ajoute aux documents du candidat"""
     try:
         data = await request.json()
+    except Exception as e:
+        print(f"❌ [SIRET DOC] Erreur: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "message": f"Erreur lors du traitement: {str(e)}"}
+        )
+    # Route async (lecture du corps JSON) : appel Pappers, écriture du fichier et base dans le pool de threads
+    return await run_in_threadpool(_enregistrer_document_siret, data, session)
+
+
+def _enregistrer_document_siret(data: dict, session: Session) -> JSONResponse:
+    try:
         candidat_id = data.get("candidat_id")
         token = data.get("token")
         nom_fichier = data.get("nom_fichier", "document_siret.pdf")
@@ -1431,7 +1446,7 @@ def download_document(
     """Télécharger un document."""
     try:
         from app_lia_web.app.models.base import Document
-        from fastapi.responses import FileResponse
+        from app_lia_web.core.file_delivery import reponse_fichier
         
         doc = session.get(Document, document_id)
         if not doc:
@@ -1444,11 +1459,7 @@ def download_document(
             print(f"❌ [DOC] Fichier non trouvé: {file_path}")
             raise HTTPException(status_code=404, detail="Fichier introuvable")
         
-        return FileResponse(
-            path=str(file_path),
-            filename=doc.nom_fichier,
-            media_type="application/octet-stream"
-        )
+        return reponse_fichier(file_path, filename=doc.nom_fichier, media_type="application/octet-stream")
         
     except Exception as e:
         print(f"❌ [DOC] Erreur lors du téléchargement: {e}")
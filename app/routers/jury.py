@@ -20,7 +20,7 @@ router = APIRouter()
 
 
 @router.post("/jurys", response_model=JuryResponse)
-async def create_jury(
+def create_jury(
     jury_data: JuryCreate,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -46,7 +46,7 @@ async def create_jury(
 
 
 @router.get("/jurys", response_model=List[JuryResponse])
-async def get_jurys(
+def get_jurys(
     programme_id: Optional[int] = Query(None, description="Filtrer par programme"),
     statut: Optional[str] = Query(None, description="Filtrer par statut"),
     session: Session = Depends(get_session),
@@ -67,7 +67,7 @@ async def get_jurys(
 
 
 @router.get("/jurys/{jury_id}", response_model=JuryResponse)
-async def get_jury(
+def get_jury(
     jury_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -84,7 +84,7 @@ async def get_jury(
 
 
 @router.put("/jurys/{jury_id}", response_model=JuryResponse)
-async def update_jury(
+def update_jury(
     jury_id: int,
     jury_data: JuryUpdate,
     session: Session = Depends(get_session),
@@ -118,7 +118,7 @@ async def update_jury(
 
 
 @router.post("/jurys/{jury_id}/membres")
-async def add_jury_member(
+def add_jury_member(
     jury_id: int,
     utilisateur_id: int,
     role: str = "membre",
@@ -177,7 +177,7 @@ async def add_jury_member(
 
 
 @router.get("/jurys/{jury_id}/membres")
-async def get_jury_members(
+def get_jury_members(
     jury_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -199,7 +199,7 @@ async def get_jury_members(
 
 
 @router.post("/jurys/{jury_id}/decisions")
-async def create_jury_decision(
+def create_jury_decision(
     jury_id: int,
     decision_data: DecisionJuryCreate,
     session: Session = Depends(get_session),
@@ -271,7 +271,7 @@ async def create_jury_decision(
 
 
 @router.get("/jurys/{jury_id}/decisions")
-async def get_jury_decisions(
+def get_jury_decisions(
     jury_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -293,7 +293,7 @@ async def get_jury_decisions(
 
 
 @router.get("/programmes/{programme_id}/jurys")
-async def get_programme_jurys(
+def get_programme_jurys(
     programme_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -0,0 +1,31 @@
+"""
+Routeur de l'exposition des métriques Prometheus
+
+Sans requête en base : lit les métriques du processus (ou de tous les workers
+si PROMETHEUS_MULTIPROC_DIR est défini, voir core/metrics.py). Exposé si
+settings.METRICS_ENABLED et protégé par settings.METRICS_TOKEN ; hors DEBUG,
+refusé tant qu'aucun jeton n'est configuré (routes, volumes et dépendances
+ne doivent pas être publics).
+"""
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import Response
+
+from app_lia_web.core import metrics
+from app_lia_web.core.config import settings
+
+router = APIRouter()
+
+
+@router.get("/metrics", name="metrics", include_in_schema=False)
+def exposer_metriques(authorization: Optional[str] = Header(None)):
+    """Métriques au format texte Prometheus"""
+    if settings.METRICS_TOKEN or not settings.DEBUG:
+        attendu = f"Bearer {settings.METRICS_TOKEN}" if settings.METRICS_TOKEN else None
+        if attendu is None or not hmac.compare_digest(authorization or "", attendu):
+            raise HTTPException(status_code=403, detail="Accès non autorisé")
+    if not settings.METRICS_ENABLED or not metrics.disponible():
+        raise HTTPException(status_code=503, detail="Métriques indisponibles")
+    return Response(content=metrics.exposition(), media_type=metrics.CONTENT_TYPE_LATEST)
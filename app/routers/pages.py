@@ -6,6 +6,7 @@ from app_lia_web.core.database import get_session
 from app_lia_web.core.security import get_current_user, require_permission
 from app_lia_web.app.models.base import Programme, User, Inscription, Jury, Candidat, Document
 from app_lia_web.app.models.enums import UserRole
+from app_lia_web.app.services.activity_feed_service import ActivityFeedService
 from app_lia_web.app.templates import templates
 
 router = APIRouter()
@@ -55,11 +56,12 @@ def page_directeur(request: Request, session=Depends(get_session), u=Depends(get
         "pappers_ok": bool(settings.PAPPERS_API_KEY),
     }
 
-    # Activité & invitations (exemples : à remplacer par audit réel)
+    # Activité récente : fil unifié (préinscriptions, inscriptions, jurys, audit)
     activites = [
-        {"texte": "Programme ACT attribué à RP-ACT", "quand": "il y a 2 h"},
-        {"texte": "2 inscriptions passées en 'validé'", "quand": "hier"},
+        {"texte": a["description"], "quand": a["date"].strftime("%d/%m/%Y %H:%M")}
+        for a in ActivityFeedService.get_feed(session, limit=8)["items"]
     ]
+    # Invitations (exemple : à remplacer par les invitations réelles)
     invitations = [
         {"email": "coach.ext@lia.app", "role": "COACH_EXTERNE", "expire": "dans 5 jours"},
     ]
@@ -40,7 +40,7 @@ async def forgot_password_page(request: Request):
 
 
 @router.post("/mot-de-passe-oublie", response_class=HTMLResponse, name="request_password_recovery_post")
-async def request_password_recovery(
+def request_password_recovery(
     request: Request,
     email: str = Form(...),
     session: Session = Depends(get_session)
@@ -107,7 +107,7 @@ async def verify_code_page(request: Request, email: Optional[str] = None, succes
 
 
 @router.post("/verification-code", response_class=HTMLResponse, name="verify_recovery_code_post")
-async def verify_recovery_code(
+def verify_recovery_code(
     request: Request,
     email: str = Form(...),
     code: str = Form(...),
@@ -176,7 +176,7 @@ async def reset_password_page(request: Request, email: Optional[str] = None, cod
 
 
 @router.post("/reinitialiser-mot-de-passe", response_class=HTMLResponse, name="reset_password_post")
-async def reset_password(
+def reset_password(
     request: Request,
     email: str = Form(...),
     code: str = Form(...),
@@ -262,7 +262,7 @@ async def reset_password(
 
 # Routes API pour intégration avec d'autres systèmes
 @router.post("/api/password-recovery/request", response_model=PasswordRecoveryResponse, name="api_request_password_recovery_post")
-async def api_request_password_recovery(
+def api_request_password_recovery(
     request_data: PasswordRecoveryRequest,
     request: Request,
     session: Session = Depends(get_session)
@@ -286,7 +286,7 @@ async def api_request_password_recovery(
 
 
 @router.post("/api/password-recovery/verify", response_model=PasswordRecoveryResponse, name="api_verify_recovery_code_post")
-async def api_verify_recovery_code(
+def api_verify_recovery_code(
     request_data: PasswordRecoveryVerify,
     session: Session = Depends(get_session)
 ):
@@ -308,7 +308,7 @@ async def api_verify_recovery_code(
 
 
 @router.post("/api/password-recovery/reset", response_model=PasswordRecoveryResponse, name="api_reset_password_post")
-async def api_reset_password(
+def api_reset_password(
     request_data: PasswordReset,
     session: Session = Depends(get_session)
 ):
@@ -335,7 +335,7 @@ async def api_reset_password(
 
 
 @router.post("/api/password-recovery/cleanup", name="api_cleanup_expired_codes")
-async def cleanup_expired_codes(session: Session = Depends(get_session)):
+def cleanup_expired_codes(session: Session = Depends(get_session)):
     """API pour nettoyer les codes expirés (utilisé par un cron job)"""
     try:
         count = recovery_service.cleanup_expired_codes(session)
@@ -1,13 +1,15 @@
 """
 Router pour la gestion des pipelines de formation
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, status, Query
+from sqlalchemy import func
 from sqlmodel import Session, select
 from typing import List, Optional
 from datetime import datetime
 
 from app_lia_web.core.database import get_session
 from app_lia_web.core.security import get_current_user, require_permission
+from app_lia_web.core.sql_budget import budget_sql
 from app_lia_web.app.models.base import User, EtapePipeline, AvancementEtape, Programme, Inscription
 from app_lia_web.app.models.enums import UserRole, StatutDossier
 from app_lia_web.app.schemas import EtapePipelineCreate, EtapePipelineUpdate, AvancementEtapeCreate
@@ -17,7 +19,7 @@ router = APIRouter()
 
 
 @router.get("/pipelines/{programme_id}/etapes", response_model=List[dict])
-async def get_pipeline_etapes(
+def get_pipeline_etapes(
     programme_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -28,7 +30,7 @@ async def get_pipeline_etapes(
 
 
 @router.post("/pipelines/{programme_id}/etapes")
-async def create_pipeline_etape(
+def create_pipeline_etape(
     programme_id: int,
     etape: EtapePipelineCreate,
     session: Session = Depends(get_session),
@@ -42,7 +44,7 @@ async def create_pipeline_etape(
 
 
 @router.put("/pipelines/etapes/{etape_id}")
-async def update_pipeline_etape(
+def update_pipeline_etape(
     etape_id: int,
     etape_update: EtapePipelineUpdate,
     session: Session = Depends(get_session),
@@ -56,7 +58,7 @@ async def update_pipeline_etape(
 
 
 @router.delete("/pipelines/etapes/{etape_id}")
-async def delete_pipeline_etape(
+def delete_pipeline_etape(
     etape_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -69,7 +71,7 @@ async def delete_pipeline_etape(
 
 
 @router.post("/pipelines/etapes/{etape_id}/toggle")
-async def toggle_pipeline_etape(
+def toggle_pipeline_etape(
     etape_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -82,7 +84,7 @@ async def toggle_pipeline_etape(
 
 
 @router.get("/inscriptions/{inscription_id}/avancement")
-async def get_inscription_avancement(
+def get_inscription_avancement(
     inscription_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -93,7 +95,7 @@ async def get_inscription_avancement(
 
 
 @router.post("/inscriptions/{inscription_id}/avancement")
-async def update_inscription_avancement(
+def update_inscription_avancement(
     inscription_id: int,
     avancement: AvancementEtapeCreate,
     session: Session = Depends(get_session),
@@ -107,7 +109,7 @@ async def update_inscription_avancement(
 
 
 @router.get("/pipelines/{programme_id}/statistiques")
-async def get_pipeline_statistiques(
+def get_pipeline_statistiques(
     programme_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -117,8 +119,21 @@ async def get_pipeline_statistiques(
     return stats
 
 
+@router.get("/pipelines/{programme_id}/board")
+@budget_sql(2)
+def get_pipeline_board(
+    programme_id: int,
+    limite_par_etape: Optional[int] = Query(50, ge=1, le=1000),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Tableau kanban du pipeline : étapes, candidats par étape et compteurs"""
+    return PipelineService.get_pipeline_board(session, programme_id, limite_par_etape)
+
+
 @router.get("/pipelines/etapes/{etape_id}/candidats")
-async def get_candidats_par_etape(
+@budget_sql(2)
+def get_candidats_par_etape(
     etape_id: int,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
@@ -131,7 +146,7 @@ async def get_candidats_par_etape(
 
 
 @router.post("/pipelines/{programme_id}/reinitialiser")
-async def reinitialiser_pipeline(
+def reinitialiser_pipeline(
     programme_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -139,12 +154,12 @@ async def reinitialiser_pipeline(
     """Réinitialise le pipeline d'un programme (supprime tous les avancements)"""
     require_permission(current_user, [UserRole.DIRECTEUR_TECHNIQUE.value])
     
-    PipelineService.reinitialiser_pipeline(session, programme_id)
-    return {"message": "Pipeline réinitialisé avec succès"}
+    supprimes = PipelineService.reinitialiser_pipeline(session, programme_id)
+    return {"message": "Pipeline réinitialisé avec succès", "avancements_supprimes": supprimes}
 
 
 @router.get("/pipelines/etapes/{etape_id}/details")
-async def get_etape_details(
+def get_etape_details(
     etape_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -156,9 +171,9 @@ async def get_etape_details(
     
     # Compter les candidats à cette étape
     candidats_count = session.exec(
-        select(AvancementEtape)
+        select(func.count(AvancementEtape.id))
         .where(AvancementEtape.etape_id == etape_id)
-    ).count()
+    ).one()
     
     return {
         "etape": etape,
@@ -167,7 +182,7 @@ async def get_etape_details(
 
 
 @router.post("/pipelines/etapes/{etape_id}/reordonner")
-async def reordonner_etapes(
+def reordonner_etapes(
     etape_id: int,
     nouvelle_position: int,
     session: Session = Depends(get_session),
@@ -178,3 +193,20 @@ async def reordonner_etapes(
     
     PipelineService.reordonner_etapes(session, etape_id, nouvelle_position)
     return {"message": "Ordre des étapes mis à jour avec succès"}
+
+
+@router.put("/pipelines/{programme_id}/ordre")
+def definir_ordre_etapes(
+    programme_id: int,
+    etape_ids: List[int] = Body(..., embed=True),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Applique l'ordre complet des étapes en une seule mise à jour"""
+    require_permission(current_user, [UserRole.DIRECTEUR_TECHNIQUE.value, UserRole.RESPONSABLE_PROGRAMME.value])
+    
+    try:
+        PipelineService.definir_ordre_etapes(session, programme_id, etape_ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": "Ordre des étapes mis à jour avec succès"}
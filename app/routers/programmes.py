@@ -1,7 +1,7 @@
 """
 Router pour la gestion des programmes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlmodel import Session, select
 from typing import List
 
@@ -11,13 +11,14 @@ from app_lia_web.app.models.base import User, Programme
 from app_lia_web.app.models.enums import UserRole
 from app_lia_web.app.schemas import ProgrammeCreate, ProgrammeUpdate, ProgrammeResponse
 from app_lia_web.app.services import ProgrammeService
+from app_lia_web.app.services.eligibilite_service import recalculer_programme_en_arriere_plan, seuils
 from app_lia_web.app.models.base import Preinscription, Inscription, Jury
 
 router = APIRouter()
 
 
 @router.post("/programmes", response_model=ProgrammeResponse)
-async def create_programme(
+def create_programme(
     programme_data: ProgrammeCreate,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -42,7 +43,7 @@ async def create_programme(
 
 
 @router.get("/programmes", response_model=List[ProgrammeResponse])
-async def get_programmes(
+def get_programmes(
     actif: bool = None,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -57,7 +58,7 @@ async def get_programmes(
 
 
 @router.get("/programmes/{programme_id}", response_model=ProgrammeResponse)
-async def get_programme(
+def get_programme(
     programme_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -74,9 +75,10 @@ async def get_programme(
 
 
 @router.put("/programmes/{programme_id}", response_model=ProgrammeResponse)
-async def update_programme(
+def update_programme(
     programme_id: int,
     programme_data: ProgrammeUpdate,
+    background_tasks: BackgroundTasks,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
@@ -87,18 +89,23 @@ async def update_programme(
             detail="Seul le directeur technique peut modifier les programmes"
         )
     
+    existant = session.get(Programme, programme_id)
+    seuils_avant = seuils(existant) if existant else None
     programme = ProgrammeService.update_programme(session, programme_id, programme_data)
     if not programme:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Programme non trouvé"
         )
+    if seuils(programme) != seuils_avant:
+        # Toutes les éligibilités du programme sont périmées : recalcul après la réponse
+        background_tasks.add_task(recalculer_programme_en_arriere_plan, programme_id)
     
     return ProgrammeResponse.from_orm(programme)
 
 
 @router.get("/programmes/{programme_id}/statistiques")
-async def get_programme_stats(
+def get_programme_stats(
     programme_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
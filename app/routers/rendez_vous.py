@@ -12,7 +12,7 @@ from app_lia_web.core.config import settings
 from app_lia_web.app.models.base import User, Programme, Inscription, Candidat, Entreprise, RendezVous, EmargementRDV
 from app_lia_web.app.models.enums import TypeRDV, StatutRDV, UserRole
 from app_lia_web.app.schemas.rendez_vous_schemas import RendezVousCreate, RendezVousUpdate, RendezVousFilter
-from app_lia_web.app.services.rendez_vous_service import RendezVousService
+from app_lia_web.app.services.rendez_vous_service import RendezVousService, ConflitRendezVous, DUREE_RDV_DEFAUT_MINUTES
 from app_lia_web.app.templates import templates
 
 router = APIRouter()
@@ -217,6 +217,8 @@ def rendez_vous_create(
         
         return RedirectResponse(url="/rendez-vous", status_code=303)
         
+    except ConflitRendezVous as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Erreur lors de la création du rendez-vous: {str(e)}")
 
@@ -285,6 +287,10 @@ def rendez_vous_update(
         
         return RedirectResponse(url=f"/rendez-vous/{rdv_id}", status_code=303)
         
+    except HTTPException:
+        raise
+    except ConflitRendezVous as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Erreur lors de la modification du rendez-vous: {str(e)}")
 
@@ -356,8 +362,31 @@ def rendez_vous_api_stats(
     
     return stats
 
+@router.get("/rendez-vous/api/creneaux-libres", name="rendez_vous_api_creneaux_libres")
+def rendez_vous_api_creneaux_libres(
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    conseiller_ids: List[int] = Query(...),
+    nombre: int = Query(5, ge=1, le=50),
+    duree_minutes: int = Query(DUREE_RDV_DEFAUT_MINUTES, ge=15, le=480),
+    a_partir_de: Optional[str] = Query(None),
+    horizon_jours: int = Query(14, ge=1, le=90)
+):
+    """API des prochains créneaux libres d'un ou plusieurs conseillers"""
+    
+    service = RendezVousService(session)
+    creneaux = service.get_creneaux_libres(
+        conseiller_ids,
+        nombre=nombre,
+        duree_minutes=duree_minutes,
+        a_partir_de=datetime.fromisoformat(a_partir_de) if a_partir_de else None,
+        horizon_jours=horizon_jours
+    )
+    
+    return {"creneaux": creneaux}
+
 @router.get("/emargement/{rdv_id}", name="emargement_rdv")
-async def page_emargement_conseiller(
+def page_emargement_conseiller(
     request: Request,
     rdv_id: int,
     session: Session = Depends(get_session),
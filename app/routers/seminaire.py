@@ -1,6 +1,7 @@
 # app/routers/seminaire.py
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Form, File, UploadFile
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Request, Form, File, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from sqlmodel import Session, select
 from typing import List, Optional
 from datetime import datetime, date, timezone
@@ -9,6 +10,7 @@ import uuid
 
 from app_lia_web.core.database import get_session
 from app_lia_web.core.security import get_current_user
+from app_lia_web.core.sql_budget import budget_sql
 from app_lia_web.core.path_config import path_config
 from app_lia_web.app.services.file_upload_service import FileUploadService
 from app_lia_web.app.models.base import User, Programme
@@ -20,7 +22,10 @@ from app_lia_web.app.schemas.seminaire_schemas import (
     SeminaireFilter, PresenceFilter
 )
 from app_lia_web.app.services.seminaire_service import SeminaireService
+from app_lia_web.app.services.feuille_emargement_service import feuilles_seminaire, servir_feuilles
+from app_lia_web.app.services.emargement_live import ENTETES_SSE, canal, diffuseur, existe_puis_liberer, flux_sse
 from app_lia_web.app.templates import templates
+from app_lia_web.core.gr_code import generate_qr_batch, png_depuis_data_url
 
 router = APIRouter()
 seminaire_service = SeminaireService()
@@ -28,7 +33,7 @@ seminaire_service = SeminaireService()
 # === ROUTES WEB ===
 
 @router.get("/", name="liste_seminaires", response_class=HTMLResponse)
-async def liste_seminaires(
+def liste_seminaires(
     request: Request,
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
@@ -54,7 +59,7 @@ async def liste_seminaires(
     })
 
 @router.get("/nouveau", name="form_seminaire", response_class=HTMLResponse)
-async def nouveau_seminaire_form(
+def nouveau_seminaire_form(
     request: Request,
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -71,7 +76,7 @@ async def nouveau_seminaire_form(
     })
 
 @router.post("/nouveau",name="creer_seminaire")
-async def creer_seminaire(
+def creer_seminaire(
     request: Request,
     titre: str = Form(...),
     description: str = Form(""),
@@ -105,7 +110,7 @@ async def creer_seminaire(
     return RedirectResponse(url=f"/seminaires/{seminaire.id}", status_code=303)
 
 @router.get("/{seminaire_id}",name="detail_seminaire", response_class=HTMLResponse)
-async def detail_seminaire(
+def detail_seminaire(
     seminaire_id: int,
     request: Request,
     db: Session = Depends(get_session),
@@ -131,7 +136,7 @@ async def detail_seminaire(
     })
 
 @router.get("/{seminaire_id}/sessions/nouvelle",name="nouvelle_session_seminaire", response_class=HTMLResponse)
-async def nouvelle_session_form(
+def nouvelle_session_form(
     seminaire_id: int,
     request: Request,
     db: Session = Depends(get_session),
@@ -150,7 +155,7 @@ async def nouvelle_session_form(
     })
 
 @router.post("/{seminaire_id}/sessions/nouvelle",name="creer_session_seminaire")
-async def creer_session(
+def creer_session(
     seminaire_id: int,
     request: Request,
     titre: str = Form(...),
@@ -195,7 +200,7 @@ async def creer_session(
     return RedirectResponse(url=f"/seminaires/{seminaire_id}", status_code=303)
 
 @router.get("/{seminaire_id}/invitations",name="invitations_seminaire", response_class=HTMLResponse)
-async def invitations_seminaire(
+def invitations_seminaire(
     seminaire_id: int,
     request: Request,
     db: Session = Depends(get_session),
@@ -240,7 +245,7 @@ async def invitations_seminaire(
     })
 
 @router.post("/{seminaire_id}/invitations/envoyer",name="envoyer_invitations_seminaire")
-async def envoyer_invitations(
+def envoyer_invitations(
     seminaire_id: int,
     request: Request,
     type_invitation: str = Form(...),
@@ -255,7 +260,7 @@ async def envoyer_invitations(
     return RedirectResponse(url=f"/seminaires/{seminaire_id}/invitations", status_code=303)
 
 @router.get("/{seminaire_id}/sessions/{session_id}/emargement/liens", name="generer_liens_emargement", response_class=HTMLResponse)
-async def generer_liens_emargement(
+def generer_liens_emargement(
     request: Request,
     seminaire_id: int,
     session_id: int,
@@ -288,7 +293,7 @@ async def generer_liens_emargement(
     })
 
 @router.post("/{seminaire_id}/sessions/{session_id}/emargement/liens/envoyer", name="envoyer_liens_emargement")
-async def envoyer_liens_emargement(
+def envoyer_liens_emargement(
     seminaire_id: int,
     session_id: int,
     request: Request,
@@ -304,14 +309,17 @@ async def envoyer_liens_emargement(
         if invitation:
             invitations.append(invitation)
     
+    # Liens d'émargement et leurs QR codes, générés en un appel pour toute la liste
+    from app_lia_web.core.config import settings
+    base_url = settings.get_base_url_for_email()
+    liens = {invitation.id: f"{base_url}/seminaires/{seminaire_id}/sessions/{session_id}/emargement/lien/{invitation.token_invitation}" for invitation in invitations}
+    qr_codes = generate_qr_batch(liens.values())
+    
     # Envoyer les emails avec les liens d'émargement
     sent_count = 0
     for invitation in invitations:
         try:
-            # Générer le lien d'émargement
-            from app_lia_web.core.config import settings
-            base_url = settings.get_base_url_for_email()
-            emargement_url = f"{base_url}/seminaires/{seminaire_id}/sessions/{session_id}/emargement/lien/{invitation.token_invitation}"
+            emargement_url = liens[invitation.id]
             
             # Préparer l'email
             subject = f"Lien d'émargement - {invitation.seminaire.titre}"
@@ -321,6 +329,7 @@ async def envoyer_liens_emargement(
                 'session_titre': invitation.seminaire.sessions[0].titre if invitation.seminaire.sessions else "Session",
                 'date_session': invitation.seminaire.sessions[0].date_session.strftime('%d/%m/%Y') if invitation.seminaire.sessions else "",
                 'emargement_url': emargement_url,
+                'qr_cid': 'qr_emargement',
                 'base_url': base_url
             }
             
@@ -329,7 +338,8 @@ async def envoyer_liens_emargement(
                 to_email=invitation.inscription.candidat.email,
                 subject=subject,
                 template="emargement_lien",
-                data=template_data
+                data=template_data,
+                images={'qr_emargement': png_depuis_data_url(qr_codes[emargement_url])}
             )
             sent_count += 1
             
@@ -339,7 +349,7 @@ async def envoyer_liens_emargement(
     return RedirectResponse(url=f"/seminaires/{seminaire_id}/sessions/{session_id}/emargement", status_code=303)
 
 @router.get("/{seminaire_id}/sessions/{session_id}/emargement/lien/{token}", name="emargement_lien", response_class=HTMLResponse)
-async def emargement_lien(
+def emargement_lien(
     request: Request,
     seminaire_id: int,
     session_id: int,
@@ -373,7 +383,7 @@ async def emargement_lien(
     })
 
 @router.post("/{seminaire_id}/sessions/{session_id}/emargement/lien/{token}", name="signer_emargement_lien")
-async def signer_emargement_lien(
+def signer_emargement_lien(
     seminaire_id: int,
     session_id: int,
     token: str,
@@ -429,7 +439,8 @@ async def signer_emargement_lien(
     })
 
 @router.get("/{seminaire_id}/sessions/{session_id}/emargement",name="emargement_session", response_class=HTMLResponse)
-async def emargement_session(
+@budget_sql(10)
+def emargement_session(
     seminaire_id: int,
     session_id: int,
     request: Request,
@@ -444,7 +455,8 @@ async def emargement_session(
         raise HTTPException(status_code=404, detail="Séminaire ou session non trouvé")
     
     presences_data = seminaire_service.get_presences_with_invitation_details(seminaire_id, session_id, db)
-    stats = seminaire_service.get_presence_stats_with_invitations(seminaire_id, session_id, db)
+    # Statistiques calculées sur la liste déjà chargée : pas de second passage sur le roster
+    stats = seminaire_service.compute_presence_stats([p['presence'] for p in presences_data])
     
     return templates.TemplateResponse("seminaires/emargement.html", {
         "request": request,
@@ -456,8 +468,51 @@ async def emargement_session(
         "utilisateur": current_user
     })
 
+@router.get("/{seminaire_id}/emargement.pdf", name="feuilles_emargement_seminaire")
+def feuilles_emargement_seminaire(
+    seminaire_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Feuilles d'émargement PDF de tout le séminaire (une par session)"""
+    feuilles = feuilles_seminaire(db, seminaire_id)
+    if not feuilles:
+        raise HTTPException(status_code=404, detail="Séminaire non trouvé ou sans session")
+    return servir_feuilles(feuilles, background_tasks, f"emargement_seminaire_{seminaire_id}.pdf")
+
+@router.get("/{seminaire_id}/sessions/{session_id}/emargement.pdf", name="feuille_emargement_session")
+def feuille_emargement_session(
+    seminaire_id: int,
+    session_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Feuille d'émargement PDF d'une session"""
+    feuilles = feuilles_seminaire(db, seminaire_id, session_id)
+    if not feuilles:
+        raise HTTPException(status_code=404, detail="Séminaire ou session non trouvé")
+    return servir_feuilles(feuilles, background_tasks, f"emargement_session_{session_id}.pdf")
+
+@router.get("/{seminaire_id}/sessions/{session_id}/emargement/flux", name="flux_emargement_session")
+async def flux_emargement_session(
+    seminaire_id: int,
+    session_id: int,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Flux SSE des présences de la session (une ligne par signature ou pointage)"""
+    if not await run_in_threadpool(existe_puis_liberer, db, SessionSeminaire, session_id):
+        raise HTTPException(status_code=404, detail="Session non trouvée")
+    return StreamingResponse(
+        flux_sse(diffuseur, [canal("session", session_id)]),
+        media_type="text/event-stream",
+        headers=ENTETES_SSE,
+    )
+
 @router.post("/{seminaire_id}/sessions/{session_id}/emargement",name="marquer_presence_session")
-async def marquer_presence(
+def marquer_presence(
     seminaire_id: int,
     session_id: int,
     request: Request,
@@ -485,7 +540,7 @@ async def marquer_presence(
     return RedirectResponse(url=f"/seminaires/{seminaire_id}/sessions/{session_id}/emargement", status_code=303)
 
 @router.get("/{seminaire_id}/livrables",name="livrables_seminaire", response_class=HTMLResponse)
-async def livrables_seminaire(
+def livrables_seminaire(
     seminaire_id: int,
     request: Request,
     db: Session = Depends(get_session),
@@ -507,7 +562,7 @@ async def livrables_seminaire(
     })
 
 @router.post("/{seminaire_id}/livrables/nouveau",name="creer_livrable_seminaire")
-async def creer_livrable(
+def creer_livrable(
     seminaire_id: int,
     request: Request,
     titre: str = Form(...),
@@ -546,7 +601,7 @@ async def creer_livrable(
     return RedirectResponse(url=f"/seminaires/{seminaire_id}/livrables", status_code=303)
 
 @router.get("/{seminaire_id}/livrables/candidat", name="livrables_candidat", response_class=HTMLResponse)
-async def livrables_candidat(
+def livrables_candidat(
     request: Request,
     seminaire_id: int,
     db: Session = Depends(get_session),
@@ -617,13 +672,13 @@ async def rendre_livrable(
         'commentaire_candidat': commentaire
     }
     
-    rendu = seminaire_service.submit_livrable(livrable_id, inscription_id, file_data, db)
+    await run_in_threadpool(seminaire_service.submit_livrable, livrable_id, inscription_id, file_data, db)
     return RedirectResponse(url=f"/seminaires/{seminaire_id}/livrables", status_code=303)
 
 # === ROUTES API ===
 
 @router.get("/api/stats",name="get_seminaire_stats_api")
-async def get_seminaire_stats(
+def get_seminaire_stats(
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
@@ -631,7 +686,7 @@ async def get_seminaire_stats(
     return seminaire_service.get_seminaire_stats(db)
 
 @router.get("/api/{seminaire_id}/sessions/{session_id}/stats",name="get_session_stats_api")
-async def get_session_stats(
+def get_session_stats(
     seminaire_id: int,
     session_id: int,
     db: Session = Depends(get_session),
@@ -644,7 +699,7 @@ async def get_session_stats(
 # === ROUTES PUBLIQUES (pour les invitations) ===
 
 @router.get("/{seminaire_id}/sessions/{session_id}/emargement-direct", name="emargement_direct", response_class=HTMLResponse)
-async def emargement_direct(
+def emargement_direct(
     seminaire_id: int, session_id: int, request: Request,
     db: Session = Depends(get_session)
 ):
@@ -678,7 +733,7 @@ async def emargement_direct(
     })
 
 @router.post("/{seminaire_id}/supprimer", name="supprimer_seminaire")
-async def supprimer_seminaire(
+def supprimer_seminaire(
     seminaire_id: int,
     request: Request,
     db: Session = Depends(get_session),
@@ -703,7 +758,7 @@ async def supprimer_seminaire(
         raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
 
 @router.post("/{seminaire_id}/sessions/{session_id}/supprimer", name="supprimer_session")
-async def supprimer_session(
+def supprimer_session(
     seminaire_id: int,
     session_id: int,
     request: Request,
@@ -731,7 +786,7 @@ async def supprimer_session(
         raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
 
 @router.get("/invitation/{token}",name="invitation_page", response_class=HTMLResponse)
-async def invitation_page(
+def invitation_page(
     token: str,
     request: Request,
     db: Session = Depends(get_session)
@@ -757,7 +812,7 @@ async def invitation_page(
     })
 
 @router.get("/invitation/{token}/accepter", name="accepter_invitation", response_class=HTMLResponse)
-async def accepter_invitation(
+def accepter_invitation(
     request: Request,
     token: str,
     db: Session = Depends(get_session)
@@ -777,7 +832,7 @@ async def accepter_invitation(
     })
 
 @router.get("/invitation/{token}/refuser", name="refuser_invitation", response_class=HTMLResponse)
-async def refuser_invitation(
+def refuser_invitation(
     request: Request,
     token: str,
     db: Session = Depends(get_session)
@@ -797,7 +852,7 @@ async def refuser_invitation(
     })
 
 @router.post("/{seminaire_id}/sessions/{session_id}/participant/{inscription_id}/supprimer", name="supprimer_participant_session")
-async def supprimer_participant_session(
+def supprimer_participant_session(
     seminaire_id: int,
     session_id: int,
     inscription_id: int,
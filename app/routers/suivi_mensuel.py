@@ -44,7 +44,7 @@ def clean_int_data(data: str) -> Optional[int]:
 # === ROUTES WEB ===
 
 @router.get("/", name="liste_candidats_valides", response_class=HTMLResponse)
-async def liste_candidats_valides(
+def liste_candidats_valides(
     request: Request,
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
@@ -139,7 +139,7 @@ async def liste_candidats_valides(
         raise
 
 @router.get("/suivis", name="liste_suivis_mensuels", response_class=HTMLResponse)
-async def liste_suivis_mensuels(
+def liste_suivis_mensuels(
     request: Request,
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
@@ -182,7 +182,7 @@ async def liste_suivis_mensuels(
     )
 
 @router.get("/creer", name="creer_suivi_mensuel_form", response_class=HTMLResponse)
-async def creer_suivi_mensuel_form(
+def creer_suivi_mensuel_form(
     request: Request,
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
@@ -210,7 +210,7 @@ async def creer_suivi_mensuel_form(
     )
 
 @router.post("/creer", name="creer_suivi_mensuel")
-async def creer_suivi_mensuel(
+def creer_suivi_mensuel(
     request: Request,
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
@@ -315,7 +315,7 @@ async def creer_suivi_mensuel(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 @router.get("/modifier/{suivi_id}", name="modifier_suivi_mensuel_form", response_class=HTMLResponse)
-async def modifier_suivi_mensuel_form(
+def modifier_suivi_mensuel_form(
     request: Request,
     suivi_id: int,
     db: Session = Depends(get_session),
@@ -362,7 +362,7 @@ async def modifier_suivi_mensuel_form(
     )
 
 @router.post("/modifier/{suivi_id}", name="modifier_suivi_mensuel")
-async def modifier_suivi_mensuel(
+def modifier_suivi_mensuel(
     request: Request,
     suivi_id: int,
     db: Session = Depends(get_session),
@@ -468,7 +468,7 @@ async def modifier_suivi_mensuel(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 @router.post("/supprimer/{suivi_id}", name="supprimer_suivi_mensuel")
-async def supprimer_suivi_mensuel(
+def supprimer_suivi_mensuel(
     request: Request,
     suivi_id: int,
     db: Session = Depends(get_session),
@@ -489,7 +489,7 @@ async def supprimer_suivi_mensuel(
     )
 
 @router.get("/inscription/{inscription_id}", name="suivis_par_inscription", response_class=HTMLResponse)
-async def suivis_par_inscription(
+def suivis_par_inscription(
     request: Request,
     inscription_id: int,
     db: Session = Depends(get_session),
@@ -521,7 +521,7 @@ async def suivis_par_inscription(
     )
 
 @router.get("/programme/{programme_id}", name="suivis_par_programme", response_class=HTMLResponse)
-async def suivis_par_programme(
+def suivis_par_programme(
     request: Request,
     programme_id: int,
     db: Session = Depends(get_session),
@@ -545,4 +545,19 @@ async def suivis_par_programme(
             "suivis": suivis,
             "stats": stats
         }
-    )
\ No newline at end of file
+    )
+# === API ===
+
+@router.get("/api/series", name="series_suivi_mensuel")
+def series_suivi_mensuel(
+    programme_id: Optional[int] = None,
+    mois_debut: Optional[date] = None,
+    mois_fin: Optional[date] = None,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Série mensuelle des indicateurs (graphiques), lue dans le rollup par programme"""
+    return {
+        "programme_id": programme_id,
+        "series": suivi_mensuel_service.get_series_mensuelles(db, programme_id, mois_debut, mois_fin)
+    }
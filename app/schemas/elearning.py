@@ -1,6 +1,6 @@
 # app/schemas/elearning.py
 from pydantic import BaseModel, Field
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Dict
 from datetime import datetime
 
 # Schémas pour les fichiers uploadés
@@ -273,6 +273,8 @@ class StatistiquesElearningCandidat(BaseModel):
     score_moyen: Optional[float] = None
     derniere_activite: Optional[datetime] = None
     objectif_atteint: bool
+    ressources_terminees: int = 0
+    terminees_par_type: Dict[str, int] = {}
 
 class StatistiquesElearningProgramme(BaseModel):
     programme_id: int
@@ -282,6 +284,11 @@ class StatistiquesElearningProgramme(BaseModel):
     temps_moyen_minutes: float
     taux_completion: float
     modules_populaires: List[dict]
+    nb_modules: int = 0
+    nb_ressources: int = 0
+    score_moyen: Optional[float] = None
+    candidats_objectifs_atteints: int = 0
+    terminees_par_type: Dict[str, int] = {}
 
 class RapportProgressionElearning(BaseModel):
     inscription_id: int
@@ -143,6 +143,7 @@ class SuiviMensuelWithCandidat(SuiviMensuelResponse):
 
 class SuiviMensuelFilter(BaseModel):
     """Filtres pour la recherche de suivis mensuels"""
+    inscription_id: Optional[int] = None
     programme_id: Optional[int] = None
     candidat_id: Optional[int] = None
     mois_debut: Optional[date] = None
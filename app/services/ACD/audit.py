@@ -1,7 +1,9 @@
 # app/services/audit.py
 from __future__ import annotations
-from typing import Optional, Any, Dict
+from datetime import datetime, timezone
+from typing import Optional, Any, Dict, Iterable, Tuple
 from fastapi import Request
+from sqlalchemy import insert
 from sqlmodel import Session
 from app_lia_web.app.models.ACD.activity import ActivityLog
 from app_lia_web.app.models.base import User
@@ -42,3 +44,33 @@ def log_activity(
     )
     session.add(row)
     # on ne commit PAS ici : laisse l’appelant gérer la transaction
+
+def log_activities(
+    session: Session,
+    *,
+    user: Optional[User],
+    action: str,
+    entity: Optional[str] = None,
+    entries: Iterable[Tuple[Optional[int], Optional[Dict[str, Any]]]] = (),
+    request: Optional[Request] = None
+) -> int:
+    """Même journalisation que log_activity pour tout un lot : un seul INSERT multi-lignes
+
+    `entries` : couples (entity_id, activity_data). Renvoie le nombre d'entrées écrites.
+    """
+    commun = {
+        "user_id": user.id if user else None,
+        "user_email": user.email if user else None,
+        "user_nom_complet": user.nom_complet if user else None,
+        "user_role": user.role if user else None,
+        "action": action,
+        "entity": entity,
+        "ip_address": _client_ip(request),
+        "user_agent": _ua(request),
+        "created_at": datetime.now(timezone.utc),
+    }
+    rows = [{**commun, "entity_id": entity_id, "activity_data": activity_data or {}} for entity_id, activity_data in entries]
+    if rows:
+        session.execute(insert(ActivityLog).values(rows))
+    # pas de commit ici non plus
+    return len(rows)
@@ -1,5 +1,6 @@
 # app/services/eligibilite.py
 from datetime import date
+from functools import lru_cache
 from typing import Optional, Tuple
 
 # On consomme TA fonction (exemple: import depuis app.domain.rules)
@@ -15,10 +16,13 @@ def entreprise_age_annees(date_creation: Optional[date]) -> Optional[float]:
     delta = today.year - date_creation.year - ((today.month, today.day) < (date_creation.month, date_creation.day))
     return float(delta)
 
+@lru_cache(maxsize=4096)
 def parse_ca_intervalle(ca_string: Optional[str]) -> Optional[dict]:
     """
     Parse un intervalle de CA (ex: "10 000 - 50 000 €") et retourne les bornes min/max.
     Retourne None si impossible à parser.
+    Mémoïsé : les tranches de CA proposées au formulaire sont peu nombreuses,
+    le résultat partagé ne doit pas être modifié par l'appelant.
     """
     if not ca_string or not ca_string.strip():
         return None
@@ -4,6 +4,7 @@ from email.message import EmailMessage as MimeEmail
 from email.utils import formataddr
 from typing import Optional, List
 from app_lia_web.core.config import settings
+from app_lia_web.core.metrics import appel_externe
 
 class Attachment:
     def __init__(self, filename: str, content: bytes, mimetype: str = "application/octet-stream"):
@@ -66,15 +67,15 @@ class SmtpMailer:
                 filename=a.filename
             )
 
-        # Connexion SMTP
+        # Connexion SMTP (durée exposée sur /metrics)
         if settings.SMTP_SSL:
             context = ssl.create_default_context()
-            with smtplib.SMTP_SSL(settings.SMTP_HOST, settings.SMTP_PORT, context=context) as server:
+            with appel_externe("smtp"), smtplib.SMTP_SSL(settings.SMTP_HOST, settings.SMTP_PORT, context=context) as server:
                 if settings.SMTP_USER:
                     server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
                 server.send_message(mime)
         else:
-            with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
+            with appel_externe("smtp"), smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
                 server.ehlo()
                 if settings.SMTP_TLS:
                     context = ssl.create_default_context()
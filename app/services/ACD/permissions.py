@@ -1,64 +1,276 @@
 # app/services/ACD/permissions.py
-from typing import List, Optional, Set, Dict
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, List, Mapping, Optional, Set, Dict, Tuple
+from sqlalchemy import update
 from sqlmodel import Session, select
 from datetime import datetime, timezone
 
 from app_lia_web.app.models.enums import UserRole
 from app_lia_web.app.models.ACD.permissions import (
     PermissionRole, PermissionUtilisateur, LogPermission,
-    NiveauPermission, TypeRessource
+    NiveauPermission, TypeRessource, VersionPermissions
 )
 from app_lia_web.app.models.base import User
 
+# Hiérarchie des permissions (calculée une seule fois)
+LEVEL_HIERARCHY: Mapping[NiveauPermission, int] = MappingProxyType({
+    NiveauPermission.LECTURE: 1,
+    NiveauPermission.ECRITURE: 2,
+    NiveauPermission.SUPPRESSION: 3,
+    NiveauPermission.ADMIN: 4
+})
+
+# Durée de vie de la matrice compilée : filet de sécurité, la synchronisation
+# entre workers passe par le compteur VersionPermissions
+MATRIX_TTL_SECONDS = 300
+
+# Clé de session.info : résolveurs dont la version a déjà été vérifiée pour
+# cette session (une session par requête : une lecture du compteur par requête)
+_VERSION_VERIFIEE = "permissions_version_verifiee"
+
+
+def _role_key(role: Any) -> str:
+    """Normalise un rôle (enum ou chaîne) en clé de matrice"""
+    return getattr(role, "value", role)
+
+
+def read_version(session: Session) -> int:
+    """Version courante des permissions en base (0 si jamais modifiées)"""
+    return session.exec(select(VersionPermissions.version).where(VersionPermissions.id == 1)).first() or 0
+
+
+def bump_version(session: Session) -> int:
+    """Incrémente le compteur dans la transaction en cours et renvoie la nouvelle version
+
+    La ligne reste verrouillée jusqu'au commit : deux modifications concurrentes
+    obtiennent deux versions distinctes.
+    """
+    result = session.execute(
+        update(VersionPermissions)
+        .where(VersionPermissions.id == 1)
+        .values(version=VersionPermissions.version + 1, modifie_le=datetime.now(timezone.utc))
+    )
+    if result.rowcount == 0:
+        session.add(VersionPermissions(id=1, version=1))
+        session.flush()
+    return read_version(session)
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Les dates lues en base peuvent être naïves : on les considère en UTC"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class PermissionResolver:
+    """
+    Résolveur de permissions en mémoire.
+
+    La matrice rôle × ressource est compilée une fois en structure immuable,
+    les surcharges utilisateur sont mises en cache par utilisateur et
+    invalidées lors d'un octroi, d'une révocation ou à leur expiration.
+    Une vérification de permission est alors une simple lecture de dictionnaire.
+
+    Toute modification incrémente VersionPermissions ; chaque worker relit ce
+    compteur une fois par requête et recompile s'il a changé, de sorte qu'un
+    octroi ou une révocation faits par un autre worker s'applique dès la
+    requête suivante.
+    """
+
+    def __init__(self, ttl_seconds: int = MATRIX_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._matrix: Mapping[str, Mapping[TypeRessource, int]] = MappingProxyType({})
+        self._overrides: Dict[int, Mapping[TypeRessource, Tuple[int, Optional[datetime]]]] = {}
+        self._next_expiry: Dict[int, datetime] = {}
+        self._compiled_at: Optional[float] = None
+        self._version = 0
+        self._db_version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    # --- Compilation ---
+    def is_stale(self) -> bool:
+        return self._compiled_at is None or (time.monotonic() - self._compiled_at) > self.ttl_seconds
+
+    def compile(self, session: Session, db_version: Optional[int] = None) -> None:
+        """Charge la matrice des rôles et toutes les surcharges actives (2 requêtes, 3 sans db_version)"""
+        if db_version is None:
+            db_version = read_version(session)
+        now = datetime.now(timezone.utc)
+        matrix: Dict[str, Dict[TypeRessource, int]] = {}
+        for perm in session.exec(select(PermissionRole)).all():
+            matrix.setdefault(_role_key(perm.role), {})[perm.ressource] = LEVEL_HIERARCHY.get(perm.niveau_permission, 0)
+
+        overrides: Dict[int, Dict[TypeRessource, Tuple[int, Optional[datetime]]]] = {}
+        user_permissions = session.exec(
+            select(PermissionUtilisateur).where(
+                PermissionUtilisateur.expire_le.is_(None) | (PermissionUtilisateur.expire_le > now)
+            )
+        ).all()
+        for perm in user_permissions:
+            overrides.setdefault(perm.utilisateur_id, {})[perm.ressource] = (
+                LEVEL_HIERARCHY.get(perm.niveau_permission, 0), _as_utc(perm.expire_le)
+            )
+
+        with self._lock:
+            self._matrix = MappingProxyType({role: MappingProxyType(levels) for role, levels in matrix.items()})
+            self._overrides = {}
+            self._next_expiry = {}
+            for user_id, perms in overrides.items():
+                self._store_overrides(user_id, perms)
+            self._compiled_at = time.monotonic()
+            self._db_version = db_version
+            self._version += 1
+
+    def ensure_compiled(self, session: Session) -> None:
+        """Recompile si la matrice a expiré ou si la version en base a changé (vérifiée une fois par session)"""
+        verifies = session.info.setdefault(_VERSION_VERIFIEE, set())
+        if id(self) in verifies and not self.is_stale():
+            return
+        db_version = read_version(session)
+        verifies.add(id(self))
+        if self.is_stale() or db_version != self._db_version:
+            self.compile(session, db_version)
+
+    def _store_overrides(self, user_id: int, perms: Dict[TypeRessource, Tuple[int, Optional[datetime]]]) -> None:
+        if not perms:
+            self._overrides.pop(user_id, None)
+            self._next_expiry.pop(user_id, None)
+            return
+        self._overrides[user_id] = MappingProxyType(perms)
+        expiries = [expire for _, expire in perms.values() if expire is not None]
+        if expiries:
+            self._next_expiry[user_id] = min(expiries)
+        else:
+            self._next_expiry.pop(user_id, None)
+
+    # --- Invalidation ---
+    def refresh_user(self, session: Session, user_id: int, db_version: int) -> None:
+        """Recharge les surcharges d'un utilisateur après octroi/révocation
+
+        db_version est la version obtenue par bump_version : si une autre
+        modification s'est intercalée depuis la dernière compilation, la
+        matrice entière est recompilée à la prochaine vérification.
+        """
+        now = datetime.now(timezone.utc)
+        rows = session.exec(
+            select(PermissionUtilisateur).where(
+                PermissionUtilisateur.utilisateur_id == user_id,
+                PermissionUtilisateur.expire_le.is_(None) | (PermissionUtilisateur.expire_le > now)
+            )
+        ).all()
+        perms = {
+            perm.ressource: (LEVEL_HIERARCHY.get(perm.niveau_permission, 0), _as_utc(perm.expire_le))
+            for perm in rows
+        }
+        with self._lock:
+            self._store_overrides(user_id, perms)
+            if self._db_version == db_version - 1:
+                self._db_version = db_version
+            else:
+                self._compiled_at = None
+
+    def invalidate(self) -> None:
+        """Force une recompilation complète au prochain accès"""
+        with self._lock:
+            self._compiled_at = None
+
+    def _purge_expired(self, user_id: int, now: datetime) -> None:
+        with self._lock:
+            current = self._overrides.get(user_id)
+            if current is None:
+                return
+            self._store_overrides(user_id, {
+                resource: (level, expire)
+                for resource, (level, expire) in current.items()
+                if expire is None or expire > now
+            })
+
+    # --- Résolution ---
+    def level_for(self, user: User, resource: TypeRessource) -> int:
+        user_id = user.id
+        next_expiry = self._next_expiry.get(user_id)
+        if next_expiry is not None:
+            now = datetime.now(timezone.utc)
+            if next_expiry <= now:
+                self._purge_expired(user_id, now)
+
+        override = self._overrides.get(user_id)
+        if override is not None and resource in override:
+            self.hits += 1
+            return override[resource][0]
+
+        role_levels = self._matrix.get(_role_key(user.role))
+        if role_levels is not None and resource in role_levels:
+            self.hits += 1
+            return role_levels[resource]
+
+        self.misses += 1
+        return 0
+
+    def effective_permissions(self, user: User) -> Dict[TypeRessource, NiveauPermission]:
+        by_rank = {rank: level for level, rank in LEVEL_HIERARCHY.items()}
+        permissions: Dict[TypeRessource, NiveauPermission] = {}
+        for resource in TypeRessource:
+            rank = self.level_for(user, resource)
+            if rank:
+                permissions[resource] = by_rank[rank]
+        return permissions
+
+    def dump(self) -> Dict[str, Any]:
+        """Photographie de l'état du résolveur (audit / débogage)"""
+        by_rank = {rank: level.value for level, rank in LEVEL_HIERARCHY.items()}
+        return {
+            "version": self._version,
+            "db_version": self._db_version,
+            "age_seconds": None if self._compiled_at is None else round(time.monotonic() - self._compiled_at, 3),
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "matrix": {
+                role: {resource.value: by_rank.get(rank) for resource, rank in levels.items()}
+                for role, levels in self._matrix.items()
+            },
+            "overrides": {
+                str(user_id): {
+                    resource.value: {
+                        "niveau": by_rank.get(rank),
+                        "expire_le": expire.isoformat() if expire else None
+                    }
+                    for resource, (rank, expire) in perms.items()
+                }
+                for user_id, perms in self._overrides.items()
+            },
+        }
+
+
+# Instance partagée par processus
+permission_resolver = PermissionResolver()
+
+
 class PermissionService:
     """Service de gestion des permissions"""
     
-    def __init__(self, session: Session):
+    def __init__(self, session: Session, resolver: PermissionResolver = permission_resolver):
         self.session = session
+        self.resolver = resolver
     
     def get_user_permissions(self, user: User) -> Dict[TypeRessource, NiveauPermission]:
         """Récupère toutes les permissions d'un utilisateur"""
-        permissions = {}
-        
-        # Permissions par rôle
-        role_permissions = self.session.exec(
-            select(PermissionRole).where(PermissionRole.role == user.role)
-        ).all()
-        
-        for perm in role_permissions:
-            permissions[perm.ressource] = perm.niveau_permission
-        
-        # Permissions spécifiques à l'utilisateur (surcharge)
-        user_permissions = self.session.exec(
-            select(PermissionUtilisateur).where(
-                PermissionUtilisateur.utilisateur_id == user.id,
-                PermissionUtilisateur.expire_le.is_(None) | (PermissionUtilisateur.expire_le > datetime.now(timezone.utc))
-            )
-        ).all()
-        
-        for perm in user_permissions:
-            permissions[perm.ressource] = perm.niveau_permission
-        
-        return permissions
+        self.resolver.ensure_compiled(self.session)
+        return self.resolver.effective_permissions(user)
     
     def has_permission(self, user: User, resource: TypeRessource, required_level: NiveauPermission) -> bool:
         """Vérifie si un utilisateur a la permission requise"""
-        user_permissions = self.get_user_permissions(user)
-        
-        if resource not in user_permissions:
+        self.resolver.ensure_compiled(self.session)
+        user_level = self.resolver.level_for(user, resource)
+        if not user_level:
             return False
-        
-        user_level = user_permissions[resource]
-        
-        # Hiérarchie des permissions
-        level_hierarchy = {
-            NiveauPermission.LECTURE: 1,
-            NiveauPermission.ECRITURE: 2,
-            NiveauPermission.SUPPRESSION: 3,
-            NiveauPermission.ADMIN: 4
-        }
-        
-        return level_hierarchy.get(user_level, 0) >= level_hierarchy.get(required_level, 0)
+        return user_level >= LEVEL_HIERARCHY.get(required_level, 0)
     
     def grant_permission(self, user: User, target_user_id: int, resource: TypeRessource, 
                         permission_level: NiveauPermission, reason: str = None) -> bool:
@@ -102,8 +314,10 @@ class PermissionService:
                 raison=reason
             )
             self.session.add(log)
+            db_version = bump_version(self.session)
             
             self.session.commit()
+            self.resolver.refresh_user(self.session, target_user_id, db_version)
             return True
             
         except Exception as e:
@@ -139,8 +353,10 @@ class PermissionService:
                     raison=reason
                 )
                 self.session.add(log)
+                db_version = bump_version(self.session)
                 
                 self.session.commit()
+                self.resolver.refresh_user(self.session, target_user_id, db_version)
                 return True
             
             return False
@@ -376,25 +592,30 @@ class PermissionService:
             }
         }
         
+        # Paires (rôle, ressource) déjà présentes, en une seule requête
+        existing = {
+            (_role_key(role), ressource)
+            for role, ressource in self.session.exec(
+                select(PermissionRole.role, PermissionRole.ressource)
+            ).all()
+        }
+        
+        created = 0
         for role, permissions in default_permissions.items():
             for resource, level in permissions.items():
-                # Vérifier si la permission existe déjà
-                existing = self.session.exec(
-                    select(PermissionRole).where(
-                        PermissionRole.role == role,
-                        PermissionRole.ressource == resource
-                    )
-                ).first()
-                
-                if not existing:
+                if (role, resource) not in existing:
                     new_permission = PermissionRole(
                         role=role,
                         ressource=resource,
                         niveau_permission=level
                     )
                     self.session.add(new_permission)
+                    created += 1
         
-        self.session.commit()
+        if created:
+            bump_version(self.session)
+            self.session.commit()
+            self.resolver.invalidate()
     
     def update_role_permission(self, role: str, resource: TypeRessource, 
                                permission_level: NiveauPermission, user: User) -> bool:
@@ -435,8 +656,10 @@ class PermissionService:
                 raison=f"Modification permission rôle {role}"
             )
             self.session.add(log)
+            bump_version(self.session)
             
             self.session.commit()
+            self.resolver.invalidate()
             return True
             
         except Exception as e:
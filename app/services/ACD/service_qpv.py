@@ -1,27 +1,31 @@
 import requests
-import folium
 from datetime import date
-from geopy.distance import geodesic
-from shapely.geometry import Point, Polygon
 import os
 import time
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from PIL import Image
-from folium.features import DivIcon
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
 
 from app_lia_web.core.config import settings
+from app_lia_web.core.metrics import appel_externe
 from app_lia_web.app.services.file_upload_service import FileUploadService
 from app_lia_web.app.schemas.ACD.schema_qpv import Adresse
+from app_lia_web.core.lazy_import import LazyModule
+
+# Dépendances lourdes chargées au premier appel de verif_qpv (voir core/lazy_import.py)
+folium = LazyModule("folium")
+folium_features = LazyModule("folium.features")
+geopy_distance = LazyModule("geopy.distance")
+shapely_geometry = LazyModule("shapely.geometry")
 
 FileUploadService = FileUploadService()
 
 async def verif_qpv(address_coords, request: Request):
+    """Vérification QPV d'une adresse : appels HTTP, carte folium et capture Selenium
+    bloquants, exécutés dans le pool de threads pour ne pas bloquer la boucle"""
+    return await run_in_threadpool(_verif_qpv, address_coords, request)
+
+
+def _verif_qpv(address_coords, request: Request):
 
     base_url = settings.get_base_url(request)  # Récupérer l'URL dynamique
     print("✅ Adresse validée au niveau du service :", address_coords)
@@ -105,8 +109,8 @@ async def verif_qpv(address_coords, request: Request):
     if coord_qpv and isinstance(coord_qpv, list) and len(coord_qpv) > 2:
         
         point_coords = (lat, lon)
-        address_point = Point(point_coords[::-1])  # Shapely utilise (lon, lat)
-        polygon = Polygon(coord_qpv)
+        address_point = shapely_geometry.Point(point_coords[::-1])  # Shapely utilise (lon, lat)
+        polygon = shapely_geometry.Polygon(coord_qpv)
         
         # Générer la carte avec Folium
         folium.PolyLine([(y, x) for x, y in coord_qpv], color="blue", fill=True,fill_color="lightblue",
@@ -127,7 +131,7 @@ async def verif_qpv(address_coords, request: Request):
             # Calcul de la distance
             nearest_point = polygon.exterior.interpolate(polygon.exterior.project(address_point))
             nearest_coords = (nearest_point.y, nearest_point.x)
-            distance_km = geodesic(point_coords, nearest_coords).kilometers
+            distance_km = geopy_distance.geodesic(point_coords, nearest_coords).kilometers
             distance_m = round(distance_km * 1000) # On calcul en mètres
             
             if distance_m <= settings.DISTANCE_QPV_LIMITE:
@@ -157,7 +161,7 @@ async def verif_qpv(address_coords, request: Request):
         # Ajouter le texte comme un "marqueur invisible" sur la carte
         folium.Marker(
             location=(lat, lon),  # Position sur la carte
-            icon=DivIcon(
+            icon=folium_features.DivIcon(
                 icon_size=(350, 50),  # Taille de l'affichage
                 icon_anchor=(0, 0),  # Ancrage en haut à gauche
                 html=info_text,  # Contenu HTML
@@ -220,7 +224,7 @@ async def verif_qpv(address_coords, request: Request):
         # Ajouter le texte comme un "marqueur invisible" sur la carte
         folium.Marker(
             location=(lat, lon),  # Position sur la carte
-            icon=DivIcon(
+            icon=folium_features.DivIcon(
                 icon_size=(350, 50),  # Taille de l'affichage
                 icon_anchor=(0, 0),  # Ancrage en haut à gauche
                 html=info_text,  # Contenu HTML
@@ -256,6 +260,14 @@ async def verif_qpv(address_coords, request: Request):
 
 def save_map_as_image(map_path, image_path):
     """Capture une image d'une page HTML avec Selenium headless."""
+    # Imports locaux : selenium et Pillow ne sont chargés que pour une capture
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from webdriver_manager.chrome import ChromeDriverManager
+    from PIL import Image
     
     options = webdriver.ChromeOptions()
     options.add_argument("--headless")  # Exécution sans interface graphique
@@ -265,28 +277,29 @@ def save_map_as_image(map_path, image_path):
     options.add_argument("--disable-gpu")  # Désactive l'accélération GPU
     options.add_argument("--disable-software-rasterizer")  # Évite certains crashs graphiques
 
-    # Installer automatiquement le bon ChromeDriver
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=options)
+    with appel_externe("selenium"):
+        # Installer automatiquement le bon ChromeDriver
+        service = Service(ChromeDriverManager().install())
+        driver = webdriver.Chrome(service=service, options=options)
 
-    try:
+        try:
         
-        driver.get("file://" + os.path.abspath(map_path))  # Charger le fichier HTML
+            driver.get("file://" + os.path.abspath(map_path))  # Charger le fichier HTML
 
-        # Attendre que le corps de la page soit chargé avant la capture
-        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+            # Attendre que le corps de la page soit chargé avant la capture
+            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
 
-        time.sleep(2)  # Attendre le rendu de la carte
+            time.sleep(2)  # Attendre le rendu de la carte
 
-        # Capture d'écran et enregistrement
-        driver.save_screenshot(image_path)
+            # Capture d'écran et enregistrement
+            driver.save_screenshot(image_path)
 
-        # Convertir et optimiser l’image avec Pillow
-        img = Image.open(image_path)
-        img = img.convert("RGB")
-        img.save(image_path, "PNG", quality=95)
+            # Convertir et optimiser l’image avec Pillow
+            img = Image.open(image_path)
+            img = img.convert("RGB")
+            img.save(image_path, "PNG", quality=95)
 
-    except Exception as e:
-        print(f"❌ Erreur lors de la capture : {e}")
-    finally:
-        driver.quit()  # Fermer le navigateur
\ No newline at end of file
+        except Exception as e:
+            print(f"❌ Erreur lors de la capture : {e}")
+        finally:
+            driver.quit()  # Fermer le navigateur
\ No newline at end of file
@@ -1,4 +1,5 @@
 from fastapi import Request, HTTPException
+from fastapi.concurrency import run_in_threadpool
 import csv
 import os
 import requests
@@ -9,6 +10,12 @@ from app_lia_web.app.services.file_upload_service import FileUploadService
 FileUploadService = FileUploadService()
       
 async def get_entreprise_process(numero_siret: str, request: Request):
+    """Fiche entreprise Pappers : appel HTTP et écriture du CSV bloquants, exécutés
+    dans le pool de threads pour ne pas bloquer la boucle"""
+    return await run_in_threadpool(_get_entreprise_process, numero_siret, request)
+
+
+def _get_entreprise_process(numero_siret: str, request: Request):
     base_url = settings.get_base_url(request)
     print(f"🚀 [SERVICE] Début get_entreprise_process pour SIRET: {numero_siret}")
     print(f"🔑 [SERVICE] Utilisation de l'API key: {settings.PAPPERS_API_KEY[:5]}...")
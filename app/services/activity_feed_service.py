@@ -0,0 +1,233 @@
+# app/services/activity_feed_service.py
+"""
+Fil d'activité unifié (tableau de bord, espace directeur, pages programme)
+
+Une seule requête UNION ALL sur les préinscriptions, inscriptions, décisions de
+jury et le journal d'audit, jointures résolues en SQL. La pagination se fait par
+curseur (date, type, id) : chaque branche lit au plus `limit` lignes depuis
+l'index sur sa date, quelle que soit la profondeur de défilement.
+
+Les dates du fil sont en UTC sans fuseau, comme les colonnes cree_le ; seul
+ActivityLog.created_at (timestamptz) est converti.
+"""
+import base64
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import DateTime, Integer, String, and_, cast, func, literal, null, or_, type_coerce, union_all
+from sqlmodel import Session, select
+
+from app_lia_web.app.models.base import Candidat, DecisionJuryCandidat, Inscription, Jury, Preinscription, Programme
+from app_lia_web.app.models.ACD.activity import ActivityLog
+from app_lia_web.app.models.enums import DecisionJury, StatutDossier
+
+FEED_TYPES = ("activite", "decision_jury", "inscription", "preinscription")
+FEED_PAGE_MAX = 100
+
+Curseur = Tuple[datetime, str, int]
+
+
+def encode_curseur(date: datetime, type_activite: str, source_id: int) -> str:
+    """Curseur opaque transmis au client pour la page suivante"""
+    brut = f"{date.isoformat()}|{type_activite}|{source_id}"
+    return base64.urlsafe_b64encode(brut.encode("utf-8")).decode("ascii")
+
+
+def decode_curseur(curseur: str) -> Curseur:
+    try:
+        date, type_activite, source_id = base64.urlsafe_b64decode(curseur.encode("ascii")).decode("utf-8").split("|")
+        if type_activite not in FEED_TYPES:
+            raise ValueError(type_activite)
+        return datetime.fromisoformat(date), type_activite, int(source_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Curseur invalide: {e}")
+
+
+def _libelle_enum(enum_class, valeur: Optional[str]) -> Optional[str]:
+    """Les enums sont stockés par nom : on restitue la valeur lisible"""
+    if valeur is None:
+        return None
+    try:
+        return enum_class[valeur].value
+    except KeyError:
+        return valeur
+
+
+class ActivityFeedService:
+    """Construction du fil d'activité en une requête"""
+
+    @staticmethod
+    def _branche(
+        type_activite: str,
+        date_col,
+        id_col,
+        colonnes: Dict[str, Any],
+        curseur: Optional[Curseur],
+        limit: int,
+        query,
+        postgres: bool,
+        avec_fuseau: bool = False,
+    ):
+        """Branche de l'UNION : colonnes communes, filtre de curseur et LIMIT propres à la branche"""
+        if avec_fuseau and postgres:
+            date = func.timezone("UTC", date_col, type_=DateTime())
+        else:
+            date = type_coerce(date_col, DateTime())
+        if curseur:
+            date_c, type_c, id_c = curseur
+            if avec_fuseau:
+                date_c = date_c.replace(tzinfo=timezone.utc)
+            # Ordre du fil : date, type puis id décroissants ; le type est constant dans la branche
+            if type_activite < type_c:
+                condition = date_col <= date_c
+            elif type_activite == type_c:
+                condition = or_(date_col < date_c, and_(date_col == date_c, id_col < id_c))
+            else:
+                condition = date_col < date_c
+            query = query.where(condition)
+        colonnes_par_defaut = {
+            "candidat_id": null(), "candidat_nom": null(), "candidat_prenom": null(),
+            "programme_id": null(), "programme_nom": null(), "statut": null(),
+            "acteur": null(), "detail": null(), "entite": null(), "entite_id": null(),
+        }
+        colonnes_par_defaut.update(colonnes)
+        branche = (
+            query.with_only_columns(
+                literal(type_activite, String).label("type_activite"),
+                id_col.label("source_id"),
+                date.label("date"),
+                *[
+                    cast(valeur, Integer if nom.endswith("_id") else String).label(nom)
+                    for nom, valeur in colonnes_par_defaut.items()
+                ],
+            )
+            .order_by(date_col.desc(), id_col.desc())
+            .limit(limit)
+            .subquery()
+        )
+        # Sous-requête : ORDER BY/LIMIT par branche acceptés par tous les moteurs dans un UNION
+        return select(*branche.c)
+
+    @classmethod
+    def _requete(
+        cls,
+        limit: int,
+        curseur: Optional[Curseur],
+        programme_id: Optional[int],
+        types: Sequence[str],
+        postgres: bool,
+    ):
+        branches = []
+        if "preinscription" in types:
+            query = (
+                select(Preinscription.id)
+                .join(Candidat, Candidat.id == Preinscription.candidat_id)
+                .join(Programme, Programme.id == Preinscription.programme_id)
+            )
+            if programme_id:
+                query = query.where(Preinscription.programme_id == programme_id)
+            branches.append(cls._branche("preinscription", Preinscription.cree_le, Preinscription.id, {
+                "candidat_id": Candidat.id, "candidat_nom": Candidat.nom, "candidat_prenom": Candidat.prenom,
+                "programme_id": Programme.id, "programme_nom": Programme.nom, "statut": Preinscription.statut,
+            }, curseur, limit, query, postgres))
+        if "inscription" in types:
+            query = (
+                select(Inscription.id)
+                .join(Candidat, Candidat.id == Inscription.candidat_id)
+                .join(Programme, Programme.id == Inscription.programme_id)
+            )
+            if programme_id:
+                query = query.where(Inscription.programme_id == programme_id)
+            branches.append(cls._branche("inscription", Inscription.cree_le, Inscription.id, {
+                "candidat_id": Candidat.id, "candidat_nom": Candidat.nom, "candidat_prenom": Candidat.prenom,
+                "programme_id": Programme.id, "programme_nom": Programme.nom, "statut": Inscription.statut,
+            }, curseur, limit, query, postgres))
+        if "decision_jury" in types:
+            query = (
+                select(DecisionJuryCandidat.id)
+                .join(Candidat, Candidat.id == DecisionJuryCandidat.candidat_id)
+                .join(Jury, Jury.id == DecisionJuryCandidat.jury_id)
+                .join(Programme, Programme.id == Jury.programme_id)
+            )
+            if programme_id:
+                query = query.where(Jury.programme_id == programme_id)
+            branches.append(cls._branche("decision_jury", DecisionJuryCandidat.date_decision, DecisionJuryCandidat.id, {
+                "candidat_id": Candidat.id, "candidat_nom": Candidat.nom, "candidat_prenom": Candidat.prenom,
+                "programme_id": Programme.id, "programme_nom": Programme.nom, "statut": DecisionJuryCandidat.decision,
+            }, curseur, limit, query, postgres))
+        if "activite" in types:
+            query = select(ActivityLog.id)
+            if programme_id:
+                query = query.where(ActivityLog.entity == "Programme", ActivityLog.entity_id == programme_id)
+            branches.append(cls._branche("activite", ActivityLog.created_at, ActivityLog.id, {
+                "acteur": func.coalesce(ActivityLog.user_nom_complet, ActivityLog.user_email),
+                "detail": ActivityLog.action, "entite": ActivityLog.entity, "entite_id": ActivityLog.entity_id,
+            }, curseur, limit, query, postgres, avec_fuseau=True))
+
+        feed = union_all(*branches).subquery()
+        return (
+            select(*feed.c)
+            .order_by(feed.c.date.desc(), feed.c.type_activite.desc(), feed.c.source_id.desc())
+            .limit(limit)
+        )
+
+    @staticmethod
+    def _description(row) -> str:
+        candidat = f"{row.candidat_prenom} {row.candidat_nom}"
+        if row.type_activite == "preinscription":
+            return f"Nouvelle préinscription de {candidat} pour {row.programme_nom}"
+        if row.type_activite == "inscription":
+            return f"Nouvelle inscription de {candidat} pour {row.programme_nom}"
+        if row.type_activite == "decision_jury":
+            return f"Décision du jury pour {candidat} ({row.programme_nom}) : {_libelle_enum(DecisionJury, row.statut)}"
+        cible = f" {row.entite}" if row.entite else ""
+        if row.entite_id:
+            cible += f" #{row.entite_id}"
+        return f"{row.detail}{cible}" + (f" par {row.acteur}" if row.acteur else "")
+
+    @classmethod
+    def get_feed(
+        cls,
+        session: Session,
+        limit: int = 20,
+        curseur: Optional[str] = None,
+        programme_id: Optional[int] = None,
+        types: Optional[Sequence[str]] = None,
+    ) -> Dict[str, Any]:
+        """Page du fil d'activité, du plus récent au plus ancien
+
+        `curseur` est le `next_cursor` de la page précédente (None pour la première page).
+        """
+        limit = max(1, min(limit, FEED_PAGE_MAX))
+        types = [t for t in (types or FEED_TYPES) if t in FEED_TYPES]
+        if not types:
+            return {"items": [], "next_cursor": None}
+        position = decode_curseur(curseur) if curseur else None
+
+        postgres = session.get_bind().dialect.name == "postgresql"
+        rows = session.execute(cls._requete(limit, position, programme_id, types, postgres)).all()
+        items: List[Dict[str, Any]] = []
+        for row in rows:
+            statut = row.statut
+            if row.type_activite in ("preinscription", "inscription"):
+                statut = _libelle_enum(StatutDossier, statut)
+            elif row.type_activite == "decision_jury":
+                statut = _libelle_enum(DecisionJury, statut)
+            items.append({
+                "type": row.type_activite,
+                "id": row.source_id,
+                "date": row.date,
+                "description": cls._description(row),
+                "statut": statut,
+                "candidat_id": row.candidat_id,
+                "programme_id": row.programme_id,
+                "programme_nom": row.programme_nom,
+                "acteur": row.acteur,
+                "entite": row.entite,
+                "entite_id": row.entite_id,
+            })
+        next_cursor = None
+        if len(rows) == limit:
+            dernier = rows[-1]
+            next_cursor = encode_curseur(dernier.date, dernier.type_activite, dernier.source_id)
+        return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,63 @@
+# app/services/cache_version.py
+"""
+Versions en base des caches de référence gardés en mémoire
+
+Les programmes actifs et les listes du jury sont gardés en mémoire dans chaque
+worker. invalidate() ne vide que le cache du worker qui a reçu la modification :
+il incrémente aussi le compteur VersionCache du cache, que les autres workers
+relisent au plus toutes les VERIFICATION_VERSION_SECONDS secondes (une requête
+d'une ligne) pour recharger dès qu'il a changé.
+"""
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app_lia_web.app.models.ACD.admin import VersionCache
+
+VERIFICATION_VERSION_SECONDS = 5
+
+
+def lire_version(session: Session, cle: str) -> int:
+    """Version courante du cache `cle` (0 s'il n'a jamais été invalidé)"""
+    return session.exec(select(VersionCache.version).where(VersionCache.cle == cle)).first() or 0
+
+
+def incrementer_version(session: Session, cle: str) -> None:
+    """Incrémente le compteur du cache `cle` dans la transaction en cours"""
+    result = session.execute(
+        update(VersionCache)
+        .where(VersionCache.cle == cle)
+        .values(version=VersionCache.version + 1, modifie_le=datetime.now(timezone.utc))
+    )
+    if result.rowcount == 0:
+        session.add(VersionCache(cle=cle, version=1))
+        session.flush()
+
+
+class SuiviVersion:
+    """Version du contenu chargé par un cache, comparée à celle en base au plus toutes les `intervalle` secondes"""
+
+    def __init__(self, cle: str, intervalle: float = VERIFICATION_VERSION_SECONDS):
+        self.cle = cle
+        self.intervalle = intervalle
+        self._chargee: Optional[int] = None
+        self._verifiee_a = 0.0
+
+    def a_verifier(self) -> bool:
+        """Vrai si la version en base doit être relue (sans requête)"""
+        return time.monotonic() - self._verifiee_a >= self.intervalle
+
+    def a_change(self, session: Session) -> bool:
+        """Relit la version en base : vrai si le cache a été invalidé ailleurs depuis son chargement"""
+        if self._chargee is None:
+            return False  # jamais chargé : rien à invalider
+        self._verifiee_a = time.monotonic()
+        return lire_version(session, self.cle) != self._chargee
+
+    def charge(self, session: Session) -> None:
+        """À appeler au début d'un rechargement, dans la même session"""
+        self._chargee = lire_version(session, self.cle)
+        self._verifiee_a = time.monotonic()
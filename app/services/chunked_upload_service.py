@@ -0,0 +1,275 @@
+# app/services/chunked_upload_service.py
+"""
+Uploads reprenables par morceaux pour les médias e-learning (protocole inspiré de tus)
+
+1. create_upload() réserve un fichier creux de la taille annoncée ;
+2. write_chunk() reçoit un morceau en flux continu dans un fichier temporaire,
+   vérifie sa longueur et sa somme de contrôle, puis le copie à son offset ; les
+   morceaux peuvent arriver dans le désordre et en parallèle ;
+3. finalize() vérifie que tous les octets sont reçus et déplace le fichier dans
+   la même arborescence que FileUploadService.save_file.
+
+Chaque session est un dossier : meta.json, data.part et un marqueur vide par plage
+vérifiée (ranges/<debut>-<fin>). Seuls des octets vérifiés atteignent data.part :
+un renvoi tronqué ou corrompu d'une plage déjà reçue ne l'écrase pas. Les
+marqueurs étant créés atomiquement, aucun verrou n'est nécessaire entre requêtes
+ni entre workers.
+"""
+import base64
+import hashlib
+import json
+import re
+import shutil
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import aiofiles
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from app_lia_web.core.config import settings
+from app_lia_web.app.services.file_upload_service import FileUploadService
+
+# Taille conseillée aux clients et taille maximale acceptée pour un morceau
+CHUNK_SIZE_BYTES = 5 * 1024 * 1024
+MAX_CHUNK_BYTES = 32 * 1024 * 1024
+# Sessions sans activité supprimées par le cleanup_scheduler
+UPLOAD_SESSION_MAX_AGE_MINUTES = 1440
+# Types de ressources acceptant l'upload par morceaux
+CHUNKED_RESOURCE_TYPES = ("video", "audio")
+CHECKSUM_ALGORITHMS = ("sha256", "sha1", "md5")
+# Code de statut tus pour une somme de contrôle incorrecte
+STATUS_CHECKSUM_MISMATCH = 460
+# Taille des blocs recopiés du fichier temporaire d'un morceau vers data.part
+COPY_BLOCK_BYTES = 1024 * 1024
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ChunkedUploadService:
+    """Sessions d'upload par morceaux stockées sur disque"""
+
+    @staticmethod
+    def root() -> Path:
+        return Path(settings.CHUNKED_UPLOAD_DIR)
+
+    @classmethod
+    def _session_dir(cls, upload_id: str) -> Path:
+        session_dir = cls.root() / upload_id
+        if not _UPLOAD_ID.match(upload_id) or not (session_dir / "meta.json").exists():
+            raise HTTPException(status_code=404, detail="Session d'upload introuvable ou expirée")
+        return session_dir
+
+    @classmethod
+    def get_meta(cls, upload_id: str, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Métadonnées de la session (404 si elle appartient à un autre utilisateur)"""
+        meta = json.loads((cls._session_dir(upload_id) / "meta.json").read_text(encoding="utf-8"))
+        if user_id is not None and meta["user_id"] != user_id:
+            raise HTTPException(status_code=404, detail="Session d'upload introuvable ou expirée")
+        return meta
+
+    @classmethod
+    def create_upload(cls, filename: str, resource_type: str, size: int, user_id: int) -> Dict[str, Any]:
+        """Créer une session d'upload et réserver le fichier sur disque"""
+        if resource_type not in CHUNKED_RESOURCE_TYPES:
+            raise HTTPException(status_code=400, detail=f"Upload par morceaux non disponible pour {resource_type}")
+        extension = Path(filename or "").suffix.lower()
+        if not FileUploadService.is_extension_allowed(extension, resource_type):
+            allowed_exts = ', '.join(FileUploadService.get_allowed_extensions(resource_type))
+            raise HTTPException(
+                status_code=400,
+                detail=f"Extension '{extension}' non autorisée pour {resource_type}. Extensions autorisées: {allowed_exts}"
+            )
+        max_size = FileUploadService.get_max_file_size(resource_type)
+        if size <= 0 or size > max_size * 1024 * 1024:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Taille invalide ({size} octets). Taille maximale pour {resource_type}: {max_size} MB"
+            )
+
+        upload_id = uuid.uuid4().hex
+        session_dir = cls.root() / upload_id
+        (session_dir / "ranges").mkdir(parents=True)
+        # Fichier creux : l'espace n'est alloué qu'à l'écriture des morceaux
+        with open(session_dir / "data.part", "wb") as f:
+            f.truncate(size)
+        meta = {
+            "upload_id": upload_id,
+            "filename": filename,
+            "extension": extension,
+            "resource_type": resource_type,
+            "size": size,
+            "user_id": user_id,
+            "created_at": datetime.now().isoformat(),
+        }
+        # meta.json en dernier : la session n'est visible qu'une fois complète
+        (session_dir / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+        return meta
+
+    @classmethod
+    def received_ranges(cls, upload_id: str) -> List[Tuple[int, int]]:
+        """Plages vérifiées [début, fin), fusionnées et triées"""
+        ranges = sorted(
+            tuple(int(bound) for bound in marker.name.split("-"))
+            for marker in (cls._session_dir(upload_id) / "ranges").iterdir()
+        )
+        merged: List[Tuple[int, int]] = []
+        for start, end in ranges:
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    @classmethod
+    def status(cls, upload_id: str, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """État de la session : offset contigu (reprise séquentielle) et plages reçues (reprise parallèle)"""
+        meta = cls.get_meta(upload_id, user_id)
+        ranges = cls.received_ranges(upload_id)
+        offset = ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+        return {
+            "upload_id": upload_id,
+            "length": meta["size"],
+            "offset": offset,
+            "received": [list(r) for r in ranges],
+            "complete": offset == meta["size"],
+            "chunk_size": CHUNK_SIZE_BYTES,
+        }
+
+    @staticmethod
+    def parse_checksum(header: Optional[str]) -> Tuple[str, bytes]:
+        """Lit un en-tête « Upload-Checksum: <algorithme> <empreinte base64> »"""
+        try:
+            algorithm, encoded = (header or "").split(" ", 1)
+            digest = base64.b64decode(encoded.strip(), validate=True)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="En-tête Upload-Checksum manquant ou invalide")
+        if algorithm.lower() not in CHECKSUM_ALGORITHMS:
+            raise HTTPException(status_code=400, detail=f"Algorithme non supporté. Disponibles: {', '.join(CHECKSUM_ALGORITHMS)}")
+        return algorithm.lower(), digest
+
+    @classmethod
+    async def write_chunk(
+        cls,
+        upload_id: str,
+        user_id: int,
+        offset: int,
+        length: int,
+        checksum: Optional[str],
+        chunks: AsyncIterator[bytes],
+    ) -> Dict[str, Any]:
+        """Recevoir un morceau sans le garder en mémoire, le valider puis l'écrire à son offset
+
+        Appelée depuis la boucle d'événements : les accès disque passent par
+        aiofiles ou par le pool de threads.
+        """
+        meta = await run_in_threadpool(cls.get_meta, upload_id, user_id)
+        algorithm, expected = cls.parse_checksum(checksum)
+        if offset < 0 or length <= 0 or offset + length > meta["size"]:
+            raise HTTPException(status_code=400, detail="Plage hors du fichier annoncé")
+        if length > MAX_CHUNK_BYTES:
+            raise HTTPException(status_code=413, detail=f"Morceau trop volumineux (maximum {MAX_CHUNK_BYTES} octets)")
+
+        session_dir = cls.root() / upload_id
+        temp_path = session_dir / f"chunk-{uuid.uuid4().hex}.tmp"
+        hasher = hashlib.new(algorithm)
+        written = 0
+        try:
+            async with aiofiles.open(temp_path, "wb") as f:
+                async for data in chunks:
+                    written += len(data)
+                    if written > length:
+                        raise HTTPException(status_code=400, detail="Morceau plus long que Content-Length")
+                    hasher.update(data)
+                    await f.write(data)
+
+            # Morceau tronqué (connexion coupée) ou corrompu : data.part intact, le client le renvoie
+            if written != length:
+                raise HTTPException(status_code=400, detail=f"Morceau incomplet ({written}/{length} octets)")
+            if hasher.digest() != expected:
+                raise HTTPException(status_code=STATUS_CHECKSUM_MISMATCH, detail="Somme de contrôle incorrecte")
+
+            async with aiofiles.open(temp_path, "rb") as source, aiofiles.open(session_dir / "data.part", "r+b") as f:
+                await f.seek(offset)
+                while data := await source.read(COPY_BLOCK_BYTES):
+                    await f.write(data)
+        finally:
+            await run_in_threadpool(temp_path.unlink, missing_ok=True)
+
+        return await run_in_threadpool(cls._record_range, upload_id, offset, offset + length)
+
+    @classmethod
+    def _record_range(cls, upload_id: str, start: int, end: int) -> Dict[str, Any]:
+        """Marquer la plage [start, end) comme vérifiée et renvoyer l'état de la session"""
+        (cls._session_dir(upload_id) / "ranges" / f"{start}-{end}").touch()
+        return cls.status(upload_id)
+
+    @classmethod
+    def finalize(
+        cls,
+        upload_id: str,
+        user_id: int,
+        resource_type: str,
+        folder_name: str = "elearning",
+        subfolder_id: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Déplacer le fichier complet à son emplacement définitif (mêmes clés que FileUploadService.save_file)"""
+        meta = cls.get_meta(upload_id, user_id)
+        if meta["resource_type"] != resource_type:
+            raise HTTPException(status_code=400, detail=f"La session d'upload concerne un fichier {meta['resource_type']}")
+        if cls.received_ranges(upload_id) != [(0, meta["size"])]:
+            raise HTTPException(status_code=409, detail="Upload incomplet : tous les morceaux n'ont pas été reçus")
+
+        unique_filename = FileUploadService.generate_unique_filename(meta["filename"], meta["extension"])
+        relative_dir = f"{folder_name}/{resource_type}" + (f"/id_{subfolder_id}" if subfolder_id else "")
+        destination = Path(settings.UPLOAD_DIR) / relative_dir / unique_filename
+        destination.parent.mkdir(parents=True, exist_ok=True)
+
+        session_dir = cls._session_dir(upload_id)
+        shutil.move(str(session_dir / "data.part"), str(destination))
+        shutil.rmtree(session_dir, ignore_errors=True)
+
+        relative_path = f"{relative_dir}/{unique_filename}"
+        return {
+            "original_filename": meta["filename"],
+            "saved_filename": unique_filename,
+            "file_url": f"/uploads/{relative_path}",
+            "relative_path": relative_path,
+            "size_bytes": meta["size"],
+            "size_mb": round(meta["size"] / (1024 * 1024), 2),
+            "upload_date": datetime.now().isoformat(),
+            "folder_name": folder_name,
+            "resource_type": resource_type,
+            "subfolder_id": subfolder_id,
+            "mount_used": None,
+        }
+
+    @classmethod
+    def abort(cls, upload_id: str, user_id: int) -> None:
+        """Abandonner une session et libérer l'espace disque"""
+        cls.get_meta(upload_id, user_id)
+        shutil.rmtree(cls._session_dir(upload_id), ignore_errors=True)
+
+    @classmethod
+    def cleanup_stale_uploads(cls, max_age_minutes: int = UPLOAD_SESSION_MAX_AGE_MINUTES) -> int:
+        """Supprimer les sessions sans activité depuis max_age_minutes (appelé par le cleanup_scheduler)"""
+        root = cls.root()
+        if not root.exists():
+            return 0
+        limite = time.time() - max_age_minutes * 60
+        deleted = 0
+        for session_dir in root.iterdir():
+            if not session_dir.is_dir():
+                continue
+            # Dernière activité : écriture de données ou validation d'un morceau
+            activite = max(
+                (p.stat().st_mtime for p in (session_dir, session_dir / "data.part", session_dir / "ranges") if p.exists()),
+                default=0,
+            )
+            if activite < limite:
+                shutil.rmtree(session_dir, ignore_errors=True)
+                deleted += 1
+        return deleted
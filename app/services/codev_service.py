@@ -2,6 +2,7 @@
 Service de gestion du Codéveloppement
 """
 from typing import List, Optional, Dict, Any
+from sqlalchemy import case, insert, literal, union_all, update
 from sqlmodel import Session, select, func, and_, or_
 from datetime import datetime, timezone, date, timedelta
 import logging
@@ -24,6 +25,15 @@ from app_lia_web.app.schemas import (
 
 logger = logging.getLogger(__name__)
 
+# Entités comptées par statut dans les statistiques globales
+ENTITES_STATISTIQUES = {
+    "cycles": CycleCodev,
+    "groupes": GroupeCodev,
+    "membres": MembreGroupeCodev,
+    "seances": SeanceCodev,
+    "presentations": PresentationCodev,
+}
+
 class CodevService:
     """Service de gestion du codéveloppement"""
     
@@ -182,31 +192,70 @@ class CodevService:
         if not seance:
             raise ValueError("Séance introuvable")
         
-        presentations = []
-        
         # Si pas d'ordre spécifié, utiliser l'ordre de la liste
         if not ordre_presentations:
             ordre_presentations = list(range(1, len(candidats_ids) + 1))
+        if len(ordre_presentations) != len(candidats_ids):
+            raise ValueError("L'ordre des présentations doit couvrir chaque candidat")
+        if not candidats_ids:
+            return []
         
-        for i, candidat_id in enumerate(candidats_ids):
-            presentation = PresentationCodev(
-                seance_id=seance_id,
-                candidat_id=candidat_id,
-                ordre_presentation=ordre_presentations[i],
-                probleme_expose="",  # À remplir par le candidat
-                statut=StatutPresentation.EN_ATTENTE.value
-            )
-            session.add(presentation)
-            presentations.append(presentation)
-        
+        # Un seul INSERT ... RETURNING pour toutes les présentations
+        maintenant = datetime.now(timezone.utc)
+        ids = session.scalars(
+            insert(PresentationCodev).returning(PresentationCodev.id),
+            [
+                {
+                    "seance_id": seance_id,
+                    "candidat_id": candidat_id,
+                    "ordre_presentation": ordre,
+                    "probleme_expose": "",  # À remplir par le candidat
+                    "statut": StatutPresentation.EN_ATTENTE.value,
+                    "cree_le": maintenant,
+                }
+                for candidat_id, ordre in zip(candidats_ids, ordre_presentations)
+            ],
+        ).all()
         session.commit()
         
-        for presentation in presentations:
-            session.refresh(presentation)
+        presentations = session.exec(
+            select(PresentationCodev)
+            .where(PresentationCodev.id.in_(ids))
+            .order_by(PresentationCodev.ordre_presentation, PresentationCodev.id)
+        ).all()
         
         logger.info(f"{len(presentations)} présentations planifiées pour la séance {seance_id}")
         return presentations
     
+    @staticmethod
+    def _prochain_ordre_contribution(session: Session, presentation_id: int, ordre_impose: Optional[int] = None) -> int:
+        """Réserve l'ordre d'une contribution par incrément du compteur de la présentation
+        
+        L'UPDATE verrouille la ligne de la présentation : deux contributions
+        simultanées obtiennent des ordres distincts. Le compteur est initialisé
+        depuis les contributions existantes lors de son premier usage.
+        """
+        compteur = func.coalesce(
+            PresentationCodev.dernier_ordre_contribution,
+            select(func.max(ContributionCodev.ordre_contribution))
+            .where(ContributionCodev.presentation_id == PresentationCodev.id)
+            .scalar_subquery(),
+            0,
+        )
+        if ordre_impose:
+            valeur = case((compteur < ordre_impose, ordre_impose), else_=compteur)
+        else:
+            valeur = compteur + 1
+        ordre = session.execute(
+            update(PresentationCodev)
+            .where(PresentationCodev.id == presentation_id)
+            .values(dernier_ordre_contribution=valeur)
+            .returning(PresentationCodev.dernier_ordre_contribution)
+        ).scalar_one_or_none()
+        if ordre is None:
+            raise ValueError("Présentation introuvable")
+        return ordre_impose or ordre
+    
     @staticmethod
     def add_contribution(
         session: Session,
@@ -219,12 +268,7 @@ class CodevService:
         """Ajoute une contribution à une présentation"""
         
         # Déterminer l'ordre automatiquement si non spécifié
-        if not ordre_contribution:
-            max_ordre = session.exec(
-                select(func.max(ContributionCodev.ordre_contribution))
-                .where(ContributionCodev.presentation_id == presentation_id)
-            ).one() or 0
-            ordre_contribution = max_ordre + 1
+        ordre_contribution = CodevService._prochain_ordre_contribution(session, presentation_id, ordre_contribution)
         
         contribution = ContributionCodev(
             presentation_id=presentation_id,
@@ -241,6 +285,26 @@ class CodevService:
         logger.info(f"Contribution ajoutée à la présentation {presentation_id}")
         return contribution
     
+    @staticmethod
+    def get_statistiques_globales(session: Session) -> Dict[str, Any]:
+        """Totaux et répartitions par statut de toutes les entités codev, en une requête"""
+        
+        lignes = session.execute(union_all(*[
+            select(literal(nom).label("entite"), modele.statut.label("statut"), func.count().label("nb"))
+            .group_by(modele.statut)
+            for nom, modele in ENTITES_STATISTIQUES.items()
+        ])).all()
+        
+        stats: Dict[str, Any] = {}
+        for nom in ENTITES_STATISTIQUES:
+            par_statut = sorted(
+                ((ligne.statut, ligne.nb) for ligne in lignes if ligne.entite == nom),
+                key=lambda item: item[1], reverse=True
+            )
+            stats[f"nb_{nom}"] = sum(nb for _, nb in par_statut)
+            stats[f"{nom}_par_statut"] = par_statut
+        return stats
+    
     @staticmethod
     def get_statistiques_cycle(session: Session, cycle_id: int) -> Dict[str, Any]:
         """Récupère les statistiques d'un cycle de codéveloppement"""
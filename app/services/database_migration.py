@@ -1,9 +1,10 @@
 # app/services/database_migration.py
 from __future__ import annotations
 from typing import List, Dict, Any, Optional
+import hashlib
 import logging
-from sqlmodel import Session, text, inspect
-from sqlalchemy import create_engine, MetaData, Table, Column, Enum as SQLEnum
+from sqlmodel import SQLModel, Session, select, text, inspect
+from sqlalchemy import create_engine, MetaData, Table, Column, Enum as SQLEnum, UniqueConstraint
 from sqlalchemy.dialects.postgresql import ENUM
 from sqlalchemy.exc import ProgrammingError
 
@@ -12,6 +13,22 @@ from app_lia_web.app.models.enums import TypeDocument, UserRole, StatutPresence,
 
 logger = logging.getLogger(__name__)
 
+# Clé AppSetting mémorisant la version de schéma déjà migrée
+SCHEMA_VERSION_KEY = "schema_version"
+
+# Ordre de conservation des doublons avant la pose d'une contrainte unique
+# (première ligne gardée) ; par défaut la plus ancienne (id croissant)
+DEDUP_KEEP_ORDER = {
+    "presenceseminaire": "modifie_le DESC NULLS LAST, id",
+    "presence_events": "modifie_le DESC NULLS LAST, id",
+    "progressionelearning": "derniere_activite DESC NULLS LAST, id",
+    "decisionjurycandidat": "date_decision DESC, id DESC",
+    "eligibilite": "calcule_le DESC, id DESC",
+}
+
+def _nom_table(table: Table) -> str:
+    return f'"{table.schema}"."{table.name}"' if table.schema else f'"{table.name}"'
+
 class DatabaseMigrationService:
     """Service de migration automatique de la base de données"""
     
@@ -25,6 +42,9 @@ class DatabaseMigrationService:
             "enums_updated": [],
             "tables_created": [],
             "columns_added": [],
+            "constraints_added": [],
+            "indexes_added": [],
+            "triggers_added": [],
             "errors": []
         }
         
@@ -38,6 +58,18 @@ class DatabaseMigrationService:
             # 3. Migrer les colonnes
             self._migrate_columns(migration_results)
             
+            # 4. Poser les contraintes uniques nommées (requises par les INSERT ... ON CONFLICT)
+            self._migrate_unique_constraints(migration_results)
+            
+            # 5. Interdire les rendez-vous qui se chevauchent pour un même conseiller
+            self._migrate_rendez_vous_exclusion(migration_results)
+            
+            # 6. Créer les index déclarés dans les modèles sur les tables existantes
+            self._migrate_indexes(migration_results)
+            
+            # 7. Notifier l'émargement en direct (pg_notify) à chaque signature ou présence
+            self._migrate_notify_triggers(migration_results)
+            
             logger.info("✅ Migration de la base de données terminée avec succès")
             
         except Exception as e:
@@ -188,6 +220,193 @@ class DatabaseMigrationService:
             except Exception as e:
                 logger.error(f"Erreur lors de la vérification des colonnes de {table_name}: {e}")
     
+    def _migrate_unique_constraints(self, results: Dict[str, Any]):
+        """Ajoute aux tables existantes les contraintes uniques nommées déclarées dans les modèles"""
+        logger.info("🔄 Vérification des contraintes uniques...")
+        
+        inspector = inspect(self.engine)
+        for table in SQLModel.metadata.sorted_tables:
+            constraints = [
+                c for c in table.constraints
+                if isinstance(c, UniqueConstraint) and isinstance(c.name, str)
+            ]
+            if not constraints or not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_unique_constraints(table.name)}
+            for constraint in constraints:
+                if constraint.name in existing:
+                    continue
+                columns = ", ".join(column.name for column in constraint.columns)
+                keep_order = DEDUP_KEEP_ORDER.get(table.name, "id")
+                try:
+                    # Supprimer les doublons qui empêcheraient la création de la contrainte
+                    deleted = self._supprimer_doublons(table, columns, keep_order)
+                    self.session.exec(text(
+                        f'ALTER TABLE "{table.name}" ADD CONSTRAINT {constraint.name} UNIQUE ({columns})'
+                    ))
+                    self.session.commit()
+                    logger.info(f"✅ Contrainte {constraint.name} ajoutée ({deleted} doublon(s) supprimé(s))")
+                    results["constraints_added"].append(constraint.name)
+                except Exception as e:
+                    self.session.rollback()
+                    logger.error(f"Erreur lors de l'ajout de la contrainte {constraint.name}: {e}")
+                    results["errors"].append(f"Contrainte {constraint.name}: {str(e)}")
+    
+    def _supprimer_doublons(self, table: Table, columns: str, keep_order: str) -> int:
+        """Supprime les doublons de (columns), la première ligne selon keep_order étant gardée
+
+        Les lignes des tables qui référencent un doublon (ex. reorientationcandidat
+        → decisionjurycandidat) sont d'abord rattachées à la ligne gardée, sans
+        quoi la clé étrangère bloque la suppression.
+        """
+        inspector = inspect(self.engine)
+        for reference in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(reference.name, schema=reference.schema):
+                continue
+            for fk in reference.foreign_keys:
+                if fk.column.table is not table or fk.column.name != "id":
+                    continue
+                colonne = fk.parent.name
+                self.session.exec(text(f"""
+                    UPDATE {_nom_table(reference)} SET {colonne} = doublons.garde
+                    FROM (
+                        SELECT id, FIRST_VALUE(id) OVER (PARTITION BY {columns} ORDER BY {keep_order}) AS garde
+                        FROM "{table.name}"
+                    ) doublons
+                    WHERE {_nom_table(reference)}.{colonne} = doublons.id AND doublons.garde <> doublons.id
+                """))
+        return self.session.exec(text(f"""
+            DELETE FROM "{table.name}" WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY {columns} ORDER BY {keep_order}) AS rang
+                    FROM "{table.name}"
+                ) doublons WHERE rang > 1
+            )
+        """)).rowcount
+    
+    def _migrate_rendez_vous_exclusion(self, results: Dict[str, Any]):
+        """Contrainte d'exclusion GiST sur le créneau (conseiller, tsrange) des rendez-vous actifs"""
+        from app_lia_web.app.services.rendez_vous_service import CONTRAINTE_CHEVAUCHEMENT, creneau_sql
+        logger.info("🔄 Vérification de la contrainte de chevauchement des rendez-vous...")
+        
+        inspector = inspect(self.engine)
+        if not inspector.has_table("rendezvous"):
+            return
+        exists = self.session.exec(
+            text("SELECT 1 FROM pg_constraint WHERE conname = :name"), params={"name": CONTRAINTE_CHEVAUCHEMENT}
+        ).first()
+        if exists:
+            return
+        try:
+            self.session.exec(text('CREATE EXTENSION IF NOT EXISTS "btree_gist"'))
+            # Les chevauchements existants ne sont pas supprimés : ils sont à corriger à la main
+            overlaps = self.session.exec(text(f"""
+                SELECT count(*) FROM rendezvous a JOIN rendezvous b
+                  ON a.conseiller_id = b.conseiller_id AND a.id < b.id
+                 AND {creneau_sql("a.")} && {creneau_sql("b.")}
+                WHERE a.statut <> 'ANNULE' AND b.statut <> 'ANNULE'
+            """)).one()[0]
+            if overlaps:
+                raise ValueError(f"{overlaps} paire(s) de rendez-vous se chevauchent déjà")
+            self.session.exec(text(f"""
+                ALTER TABLE rendezvous ADD CONSTRAINT {CONTRAINTE_CHEVAUCHEMENT}
+                EXCLUDE USING gist (conseiller_id WITH =, ({creneau_sql()}) WITH &&)
+                WHERE (conseiller_id IS NOT NULL AND statut <> 'ANNULE')
+            """))
+            self.session.commit()
+            logger.info(f"✅ Contrainte {CONTRAINTE_CHEVAUCHEMENT} ajoutée")
+            results["constraints_added"].append(CONTRAINTE_CHEVAUCHEMENT)
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"Erreur lors de l'ajout de la contrainte {CONTRAINTE_CHEVAUCHEMENT}: {e}")
+            results["errors"].append(f"Contrainte {CONTRAINTE_CHEVAUCHEMENT}: {str(e)}")
+    
+    def _migrate_indexes(self, results: Dict[str, Any]):
+        """Crée les index des modèles absents des tables existantes (create_all ne les ajoute qu'aux nouvelles tables)"""
+        logger.info("🔄 Vérification des index...")
+        
+        inspector = inspect(self.engine)
+        for table in SQLModel.metadata.sorted_tables:
+            if table.schema is not None or not table.indexes or not inspector.has_table(table.name):
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+                try:
+                    index.create(self.engine)
+                    logger.info(f"✅ Index {index.name} créé")
+                    results["indexes_added"].append(index.name)
+                except Exception as e:
+                    logger.error(f"Erreur lors de la création de l'index {index.name}: {e}")
+                    results["errors"].append(f"Index {index.name}: {str(e)}")
+    
+    def _migrate_notify_triggers(self, results: Dict[str, Any]):
+        """(Re)crée la fonction et les triggers pg_notify de l'émargement en direct"""
+        from app_lia_web.app.services.emargement_live import TABLES_SUIVIES, nom_trigger, sql_declencheurs
+        logger.info("🔄 Mise à jour des triggers d'émargement en direct...")
+        
+        if self.engine.dialect.name != "postgresql":
+            return
+        inspector = inspect(self.engine)
+        if not all(inspector.has_table(table) for table in TABLES_SUIVIES):
+            results["errors"].append("Triggers d'émargement: tables suivies manquantes")
+            return
+        try:
+            for instruction in sql_declencheurs():
+                self.session.exec(text(instruction))
+            self.session.commit()
+            logger.info("✅ Triggers d'émargement en direct à jour")
+            results["triggers_added"].extend(nom_trigger(table) for table in TABLES_SUIVIES)
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"Erreur lors de la création des triggers d'émargement: {e}")
+            results["errors"].append(f"Triggers d'émargement: {str(e)}")
+    
+    @staticmethod
+    def current_schema_version() -> str:
+        """Empreinte des modèles et des enums : change dès qu'une migration est nécessaire"""
+        parts = [settings.VERSION]
+        for enum_class in (TypeDocument, UserRole, StatutPresence, TypeUtilisateur, StatutDossier, DecisionJury):
+            parts.append(f"{enum_class.__name__}={','.join(e.value for e in enum_class)}")
+        for table in SQLModel.metadata.sorted_tables:
+            for column in table.columns:
+                parts.append(f"{table.name}.{column.name}:{column.type!r}:{column.nullable}")
+            for constraint in table.constraints:
+                if isinstance(constraint, UniqueConstraint) and isinstance(constraint.name, str):
+                    parts.append(f"{table.name}.{constraint.name}")
+            for index in table.indexes:
+                parts.append(f"{table.name}.{index.name}")
+        from app_lia_web.app.services.rendez_vous_service import CONTRAINTE_CHEVAUCHEMENT, creneau_sql
+        parts.append(f"rendezvous.{CONTRAINTE_CHEVAUCHEMENT}:{creneau_sql()}")
+        from app_lia_web.app.services.emargement_live import sql_declencheurs
+        parts.extend(sql_declencheurs())
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+    
+    def get_stored_schema_version(self) -> Optional[str]:
+        """Version de schéma enregistrée lors de la dernière migration réussie"""
+        from app_lia_web.app.models.ACD.admin import AppSetting
+        try:
+            setting = self.session.exec(select(AppSetting).where(AppSetting.key == SCHEMA_VERSION_KEY)).first()
+            return setting.value if setting else None
+        except Exception as e:
+            # Table absente (première installation)
+            self.session.rollback()
+            logger.info(f"Version de schéma introuvable: {e}")
+            return None
+    
+    def store_schema_version(self, version: str) -> None:
+        """Mémorise la version de schéma après une migration réussie"""
+        from datetime import datetime, timezone
+        from app_lia_web.app.models.ACD.admin import AppSetting
+        setting = self.session.exec(select(AppSetting).where(AppSetting.key == SCHEMA_VERSION_KEY)).first()
+        if setting:
+            setting.value = version
+            setting.updated_at = datetime.now(timezone.utc)
+        else:
+            self.session.add(AppSetting(key=SCHEMA_VERSION_KEY, value=version))
+        self.session.commit()
+    
     def get_database_status(self) -> Dict[str, Any]:
         """Retourne le statut de la base de données"""
         status = {
@@ -0,0 +1,227 @@
+# app/services/elearning_progress_buffer.py
+"""
+Tampon d'écriture différée des progressions e-learning
+
+Le lecteur envoie un « heartbeat » toutes les quelques secondes. Au lieu d'une
+transaction par heartbeat, les temps sont cumulés en mémoire par
+(inscription, ressource) puis écrits par lots avec un seul
+INSERT ... ON CONFLICT DO UPDATE, à intervalle régulier, dès que le tampon
+dépasse un seuil, et à l'arrêt de l'application.
+"""
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session, select
+
+from app_lia_web.core.database import engine
+from app_lia_web.app.models.elearning import ModuleRessource, ProgressionElearning
+from app_lia_web.app.services import elearning_rollup
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_FLUSH_INTERVAL_SECONDS = 30
+PROGRESS_FLUSH_MAX_PENDING = 500
+
+Key = Tuple[int, int]  # (inscription_id, ressource_id)
+
+
+def upsert_progressions(rows: List[Dict]) -> None:
+    """Écrit un lot de progressions cumulées (et leurs rollups) en un seul commit"""
+    table = ProgressionElearning.__table__
+    with Session(engine) as session:
+        # Module par défaut des nouvelles lignes : premier module contenant la ressource
+        sans_module = {row["ressource_id"] for row in rows if row["module_id"] is None}
+        modules = {}
+        if sans_module:
+            modules = dict(session.exec(
+                select(ModuleRessource.ressource_id, func.min(ModuleRessource.module_id))
+                .where(ModuleRessource.ressource_id.in_(sans_module))
+                .group_by(ModuleRessource.ressource_id)
+            ).all())
+
+        values = []
+        for row in rows:
+            module_id = row["module_id"] or modules.get(row["ressource_id"])
+            if module_id is None:
+                logger.warning(f"⚠️ Ressource {row['ressource_id']} rattachée à aucun module, progression ignorée")
+                continue
+            values.append({
+                "inscription_id": row["inscription_id"],
+                "ressource_id": row["ressource_id"],
+                "module_id": module_id,
+                "statut": "en_cours",
+                "temps_consacre_minutes": row["minutes"],
+                "date_debut": row["premiere_activite"],
+                "derniere_activite": row["derniere_activite"],
+                "cree_le": row["premiere_activite"],
+            })
+        if not values:
+            return
+
+        insert_query = pg_insert(table).values(values)
+        excluded = insert_query.excluded
+        session.execute(insert_query.on_conflict_do_update(
+            index_elements=["inscription_id", "ressource_id"],
+            set_={
+                "temps_consacre_minutes": table.c.temps_consacre_minutes + excluded.temps_consacre_minutes,
+                "derniere_activite": func.greatest(table.c.derniere_activite, excluded.derniere_activite),
+                "date_debut": func.coalesce(table.c.date_debut, excluded.date_debut),
+                "statut": case((table.c.statut == "non_commence", "en_cours"), else_=table.c.statut),
+            },
+        ))
+        elearning_rollup.refresh_inscriptions(session, {value["inscription_id"] for value in values})
+        session.commit()
+
+
+class ProgressBuffer:
+    """Cumule les heartbeats en mémoire et les écrit par lots"""
+
+    def __init__(
+        self,
+        writer: Callable[[List[Dict]], None] = upsert_progressions,
+        flush_interval: float = PROGRESS_FLUSH_INTERVAL_SECONDS,
+        max_pending: int = PROGRESS_FLUSH_MAX_PENDING,
+    ):
+        self.writer = writer
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[Key, Dict] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.heartbeats = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.last_flush_at: Optional[str] = None
+
+    def record(self, inscription_id: int, ressource_id: int, secondes: int,
+               module_id: Optional[int] = None, at: Optional[datetime] = None) -> bool:
+        """Ajoute un heartbeat ; retourne True si le seuil de taille est atteint"""
+        at = at or datetime.now(timezone.utc)
+        with self._lock:
+            self.heartbeats += 1
+            entry = self._pending.get((inscription_id, ressource_id))
+            if entry is None:
+                self._pending[(inscription_id, ressource_id)] = {
+                    "secondes": max(secondes, 0),
+                    "module_id": module_id,
+                    "premiere_activite": at,
+                    "derniere_activite": at,
+                }
+            else:
+                entry["secondes"] += max(secondes, 0)
+                entry["module_id"] = entry["module_id"] or module_id
+                entry["derniere_activite"] = max(entry["derniere_activite"], at)
+                entry["reliquat"] = False
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+        return full
+
+    def flush(self, final: bool = False) -> int:
+        """Écrit le contenu du tampon ; retourne le nombre de lignes envoyées
+
+        Les secondes qui ne forment pas une minute entière restent en attente
+        (sans réécriture tant qu'aucun nouveau heartbeat n'arrive), sauf au
+        flush final où elles sont arrondies.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            rows, reste = [], {}
+            for (inscription_id, ressource_id), entry in batch.items():
+                if entry.get("reliquat") and not final:
+                    reste[(inscription_id, ressource_id)] = entry
+                    continue
+                if final:
+                    minutes, secondes_restantes = round(entry["secondes"] / 60), 0
+                else:
+                    minutes, secondes_restantes = divmod(entry["secondes"], 60)
+                rows.append({
+                    "inscription_id": inscription_id,
+                    "ressource_id": ressource_id,
+                    "module_id": entry["module_id"],
+                    "minutes": minutes,
+                    "premiere_activite": entry["premiere_activite"],
+                    "derniere_activite": entry["derniere_activite"],
+                })
+                if secondes_restantes:
+                    reste[(inscription_id, ressource_id)] = {**entry, "secondes": secondes_restantes, "reliquat": True}
+
+            if not rows:
+                self._merge_back(reste)
+                return 0
+            try:
+                self.writer(rows)
+            except Exception as e:
+                logger.error(f"❌ Écriture des progressions e-learning impossible ({len(rows)} lignes): {e}")
+                self._merge_back(batch)
+                return 0
+
+            if reste:
+                self._merge_back(reste)
+            self.flushes += 1
+            self.rows_written += len(rows)
+            self.last_flush_at = datetime.now(timezone.utc).isoformat()
+            return len(rows)
+
+    def _merge_back(self, entries: Dict[Key, Dict]) -> None:
+        """Réintègre des entrées non écrites (échec ou reliquat de secondes)"""
+        with self._lock:
+            for key, entry in entries.items():
+                current = self._pending.get(key)
+                if current is None:
+                    self._pending[key] = entry
+                else:
+                    current["secondes"] += entry["secondes"]
+                    current["module_id"] = current["module_id"] or entry["module_id"]
+                    current["premiere_activite"] = min(current["premiere_activite"], entry["premiere_activite"])
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if not self._stopping.is_set():
+                self.flush()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="elearning-progress-flush", daemon=True)
+        self._thread.start()
+        logger.info(f"✅ Tampon de progression e-learning démarré (flush toutes les {self.flush_interval}s)")
+
+    def stop(self) -> None:
+        """Arrête le thread puis écrit tout ce qui reste"""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval)
+            self._thread = None
+        written = self.flush(final=True)
+        logger.info(f"🛑 Tampon de progression e-learning arrêté ({written} lignes écrites à l'arrêt)")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "heartbeats": self.heartbeats,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "last_flush_at": self.last_flush_at,
+        }
+
+
+# Instance unique par processus
+progress_buffer = ProgressBuffer()
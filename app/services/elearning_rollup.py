@@ -0,0 +1,268 @@
+# app/services/elearning_rollup.py
+"""
+Agrégats e-learning précalculés (rollups)
+
+Les pages de statistiques lisent RollupElearningInscription et
+RollupElearningProgramme au lieu de recalculer les sommes à chaque affichage.
+
+- Inscriptions touchées : recalculées de manière ensembliste (INSERT ... SELECT
+  ... GROUP BY ... ON CONFLICT DO UPDATE) dans la transaction qui écrit la
+  progression ;
+- programmes : les cumuls (candidats actifs, temps, ressources terminées...)
+  reçoivent la différence entre les rollups d'inscription avant et après
+  l'écriture, sous verrou de la ligne du programme (SELECT ... FOR UPDATE) ;
+- modules distincts terminés et score moyen ne se déduisent pas d'un delta :
+  recalculés par refresh_programmes() (tâche planifiée, rebuild()).
+"""
+import logging
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import Float, and_, case, cast, func, select, true, union, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session
+
+from app_lia_web.core.database import upsert_from_select
+from app_lia_web.app.models.base import Inscription, Programme
+from app_lia_web.app.models.elearning import (
+    ObjectifElearning, ProgressionElearning, RessourceElearning,
+    RollupElearningInscription, RollupElearningProgramme
+)
+
+logger = logging.getLogger(__name__)
+
+TYPES_RESSOURCE = ("video", "document", "quiz", "lien", "audio")
+
+# Colonnes de RollupElearningProgramme sommes des rollups d'inscription (mises à jour par delta)
+CUMULS_PROGRAMME = (
+    "candidats_actifs", "candidats_objectifs_atteints", "temps_total_minutes", "ressources_terminees",
+    *(f"terminees_{type_ressource}" for type_ressource in TYPES_RESSOURCE),
+)
+
+
+def _inscriptions_query(condition):
+    """Recalcul des rollups des inscriptions vérifiant `condition`"""
+    progression = ProgressionElearning
+    termine = progression.statut == "termine"
+    agg = (
+        select(
+            progression.inscription_id,
+            func.sum(progression.temps_consacre_minutes).label("temps_total_minutes"),
+            func.count(progression.id).label("ressources_commencees"),
+            func.count(case((termine, progression.id))).label("ressources_terminees"),
+            func.count(func.distinct(case((termine, progression.module_id)))).label("modules_termines"),
+            *[
+                func.count(case((and_(termine, RessourceElearning.type_ressource == type_ressource), progression.id)))
+                .label(f"terminees_{type_ressource}")
+                for type_ressource in TYPES_RESSOURCE
+            ],
+            func.avg(progression.score).label("score_moyen"),
+            func.max(progression.derniere_activite).label("derniere_activite"),
+        )
+        .join(RessourceElearning, RessourceElearning.id == progression.ressource_id)
+        .where(progression.inscription_id.in_(select(Inscription.id).where(condition)))
+        .group_by(progression.inscription_id)
+        .subquery()
+    )
+
+    temps_total = func.coalesce(agg.c.temps_total_minutes, 0)
+    objectifs = select(func.count(ObjectifElearning.id)).where(
+        ObjectifElearning.programme_id == Inscription.programme_id
+    )
+    return (
+        select(
+            Inscription.id.label("inscription_id"),
+            Inscription.programme_id,
+            temps_total.label("temps_total_minutes"),
+            *[
+                func.coalesce(agg.c[name], 0).label(name)
+                for name in ("ressources_commencees", "ressources_terminees", "modules_termines")
+                + tuple(f"terminees_{type_ressource}" for type_ressource in TYPES_RESSOURCE)
+            ],
+            agg.c.score_moyen,
+            agg.c.derniere_activite,
+            objectifs.scalar_subquery().label("objectifs_total"),
+            objectifs.where(ObjectifElearning.temps_minimum_minutes <= temps_total)
+            .scalar_subquery().label("objectifs_atteints"),
+            func.current_timestamp().label("maj_le"),
+        )
+        .select_from(Inscription)
+        .outerjoin(agg, agg.c.inscription_id == Inscription.id)
+        .where(condition)
+    )
+
+
+def _cumuls_query(condition):
+    """CUMULS_PROGRAMME par programme, sommés sur les rollups d'inscription vérifiant `condition`"""
+    rollup = RollupElearningInscription
+    return (
+        select(
+            rollup.programme_id,
+            func.count(case((rollup.ressources_commencees > 0, rollup.inscription_id))).label("candidats_actifs"),
+            func.count(case((rollup.objectifs_atteints >= rollup.objectifs_total, rollup.inscription_id)))
+            .label("candidats_objectifs_atteints"),
+            func.sum(rollup.temps_total_minutes).label("temps_total_minutes"),
+            func.sum(rollup.ressources_terminees).label("ressources_terminees"),
+            *[
+                func.sum(getattr(rollup, f"terminees_{type_ressource}")).label(f"terminees_{type_ressource}")
+                for type_ressource in TYPES_RESSOURCE
+            ],
+        )
+        .where(condition)
+        .group_by(rollup.programme_id)
+    )
+
+
+def _programmes_query(condition):
+    """Recalcul des rollups des programmes vérifiant `condition` à partir des rollups d'inscription"""
+    programmes = select(Programme.id).where(condition)
+    par_inscription = _cumuls_query(RollupElearningInscription.programme_id.in_(programmes)).subquery()
+    # Modules distincts et score moyen ne se déduisent pas des rollups d'inscription
+    par_progression = (
+        select(
+            Inscription.programme_id,
+            func.count(func.distinct(case((ProgressionElearning.statut == "termine", ProgressionElearning.module_id))))
+            .label("modules_termines"),
+            func.avg(ProgressionElearning.score).label("score_moyen"),
+        )
+        .join(Inscription, Inscription.id == ProgressionElearning.inscription_id)
+        .where(Inscription.programme_id.in_(programmes))
+        .group_by(Inscription.programme_id)
+        .subquery()
+    )
+
+    actifs = func.coalesce(par_inscription.c.candidats_actifs, 0)
+    temps_total = func.coalesce(par_inscription.c.temps_total_minutes, 0)
+    return (
+        select(
+            Programme.id.label("programme_id"),
+            actifs.label("candidats_actifs"),
+            func.coalesce(par_inscription.c.candidats_objectifs_atteints, 0).label("candidats_objectifs_atteints"),
+            temps_total.label("temps_total_minutes"),
+            func.coalesce(cast(temps_total, Float) / func.nullif(actifs, 0), 0).label("temps_moyen_minutes"),
+            func.coalesce(par_inscription.c.ressources_terminees, 0).label("ressources_terminees"),
+            func.coalesce(par_progression.c.modules_termines, 0).label("modules_termines"),
+            *[
+                func.coalesce(par_inscription.c[f"terminees_{type_ressource}"], 0).label(f"terminees_{type_ressource}")
+                for type_ressource in TYPES_RESSOURCE
+            ],
+            par_progression.c.score_moyen,
+            func.current_timestamp().label("maj_le"),
+        )
+        .select_from(Programme)
+        .outerjoin(par_inscription, par_inscription.c.programme_id == Programme.id)
+        .outerjoin(par_progression, par_progression.c.programme_id == Programme.id)
+        .where(condition)
+    )
+
+
+def _verrouiller_programmes(session: Session, programme_ids: Iterable[int]) -> None:
+    """Crée au besoin puis verrouille les lignes de rollup des programmes (dans l'ordre des id)
+
+    Les écritures concurrentes d'un même programme s'exécutent l'une après
+    l'autre : chacune lit les rollups d'inscription validés par la précédente.
+    Sans effet sur SQLite (tests), qui n'a qu'un écrivain à la fois.
+    """
+    programme_ids = sorted(set(programme_ids))
+    if not programme_ids:
+        return
+    insert = sqlite_insert if session.get_bind().dialect.name == "sqlite" else pg_insert
+    session.execute(
+        insert(RollupElearningProgramme.__table__)
+        .values([{"programme_id": programme_id} for programme_id in programme_ids])
+        .on_conflict_do_nothing(index_elements=["programme_id"])
+    )
+    session.execute(
+        select(RollupElearningProgramme.programme_id)
+        .where(RollupElearningProgramme.programme_id.in_(programme_ids))
+        .order_by(RollupElearningProgramme.programme_id)
+        .with_for_update()
+    ).all()
+
+
+def _cumuls(session: Session, inscription_ids) -> Dict[int, Dict[str, int]]:
+    rows = session.execute(_cumuls_query(RollupElearningInscription.inscription_id.in_(inscription_ids))).mappings()
+    return {row["programme_id"]: {name: row[name] or 0 for name in CUMULS_PROGRAMME} for row in rows}
+
+
+def refresh_inscriptions(session: Session, inscription_ids: Iterable[int]) -> None:
+    """Met à jour les rollups des inscriptions touchées et les cumuls de leurs programmes
+
+    À appeler avant le commit de l'écriture de progression : les rollups sont
+    validés dans la même transaction. Le programme reçoit seulement la
+    différence des rollups de ces inscriptions, sans relire ses progressions.
+    """
+    inscription_ids = set(inscription_ids)
+    if not inscription_ids:
+        return
+    session.flush()
+    # Programmes actuels et précédents (une inscription peut changer de programme)
+    programme_ids = set(session.execute(union(
+        select(Inscription.programme_id).where(Inscription.id.in_(inscription_ids)),
+        select(RollupElearningInscription.programme_id)
+        .where(RollupElearningInscription.inscription_id.in_(inscription_ids)),
+    )).scalars())
+    _verrouiller_programmes(session, programme_ids)
+
+    avant = _cumuls(session, inscription_ids)
+    upsert_from_select(session, RollupElearningInscription, _inscriptions_query(Inscription.id.in_(inscription_ids)))
+    apres = _cumuls(session, inscription_ids)
+
+    programme = RollupElearningProgramme.__table__.c
+    for programme_id in programme_ids:
+        delta = {
+            name: apres.get(programme_id, {}).get(name, 0) - avant.get(programme_id, {}).get(name, 0)
+            for name in CUMULS_PROGRAMME
+        }
+        if not any(delta.values()):
+            continue
+        actifs = programme.candidats_actifs + delta["candidats_actifs"]
+        temps_total = programme.temps_total_minutes + delta["temps_total_minutes"]
+        session.execute(
+            update(RollupElearningProgramme.__table__)
+            .where(programme.programme_id == programme_id)
+            .values(
+                **{name: programme[name] + value for name, value in delta.items()},
+                temps_moyen_minutes=func.coalesce(cast(temps_total, Float) / func.nullif(actifs, 0), 0),
+                maj_le=func.current_timestamp(),
+            )
+        )
+
+
+def refresh_programmes(session: Session, programme_ids: Optional[Iterable[int]] = None) -> int:
+    """Recalcule entièrement les rollups de programme (tous par défaut), sans commit
+
+    Seule mise à jour des modules distincts terminés et du score moyen ;
+    corrige aussi toute dérive des cumuls.
+    """
+    programmes = true() if programme_ids is None else Programme.id.in_(list(programme_ids))
+    session.flush()
+    _verrouiller_programmes(session, session.execute(select(Programme.id).where(programmes)).scalars())
+    return upsert_from_select(session, RollupElearningProgramme, _programmes_query(programmes))
+
+
+def rebuild(session: Session, programme_ids: Optional[Iterable[int]] = None) -> Dict[str, int]:
+    """Reconstruit les rollups depuis les progressions (tous les programmes par défaut)
+
+    Requêtes ensemblistes, sans commit : à l'appelant de valider.
+    """
+    if programme_ids is None:
+        inscriptions, programmes = true(), true()
+    else:
+        programme_ids = list(programme_ids)
+        inscriptions = Inscription.programme_id.in_(programme_ids)
+        programmes = Programme.id.in_(programme_ids)
+    session.flush()
+    # Verrou pris avant de relire les progressions : aucune écriture concurrente ne se perd
+    _verrouiller_programmes(session, session.execute(select(Programme.id).where(programmes)).scalars())
+    result = {
+        "inscriptions": upsert_from_select(session, RollupElearningInscription, _inscriptions_query(inscriptions)),
+        "programmes": refresh_programmes(session, programme_ids),
+    }
+    logger.info(f"📊 Rollups e-learning reconstruits: {result['inscriptions']} inscriptions, {result['programmes']} programmes")
+    return result
+
+
+def terminees_par_type(rollup) -> Dict[str, int]:
+    """Ressources terminées par type pour une ligne de rollup"""
+    return {type_ressource: getattr(rollup, f"terminees_{type_ressource}") for type_ressource in TYPES_RESSOURCE}
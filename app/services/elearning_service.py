@@ -7,9 +7,11 @@ import json
 from app_lia_web.app.models.elearning import (
     RessourceElearning, ModuleElearning, ProgressionElearning,
     ObjectifElearning, QuizElearning, ReponseQuiz, CertificatElearning,
-    ModuleRessource
+    ModuleRessource, RollupElearningInscription, RollupElearningProgramme
 )
-from app_lia_web.app.models.base import Inscription, User, Programme
+from app_lia_web.app.models.base import Inscription, User, Programme, Candidat
+from app_lia_web.app.services.elearning_progress_buffer import progress_buffer
+from app_lia_web.app.services import elearning_rollup
 from app_lia_web.app.schemas.elearning import (
     RessourceElearningCreate, RessourceElearningUpdate,
     ModuleElearningCreate, ModuleElearningUpdate,
@@ -197,16 +199,22 @@ class ElearningService:
             if not ressource:
                 return None
             
+            # Module par défaut : premier module contenant la ressource
+            module_id = session.exec(
+                select(func.min(ModuleRessource.module_id)).where(ModuleRessource.ressource_id == ressource_id)
+            ).first()
+            
             progression = ProgressionElearning(
                 inscription_id=inscription_id,
                 ressource_id=ressource_id,
-                module_id=ressource.modules[0].id if ressource.modules else None,
+                module_id=module_id,
                 statut="en_cours",
                 date_debut=datetime.now(timezone.utc),
                 derniere_activite=datetime.now(timezone.utc)
             )
             session.add(progression)
         
+        elearning_rollup.refresh_inscriptions(session, [inscription_id])
         session.commit()
         session.refresh(progression)
         return progression
@@ -225,10 +233,16 @@ class ElearningService:
             progression.notes = notes
         
         session.add(progression)
+        elearning_rollup.refresh_inscriptions(session, [progression.inscription_id])
         session.commit()
         session.refresh(progression)
         return progression
     
+    @staticmethod
+    def record_heartbeat(inscription_id: int, ressource_id: int, secondes: int, module_id: Optional[int] = None) -> None:
+        """Enregistrer le temps passé envoyé par le lecteur (écriture différée par lots, voir progress_buffer)"""
+        progress_buffer.record(inscription_id, ressource_id, secondes, module_id)
+    
     @staticmethod
     def complete_ressource(session: Session, progression_id: int, score: Optional[float] = None) -> Optional[ProgressionElearning]:
         """Marquer une ressource comme terminée"""
@@ -244,6 +258,7 @@ class ElearningService:
             progression.score = score
         
         session.add(progression)
+        elearning_rollup.refresh_inscriptions(session, [progression.inscription_id])
         session.commit()
         session.refresh(progression)
         return progression
@@ -297,6 +312,8 @@ class ElearningService:
         """Créer un objectif e-learning"""
         objectif = ObjectifElearning(**objectif_data.dict())
         session.add(objectif)
+        # objectifs_total / objectifs_atteints dépendent des objectifs du programme
+        elearning_rollup.rebuild(session, [objectif.programme_id])
         session.commit()
         session.refresh(objectif)
         return objectif
@@ -321,167 +338,126 @@ class ElearningService:
     
     @staticmethod
     def get_statistiques_candidat(session: Session, inscription_id: int) -> StatistiquesElearningCandidat:
-        """Obtenir les statistiques e-learning d'un candidat"""
-        inscription = session.get(Inscription, inscription_id)
-        if not inscription:
-            raise ValueError("Inscription non trouvée")
-        
-        # Calculer les statistiques
-        progressions = session.exec(
-            select(ProgressionElearning).where(
-                ProgressionElearning.inscription_id == inscription_id
-            )
-        ).all()
-        
-        temps_total = sum(p.temps_consacre_minutes for p in progressions)
-        modules_termines = len(set(p.module_id for p in progressions if p.statut == "termine"))
-        
-        # Compter le nombre total de modules du programme
-        modules_total = session.exec(
+        """Obtenir les statistiques e-learning d'un candidat (lues dans les rollups)"""
+        query = select(
+            RollupElearningInscription, Candidat.nom, Candidat.prenom, Programme.nom,
             select(func.count(ModuleElearning.id)).where(
-                ModuleElearning.programme_id == inscription.programme_id
-            )
-        ).first() or 0
-        
-        # Calculer le score moyen
-        scores = [p.score for p in progressions if p.score is not None]
-        score_moyen = sum(scores) / len(scores) if scores else None
-        
-        # Dernière activité
-        derniere_activite = max(
-            (p.derniere_activite for p in progressions if p.derniere_activite),
-            default=None
-        )
-        
-        # Vérifier les objectifs
-        objectifs = session.exec(
-            select(ObjectifElearning).where(
-                ObjectifElearning.programme_id == inscription.programme_id
-            )
-        ).all()
-        
-        objectif_atteint = all(
-            ElearningService.check_objectif_atteint(session, inscription_id, obj.id)
-            for obj in objectifs
-        )
+                ModuleElearning.programme_id == RollupElearningInscription.programme_id
+            ).scalar_subquery()
+        ).join(
+            Inscription, Inscription.id == RollupElearningInscription.inscription_id
+        ).join(
+            Candidat, Candidat.id == Inscription.candidat_id
+        ).join(
+            Programme, Programme.id == RollupElearningInscription.programme_id
+        ).where(RollupElearningInscription.inscription_id == inscription_id)
+        
+        row = session.exec(query).first()
+        if row is None:
+            # Pas encore de rollup (aucune activité depuis leur mise en place) : calcul unique
+            if not session.get(Inscription, inscription_id):
+                raise ValueError("Inscription non trouvée")
+            elearning_rollup.refresh_inscriptions(session, [inscription_id])
+            session.commit()
+            row = session.exec(query).first()
         
+        rollup, nom, prenom, programme_nom, modules_total = row
         return StatistiquesElearningCandidat(
             inscription_id=inscription_id,
-            candidat_nom=f"{inscription.candidat.nom} {inscription.candidat.prenom}",
-            programme_nom=inscription.programme.nom,
-            temps_total_minutes=temps_total,
-            modules_termines=modules_termines,
-            modules_total=modules_total,
-            score_moyen=score_moyen,
-            derniere_activite=derniere_activite,
-            objectif_atteint=objectif_atteint
+            candidat_nom=f"{nom} {prenom}",
+            programme_nom=programme_nom,
+            temps_total_minutes=rollup.temps_total_minutes,
+            modules_termines=rollup.modules_termines,
+            modules_total=modules_total or 0,
+            score_moyen=rollup.score_moyen,
+            derniere_activite=rollup.derniere_activite,
+            objectif_atteint=rollup.objectifs_atteints >= rollup.objectifs_total,
+            ressources_terminees=rollup.ressources_terminees,
+            terminees_par_type=elearning_rollup.terminees_par_type(rollup)
         )
     
     @staticmethod
     def get_statistiques_programme(session: Session, programme_id: int) -> StatistiquesElearningProgramme:
         """Obtenir les statistiques e-learning d'un programme"""
-        print(f"🔍 DEBUG SERVICE: Début calcul stats pour programme {programme_id}")
-        
-        programme = session.get(Programme, programme_id)
-        if not programme:
-            print(f"❌ DEBUG SERVICE: Programme {programme_id} non trouvé")
+        stats = ElearningService.get_statistiques_programmes(session, [programme_id])
+        if not stats:
             raise ValueError("Programme non trouvé")
-        
-        print(f"✅ DEBUG SERVICE: Programme trouvé: {programme.nom}")
-        
-        # Candidats inscrits au programme
-        candidats_inscrits = session.exec(
+        return stats[0]
+    
+    @staticmethod
+    def get_statistiques_programmes(session: Session, programme_ids: List[int]) -> List[StatistiquesElearningProgramme]:
+        """Statistiques e-learning de plusieurs programmes, lues dans les rollups en deux requêtes"""
+        programme_ids = list(programme_ids)
+        if not programme_ids:
+            return []
+        
+        # Les inscrits, modules et ressources sont comptés à la lecture (ils changent sans activité e-learning)
+        query = select(
+            Programme.id, Programme.nom, RollupElearningProgramme,
             select(func.count(Inscription.id)).where(
-                Inscription.programme_id == programme_id
-            )
-        ).first() or 0
-        
-        print(f"🔍 DEBUG SERVICE: {candidats_inscrits} candidats inscrits")
-        
-        # Candidats actifs (ayant une progression)
-        candidats_actifs = session.exec(
-            select(func.count(func.distinct(ProgressionElearning.inscription_id))).where(
-                ProgressionElearning.inscription_id.in_(
-                    select(Inscription.id).where(Inscription.programme_id == programme_id)
-                )
-            )
-        ).first() or 0
-        
-        print(f"🔍 DEBUG SERVICE: {candidats_actifs} candidats actifs")
-        
-        # Temps moyen - Correction de la requête SQL imbriquée
-        # D'abord calculer le temps total par candidat, puis la moyenne
-        temps_par_candidat = session.exec(
-            select(
-                ProgressionElearning.inscription_id,
-                func.sum(ProgressionElearning.temps_consacre_minutes).label('temps_total')
-            ).where(
-                ProgressionElearning.inscription_id.in_(
-                    select(Inscription.id).where(Inscription.programme_id == programme_id)
-                )
-            ).group_by(ProgressionElearning.inscription_id)
-        ).all()
-        
-        # Calculer la moyenne des temps totaux
-        if temps_par_candidat:
-            temps_moyen = sum(t[1] for t in temps_par_candidat) / len(temps_par_candidat)
-        else:
-            temps_moyen = 0
-        
-        print(f"🔍 DEBUG SERVICE: Temps moyen: {temps_moyen} minutes")
-        
-        # Taux de completion
-        modules_total = session.exec(
+                Inscription.programme_id == Programme.id
+            ).scalar_subquery(),
             select(func.count(ModuleElearning.id)).where(
-                ModuleElearning.programme_id == programme_id
-            )
-        ).first() or 1
-        
-        print(f"🔍 DEBUG SERVICE: {modules_total} modules total")
-        
-        modules_termines = session.exec(
-            select(func.count(func.distinct(ProgressionElearning.module_id))).where(
-                and_(
-                    ProgressionElearning.statut == "termine",
-                    ProgressionElearning.inscription_id.in_(
-                        select(Inscription.id).where(Inscription.programme_id == programme_id)
-                    )
-                )
+                ModuleElearning.programme_id == Programme.id
+            ).scalar_subquery(),
+            select(func.count(func.distinct(ModuleRessource.ressource_id))).join(
+                ModuleElearning, ModuleElearning.id == ModuleRessource.module_id
+            ).where(ModuleElearning.programme_id == Programme.id).scalar_subquery()
+        ).outerjoin(
+            RollupElearningProgramme, RollupElearningProgramme.programme_id == Programme.id
+        ).where(Programme.id.in_(programme_ids))
+        
+        rows = session.exec(query).all()
+        manquants = [row[0] for row in rows if row[2] is None]
+        if manquants:
+            elearning_rollup.rebuild(session, manquants)
+            session.commit()
+            rows = session.exec(query).all()
+        
+        populaires = ElearningService._get_modules_populaires(session, programme_ids)
+        stats_par_programme = {}
+        for programme_id, programme_nom, rollup, inscrits, modules_total, nb_ressources in rows:
+            stats_par_programme[programme_id] = StatistiquesElearningProgramme(
+                programme_id=programme_id,
+                programme_nom=programme_nom,
+                candidats_inscrits=inscrits or 0,
+                candidats_actifs=rollup.candidats_actifs,
+                temps_moyen_minutes=float(rollup.temps_moyen_minutes or 0),
+                taux_completion=(rollup.modules_termines / modules_total) * 100 if modules_total else 0,
+                modules_populaires=populaires.get(programme_id, []),
+                nb_modules=modules_total or 0,
+                nb_ressources=nb_ressources or 0,
+                score_moyen=rollup.score_moyen,
+                candidats_objectifs_atteints=rollup.candidats_objectifs_atteints,
+                terminees_par_type=elearning_rollup.terminees_par_type(rollup)
             )
-        ).first() or 0
-        
-        print(f"🔍 DEBUG SERVICE: {modules_termines} modules terminés")
-        
-        taux_completion = (modules_termines / modules_total) * 100 if modules_total > 0 else 0
-        
-        print(f"🔍 DEBUG SERVICE: Taux completion: {taux_completion}%")
-        
-        # Modules populaires
-        modules_populaires = session.exec(
-            select(
-                ModuleElearning.titre,
-                func.count(ProgressionElearning.id).label('participations')
-            ).join(ProgressionElearning).where(
-                ModuleElearning.programme_id == programme_id
-            ).group_by(ModuleElearning.id).order_by(
-                func.count(ProgressionElearning.id).desc()
-            ).limit(5)
-        ).all()
-        
-        print(f"🔍 DEBUG SERVICE: {len(modules_populaires)} modules populaires trouvés")
-        
-        result = StatistiquesElearningProgramme(
-            programme_id=programme_id,
-            programme_nom=programme.nom,
-            candidats_inscrits=candidats_inscrits,
-            candidats_actifs=candidats_actifs,
-            temps_moyen_minutes=float(temps_moyen) if temps_moyen else 0,
-            taux_completion=taux_completion,
-            modules_populaires=[{"titre": m[0], "participations": m[1]} for m in modules_populaires]
-        )
-        
-        print(f"✅ DEBUG SERVICE: Statistiques créées avec succès")
-        return result
+        return [stats_par_programme[pid] for pid in programme_ids if pid in stats_par_programme]
+    
+    @staticmethod
+    def _get_modules_populaires(session: Session, programme_ids: List[int], limit: int = 5) -> Dict[int, List[dict]]:
+        """Modules les plus suivis de chaque programme (une requête, classement par fenêtre)"""
+        participations = func.count(ProgressionElearning.id)
+        classement = select(
+            ModuleElearning.programme_id,
+            ModuleElearning.titre,
+            participations.label("participations"),
+            func.row_number().over(
+                partition_by=ModuleElearning.programme_id, order_by=participations.desc()
+            ).label("rang")
+        ).join(
+            ProgressionElearning, ProgressionElearning.module_id == ModuleElearning.id
+        ).where(
+            ModuleElearning.programme_id.in_(programme_ids)
+        ).group_by(ModuleElearning.id).subquery()
+        
+        populaires: Dict[int, List[dict]] = {}
+        for programme_id, titre, nb in session.exec(
+            select(classement.c.programme_id, classement.c.titre, classement.c.participations)
+            .where(classement.c.rang <= limit)
+            .order_by(classement.c.programme_id, classement.c.rang)
+        ).all():
+            populaires.setdefault(programme_id, []).append({"titre": titre, "participations": nb})
+        return populaires
     
     @staticmethod
     def generate_certificat(session: Session, inscription_id: int, module_id: Optional[int] = None) -> CertificatElearning:
@@ -603,14 +579,10 @@ class ElearningService:
     @staticmethod
     def get_stats_ressources_par_type(session: Session) -> Dict[str, int]:
         """Obtenir les statistiques par type de ressource"""
-        stats = {}
-        types = ["video", "document", "quiz", "lien", "audio"]
-        
-        for type_ressource in types:
-            count = session.exec(
-                select(func.count(RessourceElearning.id))
-                .where(RessourceElearning.type_ressource == type_ressource)
-            ).first()
-            stats[type_ressource] = count or 0
-        
+        stats = {type_ressource: 0 for type_ressource in elearning_rollup.TYPES_RESSOURCE}
+        stats.update(session.exec(
+            select(RessourceElearning.type_ressource, func.count(RessourceElearning.id))
+            .where(RessourceElearning.type_ressource.in_(elearning_rollup.TYPES_RESSOURCE))
+            .group_by(RessourceElearning.type_ressource)
+        ).all())
         return stats
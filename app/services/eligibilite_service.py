@@ -0,0 +1,141 @@
+# app/services/eligibilite_service.py
+"""
+Recalcul en masse de l'éligibilité des préinscriptions
+
+Les dossiers (préinscription, candidat, entreprise, seuils du programme) sont
+lus en une jointure, évalués avec les règles de services/ACD/eligibilite.py
+(tranches de CA parsées une fois grâce à la mémoïsation) puis écrits par un
+INSERT ... ON CONFLICT (preinscription_id) DO UPDATE par lot.
+
+Utilisé pour le recalcul d'une préinscription, après un import, et en tâche de
+fond quand les seuils d'un programme changent : toutes ses éligibilités sont
+alors périmées.
+"""
+import json
+import logging
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from app_lia_web.app.models.base import Candidat, Eligibilite, Entreprise, Preinscription, Programme
+from app_lia_web.app.services.ACD.eligibilite import entreprise_age_annees, evaluate_eligibilite
+from app_lia_web.core.database import engine
+
+logger = logging.getLogger(__name__)
+
+LOT_ELIGIBILITE = 1000  # lignes par INSERT (limite de paramètres de SQLite et PostgreSQL)
+SEUILS_ELIGIBILITE = ("ca_seuil_min", "ca_seuil_max", "anciennete_min_annees")
+
+
+def seuils(programme: Programme) -> Tuple[Any, ...]:
+    """Seuils d'éligibilité du programme, à comparer avant / après modification"""
+    return tuple(getattr(programme, nom) for nom in SEUILS_ELIGIBILITE)
+
+
+def _dossiers(session: Session, *, programme_id: Optional[int], preinscription_ids: Optional[List[int]]):
+    stmt = (
+        select(
+            Preinscription.id,
+            Candidat.adresse_personnelle,
+            Entreprise.adresse,
+            Entreprise.chiffre_affaires,
+            Entreprise.date_creation,
+            Programme.ca_seuil_min,
+            Programme.ca_seuil_max,
+            Programme.anciennete_min_annees,
+        )
+        .join(Candidat, Candidat.id == Preinscription.candidat_id)
+        .join(Programme, Programme.id == Preinscription.programme_id)
+        .outerjoin(Entreprise, Entreprise.candidat_id == Candidat.id)
+        .order_by(Preinscription.id, Entreprise.id)
+    )
+    if programme_id is not None:
+        stmt = stmt.where(Preinscription.programme_id == programme_id)
+    if preinscription_ids is None:
+        return session.exec(stmt).all()
+    lignes = []
+    for i in range(0, len(preinscription_ids), LOT_ELIGIBILITE):
+        lignes += session.exec(stmt.where(Preinscription.id.in_(preinscription_ids[i:i + LOT_ELIGIBILITE]))).all()
+    return lignes
+
+
+def evaluer_dossiers(dossiers: Iterable[Any]) -> List[Dict[str, Any]]:
+    """Valeurs d'Eligibilite pour chaque dossier (première entreprise du candidat)"""
+    maintenant = datetime.now(timezone.utc)
+    anciennetes: Dict[Optional[date], Optional[float]] = {}
+    valeurs: Dict[int, Dict[str, Any]] = {}
+    for d in dossiers:
+        if d.id in valeurs:
+            continue
+        if d.date_creation not in anciennetes:
+            anciennetes[d.date_creation] = entreprise_age_annees(d.date_creation)
+        verdict, details = evaluate_eligibilite(
+            adresse_perso=d.adresse_personnelle,
+            adresse_entreprise=d.adresse,
+            chiffre_affaires=d.chiffre_affaires,
+            anciennete_annees=anciennetes[d.date_creation],
+            ca_min=d.ca_seuil_min,
+            ca_max=d.ca_seuil_max,
+            anciennete_min_annees=d.anciennete_min_annees,
+        )
+        valeurs[d.id] = {
+            "preinscription_id": d.id,
+            "ca_seuil_ok": details.get("ca_ok"),
+            "ca_score": None,  # Pas de valeur numérique unique pour les intervalles
+            "qpv_ok": details.get("qpv_ok"),
+            "anciennete_ok": details.get("anciennete_ok"),
+            "anciennete_annees": details.get("anciennete_annees"),
+            "verdict": verdict,
+            "details_json": json.dumps(details, ensure_ascii=False),
+            "calcule_le": maintenant,
+        }
+    return list(valeurs.values())
+
+
+def ecrire_eligibilites(session: Session, valeurs: List[Dict[str, Any]]) -> None:
+    """Upsert des éligibilités sur uq_eligibilite_preinscription, sans commit"""
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+    dialect_insert = sqlite_insert if session.get_bind().dialect.name == "sqlite" else pg_insert
+    for i in range(0, len(valeurs), LOT_ELIGIBILITE):
+        stmt = dialect_insert(Eligibilite.__table__).values(valeurs[i:i + LOT_ELIGIBILITE])
+        session.exec(stmt.on_conflict_do_update(
+            index_elements=["preinscription_id"],
+            set_={
+                colonne: stmt.excluded[colonne]
+                for colonne in valeurs[0]
+                if colonne != "preinscription_id"
+            },
+        ))
+
+
+def recalculer_eligibilites(
+    session: Session,
+    *,
+    programme_id: Optional[int] = None,
+    preinscription_ids: Optional[List[int]] = None,
+) -> int:
+    """Recalcule et enregistre les éligibilités d'un programme ou d'une liste de préinscriptions
+
+    Retourne le nombre de préinscriptions évaluées.
+    """
+    if programme_id is None and preinscription_ids is None:
+        raise ValueError("programme_id ou preinscription_ids requis")
+    valeurs = evaluer_dossiers(_dossiers(session, programme_id=programme_id, preinscription_ids=preinscription_ids))
+    if valeurs:
+        ecrire_eligibilites(session, valeurs)
+        session.commit()
+    return len(valeurs)
+
+
+def recalculer_programme_en_arriere_plan(programme_id: int) -> None:
+    """Tâche de fond lancée quand les seuils d'un programme changent"""
+    with Session(engine) as session:
+        try:
+            nb = recalculer_eligibilites(session, programme_id=programme_id)
+            logger.info(f"✅ Éligibilité recalculée pour {nb} préinscription(s) du programme {programme_id}")
+        except Exception as e:
+            session.rollback()
+            logger.error(f"❌ Recalcul de l'éligibilité du programme {programme_id} impossible: {e}")
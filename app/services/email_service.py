@@ -1,10 +1,12 @@
 # app/services/email_service.py
 import smtplib
 import logging
+from email.mime.image import MIMEImage
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Optional, Dict, Any
 from app_lia_web.core.config import settings
+from app_lia_web.core.metrics import appel_externe
 from app_lia_web.core.utils import EmailUtils
 from jinja2 import Environment, FileSystemLoader
 import os
@@ -47,8 +49,13 @@ class EmailService:
             conseiller_nom=conseiller_nom
         )
     
-    def send_template_email(self, to_email: str, subject: str, template: str, data: Dict[str, Any]) -> bool:
-        """Envoie un email en utilisant un template HTML"""
+    def send_template_email(self, to_email: str, subject: str, template: str, data: Dict[str, Any],
+                            images: Optional[Dict[str, bytes]] = None) -> bool:
+        """Envoie un email en utilisant un template HTML
+
+        `images` : {content_id: octets PNG} joints en inline, référencés dans le
+        template par src="cid:<content_id>".
+        """
         try:
             # Générer le contenu HTML à partir du template
             if self.jinja_env:
@@ -71,7 +78,7 @@ class EmailService:
                 """
             
             # Créer le message
-            msg = MIMEMultipart('alternative')
+            msg = MIMEMultipart('related' if images else 'alternative')
             msg['Subject'] = subject
             msg['From'] = self.from_email
             msg['To'] = to_email
@@ -79,9 +86,14 @@ class EmailService:
             # Ajouter le contenu HTML
             html_part = MIMEText(html_content, 'html', 'utf-8')
             msg.attach(html_part)
+            for content_id, contenu in (images or {}).items():
+                image = MIMEImage(contenu, 'png')
+                image.add_header('Content-ID', f'<{content_id}>')
+                image.add_header('Content-Disposition', 'inline', filename=f'{content_id}.png')
+                msg.attach(image)
             
             # Envoyer l'email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
+            with appel_externe("smtp"), smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
                 if self.smtp_username and self.smtp_password:
                     server.starttls()
                     server.login(self.smtp_username, self.smtp_password)
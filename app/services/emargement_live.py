@@ -0,0 +1,295 @@
+# app/services/emargement_live.py
+"""
+Émargement en direct (Server-Sent Events)
+
+Les signatures de rendez-vous et les présences de séminaires/événements sont
+publiées par des triggers PostgreSQL (pg_notify) au commit de l'écriture,
+quel que soit le worker ou le code qui l'a faite. Chaque worker tient une
+seule connexion LISTEN et redistribue les notifications aux flux SSE abonnés :
+un écran ouvert ne coûte plus une requête à chaque rafraîchissement.
+"""
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+CANAL_NOTIFY = "emargement"
+FONCTION_NOTIFY = "notifier_emargement"
+HEARTBEAT_SECONDES = 15
+RECONNEXION_SECONDES = 5
+TAILLE_FILE_ABONNE = 100
+# Pas de cache ni de mise en tampon par le proxy (nginx) sur les flux
+ENTETES_SSE = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# Table -> (portée du canal, colonne identifiant la salle)
+TABLES_SUIVIES = {
+    "emargementrdv": ("rdv", "rdv_id"),
+    "presenceseminaire": ("session", "session_id"),
+    "presence_events": ("event", "event_id"),
+}
+# Colonnes remplacées par un booléen (pg_notify est limité à 8000 octets)
+COLONNES_SIGNATURE = (
+    "signature_conseiller", "signature_candidat",
+    "signature_manuelle", "signature_digitale", "photo_signature",
+)
+# Colonnes jamais diffusées
+COLONNES_PRIVEES = ("ip_address", "ip_signature", "user_agent", "note", "commentaire")
+
+
+def canal(portee: str, identifiant: int) -> str:
+    return f"{portee}:{identifiant}"
+
+
+def nom_trigger(table: str) -> str:
+    return f"trg_{table}_{CANAL_NOTIFY}"
+
+
+def _tableau_sql(valeurs: Iterable[str]) -> str:
+    return "ARRAY[" + ", ".join(f"'{v}'" for v in valeurs) + "]::text[]"
+
+
+def sql_declencheurs() -> List[str]:
+    """Fonction et triggers de notification (idempotents)"""
+    instructions = [f"""
+        CREATE OR REPLACE FUNCTION {FONCTION_NOTIFY}() RETURNS trigger AS $$
+        DECLARE
+            ligne jsonb;
+            signatures jsonb;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN ligne := to_jsonb(OLD); ELSE ligne := to_jsonb(NEW); END IF;
+            SELECT coalesce(jsonb_object_agg(cle, valeur <> 'null'::jsonb), '{{}}'::jsonb) INTO signatures
+              FROM jsonb_each(ligne) AS e(cle, valeur)
+             WHERE cle = ANY({_tableau_sql(COLONNES_SIGNATURE)});
+            PERFORM pg_notify('{CANAL_NOTIFY}', jsonb_build_object(
+                'canal', TG_ARGV[0] || ':' || (ligne ->> TG_ARGV[1]),
+                'table', TG_TABLE_NAME,
+                'operation', TG_OP,
+                'ligne', ligne - {_tableau_sql(COLONNES_SIGNATURE + COLONNES_PRIVEES)},
+                'signatures', signatures
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """]
+    for table, (portee, colonne) in TABLES_SUIVIES.items():
+        trigger = nom_trigger(table)
+        instructions.append(f'DROP TRIGGER IF EXISTS {trigger} ON "{table}"')
+        instructions.append(
+            f'CREATE TRIGGER {trigger} AFTER INSERT OR UPDATE OR DELETE ON "{table}" '
+            f"FOR EACH ROW EXECUTE FUNCTION {FONCTION_NOTIFY}('{portee}', '{colonne}')"
+        )
+    return instructions
+
+
+STATUT_RDV_ABSENT = {"status": "not_found", "conseiller_signe": False, "candidat_signe": False, "peut_commencer": False}
+
+
+def existe_puis_liberer(session, modele, identifiant: int) -> bool:
+    """Contrôle d'existence avant un flux, puis connexion rendue au pool (le flux n'en garde aucune)"""
+    try:
+        return session.get(modele, identifiant) is not None
+    finally:
+        session.close()
+
+
+def _iso(valeur: Optional[Any]) -> Optional[Any]:
+    return valeur.isoformat() if isinstance(valeur, datetime) else valeur
+
+
+def statut_rdv(
+    date_signature_conseiller: Optional[Any],
+    date_signature_candidat: Optional[Any],
+    conseiller_signe: bool,
+    candidat_signe: bool,
+) -> Dict[str, Any]:
+    """Statut d'émargement d'un rendez-vous (même forme que /emargement/{rdv_id}/statut)"""
+    conseiller_signe = bool(conseiller_signe and date_signature_conseiller)
+    candidat_signe = bool(candidat_signe and date_signature_candidat)
+    return {
+        "status": "found",
+        "conseiller_signe": conseiller_signe,
+        "candidat_signe": candidat_signe,
+        "peut_commencer": conseiller_signe and candidat_signe,
+        "date_signature_conseiller": _iso(date_signature_conseiller),
+        "date_signature_candidat": _iso(date_signature_candidat),
+    }
+
+
+def evenement_depuis_notification(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Message SSE diffusé aux écrans à partir d'une notification des triggers"""
+    ligne = message.get("ligne", {})
+    signatures = message.get("signatures", {})
+    portee, identifiant = message["canal"].split(":", 1)
+    if message.get("table") == "emargementrdv":
+        if message.get("operation") == "DELETE":
+            donnees = STATUT_RDV_ABSENT
+        else:
+            donnees = statut_rdv(
+                ligne.get("date_signature_conseiller"), ligne.get("date_signature_candidat"),
+                signatures.get("signature_conseiller", False), signatures.get("signature_candidat", False),
+            )
+        return {"type": "statut", "rdv_id": int(identifiant), **donnees}
+    return {
+        "type": "suppression" if message.get("operation") == "DELETE" else "presence",
+        portee + "_id": int(identifiant),
+        "inscription_id": ligne.get("inscription_id"),
+        "presence": ligne.get("presence"),
+        "methode_signature": ligne.get("methode_signature"),
+        "heure_arrivee": ligne.get("heure_arrivee"),
+        "signe": any(signatures.values()),
+    }
+
+
+def format_sse(donnees: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(donnees, default=str)}\n\n"
+
+
+class DiffuseurEmargement:
+    """Connexion LISTEN unique du worker, redistribuée aux files des abonnés SSE par canal
+
+    Sans DSN (tests, SQLite), seule la diffusion locale via publier() est active.
+    """
+
+    def __init__(self, dsn: Optional[str] = None):
+        self.dsn = dsn
+        self._abonnes: Dict[str, Set[asyncio.Queue]] = {}
+        self._connexion = None
+        self._boucle: Optional[asyncio.AbstractEventLoop] = None
+        self._reconnexion: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def nb_abonnes(self) -> int:
+        return len({id(file) for files in self._abonnes.values() for file in files})
+
+    @property
+    def a_l_ecoute(self) -> bool:
+        return self._connexion is not None
+
+    def publier(self, message: Dict[str, Any]) -> int:
+        """Transmet une notification aux abonnés de son canal ; renvoie le nombre de files servies"""
+        files = self._abonnes.get(message.get("canal"), ())
+        if not files:
+            return 0
+        evenement = evenement_depuis_notification(message)
+        for file in files:
+            try:
+                file.put_nowait(evenement)
+            except asyncio.QueueFull:
+                # Écran trop lent : il recevra l'état suivant, inutile de bloquer les autres
+                logger.warning(f"⚠️ File SSE pleine sur {message.get('canal')}, événement ignoré")
+        return len(files)
+
+    @asynccontextmanager
+    async def abonnement(self, canaux: Iterable[str]) -> AsyncIterator[asyncio.Queue]:
+        file: asyncio.Queue = asyncio.Queue(maxsize=TAILLE_FILE_ABONNE)
+        canaux = set(canaux)
+        for nom in canaux:
+            self._abonnes.setdefault(nom, set()).add(file)
+        self._demarrer_ecoute()
+        try:
+            yield file
+        finally:
+            for nom in canaux:
+                files = self._abonnes.get(nom)
+                if files is not None:
+                    files.discard(file)
+                    if not files:
+                        del self._abonnes[nom]
+            if not self._abonnes:
+                self.arreter()
+
+    def _demarrer_ecoute(self) -> None:
+        if not self.dsn or self._connexion is not None or self._reconnexion is not None:
+            return
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        self._boucle = asyncio.get_running_loop()
+        try:
+            connexion = psycopg2.connect(self.dsn)
+            connexion.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with connexion.cursor() as curseur:
+                curseur.execute(f"LISTEN {CANAL_NOTIFY}")
+        except psycopg2.Error as e:
+            logger.error(f"❌ LISTEN {CANAL_NOTIFY} impossible: {e}")
+            self._planifier_reconnexion()
+            return
+        self._connexion = connexion
+        self._boucle.add_reader(connexion.fileno(), self._lire_notifications)
+        logger.info(f"📡 Écoute PostgreSQL '{CANAL_NOTIFY}' démarrée")
+
+    def _lire_notifications(self) -> None:
+        import psycopg2
+
+        try:
+            self._connexion.poll()
+        except psycopg2.Error as e:
+            logger.error(f"❌ Connexion LISTEN perdue: {e}")
+            self.arreter()
+            self._planifier_reconnexion()
+            return
+        while self._connexion.notifies:
+            notification = self._connexion.notifies.pop(0)
+            try:
+                self.publier(json.loads(notification.payload))
+            except (ValueError, KeyError) as e:
+                logger.warning(f"⚠️ Notification d'émargement illisible: {e}")
+
+    def _planifier_reconnexion(self) -> None:
+        if self._abonnes and self._boucle is not None and self._reconnexion is None:
+            def relancer():
+                self._reconnexion = None
+                if self._abonnes:
+                    self._demarrer_ecoute()
+            self._reconnexion = self._boucle.call_later(RECONNEXION_SECONDES, relancer)
+
+    def arreter(self) -> None:
+        """Ferme la connexion LISTEN (dernier abonné parti ou arrêt de l'application)"""
+        if self._reconnexion is not None:
+            self._reconnexion.cancel()
+            self._reconnexion = None
+        if self._connexion is None:
+            return
+        try:
+            self._boucle.remove_reader(self._connexion.fileno())
+        except (ValueError, OSError):
+            pass
+        try:
+            self._connexion.close()
+        finally:
+            self._connexion = None
+            logger.info(f"📡 Écoute PostgreSQL '{CANAL_NOTIFY}' arrêtée")
+
+
+async def flux_sse(
+    diffuseur: DiffuseurEmargement,
+    canaux: Iterable[str],
+    etat_initial: Iterable[Dict[str, Any]] = (),
+    heartbeat: float = HEARTBEAT_SECONDES,
+) -> AsyncIterator[str]:
+    """Générateur SSE : état initial, puis un message par changement et un commentaire de maintien"""
+    async with diffuseur.abonnement(canaux) as file:
+        yield f"retry: {RECONNEXION_SECONDES * 1000}\n\n"
+        for donnees in etat_initial:
+            yield format_sse(donnees)
+        while True:
+            try:
+                donnees = await asyncio.wait_for(file.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield format_sse(donnees)
+
+
+def _creer_diffuseur() -> DiffuseurEmargement:
+    from app_lia_web.core.config import settings
+
+    url = settings.DATABASE_URL
+    return DiffuseurEmargement(url if url.startswith("postgresql") else None)
+
+
+diffuseur = _creer_diffuseur()
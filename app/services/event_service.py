@@ -1,13 +1,38 @@
 from sqlmodel import Session, select
+from sqlalchemy import and_, case, func, literal
+from sqlalchemy.orm import contains_eager
 from datetime import datetime, timezone
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict, Tuple
 import secrets
 import string
-from app_lia_web.app.models.event import Event, InvitationEvent, PresenceEvent
+from app_lia_web.app.models.base import Candidat, Inscription
+from app_lia_web.app.models.event import Event, InvitationEvent, PresenceEvent, StatutInvitationEvent
 from app_lia_web.app.models.enums import TypeInvitation
 from app_lia_web.app.schemas.event_schemas import EventCreate, EventUpdate, InvitationEventCreate, PresenceEventCreate
 from app_lia_web.app.services.email_service import EmailService
 
+# Statuts imbriqués possibles, dans l'ordre d'affichage des compteurs
+COMBINED_STATUSES = ("en_attente", "acceptee", "refusee", "present", "absent", "excuse")
+
+
+def combined_status_expression():
+    """
+    Statut imbriqué d'un participant en une expression SQL CASE
+    (sur Event ⋈ InvitationEvent ⟕ PresenceEvent) :
+    - Présence marquée (present / absent / excuse) : prioritaire
+    - Événement passé sans présence marquée : absent
+    - Sinon statut d'invitation : refusee / acceptee / en_attente
+    """
+    evenement_passe = Event.date_fin < func.current_date()
+    return case(
+        (PresenceEvent.presence.in_(("present", "absent", "excuse")), PresenceEvent.presence),
+        (evenement_passe, literal("absent")),
+        (InvitationEvent.statut == StatutInvitationEvent.REFUSEE, literal("refusee")),
+        (InvitationEvent.statut == StatutInvitationEvent.ACCEPTEE, literal("acceptee")),
+        else_=literal("en_attente"),
+    )
+
+
 class EventService:
     def __init__(self):
         self.email_service = EmailService()
@@ -150,82 +175,73 @@ class EventService:
         
         return presence_obj
     
+    def _combined_status_query(self, event_id: int):
+        """Invitations ⟕ présences d'un événement avec statut imbriqué et effectif par statut"""
+        statut = combined_status_expression()
+        return (
+            select(
+                InvitationEvent,
+                PresenceEvent,
+                statut.label("statut_combine"),
+                func.count().over(partition_by=statut).label("effectif_statut"),
+            )
+            .join(Event, Event.id == InvitationEvent.event_id)
+            .join(Inscription, Inscription.id == InvitationEvent.inscription_id)
+            .join(Candidat, Candidat.id == Inscription.candidat_id)
+            .outerjoin(PresenceEvent, and_(
+                PresenceEvent.event_id == InvitationEvent.event_id,
+                PresenceEvent.inscription_id == InvitationEvent.inscription_id,
+            ))
+            .where(InvitationEvent.event_id == event_id)
+            .order_by(InvitationEvent.id)
+            .options(contains_eager(InvitationEvent.inscription).contains_eager(Inscription.candidat))
+        )
+    
     def get_combined_status(self, event_id: int, inscription_id: int, db: Session) -> str:
         """
-        Retourne le statut imbriqué pour la page principale :
-        - Avant l'événement : privilégie le statut d'invitation
-        - Après l'événement : privilégie le statut de présence
+        Retourne le statut imbriqué d'un participant (voir combined_status_expression) :
+        - Présence marquée (present / absent / excuse) : prioritaire
+        - Après l'événement sans présence marquée : absent
+        - Avant l'événement : statut d'invitation (acceptee / refusee / en_attente)
         """
-        from datetime import date
-        
-        # Récupérer l'événement pour connaître sa date
-        event = db.get(Event, event_id)
-        if not event:
-            return "en_attente"
-        
-        today = date.today()
-        event_passed = event.date_fin < today
-        
-        # Récupérer l'invitation
-        invitation_query = select(InvitationEvent).where(
-            InvitationEvent.event_id == event_id,
-            InvitationEvent.inscription_id == inscription_id
+        query = (
+            select(combined_status_expression())
+            .select_from(InvitationEvent)
+            .join(Event, Event.id == InvitationEvent.event_id)
+            .outerjoin(PresenceEvent, and_(
+                PresenceEvent.event_id == InvitationEvent.event_id,
+                PresenceEvent.inscription_id == InvitationEvent.inscription_id,
+            ))
+            .where(InvitationEvent.event_id == event_id, InvitationEvent.inscription_id == inscription_id)
         )
-        invitation = db.exec(invitation_query).first()
-        
-        # Récupérer la présence
-        presence = self.get_presence_candidat(event_id, inscription_id, db)
-        
-        if event_passed:
-            # APRÈS L'ÉVÉNEMENT : privilégier le statut de présence
-            if presence and presence.presence in ['present', 'absent', 'excuse']:
-                return presence.presence
-            else:
-                # Pas de présence marquée après l'événement = absent
-                return "absent"
-        else:
-            # AVANT L'ÉVÉNEMENT : privilégier le statut d'invitation
-            if invitation:
-                if invitation.statut == "refusee":
-                    return "refusee"
-                elif invitation.statut == "acceptee":
-                    return "acceptee"
-                else:
-                    return "en_attente"
-            else:
-                return "en_attente"
+        return db.exec(query).first() or "en_attente"
     
-    def get_presences_with_combined_status(self, event_id: int, db: Session) -> List[dict]:
+    def get_event_roster(self, event_id: int, db: Session) -> Tuple[List[dict], Dict[str, Any]]:
         """
-        Retourne les présences avec le statut imbriqué pour la page principale
+        Participants avec statut imbriqué et compteurs d'en-tête, en une seule requête
+        (statut calculé par CASE SQL, effectifs par agrégat fenêtré sur ce statut)
         """
-        from datetime import date
-        
-        # Récupérer toutes les invitations pour cet événement
-        invitations_query = select(InvitationEvent).where(InvitationEvent.event_id == event_id)
-        invitations = db.exec(invitations_query).all()
-        
         result = []
-        for invitation in invitations:
-            db.refresh(invitation)
-            
-            # Récupérer la présence existante
-            presence = self.get_presence_candidat(event_id, invitation.inscription_id, db)
-            
-            # Calculer le statut imbriqué
-            combined_status = self.get_combined_status(event_id, invitation.inscription_id, db)
-            
-            # Créer l'objet de résultat
-            presence_data = {
+        counts = {status: 0 for status in COMBINED_STATUSES}
+        for invitation, presence, combined_status, effectif in db.exec(self._combined_status_query(event_id)).all():
+            counts[combined_status] = effectif
+            result.append({
                 'invitation': invitation,
                 'presence': presence,
                 'combined_status': combined_status,
                 'inscription_id': invitation.inscription_id
-            }
-            
-            result.append(presence_data)
+            })
         
-        return result
+        stats = {'total': len(result), **counts}
+        stats['taux_presence'] = round((stats['present'] / stats['total']) * 100, 1) if stats['total'] else 0
+        return result, stats
+    
+    def get_presences_with_combined_status(self, event_id: int, db: Session) -> List[dict]:
+        """
+        Retourne les présences avec le statut imbriqué pour la page principale
+        """
+        presences_data, _ = self.get_event_roster(event_id, db)
+        return presences_data
     
     def get_presences_by_event(self, event_id: int, db: Session) -> List[PresenceEvent]:
         """Récupère toutes les présences d'un événement"""
@@ -0,0 +1,334 @@
+# app/services/feuille_emargement_service.py
+"""
+Feuilles d'émargement PDF par lot
+
+Une feuille par session de séminaire (ou par événement), tout un séminaire
+en un seul document. Les lignes sont lues en une requête par document (sans
+les photos de signature), chaque image de signature est décodée et réduite
+une seule fois (cache par empreinte du contenu) et le PDF est écrit sur
+disque page par page. Au-delà de SEUIL_ARRIERE_PLAN lignes, la génération
+part en tâche de fond et le fichier est servi une fois terminé.
+"""
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import math
+import os
+import threading
+import uuid
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import BackgroundTasks
+from fastapi.responses import FileResponse, JSONResponse
+from sqlalchemy import select
+from sqlmodel import Session
+
+from app_lia_web.app.models.base import Candidat, Entreprise, Inscription
+from app_lia_web.app.models.event import Event, PresenceEvent
+from app_lia_web.app.models.seminaire import PresenceSeminaire, Seminaire, SessionSeminaire
+from app_lia_web.core.lazy_import import LazyModule
+from app_lia_web.core.pdf_dynamique import Canevas, PdfFlux, get_pdf_path
+
+logger = logging.getLogger(__name__)
+
+# Pillow n'est chargé qu'au premier rendu de signature
+PIL_Image = LazyModule("PIL.Image")
+
+SEUIL_ARRIERE_PLAN = 300  # lignes au-delà desquelles la génération part en tâche de fond
+TAILLE_CACHE_SIGNATURES = 2048
+SIGNATURE_PX = (240, 64)  # taille maximale du rendu, ~150 dpi dans la case
+LIGNES_PAR_PAGE = 16
+DELAI_RAFRAICHISSEMENT = 3  # secondes entre deux vérifications d'un travail en cours
+PREFIXE_FICHIER = "emargement_"
+
+LIBELLES_PRESENCE = {"present": "Présent", "absent": "Absent", "excuse": "Excusé", "en_attente": "En attente"}
+# (titre, x, largeur) en points sur une page A4
+COLONNES = (("Participant", 36, 150), ("Entreprise", 186, 120), ("Statut", 306, 60), ("Arrivée", 366, 45), ("Signature", 411, 148))
+
+
+@dataclass
+class LigneFeuille:
+    nom: str
+    entreprise: str
+    presence: str
+    heure_arrivee: Optional[datetime]
+    signature_image: Optional[str]  # data URL base64 (signature digitale)
+    signature_texte: Optional[str]  # nom saisi (signature manuelle)
+    signe: bool = False  # signature enregistrée, même sans image exploitable
+
+
+@dataclass
+class Feuille:
+    titre: str
+    sous_titre: str
+    lignes: List[LigneFeuille] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class SignatureRendue:
+    cle: str
+    largeur: int
+    hauteur: int
+    pixels: bytes  # niveaux de gris compressés zlib
+
+
+class CacheSignatures:
+    """Signatures décodées et réduites, indexées par empreinte (LRU, partagé entre les threads)"""
+
+    def __init__(self, taille: int = TAILLE_CACHE_SIGNATURES):
+        self.taille = taille
+        self._rendus: "OrderedDict[str, Optional[SignatureRendue]]" = OrderedDict()
+        self._verrou = threading.Lock()
+        self.succes = 0
+        self.echecs = 0
+
+    def rendu(self, donnees: str) -> Optional[SignatureRendue]:
+        cle = hashlib.sha1(donnees.encode("ascii", errors="replace")).hexdigest()
+        with self._verrou:
+            if cle in self._rendus:
+                self._rendus.move_to_end(cle)
+                self.succes += 1
+                return self._rendus[cle]
+        rendu = _rendre_signature(cle, donnees)
+        with self._verrou:
+            self.echecs += 1
+            self._rendus[cle] = rendu
+            while len(self._rendus) > self.taille:
+                self._rendus.popitem(last=False)
+        return rendu
+
+    def vider(self) -> None:
+        with self._verrou:
+            self._rendus.clear()
+            self.succes = self.echecs = 0
+
+
+def _rendre_signature(cle: str, donnees: str) -> Optional[SignatureRendue]:
+    """Data URL PNG/JPEG -> niveaux de gris sur fond blanc, réduits à SIGNATURE_PX"""
+    try:
+        brut = base64.b64decode(donnees.split(",", 1)[-1], validate=False)
+        with PIL_Image.open(io.BytesIO(brut)) as image:
+            image = image.convert("RGBA")
+            fond = PIL_Image.new("RGBA", image.size, (255, 255, 255, 255))
+            fond.alpha_composite(image)
+            gris = fond.convert("L")
+            gris.thumbnail(SIGNATURE_PX)
+            return SignatureRendue(cle, gris.width, gris.height, zlib.compress(gris.tobytes(), 6))
+    except ImportError:
+        logger.warning("⚠️ Pillow non installé - signatures remplacées par une mention")
+    except (binascii.Error, ValueError, OSError) as e:
+        logger.warning(f"⚠️ Signature illisible ({cle[:8]}): {e}")
+    return None
+
+
+cache_signatures = CacheSignatures()
+
+
+# ===== LECTURE DES LIGNES (une requête par document) =====
+
+def _colonnes_participant():
+    return (Candidat.nom, Candidat.prenom, Entreprise.raison_sociale)
+
+
+def _ligne(presence, signature_manuelle, signature_digitale, heure, nom, prenom, entreprise) -> LigneFeuille:
+    return LigneFeuille(
+        nom=f"{nom or ''} {prenom or ''}".strip(),
+        entreprise=entreprise or "",
+        presence=presence or "",
+        heure_arrivee=heure,
+        signature_image=signature_digitale if signature_digitale and signature_digitale.startswith("data:image") else None,
+        signature_texte=signature_manuelle,
+        signe=bool(signature_manuelle or signature_digitale),
+    )
+
+
+def feuilles_seminaire(db: Session, seminaire_id: int, session_id: Optional[int] = None) -> List[Feuille]:
+    """Une feuille par session du séminaire (ou la seule session demandée)"""
+    seminaire = db.get(Seminaire, seminaire_id)
+    if seminaire is None:
+        return []
+    requete_sessions = select(SessionSeminaire).where(SessionSeminaire.seminaire_id == seminaire_id)
+    if session_id is not None:
+        requete_sessions = requete_sessions.where(SessionSeminaire.id == session_id)
+    sessions = db.execute(requete_sessions.order_by(SessionSeminaire.date_session, SessionSeminaire.id)).scalars().all()
+    feuilles = {
+        s.id: Feuille(titre=seminaire.titre, sous_titre=_sous_titre(s.titre, s.date_session, s.heure_debut, s.heure_fin, s.lieu or seminaire.lieu))
+        for s in sessions
+    }
+    if not feuilles:
+        return []
+
+    lignes = db.execute(
+        select(
+            PresenceSeminaire.session_id, PresenceSeminaire.presence,
+            PresenceSeminaire.signature_manuelle, PresenceSeminaire.signature_digitale, PresenceSeminaire.heure_arrivee,
+            *_colonnes_participant(),
+        )
+        .join(Inscription, Inscription.id == PresenceSeminaire.inscription_id)
+        .join(Candidat, Candidat.id == Inscription.candidat_id)
+        .outerjoin(Entreprise, Entreprise.candidat_id == Candidat.id)
+        .where(PresenceSeminaire.session_id.in_(list(feuilles)))
+        .order_by(PresenceSeminaire.session_id, Candidat.nom, Candidat.prenom, PresenceSeminaire.id)
+    )
+    for session_ligne, *colonnes in lignes:
+        feuilles[session_ligne].lignes.append(_ligne(*colonnes))
+    return list(feuilles.values())
+
+
+def feuilles_event(db: Session, event_id: int) -> List[Feuille]:
+    """La feuille d'un événement"""
+    event = db.get(Event, event_id)
+    if event is None:
+        return []
+    feuille = Feuille(titre=event.titre, sous_titre=_sous_titre(None, event.date_debut, event.heure_debut, event.heure_fin, event.lieu))
+    lignes = db.execute(
+        select(
+            PresenceEvent.presence,
+            PresenceEvent.signature_manuelle, PresenceEvent.signature_digitale, PresenceEvent.heure_arrivee,
+            *_colonnes_participant(),
+        )
+        .join(Inscription, Inscription.id == PresenceEvent.inscription_id)
+        .join(Candidat, Candidat.id == Inscription.candidat_id)
+        .outerjoin(Entreprise, Entreprise.candidat_id == Candidat.id)
+        .where(PresenceEvent.event_id == event_id)
+        .order_by(Candidat.nom, Candidat.prenom, PresenceEvent.id)
+    )
+    feuille.lignes = [_ligne(*colonnes) for colonnes in lignes]
+    return [feuille]
+
+
+def _sous_titre(intitule, jour, debut, fin, lieu) -> str:
+    parties = [intitule] if intitule else []
+    if jour:
+        parties.append(jour.strftime("%d/%m/%Y"))
+    if debut:
+        parties.append(f"{debut.strftime('%H:%M')}–{fin.strftime('%H:%M')}" if fin else debut.strftime("%H:%M"))
+    if lieu:
+        parties.append(lieu)
+    return " · ".join(parties)
+
+
+# ===== RENDU =====
+
+def _dessiner_page(pdf: PdfFlux, feuille: Feuille, lignes: List[LigneFeuille], page: int, nb_pages: int, genere_le: str) -> None:
+    canevas = Canevas()
+    haut = pdf.hauteur - 48
+    canevas.texte(36, haut, "Feuille d'émargement", 9)
+    canevas.texte(36, haut - 20, feuille.titre, 14, gras=True)
+    canevas.texte(36, haut - 36, feuille.sous_titre, 10)
+
+    y = haut - 64
+    canevas.rectangle(36, y - 4, 523, 16)
+    for titre, x, _ in COLONNES:
+        canevas.texte(x + 3, y + 1, titre, 9, gras=True)
+
+    hauteur_ligne = 40
+    _, x_signature, largeur_signature = COLONNES[-1]
+    for ligne in lignes:
+        y -= hauteur_ligne
+        canevas.texte(COLONNES[0][1] + 3, y + 16, ligne.nom[:34], 9)
+        canevas.texte(COLONNES[1][1] + 3, y + 16, ligne.entreprise[:26], 8)
+        canevas.texte(COLONNES[2][1] + 3, y + 16, LIBELLES_PRESENCE.get(ligne.presence, ligne.presence), 8)
+        if ligne.heure_arrivee:
+            canevas.texte(COLONNES[3][1] + 3, y + 16, ligne.heure_arrivee.strftime("%H:%M"), 8)
+        rendu = cache_signatures.rendu(ligne.signature_image) if ligne.signature_image else None
+        if rendu is not None:
+            nom = pdf.ajouter_image_grise(rendu.cle, rendu.largeur, rendu.hauteur, rendu.pixels)
+            echelle = min((largeur_signature - 8) / rendu.largeur, (hauteur_ligne - 8) / rendu.hauteur)
+            canevas.image(nom, x_signature + 4, y + 4, rendu.largeur * echelle, rendu.hauteur * echelle)
+        elif ligne.signature_texte:
+            canevas.texte(x_signature + 4, y + 16, f"Signé : {ligne.signature_texte}"[:40], 8)
+        elif ligne.signe:
+            canevas.texte(x_signature + 4, y + 16, "Signature électronique enregistrée", 8)
+        canevas.ligne(36, y, 559, y)
+
+    canevas.texte(36, 28, f"Généré le {genere_le}", 7)
+    canevas.texte(500, 28, f"Page {page}/{nb_pages}", 7)
+    pdf.ajouter_page(canevas)
+
+
+def generer_pdf(feuilles: Iterable[Feuille], chemin: str) -> int:
+    """Écrit les feuilles dans un PDF (fichier temporaire puis renommage) ; renvoie le nombre de pages"""
+    temporaire = f"{chemin}.part"
+    genere_le = datetime.now().strftime("%d/%m/%Y %H:%M")
+    try:
+        with open(temporaire, "wb") as fichier:
+            pdf = PdfFlux(fichier)
+            for feuille in feuilles:
+                nb_pages = max(1, math.ceil(len(feuille.lignes) / LIGNES_PAR_PAGE))
+                for page in range(nb_pages):
+                    lignes = feuille.lignes[page * LIGNES_PAR_PAGE:(page + 1) * LIGNES_PAR_PAGE]
+                    _dessiner_page(pdf, feuille, lignes, page + 1, nb_pages, genere_le)
+            pdf.fermer()
+        os.replace(temporaire, chemin)
+    except BaseException:
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+        raise
+    return pdf.nb_pages
+
+
+# ===== GÉNÉRATION EN TÂCHE DE FOND =====
+
+def nb_lignes(feuilles: Iterable[Feuille]) -> int:
+    return sum(len(feuille.lignes) for feuille in feuilles)
+
+
+def nouveau_travail() -> Tuple[str, str]:
+    """Identifiant et chemin du PDF d'une génération (dossier fichiers/, purgé par le nettoyage planifié)
+
+    Le fichier .part est réservé tout de suite : le travail est « en cours » dès la réponse 202.
+    """
+    travail = uuid.uuid4().hex
+    chemin = get_pdf_path(f"{PREFIXE_FICHIER}{travail}.pdf")
+    open(f"{chemin}.part", "wb").close()
+    return travail, chemin
+
+
+def generer_en_arriere_plan(feuilles: List[Feuille], chemin: str) -> None:
+    debut = datetime.now()
+    try:
+        nb_pages = generer_pdf(feuilles, chemin)
+        logger.info(f"📄 {os.path.basename(chemin)}: {nb_pages} page(s) en {(datetime.now() - debut).total_seconds():.1f}s")
+    except Exception as e:
+        logger.error(f"❌ Génération de {os.path.basename(chemin)} échouée: {e}")
+
+
+def etat_travail(travail: str) -> Tuple[str, Optional[str]]:
+    """("termine", chemin), ("en_cours", None) ou ("inconnu", None) ; lu sur disque, donc valable pour tous les workers"""
+    if not travail.isalnum():
+        return "inconnu", None
+    chemin = get_pdf_path(f"{PREFIXE_FICHIER}{travail}.pdf")
+    if os.path.exists(chemin):
+        return "termine", chemin
+    if os.path.exists(f"{chemin}.part"):
+        return "en_cours", None
+    return "inconnu", None
+
+
+def servir_feuilles(feuilles: List[Feuille], taches: BackgroundTasks, nom_telechargement: str):
+    """PDF tout de suite pour une petite feuille, sinon 202 et génération en tâche de fond
+
+    L'en-tête Refresh fait revenir le navigateur sur l'URL du travail jusqu'à ce que le fichier soit prêt.
+    """
+    travail, chemin = nouveau_travail()
+    if nb_lignes(feuilles) <= SEUIL_ARRIERE_PLAN:
+        generer_pdf(feuilles, chemin)
+        return FileResponse(chemin, media_type="application/pdf", filename=nom_telechargement)
+    taches.add_task(generer_en_arriere_plan, feuilles, chemin)
+    return reponse_en_cours(travail)
+
+
+def reponse_en_cours(travail: str) -> JSONResponse:
+    url = f"/emargement/feuilles/{travail}"
+    return JSONResponse(
+        {"statut": "en_cours", "travail": travail, "url": url},
+        status_code=202,
+        headers={"Refresh": f"{DELAI_RAFRAICHISSEMENT}; url={url}"},
+    )
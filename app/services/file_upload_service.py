@@ -10,10 +10,11 @@ from typing import Optional, Dict, Any, List, Union
 from datetime import datetime
 import aiofiles
 from fastapi import UploadFile, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import Response
 
 from app_lia_web.core.config import settings
 from app_lia_web.core.path_config import path_config
+from app_lia_web.core.file_delivery import reponse_fichier
 
 
 class FileUploadService:
@@ -489,7 +490,7 @@ class FileUploadService:
             return None
     
     @classmethod
-    def serve_file(cls, file_path: str) -> Union[FileResponse, HTTPException]:
+    def serve_file(cls, file_path: str) -> Union[Response, HTTPException]:
         """
         Servir un fichier uploadé de manière optimisée
         
@@ -497,7 +498,7 @@ class FileUploadService:
             file_path: Chemin relatif du fichier
             
         Returns:
-            FileResponse ou HTTPException
+            FileResponse (ou réponse X-Accel-Redirect / X-Sendfile) ou HTTPException
         """
         # Construire le chemin complet
         full_path = path_config.UPLOAD_DIR / file_path
@@ -518,13 +519,8 @@ class FileUploadService:
             mime_type, _ = mimetypes.guess_type(str(full_path))
             mime_type = mime_type or "application/octet-stream"
         
-        # Retourner le fichier avec les bonnes informations
-        return FileResponse(
-            path=str(full_path),
-            media_type=mime_type,
-            filename=full_path.name,
-            headers={"Content-Disposition": f"inline; filename={full_path.name}"}
-        )
+        # Retourner le fichier (ou déléguer l'envoi au serveur frontal)
+        return reponse_fichier(full_path, media_type=mime_type, inline=True)
     
     # === MÉTHODES UTILITAIRES ===
     @classmethod
@@ -1,26 +1,54 @@
 # app/services/geocoding.py
 from __future__ import annotations
 import httpx, asyncio, urllib.parse
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 from sqlmodel import Session, select
 from app_lia_web.app.models.base import Entreprise
+from app_lia_web.core.metrics import appel_externe
 
 BAN_ENDPOINT = "https://api-adresse.data.gouv.fr/search/"  # search?q=... (voir doc) :contentReference[oaicite:2]{index=2}
 
-async def geocode_one(address: str, timeout: float = 6.0) -> Optional[Tuple[float, float]]:
+GEOCODAGE_CONCURRENCE = 8  # requêtes simultanées vers la BAN lors d'un géocodage par lot
+
+async def geocode_one(address: str, timeout: float = 6.0, client: Optional[httpx.AsyncClient] = None) -> Optional[Tuple[float, float]]:
     if not address:
         return None
     q = urllib.parse.urlencode({"q": address, "limit": 1})
     url = f"{BAN_ENDPOINT}?{q}"
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        r = await client.get(url)
+    with appel_externe("geocodage"):
+        if client is None:
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                r = await client.get(url)
+        else:
+            r = await client.get(url, timeout=timeout)
         r.raise_for_status()
-        js = r.json()
-        feats = js.get("features") or []
-        if not feats:
-            return None
-        coords = feats[0]["geometry"]["coordinates"]  # [lng, lat]
-        return (float(coords[1]), float(coords[0])) #lat, lng
+    js = r.json()
+    feats = js.get("features") or []
+    if not feats:
+        return None
+    coords = feats[0]["geometry"]["coordinates"]  # [lng, lat]
+    return (float(coords[1]), float(coords[0])) #lat, lng
+
+async def geocode_many(adresses: Dict[int, str], concurrence: int = GEOCODAGE_CONCURRENCE) -> Dict[int, Tuple[float, float]]:
+    """Géocode {clé: adresse} avec un client partagé et au plus `concurrence` requêtes en vol.
+
+    Les adresses introuvables ou en erreur sont absentes du résultat.
+    """
+    semaphore = asyncio.Semaphore(concurrence)
+    resultats: Dict[int, Tuple[float, float]] = {}
+
+    async with httpx.AsyncClient() as client:
+        async def un(cle: int, adresse: str):
+            async with semaphore:
+                try:
+                    latlng = await geocode_one(adresse, client=client)
+                except (httpx.HTTPError, ValueError, KeyError):
+                    return
+                if latlng:
+                    resultats[cle] = latlng
+
+        await asyncio.gather(*(un(cle, adresse) for cle, adresse in adresses.items() if adresse))
+    return resultats
 
 async def enrich_missing_latlng(session: Session, batch_limit: int = 200):
     """Géocode les entreprises sans lat/lng (adresse + territoire)."""
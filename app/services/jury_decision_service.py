@@ -0,0 +1,340 @@
+# app/services/jury_decision_service.py
+"""
+Poste de travail des décisions de jury
+
+- Liste paginée par curseur (date_decision, id) : chaque page lit au plus
+  `limite` lignes depuis les index composites, quelle que soit la profondeur.
+- Recherche candidat par préfixe (nom, prénom, email) sur lower(col), servie
+  par les index ix_candidat_*_prefixe, à la place des ilike '%...%'.
+- Listes de référence (jurys actifs, partenaires, conseillers, promotions)
+  gardées en mémoire comme les programmes actifs (TTL + invalidate(), propagé
+  aux autres workers par le compteur VersionCache).
+- Décision par lot : une décision appliquée à N candidats en un seul
+  INSERT ... ON CONFLICT, statuts candidats, réorientations et journal
+  d'audit écrits chacun en une requête.
+"""
+import base64
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Request
+from sqlalchemy import and_, delete, func, insert, or_, update
+from sqlmodel import Session, select
+
+from app_lia_web.app.models.base import (
+    Candidat, DecisionJuryCandidat, Jury, Partenaire, Programme, Promotion, ReorientationCandidat, User,
+)
+from app_lia_web.app.models.enums import DecisionJury, UserRole
+from app_lia_web.app.services.ACD.audit import log_activities
+from app_lia_web.app.services.cache_version import SuiviVersion, incrementer_version
+from app_lia_web.core.database import engine
+
+logger = logging.getLogger(__name__)
+
+DECISIONS_PAGE = 50
+DECISIONS_PAGE_MAX = 200
+DECISIONS_LOT_MAX = 1000
+REFERENCES_JURY_TTL_SECONDS = 300
+CLE_VERSION_REFERENCES = "references_jury"
+STATUTS_JURY_ACTIFS = ("planifie", "en_cours")
+
+Curseur = Tuple[datetime, int]
+
+
+def encode_curseur(date_decision: datetime, decision_id: int) -> str:
+    """Curseur opaque de la page suivante"""
+    brut = f"{date_decision.isoformat()}|{decision_id}"
+    return base64.urlsafe_b64encode(brut.encode("utf-8")).decode("ascii")
+
+
+def decode_curseur(curseur: str) -> Curseur:
+    try:
+        date_decision, decision_id = base64.urlsafe_b64decode(curseur.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(date_decision), int(decision_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Curseur invalide: {e}")
+
+
+# ===== LISTES DE RÉFÉRENCE =====
+
+@dataclass(frozen=True)
+class Reference:
+    """Entrée d'une liste déroulante, utilisable hors session"""
+    id: int
+    libelle: str
+
+
+@dataclass(frozen=True)
+class ReferencesSnapshot:
+    jurys: Tuple[Reference, ...] = ()
+    partenaires: Tuple[Reference, ...] = ()
+    conseillers: Tuple[Reference, ...] = ()
+    promotions: Tuple[Reference, ...] = ()
+
+
+def charger_references(session: Session) -> ReferencesSnapshot:
+    """Les quatre listes, colonnes utiles seulement"""
+    jurys = session.execute(
+        select(Jury.id, Jury.session_le, Jury.lieu, Programme.code)
+        .join(Programme, Programme.id == Jury.programme_id)
+        .where(Jury.statut.in_(STATUTS_JURY_ACTIFS))
+        .order_by(Jury.session_le.desc())
+    ).all()
+    partenaires = session.execute(
+        select(Partenaire.id, Partenaire.nom).where(Partenaire.actif == True).order_by(Partenaire.nom)
+    ).all()
+    conseillers = session.execute(
+        select(User.id, User.nom_complet)
+        .where(User.role == UserRole.CONSEILLER.value, User.actif == True)
+        .order_by(User.nom_complet)
+    ).all()
+    promotions = session.execute(
+        select(Promotion.id, Promotion.libelle).where(Promotion.actif == True).order_by(Promotion.libelle)
+    ).all()
+    return ReferencesSnapshot(
+        jurys=tuple(
+            Reference(j.id, f"{j.code} — {j.session_le:%d/%m/%Y %H:%M}" + (f" ({j.lieu})" if j.lieu else ""))
+            for j in jurys
+        ),
+        partenaires=tuple(Reference(*p) for p in partenaires),
+        conseillers=tuple(Reference(*c) for c in conseillers),
+        promotions=tuple(Reference(*p) for p in promotions),
+    )
+
+
+class ReferencesJury:
+    """Listes de référence du poste de travail gardées en mémoire
+
+    Rechargées au plus toutes les `ttl_seconds` secondes, et immédiatement
+    après toute modification d'un jury, d'un partenaire ou d'une promotion
+    (invalidate()) ; dans les autres workers, dès la vérification suivante
+    du compteur VersionCache (quelques secondes).
+    """
+
+    def __init__(self, ttl_seconds: int = REFERENCES_JURY_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._references = ReferencesSnapshot()
+        self._expires_at = 0.0
+        self._version = SuiviVersion(CLE_VERSION_REFERENCES)
+        self._lock = threading.Lock()
+
+    def get(self) -> ReferencesSnapshot:
+        if self._expires_at > time.monotonic() and not self._version.a_verifier():
+            return self._references
+        with self._lock:
+            if self._expires_at <= time.monotonic() or self._invalide_ailleurs():
+                self._reload()
+            return self._references
+
+    def _invalide_ailleurs(self) -> bool:
+        try:
+            with Session(engine) as session:
+                return self._version.a_change(session)
+        except Exception as e:
+            logger.error(f"❌ Lecture de la version des listes de référence du jury impossible: {e}")
+            return False
+
+    def _reload(self) -> None:
+        try:
+            with Session(engine) as session:
+                self._version.charge(session)
+                self._references = charger_references(session)
+            self._expires_at = time.monotonic() + self.ttl_seconds
+        except Exception as e:
+            # On garde les dernières listes connues, nouvel essai au prochain appel
+            logger.error(f"❌ Chargement des listes de référence du jury impossible: {e}")
+
+    def invalidate(self) -> None:
+        """À appeler après toute modification d'un jury, partenaire ou promotion (tous les workers)"""
+        self._expires_at = 0.0
+        try:
+            with Session(engine) as session:
+                incrementer_version(session, CLE_VERSION_REFERENCES)
+                session.commit()
+        except Exception as e:
+            logger.error(f"❌ Invalidation des listes de référence du jury dans les autres workers impossible: {e}")
+
+
+# Instance unique par processus
+references_jury = ReferencesJury()
+
+
+# ===== LISTE PAGINÉE =====
+
+@dataclass
+class PageDecisions:
+    lignes: List[Any]
+    curseur_suivant: Optional[str]
+
+
+def page_decisions(
+    session: Session,
+    jury_id: Optional[int] = None,
+    decision: Optional[DecisionJury] = None,
+    q: Optional[str] = None,
+    curseur: Optional[str] = None,
+    limite: int = DECISIONS_PAGE,
+) -> PageDecisions:
+    """Page de décisions, de la plus récente à la plus ancienne
+
+    `curseur` est le `curseur_suivant` de la page précédente (None pour la
+    première). Lève ValueError si le curseur est illisible.
+    """
+    limite = max(1, min(limite, DECISIONS_PAGE_MAX))
+    stmt = (
+        select(
+            DecisionJuryCandidat.id,
+            DecisionJuryCandidat.candidat_id,
+            DecisionJuryCandidat.jury_id,
+            DecisionJuryCandidat.decision,
+            DecisionJuryCandidat.commentaires,
+            DecisionJuryCandidat.conseiller_id,
+            DecisionJuryCandidat.promotion_id,
+            DecisionJuryCandidat.partenaire_id,
+            DecisionJuryCandidat.date_decision,
+            Candidat.nom.label("candidat_nom"),
+            Candidat.prenom.label("candidat_prenom"),
+            Candidat.email.label("candidat_email"),
+            Jury.session_le.label("jury_session_le"),
+            User.nom_complet.label("conseiller_nom"),
+            Promotion.libelle.label("promotion_libelle"),
+            Partenaire.nom.label("partenaire_nom"),
+        )
+        .join(Candidat, Candidat.id == DecisionJuryCandidat.candidat_id)
+        .join(Jury, Jury.id == DecisionJuryCandidat.jury_id)
+        .outerjoin(User, User.id == DecisionJuryCandidat.conseiller_id)
+        .outerjoin(Promotion, Promotion.id == DecisionJuryCandidat.promotion_id)
+        .outerjoin(Partenaire, Partenaire.id == DecisionJuryCandidat.partenaire_id)
+    )
+    if jury_id:
+        stmt = stmt.where(DecisionJuryCandidat.jury_id == jury_id)
+    if decision:
+        stmt = stmt.where(DecisionJuryCandidat.decision == decision)
+    saisie = (q or "").strip().lower()
+    if saisie:
+        stmt = stmt.where(or_(
+            func.lower(Candidat.nom).startswith(saisie, autoescape=True),
+            func.lower(Candidat.prenom).startswith(saisie, autoescape=True),
+            func.lower(Candidat.email).startswith(saisie, autoescape=True),
+        ))
+    if curseur:
+        date_c, id_c = decode_curseur(curseur)
+        stmt = stmt.where(or_(
+            DecisionJuryCandidat.date_decision < date_c,
+            and_(DecisionJuryCandidat.date_decision == date_c, DecisionJuryCandidat.id < id_c),
+        ))
+    # Une ligne de plus que la page : indique s'il existe une page suivante
+    lignes = session.execute(
+        stmt.order_by(DecisionJuryCandidat.date_decision.desc(), DecisionJuryCandidat.id.desc()).limit(limite + 1)
+    ).all()
+    curseur_suivant = None
+    if len(lignes) > limite:
+        lignes = lignes[:limite]
+        curseur_suivant = encode_curseur(lignes[-1].date_decision, lignes[-1].id)
+    return PageDecisions(lignes=lignes, curseur_suivant=curseur_suivant)
+
+
+# ===== ÉCRITURE =====
+
+def champs_decision(
+    decision: DecisionJury,
+    commentaires: Optional[str] = None,
+    conseiller_id: Optional[int] = None,
+    promotion_id: Optional[int] = None,
+    partenaire_id: Optional[int] = None,
+    envoyer_mail_candidat: bool = False,
+    envoyer_mail_conseiller: bool = False,
+    envoyer_mail_partenaire: bool = False,
+) -> Dict[str, Any]:
+    """Colonnes d'une décision : conseiller et promotion si validé, partenaire si réorienté"""
+    return {
+        "decision": decision,
+        "commentaires": commentaires,
+        "conseiller_id": conseiller_id if decision == DecisionJury.VALIDE else None,
+        "promotion_id": promotion_id if decision == DecisionJury.VALIDE else None,
+        "partenaire_id": partenaire_id if decision == DecisionJury.REORIENTE else None,
+        "envoyer_mail_candidat": envoyer_mail_candidat,
+        "envoyer_mail_conseiller": envoyer_mail_conseiller,
+        "envoyer_mail_partenaire": envoyer_mail_partenaire,
+    }
+
+
+def appliquer_decision_lot(
+    session: Session,
+    *,
+    user: Optional[User],
+    jury_id: int,
+    candidat_ids: Iterable[int],
+    champs: Dict[str, Any],
+    request: Optional[Request] = None,
+) -> Dict[str, Any]:
+    """Applique la même décision à tous les candidats du lot pour ce jury
+
+    Les décisions existantes (candidat, jury) sont mises à jour, les autres
+    créées, dans un seul INSERT ... ON CONFLICT (uq_decisionjurycandidat_candidat_jury).
+    Les réorientations de ces décisions sont remplacées : une seule par décision
+    REORIENTE, aucune si la décision change.
+    Lève ValueError si le lot est vide, trop grand ou contient des candidats inconnus.
+    """
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+    ids = sorted(set(candidat_ids))
+    if not ids:
+        raise ValueError("Aucun candidat sélectionné")
+    if len(ids) > DECISIONS_LOT_MAX:
+        raise ValueError(f"Lot limité à {DECISIONS_LOT_MAX} candidats")
+    connus = set(session.exec(select(Candidat.id).where(Candidat.id.in_(ids))).all())
+    inconnus = [i for i in ids if i not in connus]
+    if inconnus:
+        raise ValueError(f"Candidat(s) introuvable(s): {inconnus}")
+
+    maintenant = datetime.now(timezone.utc)
+    decision: DecisionJury = champs["decision"]
+    table = DecisionJuryCandidat.__table__
+    # SQLite n'est utilisé que par les tests
+    dialect_insert = sqlite_insert if session.get_bind().dialect.name == "sqlite" else pg_insert
+    stmt = dialect_insert(table).values([
+        {"candidat_id": candidat_id, "jury_id": jury_id, **champs, "date_decision": maintenant, "cree_le": maintenant}
+        for candidat_id in ids
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["candidat_id", "jury_id"],
+        set_={nom: stmt.excluded[nom] for nom in (*champs, "date_decision")},
+    ).returning(table.c.id, table.c.candidat_id)
+    decisions = session.execute(stmt).all()
+
+    session.execute(update(Candidat).where(Candidat.id.in_(ids)).values(statut=decision.value))
+    # Lot réappliqué ou décision modifiée : les réorientations précédentes ne valent plus
+    session.execute(delete(ReorientationCandidat).where(
+        ReorientationCandidat.decision_jury_id.in_([decision_id for decision_id, _ in decisions])
+    ))
+    if decision == DecisionJury.REORIENTE and champs.get("partenaire_id"):
+        session.execute(insert(ReorientationCandidat).values([
+            {
+                "candidat_id": candidat_id,
+                "partenaire_id": champs["partenaire_id"],
+                "decision_jury_id": decision_id,
+                "mail_envoye": champs.get("envoyer_mail_partenaire", False),
+                "date_reorientation": maintenant,
+            }
+            for decision_id, candidat_id in decisions
+        ]))
+    log_activities(
+        session,
+        user=user,
+        action="Décision jury appliquée par lot",
+        entity="DecisionJuryCandidat",
+        entries=[
+            (decision_id, {"candidat_id": candidat_id, "jury_id": jury_id, "decision": decision.value, "lot": len(ids)})
+            for decision_id, candidat_id in decisions
+        ],
+        request=request,
+    )
+    session.commit()
+    logger.info(f"✅ Décision {decision.value} appliquée à {len(decisions)} candidat(s) du jury {jury_id}")
+    return {"jury_id": jury_id, "decision": decision.value, "decisions": [decision_id for decision_id, _ in decisions]}
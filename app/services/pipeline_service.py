@@ -1,10 +1,12 @@
 """
 Service pour la gestion des pipelines de formation
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from sqlmodel import Session, select
+from sqlalchemy import case, delete, func, update
 import logging
 from app_lia_web.app.models.base import EtapePipeline, AvancementEtape, Inscription, Candidat
+from app_lia_web.app.models.enums import StatutEtape
 
 logger = logging.getLogger(__name__)
 
@@ -149,73 +151,152 @@ class PipelineService:
         session.refresh(avancement)
         return avancement
     
+    @staticmethod
+    def get_pipeline_board(session: Session, programme_id: int, limite_par_etape: Optional[int] = None) -> List[dict]:
+        """Tableau kanban du pipeline : étapes, candidats et compteurs en une seule requête
+
+        Les compteurs sont des fenêtres sur l'étape, calculés avant la limite de
+        candidats affichés par colonne.
+        """
+        par_etape = {"partition_by": EtapePipeline.id}
+        board = (
+            select(
+                EtapePipeline.id.label("etape_id"),
+                EtapePipeline.code,
+                EtapePipeline.libelle,
+                EtapePipeline.ordre,
+                EtapePipeline.active,
+                EtapePipeline.type_etape,
+                AvancementEtape.id.label("avancement_id"),
+                AvancementEtape.statut,
+                AvancementEtape.debut_le,
+                AvancementEtape.termine_le,
+                AvancementEtape.notes,
+                Inscription.id.label("inscription_id"),
+                Candidat.id.label("candidat_id"),
+                Candidat.nom,
+                Candidat.prenom,
+                func.row_number().over(
+                    order_by=(Candidat.nom, Candidat.prenom, AvancementEtape.id), **par_etape
+                ).label("rang"),
+                func.count(AvancementEtape.id).over(**par_etape).label("candidats_count"),
+                *[
+                    func.count(case((AvancementEtape.statut == statut, AvancementEtape.id)))
+                    .over(**par_etape).label(f"count_{statut.value}")
+                    for statut in StatutEtape
+                ],
+            )
+            .select_from(EtapePipeline)
+            .outerjoin(AvancementEtape, AvancementEtape.etape_id == EtapePipeline.id)
+            .outerjoin(Inscription, Inscription.id == AvancementEtape.inscription_id)
+            .outerjoin(Candidat, Candidat.id == Inscription.candidat_id)
+            .where(EtapePipeline.programme_id == programme_id)
+            .subquery()
+        )
+        query = select(board).order_by(board.c.ordre, board.c.etape_id, board.c.rang)
+        if limite_par_etape is not None:
+            query = query.where(board.c.rang <= limite_par_etape)
+        
+        etapes: Dict[int, dict] = {}
+        for row in session.execute(query).all():
+            etape = etapes.get(row.etape_id)
+            if etape is None:
+                etape = etapes[row.etape_id] = {
+                    "id": row.etape_id,
+                    "code": row.code,
+                    "libelle": row.libelle,
+                    "ordre": row.ordre,
+                    "active": row.active,
+                    "type_etape": row.type_etape,
+                    "candidats_count": row.candidats_count,
+                    "par_statut": {statut.value: getattr(row, f"count_{statut.value}") for statut in StatutEtape},
+                    "candidats": []
+                }
+            if row.avancement_id is not None:
+                etape["candidats"].append({
+                    "avancement_id": row.avancement_id,
+                    "inscription_id": row.inscription_id,
+                    "candidat_id": row.candidat_id,
+                    "nom": row.nom,
+                    "prenom": row.prenom,
+                    "statut_avancement": row.statut,
+                    "notes": row.notes,
+                    "debut_le": row.debut_le,
+                    "termine_le": row.termine_le
+                })
+        return list(etapes.values())
+    
     @staticmethod
     def get_pipeline_statistiques(session: Session, programme_id: int) -> dict:
-        """Récupère les statistiques du pipeline d'un programme"""
-        etapes = session.exec(
-            select(EtapePipeline)
+        """Récupère les statistiques du pipeline d'un programme (un seul GROUP BY)"""
+        rows = session.exec(
+            select(EtapePipeline.id, EtapePipeline.libelle, EtapePipeline.active, func.count(AvancementEtape.id))
+            .outerjoin(AvancementEtape, AvancementEtape.etape_id == EtapePipeline.id)
             .where(EtapePipeline.programme_id == programme_id)
+            .group_by(EtapePipeline.id, EtapePipeline.libelle, EtapePipeline.active, EtapePipeline.ordre)
             .order_by(EtapePipeline.ordre)
         ).all()
         
-        stats = {}
-        for etape in etapes:
-            candidats_count = session.exec(
-                select(AvancementEtape)
-                .where(AvancementEtape.etape_id == etape.id)
-            ).count()
-            
-            stats[etape.nom] = {
-                "etape_id": etape.id,
+        return {
+            libelle: {
+                "etape_id": etape_id,
                 "candidats_count": candidats_count,
-                "active": etape.active
+                "active": active
             }
-        
-        return stats
+            for etape_id, libelle, active, candidats_count in rows
+        }
     
     @staticmethod
     def get_candidats_par_etape(session: Session, etape_id: int, skip: int = 0, limit: int = 10) -> List[dict]:
         """Récupère les candidats à une étape spécifique du pipeline"""
-        avancements = session.exec(
-            select(AvancementEtape)
+        rows = session.exec(
+            select(AvancementEtape, Candidat.id, Candidat.nom, Candidat.prenom)
+            .join(Inscription, Inscription.id == AvancementEtape.inscription_id)
+            .join(Candidat, Candidat.id == Inscription.candidat_id)
             .where(AvancementEtape.etape_id == etape_id)
+            .order_by(Candidat.nom, Candidat.prenom, AvancementEtape.id)
             .offset(skip)
             .limit(limit)
         ).all()
         
-        candidats = []
-        for av in avancements:
-            inscription = session.get(Inscription, av.inscription_id)
-            candidat = session.get(Candidat, inscription.candidat_id)
-            
-            candidats.append({
-                "candidat_id": candidat.id,
-                "nom": candidat.nom,
-                "prenom": candidat.prenom,
+        return [
+            {
+                "candidat_id": candidat_id,
+                "nom": nom,
+                "prenom": prenom,
                 "statut_avancement": av.statut,
-                "commentaires": av.commentaires,
-                "date_debut": av.date_debut,
-                "date_fin": av.date_fin
-            })
-        
-        return candidats
+                "notes": av.notes,
+                "debut_le": av.debut_le,
+                "termine_le": av.termine_le
+            }
+            for av, candidat_id, nom, prenom in rows
+        ]
     
     @staticmethod
-    def reinitialiser_pipeline(session: Session, programme_id: int):
-        """Réinitialise le pipeline d'un programme"""
-        # Supprimer tous les avancements pour ce programme
-        inscriptions = session.exec(
-            select(Inscription).where(Inscription.programme_id == programme_id)
-        ).all()
-        
-        for inscription in inscriptions:
-            avancements = session.exec(
-                select(AvancementEtape).where(AvancementEtape.inscription_id == inscription.id)
-            ).all()
-            
-            for av in avancements:
-                session.delete(av)
-        
+    def reinitialiser_pipeline(session: Session, programme_id: int) -> int:
+        """Réinitialise le pipeline d'un programme (un seul DELETE), retourne le nombre d'avancements supprimés"""
+        result = session.execute(
+            delete(AvancementEtape).where(
+                AvancementEtape.inscription_id.in_(
+                    select(Inscription.id).where(Inscription.programme_id == programme_id)
+                )
+            )
+        )
+        session.commit()
+        logger.info(f"🔄 Pipeline du programme {programme_id} réinitialisé: {result.rowcount} avancement(s) supprimé(s)")
+        return result.rowcount
+    
+    @staticmethod
+    def _appliquer_ordres(session: Session, ordres: Dict[int, int]) -> None:
+        """Écrit les nouveaux ordres en un seul UPDATE ... SET ordre = CASE id ..."""
+        if not ordres:
+            return
+        session.execute(
+            update(EtapePipeline)
+            .where(EtapePipeline.id.in_(ordres))
+            .values(ordre=case(ordres, value=EtapePipeline.id))
+            .execution_options(synchronize_session=False)
+        )
         session.commit()
     
     @staticmethod
@@ -225,27 +306,33 @@ class PipelineService:
         if not etape:
             raise ValueError("Étape non trouvée")
         
-        # Récupérer toutes les étapes du programme
-        etapes = session.exec(
-            select(EtapePipeline)
+        # Ordres actuels des étapes du programme (sans charger les entités)
+        ordres_actuels = dict(session.exec(
+            select(EtapePipeline.id, EtapePipeline.ordre)
             .where(EtapePipeline.programme_id == etape.programme_id)
-            .order_by(EtapePipeline.ordre)
-        ).all()
+        ).all())
         
         # Réordonner
         ancienne_position = etape.ordre
-        if nouvelle_position < ancienne_position:
-            # Déplacer vers le haut
-            for e in etapes:
-                if e.ordre >= nouvelle_position and e.ordre < ancienne_position:
-                    e.ordre += 1
-        else:
-            # Déplacer vers le bas
-            for e in etapes:
-                if e.ordre > ancienne_position and e.ordre <= nouvelle_position:
-                    e.ordre -= 1
-        
-        etape.ordre = nouvelle_position
+        nouveaux_ordres = {}
+        for autre_id, ordre in ordres_actuels.items():
+            if nouvelle_position < ancienne_position and nouvelle_position <= ordre < ancienne_position:
+                # Déplacer vers le haut
+                nouveaux_ordres[autre_id] = ordre + 1
+            elif nouvelle_position > ancienne_position and ancienne_position < ordre <= nouvelle_position:
+                # Déplacer vers le bas
+                nouveaux_ordres[autre_id] = ordre - 1
+        nouveaux_ordres[etape.id] = nouvelle_position
         
-        session.add(etape)
-        session.commit()
+        PipelineService._appliquer_ordres(session, nouveaux_ordres)
+        session.refresh(etape)
+    
+    @staticmethod
+    def definir_ordre_etapes(session: Session, programme_id: int, etape_ids: List[int]):
+        """Applique l'ordre complet des étapes (colonnes du kanban déplacées) : ordre = position dans la liste"""
+        etapes_programme = set(session.exec(
+            select(EtapePipeline.id).where(EtapePipeline.programme_id == programme_id)
+        ).all())
+        if set(etape_ids) != etapes_programme or len(etape_ids) != len(etapes_programme):
+            raise ValueError("La liste doit contenir chaque étape du programme une seule fois")
+        PipelineService._appliquer_ordres(session, {etape_id: position for position, etape_id in enumerate(etape_ids, start=1)})
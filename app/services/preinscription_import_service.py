@@ -0,0 +1,460 @@
+# app/services/preinscription_import_service.py
+"""
+Import en masse de préinscriptions depuis un fichier CSV ou XLSX
+
+1. Lecture en flux (csv, ou openpyxl en mode read_only) et validation ligne à
+   ligne : les erreurs sont rapportées avec leur numéro de ligne, les emails en
+   double dans le fichier ne sont importés qu'une fois.
+2. Chargement des lignes valides dans une table temporaire (COPY sous
+   PostgreSQL, INSERT multi-lignes sur la base de test).
+3. Requêtes ensemblistes depuis cette table : rattachement des candidats
+   existants par email, création des candidats et entreprises manquants, champs
+   vides complétés sans écraser les données saisies, préinscriptions créées
+   sauf si le candidat est déjà préinscrit ou inscrit au programme.
+
+Le nombre de requêtes ne dépend pas du nombre de lignes. L'éligibilité et le
+géocodage sont calculés ensuite, en tâche de fond (traiter_en_arriere_plan).
+"""
+import asyncio
+import codecs
+import csv
+import io
+import json
+import logging
+import re
+import time
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, Integer, MetaData, String, Table, Text,
+    and_, exists, func, insert, literal, select, update,
+)
+from sqlmodel import Session
+
+from app_lia_web.app.models.base import (
+    Candidat, Entreprise, Inscription, Preinscription, Programme, StatutDossier,
+)
+from app_lia_web.app.services.eligibilite_service import recalculer_eligibilites
+from app_lia_web.app.services.geocoding import geocode_many
+from app_lia_web.core.database import engine
+from app_lia_web.core.lazy_import import LazyModule
+
+# openpyxl n'est chargé qu'au premier import XLSX
+openpyxl = LazyModule("openpyxl")
+
+logger = logging.getLogger(__name__)
+
+IMPORT_LIGNES_MAX = 100_000
+IMPORT_TAILLE_MAX_MO = 50
+EXTENSIONS_IMPORT = (".csv", ".xlsx", ".xlsm")
+LOT_ARRIERE_PLAN = 1000  # entreprises géocodées par lot
+
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+FORMATS_DATE = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y")
+
+# Colonnes reconnues (nom canonique) et en-têtes acceptés, normalisés sans accents
+COLONNES = {
+    "email": ("email", "e_mail", "mail", "courriel", "adresse_email", "adresse_mail"),
+    "nom": ("nom", "nom_de_famille", "last_name"),
+    "prenom": ("prenom", "first_name"),
+    "civilite": ("civilite",),
+    "date_naissance": ("date_naissance", "date_de_naissance", "naissance"),
+    "telephone": ("telephone", "tel", "portable", "mobile"),
+    "adresse_personnelle": ("adresse_personnelle", "adresse", "adresse_perso", "adresse_postale"),
+    "niveau_etudes": ("niveau_etudes", "niveau_d_etudes", "diplome"),
+    "secteur_activite": ("secteur_activite", "secteur_d_activite", "secteur"),
+    "raison_sociale": ("raison_sociale", "entreprise", "societe", "nom_entreprise"),
+    "siret": ("siret", "numero_siret"),
+    "adresse_entreprise": ("adresse_entreprise", "adresse_de_l_entreprise"),
+    "date_creation_entreprise": ("date_creation_entreprise", "date_creation", "date_de_creation"),
+    "chiffre_affaires": ("chiffre_affaires", "chiffre_d_affaires", "chiffre_affaire", "ca"),
+}
+ALIAS_COLONNES = {alias: nom for nom, alias_list in COLONNES.items() for alias in alias_list}
+COLONNES_OBLIGATOIRES = ("email", "nom", "prenom")
+COLONNES_CANDIDAT = (
+    "nom", "prenom", "civilite", "date_naissance", "telephone",
+    "adresse_personnelle", "niveau_etudes", "secteur_activite",
+)
+COLONNES_ENTREPRISE = {  # colonne entreprise -> colonne de la table d'import
+    "raison_sociale": "raison_sociale",
+    "siret": "siret",
+    "adresse": "adresse_entreprise",
+    "date_creation": "date_creation_entreprise",
+    "chiffre_affaires": "chiffre_affaires",
+}
+REJET_PREINSCRIT = "Déjà préinscrit à ce programme"
+REJET_INSCRIT = "Déjà inscrit à ce programme"
+
+# Table de travail, propre à la connexion (TEMPORARY) : deux imports simultanés ne se voient pas
+_metadata_import = MetaData()
+table_import = Table(
+    "import_preinscription",
+    _metadata_import,
+    Column("ligne", Integer, primary_key=True),
+    Column("email", String),
+    Column("nom", String),
+    Column("prenom", String),
+    Column("civilite", String),
+    Column("date_naissance", Date),
+    Column("telephone", String),
+    Column("adresse_personnelle", String),
+    Column("niveau_etudes", String),
+    Column("secteur_activite", String),
+    Column("raison_sociale", String),
+    Column("siret", String),
+    Column("adresse_entreprise", String),
+    Column("date_creation_entreprise", Date),
+    Column("chiffre_affaires", String),
+    Column("donnees_brutes_json", Text),
+    Column("candidat_id", Integer),
+    Column("entreprise_id", Integer),
+    Column("nouveau", Boolean),
+    Column("rejet", String),
+    prefixes=["TEMPORARY"],
+)
+COLONNES_FICHIER = [c.name for c in table_import.columns][:16]  # ligne ... donnees_brutes_json
+
+
+@dataclass
+class RapportImport:
+    """Résultat d'un import, affiché à l'utilisateur"""
+    fichier: str
+    programme_code: str
+    lignes_lues: int = 0
+    preinscriptions_creees: int = 0
+    candidats_crees: int = 0
+    candidats_existants: int = 0
+    erreurs: List[Tuple[int, str]] = field(default_factory=list)
+    duree_secondes: float = 0.0
+    preinscription_ids: List[int] = field(default_factory=list)
+    entreprise_ids: List[int] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "fichier": self.fichier,
+            "programme": self.programme_code,
+            "lignes_lues": self.lignes_lues,
+            "preinscriptions_creees": self.preinscriptions_creees,
+            "candidats_crees": self.candidats_crees,
+            "candidats_existants": self.candidats_existants,
+            "erreurs": [{"ligne": ligne, "message": message} for ligne, message in self.erreurs],
+            "duree_secondes": round(self.duree_secondes, 2),
+        }
+
+
+# ===== LECTURE =====
+
+def normaliser_entete(entete: Any) -> str:
+    texte = unicodedata.normalize("NFKD", str(entete or "")).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "_", texte.lower()).strip("_")
+
+
+class _PointVirgule(csv.excel):
+    """Dialecte par défaut (export Excel français) quand le séparateur n'est pas détecté"""
+    delimiter = ";"
+
+
+def _lire_csv(fichier: BinaryIO) -> Iterator[List[Any]]:
+    echantillon = fichier.read(65536)
+    fichier.seek(0)
+    try:
+        echantillon.decode("utf-8")
+        encodage = "utf-8-sig"
+    except UnicodeDecodeError as e:
+        # Coupure au milieu d'un caractère en fin d'échantillon : reste de l'UTF-8
+        encodage = "utf-8-sig" if e.start >= len(echantillon) - 3 else "cp1252"
+    texte = codecs.getreader(encodage)(fichier)
+    try:
+        dialecte = csv.Sniffer().sniff(echantillon.decode(encodage, errors="ignore"), delimiters=";,\t")
+    except csv.Error:
+        dialecte = _PointVirgule
+    yield from csv.reader(texte, dialecte)
+
+
+def _lire_xlsx(fichier: BinaryIO) -> Iterator[List[Any]]:
+    classeur = openpyxl.load_workbook(fichier, read_only=True, data_only=True)
+    try:
+        yield from classeur.active.iter_rows(values_only=True)
+    finally:
+        classeur.close()
+
+
+def lire_fichier(fichier: BinaryIO, nom_fichier: str) -> Tuple[List[str], Iterator[Tuple[int, Dict[str, Any]]]]:
+    """En-têtes non reconnus et itérateur (numéro de ligne, {colonne canonique: valeur})
+
+    Les lignes entièrement vides sont ignorées. Lève ValueError si le format
+    n'est pas pris en charge ou si une colonne obligatoire manque.
+    """
+    extension = "." + nom_fichier.rsplit(".", 1)[-1].lower() if "." in nom_fichier else ""
+    if extension not in EXTENSIONS_IMPORT:
+        raise ValueError(f"Format non pris en charge ({extension or 'sans extension'}) : CSV ou XLSX attendu")
+    lignes = _lire_csv(fichier) if extension == ".csv" else _lire_xlsx(fichier)
+    entetes = next(lignes, None)
+    if not entetes:
+        raise ValueError("Fichier vide")
+    colonnes = [ALIAS_COLONNES.get(normaliser_entete(e)) for e in entetes]
+    manquantes = [c for c in COLONNES_OBLIGATOIRES if c not in colonnes]
+    if manquantes:
+        raise ValueError(f"Colonne(s) obligatoire(s) absente(s) : {', '.join(manquantes)}")
+    ignorees = [str(e) for e, c in zip(entetes, colonnes) if e and c is None]
+
+    def parcourir() -> Iterator[Tuple[int, Dict[str, Any]]]:
+        for numero, valeurs in enumerate(lignes, start=2):
+            if not any(v not in (None, "") for v in valeurs):
+                continue
+            yield numero, {c: v for c, v in zip(colonnes, valeurs) if c is not None}
+
+    return ignorees, parcourir()
+
+
+# ===== VALIDATION =====
+
+def _texte(valeur: Any) -> Optional[str]:
+    if valeur is None:
+        return None
+    if isinstance(valeur, float) and valeur.is_integer():
+        valeur = int(valeur)
+    texte = str(valeur).strip()
+    return texte or None
+
+
+def _date(valeur: Any, colonne: str) -> Optional[date]:
+    if valeur is None or valeur == "":
+        return None
+    if isinstance(valeur, datetime):
+        return valeur.date()
+    if isinstance(valeur, date):
+        return valeur
+    texte = str(valeur).strip()
+    for format_date in FORMATS_DATE:
+        try:
+            return datetime.strptime(texte, format_date).date()
+        except ValueError:
+            continue
+    raise ValueError(f"{colonne} : date illisible « {texte} »")
+
+
+def valider_ligne(brute: Dict[str, Any]) -> Dict[str, Any]:
+    """Ligne prête pour la table d'import ; lève ValueError avec le motif du rejet"""
+    ligne = {colonne: _texte(brute.get(colonne)) for colonne in COLONNES}
+    manquantes = [c for c in COLONNES_OBLIGATOIRES if not ligne[c]]
+    if manquantes:
+        raise ValueError(f"Champ(s) obligatoire(s) vide(s) : {', '.join(manquantes)}")
+    ligne["email"] = ligne["email"].lower()
+    if not EMAIL_RE.match(ligne["email"]):
+        raise ValueError(f"Email invalide « {ligne['email']} »")
+    if ligne["siret"]:
+        ligne["siret"] = re.sub(r"\s", "", ligne["siret"])
+        if not re.fullmatch(r"\d{14}", ligne["siret"]):
+            raise ValueError(f"SIRET invalide « {ligne['siret']} » (14 chiffres attendus)")
+    ligne["date_naissance"] = _date(brute.get("date_naissance"), "date_naissance")
+    ligne["date_creation_entreprise"] = _date(brute.get("date_creation_entreprise"), "date_creation_entreprise")
+    ligne["donnees_brutes_json"] = json.dumps(
+        {c: v for c, v in brute.items() if v not in (None, "")}, ensure_ascii=False, default=str
+    )
+    return ligne
+
+
+# ===== CHARGEMENT =====
+
+def _charger_table_import(connexion, lignes: List[Dict[str, Any]]) -> None:
+    if connexion.dialect.name == "postgresql":
+        tampon = io.StringIO()
+        ecrivain = csv.writer(tampon)
+        for ligne in lignes:
+            # En CSV, un champ vide non guillemeté est lu comme NULL
+            ecrivain.writerow(["" if ligne[c] is None else ligne[c] for c in COLONNES_FICHIER])
+        tampon.seek(0)
+        curseur = connexion.connection.cursor()
+        curseur.copy_expert(
+            f"COPY {table_import.name} ({', '.join(COLONNES_FICHIER)}) FROM STDIN WITH (FORMAT csv)", tampon
+        )
+    elif lignes:
+        connexion.execute(insert(table_import), lignes)
+
+
+def _fusionner(connexion, programme_id: int, maintenant: datetime) -> None:
+    """Requêtes ensemblistes : candidats, entreprises puis préinscriptions"""
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+    t = table_import
+    candidat = Candidat.__table__
+    entreprise = Entreprise.__table__
+    preinscription = Preinscription.__table__
+    retenue = t.c.rejet.is_(None)
+
+    # Candidats existants (email insensible à la casse, index ix_candidat_email_prefixe)
+    connexion.execute(update(t).where(func.lower(candidat.c.email) == t.c.email).values(candidat_id=candidat.c.id))
+    connexion.execute(update(t).values(nouveau=t.c.candidat_id.is_(None)))
+    for rejet, modele in ((REJET_INSCRIT, Inscription), (REJET_PREINSCRIT, Preinscription)):
+        existant = exists().where(
+            modele.__table__.c.candidat_id == t.c.candidat_id,
+            modele.__table__.c.programme_id == programme_id,
+        )
+        connexion.execute(update(t).where(retenue, t.c.candidat_id.is_not(None), existant).values(rejet=rejet))
+
+    # Nouveaux candidats ; ON CONFLICT : un candidat créé entre-temps par le formulaire public
+    dialect_insert = sqlite_insert if connexion.dialect.name == "sqlite" else pg_insert
+    connexion.execute(
+        dialect_insert(candidat).from_select(
+            ["email", *COLONNES_CANDIDAT, "statut", "handicap"],
+            select(t.c.email, *[t.c[c] for c in COLONNES_CANDIDAT], literal("EN_ATTENTE"), literal(False))
+            .where(t.c.candidat_id.is_(None)),
+        ).on_conflict_do_nothing(index_elements=["email"])
+    )
+    connexion.execute(
+        update(t).where(t.c.candidat_id.is_(None), candidat.c.email == t.c.email).values(candidat_id=candidat.c.id)
+    )
+    # Candidats existants : on complète les champs vides sans écraser la saisie
+    connexion.execute(
+        update(candidat)
+        .where(candidat.c.id == t.c.candidat_id, t.c.nouveau == False, retenue)
+        .values({c: func.coalesce(candidat.c[c], t.c[c]) for c in COLONNES_CANDIDAT if c not in ("nom", "prenom")})
+    )
+
+    # Entreprises : une par candidat, créée si absente, complétée sinon
+    connexion.execute(
+        update(t).where(entreprise.c.candidat_id == t.c.candidat_id).values(entreprise_id=entreprise.c.id)
+    )
+    connexion.execute(
+        insert(entreprise).from_select(
+            ["candidat_id", *COLONNES_ENTREPRISE],
+            select(t.c.candidat_id, *[t.c[c] for c in COLONNES_ENTREPRISE.values()])
+            .where(retenue, t.c.entreprise_id.is_(None)),
+        )
+    )
+    connexion.execute(
+        update(t).where(t.c.entreprise_id.is_(None), entreprise.c.candidat_id == t.c.candidat_id)
+        .values(entreprise_id=entreprise.c.id)
+    )
+    connexion.execute(
+        update(entreprise)
+        .where(entreprise.c.id == t.c.entreprise_id, t.c.nouveau == False, retenue)
+        .values({c: func.coalesce(entreprise.c[c], t.c[colonne]) for c, colonne in COLONNES_ENTREPRISE.items()})
+    )
+
+    connexion.execute(
+        insert(preinscription).from_select(
+            ["programme_id", "candidat_id", "source", "donnees_brutes_json", "statut", "cree_le"],
+            select(
+                literal(programme_id),
+                t.c.candidat_id,
+                literal("import"),
+                t.c.donnees_brutes_json,
+                literal(StatutDossier.SOUMIS, type_=preinscription.c.statut.type),
+                literal(maintenant, type_=DateTime()),
+            ).where(retenue),
+        )
+    )
+
+
+def importer_preinscriptions(
+    session: Session,
+    programme: Programme,
+    fichier: BinaryIO,
+    nom_fichier: str,
+) -> RapportImport:
+    """Importe le fichier pour le programme ; lève ValueError si le fichier est inexploitable"""
+    debut = time.perf_counter()
+    rapport = RapportImport(fichier=nom_fichier, programme_code=programme.code)
+    ignorees, lignes = lire_fichier(fichier, nom_fichier)
+    if ignorees:
+        logger.info(f"📥 Import {nom_fichier} : colonnes ignorées {ignorees}")
+
+    valides: List[Dict[str, Any]] = []
+    premieres: Dict[str, int] = {}
+    for numero, brute in lignes:
+        rapport.lignes_lues += 1
+        if rapport.lignes_lues > IMPORT_LIGNES_MAX:
+            raise ValueError(f"Fichier limité à {IMPORT_LIGNES_MAX} lignes")
+        try:
+            ligne = valider_ligne(brute)
+        except ValueError as e:
+            rapport.erreurs.append((numero, str(e)))
+            continue
+        if ligne["email"] in premieres:
+            rapport.erreurs.append((numero, f"Email en double (déjà présent ligne {premieres[ligne['email']]})"))
+            continue
+        premieres[ligne["email"]] = numero
+        ligne["ligne"] = numero
+        valides.append(ligne)
+
+    if valides:
+        t = table_import
+        connexion = session.connection()
+        t.drop(connexion, checkfirst=True)
+        t.create(connexion)
+        try:
+            _charger_table_import(connexion, valides)
+            _fusionner(connexion, programme.id, datetime.now(timezone.utc))
+            rapport.erreurs.extend(
+                (ligne, rejet) for ligne, rejet in connexion.execute(select(t.c.ligne, t.c.rejet).where(t.c.rejet.is_not(None)))
+            )
+            comptes = connexion.execute(
+                select(
+                    func.count().filter(t.c.rejet.is_(None)),
+                    func.count().filter(and_(t.c.rejet.is_(None), t.c.nouveau == True)),
+                )
+            ).one()
+            rapport.preinscriptions_creees, rapport.candidats_crees = comptes
+            rapport.candidats_existants = rapport.preinscriptions_creees - rapport.candidats_crees
+            nouvelles = connexion.execute(
+                select(Preinscription.__table__.c.id, t.c.entreprise_id)
+                .join(t, t.c.candidat_id == Preinscription.__table__.c.candidat_id)
+                .where(Preinscription.__table__.c.programme_id == programme.id, t.c.rejet.is_(None))
+            ).all()
+            rapport.preinscription_ids = [p for p, _ in nouvelles]
+            rapport.entreprise_ids = [e for _, e in nouvelles if e is not None]
+        finally:
+            t.drop(connexion, checkfirst=True)
+        session.commit()
+
+    rapport.erreurs.sort()
+    rapport.duree_secondes = time.perf_counter() - debut
+    logger.info(
+        f"✅ Import {nom_fichier} ({programme.code}) : {rapport.preinscriptions_creees} préinscription(s), "
+        f"{len(rapport.erreurs)} erreur(s) sur {rapport.lignes_lues} ligne(s) en {rapport.duree_secondes:.1f}s"
+    )
+    return rapport
+
+
+# ===== TRAITEMENTS DIFFÉRÉS =====
+
+def geocoder_entreprises(session: Session, entreprise_ids: List[int]) -> int:
+    """Coordonnées des entreprises importées (adresse de l'entreprise, sinon du candidat)"""
+    geocodees = 0
+    for i in range(0, len(entreprise_ids), LOT_ARRIERE_PLAN):
+        lot = entreprise_ids[i:i + LOT_ARRIERE_PLAN]
+        adresses = dict(session.execute(
+            select(Entreprise.id, func.coalesce(Entreprise.adresse, Candidat.adresse_personnelle))
+            .join(Candidat, Candidat.id == Entreprise.candidat_id)
+            .where(Entreprise.id.in_(lot), Entreprise.lat.is_(None))
+        ).all())
+        if not adresses:
+            continue
+        # Tâche de fond exécutée dans un thread : boucle d'événements dédiée
+        coordonnees = asyncio.run(geocode_many(adresses))
+        if coordonnees:
+            session.execute(
+                update(Entreprise),
+                [{"id": cle, "lat": lat, "lng": lng} for cle, (lat, lng) in coordonnees.items()],
+            )
+            session.commit()
+            geocodees += len(coordonnees)
+    return geocodees
+
+
+def traiter_en_arriere_plan(preinscription_ids: List[int], entreprise_ids: List[int]) -> None:
+    """Après l'import : éligibilité puis géocodage, hors de la requête"""
+    with Session(engine) as session:
+        try:
+            eligibilites = recalculer_eligibilites(session, preinscription_ids=preinscription_ids)
+            geocodees = geocoder_entreprises(session, entreprise_ids)
+            logger.info(f"✅ Import : {eligibilites} éligibilité(s) calculée(s), {geocodees} entreprise(s) géocodée(s)")
+        except Exception as e:
+            session.rollback()
+            logger.error(f"❌ Traitement différé de l'import impossible: {e}")
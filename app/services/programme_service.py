@@ -1,14 +1,115 @@
 """
 Service de gestion des programmes
 """
-from typing import List, Optional
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional, Tuple
 from sqlmodel import Session, select
 import logging
+import threading
+import time
 from app_lia_web.app.models.base import Programme
 from app_lia_web.app.schemas import ProgrammeCreate, ProgrammeUpdate
+from app_lia_web.app.services.cache_version import SuiviVersion, incrementer_version
+from app_lia_web.core.database import engine
+from app_lia_web.core.template_cache import fragment_cache
 
 logger = logging.getLogger(__name__)
 
+PROGRAMME_REGISTRY_TTL_SECONDS = 300
+CLE_VERSION_PROGRAMMES = "programmes_actifs"
+
+
+@dataclass(frozen=True)
+class ProgrammeSnapshot:
+    """Copie immuable d'un programme, utilisable hors session (templates, menus)"""
+    id: int
+    code: str
+    nom: str
+    objectif: Optional[str]
+    date_debut: Optional[date]
+    date_fin: Optional[date]
+    actif: bool
+
+    @classmethod
+    def from_model(cls, programme: Programme) -> "ProgrammeSnapshot":
+        return cls(
+            id=programme.id,
+            code=programme.code,
+            nom=programme.nom,
+            objectif=programme.objectif,
+            date_debut=programme.date_debut,
+            date_fin=programme.date_fin,
+            actif=programme.actif,
+        )
+
+
+class ProgrammeRegistry:
+    """Liste des programmes actifs gardée en mémoire pour les menus
+
+    Rechargée au plus toutes les `ttl_seconds` secondes, et immédiatement
+    après toute création/modification/suppression (invalidate()) ; dans les
+    autres workers, dès la vérification suivante du compteur VersionCache
+    (quelques secondes).
+    """
+
+    def __init__(self, ttl_seconds: int = PROGRAMME_REGISTRY_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._programmes: Tuple[ProgrammeSnapshot, ...] = ()
+        self._expires_at = 0.0
+        self._version = SuiviVersion(CLE_VERSION_PROGRAMMES)
+        self._lock = threading.Lock()
+
+    def active_programmes(self) -> Tuple[ProgrammeSnapshot, ...]:
+        if self._expires_at > time.monotonic() and not self._version.a_verifier():
+            return self._programmes
+        with self._lock:
+            if self._invalide_ailleurs():
+                # Fragments de menus rendus avec l'ancienne liste dans ce worker
+                fragment_cache.invalidate()
+                self._reload()
+            elif self._expires_at <= time.monotonic():
+                self._reload()
+            return self._programmes
+
+    def _invalide_ailleurs(self) -> bool:
+        if not self._version.a_verifier():
+            return False
+        try:
+            with Session(engine) as session:
+                return self._version.a_change(session)
+        except Exception as e:
+            logger.error(f"❌ Lecture de la version des programmes actifs impossible: {e}")
+            return False
+
+    def _reload(self) -> None:
+        try:
+            with Session(engine) as session:
+                self._version.charge(session)
+                programmes = session.exec(
+                    select(Programme).where(Programme.actif == True).order_by(Programme.code)
+                ).all()
+                self._programmes = tuple(ProgrammeSnapshot.from_model(p) for p in programmes)
+            self._expires_at = time.monotonic() + self.ttl_seconds
+        except Exception as e:
+            # On garde la dernière liste connue, nouvel essai au prochain appel
+            logger.error(f"❌ Chargement des programmes actifs impossible: {e}")
+
+    def invalidate(self) -> None:
+        """À appeler après toute modification d'un programme (tous les workers)"""
+        self._expires_at = 0.0
+        fragment_cache.invalidate()
+        try:
+            with Session(engine) as session:
+                incrementer_version(session, CLE_VERSION_PROGRAMMES)
+                session.commit()
+        except Exception as e:
+            logger.error(f"❌ Invalidation des programmes actifs dans les autres workers impossible: {e}")
+
+
+# Instance unique par processus
+programme_registry = ProgrammeRegistry()
+
 
 class ProgrammeService:
     """Service de gestion des programmes"""
@@ -20,6 +121,7 @@ class ProgrammeService:
         session.add(programme)
         session.commit()
         session.refresh(programme)
+        programme_registry.invalidate()
         return programme
     
     @staticmethod
@@ -46,4 +148,5 @@ class ProgrammeService:
         session.add(programme)
         session.commit()
         session.refresh(programme)
+        programme_registry.invalidate()
         return programme
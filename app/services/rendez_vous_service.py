@@ -1,24 +1,106 @@
 # app/services/rendez_vous_service.py
-from datetime import datetime, date
-from typing import List, Optional, Dict, Any
+from bisect import bisect_left
+from datetime import datetime, date, time, timedelta
+from typing import List, Optional, Dict, Any, Iterable
 from sqlmodel import Session, select, and_, or_
-from sqlalchemy import func
+from sqlalchemy import func, literal_column
+from sqlalchemy.exc import IntegrityError
 
+from app_lia_web.core.config import settings
 from app_lia_web.app.models.base import RendezVous, Inscription, Candidat, Entreprise, Programme, User
 from app_lia_web.app.models.enums import TypeRDV, StatutRDV
 from app_lia_web.app.schemas.rendez_vous_schemas import RendezVousCreate, RendezVousUpdate, RendezVousFilter
 
+# Durée retenue pour un rendez-vous sans heure de fin (aussi utilisée par la contrainte d'exclusion)
+DUREE_RDV_DEFAUT_MINUTES = 60
+# Contrainte PostgreSQL : un conseiller ne peut pas avoir deux rendez-vous actifs qui se chevauchent
+CONTRAINTE_CHEVAUCHEMENT = "rendezvous_conseiller_sans_chevauchement"
+# Code SQLSTATE d'une violation de contrainte d'exclusion
+EXCLUSION_VIOLATION = "23P01"
+
+def creneau_sql(prefixe: str = "") -> str:
+    """Expression tsrange du créneau, identique dans la contrainte GiST et les requêtes (pour que l'index serve)"""
+    return (
+        f"tsrange({prefixe}debut, COALESCE({prefixe}fin, {prefixe}debut + interval '{DUREE_RDV_DEFAUT_MINUTES} minutes'), '[)')"
+    )
+
+class ConflitRendezVous(ValueError):
+    """Le créneau demandé chevauche un rendez-vous du conseiller"""
+
+    def __init__(self, conflits: List[RendezVous]):
+        self.conflits = conflits
+        horaires = ", ".join(f"{rdv.debut:%d/%m/%Y %H:%M}" for rdv in conflits) or "créneau concurrent"
+        super().__init__(f"Le conseiller a déjà un rendez-vous sur ce créneau ({horaires})")
+
 class RendezVousService:
     """Service pour la gestion des rendez-vous"""
     
     def __init__(self, session: Session):
         self.session = session
     
+    @property
+    def _postgres(self) -> bool:
+        return self.session.get_bind().dialect.name == "postgresql"
+    
+    @staticmethod
+    def fin_effective(debut: datetime, fin: Optional[datetime]) -> datetime:
+        return fin or debut + timedelta(minutes=DUREE_RDV_DEFAUT_MINUTES)
+    
+    def _chevauche(self, debut: datetime, fin: datetime):
+        """Condition SQL : rendez-vous chevauchant [debut, fin) (opérateur && sur l'index GiST en PostgreSQL)"""
+        if self._postgres:
+            return literal_column(creneau_sql("rendezvous.")).op("&&")(func.tsrange(debut, fin, "[)"))
+        fin_existante = func.coalesce(
+            RendezVous.fin, func.datetime(RendezVous.debut, f"+{DUREE_RDV_DEFAUT_MINUTES} minutes")
+        )
+        return and_(RendezVous.debut < fin, fin_existante > debut)
+    
+    def _rendez_vous_occupant(self, conseiller_ids: Iterable[int], debut: datetime, fin: datetime):
+        """Rendez-vous actifs des conseillers chevauchant la période"""
+        return (
+            select(RendezVous)
+            .where(RendezVous.conseiller_id.in_(list(conseiller_ids)))
+            .where(RendezVous.statut != StatutRDV.ANNULE)
+            .where(self._chevauche(debut, fin))
+        )
+    
+    def verifier_disponibilite(
+        self,
+        conseiller_id: Optional[int],
+        debut: datetime,
+        fin: Optional[datetime] = None,
+        statut: StatutRDV = StatutRDV.PLANIFIE,
+        exclude_id: Optional[int] = None
+    ) -> None:
+        """Lève ConflitRendezVous si le créneau chevauche un autre rendez-vous actif du conseiller"""
+        if not conseiller_id or statut == StatutRDV.ANNULE:
+            return
+        fin = self.fin_effective(debut, fin)
+        if fin <= debut:
+            raise ValueError("L'heure de fin doit être postérieure à l'heure de début")
+        query = self._rendez_vous_occupant([conseiller_id], debut, fin)
+        if exclude_id:
+            query = query.where(RendezVous.id != exclude_id)
+        conflits = self.session.exec(query.order_by(RendezVous.debut)).all()
+        if conflits:
+            raise ConflitRendezVous(conflits)
+    
+    def _commit(self) -> None:
+        """Commit ; une violation de la contrainte d'exclusion (réservation concurrente) devient un conflit"""
+        try:
+            self.session.commit()
+        except IntegrityError as e:
+            self.session.rollback()
+            if getattr(e.orig, "pgcode", None) == EXCLUSION_VIOLATION:
+                raise ConflitRendezVous([])
+            raise
+    
     def create_rendez_vous(self, rdv_data: RendezVousCreate) -> RendezVous:
         """Créer un nouveau rendez-vous"""
+        self.verifier_disponibilite(rdv_data.conseiller_id, rdv_data.debut, rdv_data.fin, rdv_data.statut)
         rdv = RendezVous(**rdv_data.model_dump())
         self.session.add(rdv)
-        self.session.commit()
+        self._commit()
         self.session.refresh(rdv)
         return rdv
     
@@ -33,10 +115,17 @@ class RendezVousService:
             return None
         
         update_data = rdv_data.model_dump(exclude_unset=True)
+        self.verifier_disponibilite(
+            update_data.get("conseiller_id", rdv.conseiller_id),
+            update_data.get("debut") or rdv.debut,
+            update_data.get("fin", rdv.fin),
+            update_data.get("statut") or rdv.statut,
+            exclude_id=rdv.id
+        )
         for field, value in update_data.items():
             setattr(rdv, field, value)
         
-        self.session.commit()
+        self._commit()
         self.session.refresh(rdv)
         return rdv
     
@@ -200,9 +289,66 @@ class RendezVousService:
         )
         return self.search_rendez_vous(filters)
     
+    def get_creneaux_libres(
+        self,
+        conseiller_ids: List[int],
+        nombre: int = 5,
+        duree_minutes: int = DUREE_RDV_DEFAUT_MINUTES,
+        a_partir_de: Optional[datetime] = None,
+        horizon_jours: int = 14,
+        pas_minutes: int = 30
+    ) -> List[Dict[str, Any]]:
+        """Prochains créneaux libres des conseillers pendant les heures d'ouverture
+
+        Les rendez-vous occupés de la fenêtre sont lus en une seule requête (index
+        GiST sur le créneau en PostgreSQL) : le coût ne dépend pas de l'historique.
+        """
+        if not conseiller_ids or nombre <= 0:
+            return []
+        a_partir_de = a_partir_de or datetime.now()
+        duree = timedelta(minutes=duree_minutes)
+        fenetre_fin = datetime.combine(a_partir_de.date() + timedelta(days=horizon_jours), time.min)
+
+        occupes: Dict[int, List[tuple]] = {conseiller_id: [] for conseiller_id in conseiller_ids}
+        for debut, fin, conseiller_id in self.session.execute(
+            self._rendez_vous_occupant(conseiller_ids, a_partir_de, fenetre_fin)
+            .with_only_columns(RendezVous.debut, RendezVous.fin, RendezVous.conseiller_id)
+            .order_by(RendezVous.debut)
+        ).all():
+            occupes[conseiller_id].append((debut, self.fin_effective(debut, fin)))
+        # Par conseiller : débuts triés et fin la plus tardive parmi les rendez-vous commencés avant
+        debuts, fins_max = {}, {}
+        for conseiller_id, plages in occupes.items():
+            debuts[conseiller_id] = [plage_debut for plage_debut, _ in plages]
+            fins_max[conseiller_id] = []
+            for _, plage_fin in plages:
+                precedente = fins_max[conseiller_id][-1] if fins_max[conseiller_id] else plage_fin
+                fins_max[conseiller_id].append(max(precedente, plage_fin))
+
+        def libre(conseiller_id: int, debut: datetime, fin: datetime) -> bool:
+            index = bisect_left(debuts[conseiller_id], fin)
+            return index == 0 or fins_max[conseiller_id][index - 1] <= debut
+
+        creneaux = []
+        jour = a_partir_de.date()
+        while jour < fenetre_fin.date() and len(creneaux) < nombre:
+            if jour.weekday() in settings.RDV_JOURS_OUVRES:
+                debut = datetime.combine(jour, time(settings.RDV_HEURE_OUVERTURE))
+                fermeture = datetime.combine(jour, time(settings.RDV_HEURE_FERMETURE))
+                while debut + duree <= fermeture and len(creneaux) < nombre:
+                    if debut >= a_partir_de:
+                        for conseiller_id in conseiller_ids:
+                            if libre(conseiller_id, debut, debut + duree):
+                                creneaux.append({"conseiller_id": conseiller_id, "debut": debut, "fin": debut + duree})
+                                if len(creneaux) == nombre:
+                                    break
+                    debut += timedelta(minutes=pas_minutes)
+            jour += timedelta(days=1)
+        return creneaux
+    
     def get_statistiques_rendez_vous(self, programme_id: Optional[int] = None, date_debut: Optional[date] = None, date_fin: Optional[date] = None) -> Dict[str, Any]:
-        """Récupérer les statistiques des rendez-vous"""
-        query = select(RendezVous)
+        """Récupérer les statistiques des rendez-vous (un seul GROUP BY statut, type)"""
+        query = select(RendezVous.statut, RendezVous.type_rdv, func.count(RendezVous.id))
         
         if programme_id:
             query = query.join(Inscription, RendezVous.inscription_id == Inscription.id).where(Inscription.programme_id == programme_id)
@@ -213,29 +359,25 @@ class RendezVousService:
         if date_fin:
             query = query.where(RendezVous.debut <= datetime.combine(date_fin, datetime.max.time()))
         
-        rdv_list = self.session.exec(query).all()
-        
-        total = len(rdv_list)
-        planifies = len([rdv for rdv in rdv_list if rdv.statut == StatutRDV.PLANIFIE])
-        termines = len([rdv for rdv in rdv_list if rdv.statut == StatutRDV.TERMINE])
-        annules = len([rdv for rdv in rdv_list if rdv.statut == StatutRDV.ANNULE])
+        par_statut = {statut: 0 for statut in StatutRDV}
+        par_type = {type_rdv: 0 for type_rdv in TypeRDV}
+        for statut, type_rdv, nombre in self.session.exec(query.group_by(RendezVous.statut, RendezVous.type_rdv)).all():
+            par_statut[statut] += nombre
+            par_type[type_rdv] += nombre
         
-        # Statistiques par type
-        entretiens = len([rdv for rdv in rdv_list if rdv.type_rdv == TypeRDV.ENTRETIEN])
-        suivis = len([rdv for rdv in rdv_list if rdv.type_rdv == TypeRDV.SUIVI])
-        coachings = len([rdv for rdv in rdv_list if rdv.type_rdv == TypeRDV.COACHING])
-        autres = len([rdv for rdv in rdv_list if rdv.type_rdv == TypeRDV.AUTRE])
+        total = sum(par_statut.values())
+        termines = par_statut[StatutRDV.TERMINE]
         
         return {
             "total": total,
-            "planifies": planifies,
+            "planifies": par_statut[StatutRDV.PLANIFIE],
             "termines": termines,
-            "annules": annules,
+            "annules": par_statut[StatutRDV.ANNULE],
             "par_type": {
-                "entretiens": entretiens,
-                "suivis": suivis,
-                "coachings": coachings,
-                "autres": autres
+                "entretiens": par_type[TypeRDV.ENTRETIEN],
+                "suivis": par_type[TypeRDV.SUIVI],
+                "coachings": par_type[TypeRDV.COACHING],
+                "autres": par_type[TypeRDV.AUTRE]
             },
             "taux_realisation": (termines / total * 100) if total > 0 else 0
         }
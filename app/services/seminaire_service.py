@@ -1,6 +1,9 @@
 # app/services/seminaire_service.py
 from sqlmodel import Session, select, and_, or_
-from typing import List, Optional, Dict, Any
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import contains_eager
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timezone, date
 import secrets
 import string
@@ -329,177 +332,102 @@ class SeminaireService:
         query = select(PresenceSeminaire).where(PresenceSeminaire.session_id == session_id)
         return db.exec(query).all()
     
-    def get_presences_with_invitations(self, seminaire_id: int, session_id: int, db: Session) -> List[PresenceSeminaire]:
-        """Récupérer toutes les présences pour une session, créant des enregistrements par défaut pour tous les invités"""
-        from sqlalchemy.orm import selectinload
-        
-        # Récupérer toutes les invitations pour ce séminaire (acceptées ET refusées)
-        query_invitations = select(InvitationSeminaire).where(
-            InvitationSeminaire.seminaire_id == seminaire_id
-        )
-        invitations = db.exec(query_invitations).all()
-        
-        presences = []
-        
-        for invitation in invitations:
-            # Charger les relations de l'invitation
-            db.refresh(invitation)
-            
-            # Vérifier si une présence existe déjà pour cette session
-            existing_presence_query = select(PresenceSeminaire).options(
-                selectinload(PresenceSeminaire.inscription).selectinload(Inscription.candidat)
-            ).where(
+    def _roster_rows(self, seminaire_id: int, session_id: int, db: Session) -> List[Tuple[InvitationSeminaire, Optional[PresenceSeminaire]]]:
+        """Liste d'émargement en une requête : invitations ⟕ présences de la session
+
+        L'inscription et le candidat sont chargés par la même jointure,
+        les entreprises par une seule requête complémentaire.
+        """
+        query = (
+            select(InvitationSeminaire, PresenceSeminaire)
+            .join(Inscription, Inscription.id == InvitationSeminaire.inscription_id)
+            .join(Candidat, Candidat.id == Inscription.candidat_id)
+            .outerjoin(PresenceSeminaire, and_(
                 PresenceSeminaire.session_id == session_id,
-                PresenceSeminaire.inscription_id == invitation.inscription_id
+                PresenceSeminaire.inscription_id == InvitationSeminaire.inscription_id,
+            ))
+            .where(InvitationSeminaire.seminaire_id == seminaire_id)
+            # Doublons hérités : même présence gardée que la migration (DEDUP_KEEP_ORDER)
+            .order_by(InvitationSeminaire.id, PresenceSeminaire.modifie_le.desc().nulls_last(), PresenceSeminaire.id)
+            .options(
+                contains_eager(InvitationSeminaire.inscription)
+                .contains_eager(Inscription.candidat)
+                .selectinload(Candidat.entreprise)
             )
-            existing_presence = db.exec(existing_presence_query).first()
-            
-            if existing_presence:
-                presences.append(existing_presence)
-            else:
-                # Créer une présence par défaut avec statut ABSENT et la sauvegarder
-                # Récupérer l'inscription avec ses relations chargées
-                inscription_query = select(Inscription).options(
-                    selectinload(Inscription.candidat)
-                ).where(Inscription.id == invitation.inscription_id)
-                inscription = db.exec(inscription_query).first()
-                
-                if inscription:
-                    
-                    # Déterminer le statut par défaut selon l'invitation et la date
-                    default_status = "en_attente"  # Par défaut en attente
-                    
-                    # Vérifier si l'événement est déjà passé
-                    session_obj = db.get(SessionSeminaire, session_id)
-                    if session_obj and session_obj.date_session:
-                        from datetime import date
-                        today = date.today()
-                        if session_obj.date_session < today:
-                            # L'événement est passé, mettre absent par défaut
-                            default_status = "absent"
-                    
-                    # Si l'invitation est refusée, mettre absent même si l'événement n'est pas passé
-                    if invitation.statut == "REFUSEE":
-                        default_status = "absent"
-                    
-                    default_presence = PresenceSeminaire(
-                        session_id=session_id,
-                        inscription_id=invitation.inscription_id,
-                        presence=default_status
-                    )
-                    # Sauvegarder la présence par défaut en base
-                    db.add(default_presence)
-                    db.commit()
-                    db.refresh(default_presence)
-                    # Assigner manuellement l'inscription pour l'affichage
-                    default_presence.inscription = inscription
-                    presences.append(default_presence)
-        
-        return presences
+        )
+        rows = []
+        seen_invitations = set()
+        for invitation, presence in db.exec(query).all():
+            # Une ligne par invitation, même si d'anciens doublons de présence subsistent
+            if invitation.id not in seen_invitations:
+                seen_invitations.add(invitation.id)
+                rows.append((invitation, presence))
+        return rows
     
-    def get_presences_for_direct_emargement(self, seminaire_id: int, session_id: int, db: Session) -> List[PresenceSeminaire]:
-        """Récupérer les présences pour l'émargement direct - seulement les présences existantes en base"""
-        from sqlalchemy.orm import selectinload
+    def _create_default_presences(self, session_id: int, rows: List[Tuple[InvitationSeminaire, Optional[PresenceSeminaire]]], db: Session) -> bool:
+        """Crée en un seul INSERT multi-lignes les présences par défaut manquantes
+
+        Statut "absent" si la session est passée ou l'invitation refusée,
+        "en_attente" sinon. Retourne True si des lignes ont été insérées.
+        """
+        missing = {}
+        for invitation, presence in rows:
+            if presence is None:
+                missing.setdefault(invitation.inscription_id, invitation.statut)
+        if not missing:
+            return False
         
-        # Récupérer toutes les invitations pour ce séminaire (acceptées ET refusées)
-        query_invitations = select(InvitationSeminaire).where(
-            InvitationSeminaire.seminaire_id == seminaire_id
+        session_obj = db.get(SessionSeminaire, session_id)
+        session_passee = bool(session_obj and session_obj.date_session and session_obj.date_session < date.today())
+        now = datetime.now(timezone.utc)
+        values = [
+            {
+                "session_id": session_id,
+                "inscription_id": inscription_id,
+                "presence": "absent" if session_passee or statut == "REFUSEE" else "en_attente",
+                "cree_le": now,
+            }
+            for inscription_id, statut in missing.items()
+        ]
+        # Deux ouvertures simultanées de la liste ne créent pas de doublon
+        dialect_insert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+        insert_query = dialect_insert(PresenceSeminaire.__table__).values(values).on_conflict_do_nothing(
+            index_elements=["session_id", "inscription_id"]
         )
-        invitations = db.exec(query_invitations).all()
-        
-        presences = []
-        
-        for invitation in invitations:
-            # Charger les relations de l'invitation
-            db.refresh(invitation)
-            
-            # Vérifier si une présence existe déjà pour cette session
-            existing_presence_query = select(PresenceSeminaire).options(
-                selectinload(PresenceSeminaire.inscription).selectinload(Inscription.candidat)
-            ).where(
-                PresenceSeminaire.session_id == session_id,
-                PresenceSeminaire.inscription_id == invitation.inscription_id
-            )
-            existing_presence = db.exec(existing_presence_query).first()
-            
-            if existing_presence:
-                presences.append(existing_presence)
-            # Ne pas créer de présences temporaires - seulement retourner celles qui existent vraiment
-        
-        return presences
+        db.execute(insert_query)
+        db.commit()
+        return True
+    
+    def _roster_with_defaults(self, seminaire_id: int, session_id: int, db: Session) -> List[Tuple[InvitationSeminaire, PresenceSeminaire]]:
+        """Liste d'émargement complète : nombre de requêtes constant quel que soit le nombre d'invités"""
+        rows = self._roster_rows(seminaire_id, session_id, db)
+        if self._create_default_presences(session_id, rows, db):
+            rows = self._roster_rows(seminaire_id, session_id, db)
+        return [(invitation, presence) for invitation, presence in rows if presence is not None]
+    
+    def get_presences_with_invitations(self, seminaire_id: int, session_id: int, db: Session) -> List[PresenceSeminaire]:
+        """Récupérer toutes les présences pour une session, créant des enregistrements par défaut pour tous les invités"""
+        return [presence for _, presence in self._roster_with_defaults(seminaire_id, session_id, db)]
+    
+    def get_presences_for_direct_emargement(self, seminaire_id: int, session_id: int, db: Session) -> List[PresenceSeminaire]:
+        """Récupérer les présences pour l'émargement direct - seulement les présences existantes en base"""
+        rows = self._roster_rows(seminaire_id, session_id, db)
+        return [presence for _, presence in rows if presence is not None]
     
     def get_presences_with_invitation_details(self, seminaire_id: int, session_id: int, db: Session) -> List[Dict]:
         """Récupérer toutes les présences avec les détails d'invitation pour une session"""
-        # Récupérer toutes les invitations pour ce séminaire (acceptées ET refusées)
-        query_invitations = select(InvitationSeminaire).where(
-            InvitationSeminaire.seminaire_id == seminaire_id
-        )
-        invitations = db.exec(query_invitations).all()
-        
-        presences_data = []
-        
-        for invitation in invitations:
-            # Charger les relations de l'invitation
-            db.refresh(invitation)
-            
-            # Vérifier si une présence existe déjà pour cette session
-            existing_presence = self.get_presence_candidat(session_id, invitation.inscription_id, db)
-            
-            if existing_presence:
-                # Charger les relations de la présence existante
-                db.refresh(existing_presence)
-                presence_obj = existing_presence
-            else:
-                # Créer une présence par défaut avec statut ABSENT et la sauvegarder
-                inscription = db.get(Inscription, invitation.inscription_id)
-                if inscription:
-                    db.refresh(inscription)
-                    if inscription.candidat:
-                        db.refresh(inscription.candidat)
-                    
-                    # Déterminer le statut par défaut selon l'invitation et la date
-                    default_status = "en_attente"  # Par défaut en attente
-                    
-                    # Vérifier si l'événement est déjà passé
-                    session_obj = db.get(SessionSeminaire, session_id)
-                    if session_obj and session_obj.date_session:
-                        from datetime import date
-                        today = date.today()
-                        if session_obj.date_session < today:
-                            # L'événement est passé, mettre absent par défaut
-                            default_status = "absent"
-                    
-                    # Si l'invitation est refusée, mettre absent même si l'événement n'est pas passé
-                    if invitation.statut == "REFUSEE":
-                        default_status = "absent"
-                    
-                    default_presence = PresenceSeminaire(
-                        session_id=session_id,
-                        inscription_id=invitation.inscription_id,
-                        presence=default_status
-                    )
-                    db.add(default_presence)
-                    db.commit()
-                    db.refresh(default_presence)
-                    default_presence.inscription = inscription
-                    presence_obj = default_presence
-                else:
-                    continue
-            
-            # Créer l'objet de données enrichi
-            presence_data = {
-                'presence': presence_obj,
+        return [
+            {
+                'presence': presence,
                 'invitation': invitation,
                 'invitation_statut': invitation.statut
             }
-            presences_data.append(presence_data)
-        
-        return presences_data
+            for invitation, presence in self._roster_with_defaults(seminaire_id, session_id, db)
+        ]
 
-    def get_presence_stats(self, session_id: int, db: Session) -> Dict[str, int]:
-        """Obtenir les statistiques de présence pour une session"""
-        presences = self.get_presences_session(session_id, db)
-        
+    @staticmethod
+    def compute_presence_stats(presences: List[PresenceSeminaire]) -> Dict[str, int]:
+        """Statistiques d'une liste de présences déjà chargée (sans requête)"""
         stats = {
             'total': len(presences),
             'present': len([p for p in presences if p.presence == StatutPresence.PRESENT]),
@@ -513,24 +441,14 @@ class SeminaireService:
             stats['taux_presence'] = 0
         
         return stats
+
+    def get_presence_stats(self, session_id: int, db: Session) -> Dict[str, int]:
+        """Obtenir les statistiques de présence pour une session"""
+        return self.compute_presence_stats(self.get_presences_session(session_id, db))
         
     def get_presence_stats_with_invitations(self, seminaire_id: int, session_id: int, db: Session) -> Dict[str, int]:
         """Obtenir les statistiques de présence pour une session avec invitations"""
-        presences = self.get_presences_with_invitations(seminaire_id, session_id, db)
-        
-        stats = {
-            'total': len(presences),
-            'present': len([p for p in presences if p.presence == StatutPresence.PRESENT]),
-            'absent': len([p for p in presences if p.presence == StatutPresence.ABSENT]),
-            'excuse': len([p for p in presences if p.presence == StatutPresence.EXCUSE])
-        }
-        
-        if stats['total'] > 0:
-            stats['taux_presence'] = round((stats['present'] / stats['total']) * 100, 2)
-        else:
-            stats['taux_presence'] = 0
-        
-        return stats
+        return self.compute_presence_stats(self.get_presences_with_invitations(seminaire_id, session_id, db))
 
     # === GESTION DES LIVRABLES ===
     
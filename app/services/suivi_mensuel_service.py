@@ -1,31 +1,62 @@
 from sqlmodel import Session, select, func
-from typing import List, Optional, Dict, Any
+from sqlalchemy import Date, cast, delete, exists, tuple_
+from typing import List, Optional, Dict, Any, Iterable, Tuple
 from datetime import date, datetime, timezone
-from app_lia_web.app.models.base import SuiviMensuel, Inscription, Candidat, Programme
+from app_lia_web.core.database import upsert_from_select
+from app_lia_web.app.models.base import SuiviMensuel, SuiviMensuelRollup, Inscription, Candidat, Programme
 from app_lia_web.app.schemas.suivi_mensuel_schemas import (
     SuiviMensuelCreate, SuiviMensuelUpdate, SuiviMensuelFilter, SuiviMensuelStats, SuiviMensuelWithCandidat
 )
 
+def debut_du_mois(db: Session, colonne):
+    """Expression SQL du 1er du mois (date_trunc('month') ; SQLite pour les tests)"""
+    if db.get_bind().dialect.name == "sqlite":
+        return func.date(colonne, "start of month", type_=Date)
+    return cast(func.date_trunc("month", colonne), Date)
+
+def agregats_suivis() -> list:
+    """Sommes et comptages des métriques business, communs aux statistiques et au rollup mensuel"""
+    return [
+        func.count(SuiviMensuel.id).label("nb_suivis"),
+        func.count(func.nullif(SuiviMensuel.commentaire, "")).label("nb_avec_commentaire"),
+        func.count(SuiviMensuel.score_objectifs).label("nb_scores"),
+        func.coalesce(func.sum(SuiviMensuel.score_objectifs), 0).label("somme_scores"),
+        func.count(SuiviMensuel.chiffre_affaires_actuel).label("nb_ca"),
+        func.coalesce(func.sum(SuiviMensuel.chiffre_affaires_actuel), 0).label("somme_ca"),
+        func.coalesce(func.sum(
+            func.coalesce(SuiviMensuel.nb_stagiaires, 0) + func.coalesce(SuiviMensuel.nb_alternants, 0)
+            + func.coalesce(SuiviMensuel.nb_cdd, 0) + func.coalesce(SuiviMensuel.nb_cdi, 0)
+        ), 0).label("total_employes"),
+        func.coalesce(func.sum(SuiviMensuel.montant_subventions_obtenues), 0).label("montant_subventions_total"),
+        func.coalesce(func.sum(
+            func.coalesce(SuiviMensuel.montant_dettes_effectuees, 0) + func.coalesce(SuiviMensuel.montant_dettes_encours, 0)
+            + func.coalesce(SuiviMensuel.montant_dettes_envisagees, 0)
+        ), 0).label("montant_dettes_total"),
+        func.coalesce(func.sum(
+            func.coalesce(SuiviMensuel.montant_equity_effectue, 0) + func.coalesce(SuiviMensuel.montant_equity_encours, 0)
+        ), 0).label("montant_equity_total"),
+    ]
+
+AGREGATS_ROLLUP = (
+    "nb_suivis", "nb_avec_commentaire", "nb_scores", "somme_scores", "nb_ca", "somme_ca",
+    "total_employes", "montant_subventions_total", "montant_dettes_total", "montant_equity_total",
+)
+
+def _moyenne(somme, nombre) -> Optional[float]:
+    return somme / nombre if nombre else None
+
+
 class SuiviMensuelService:
     """Service pour la gestion des suivis mensuels avec métriques business"""
     
-    def get_suivi_mensuel(self, db: Session, suivi_id: int) -> Optional[SuiviMensuel]:
-        """Récupérer un suivi mensuel par ID"""
-        return db.get(SuiviMensuel, suivi_id)
-
-    def get_suivis_mensuels(
-        self, db: Session, filters: SuiviMensuelFilter, skip: int = 0, limit: int = 100
-    ) -> List[SuiviMensuelWithCandidat]:
-        """Récupérer les suivis mensuels avec filtres"""
-        query = select(
-            SuiviMensuel,
-            Candidat.prenom,
-            Candidat.nom,
-            Programme.nom.label("programme_nom")
-        ).join(Inscription, Inscription.id == SuiviMensuel.inscription_id)\
-        .join(Candidat, Candidat.id == Inscription.candidat_id)\
-        .join(Programme, Programme.id == Inscription.programme_id)
-
+    # Vérification unique par processus que le rollup a été construit
+    _rollup_verifie = False
+    
+    @staticmethod
+    def _apply_filters(query, filters: SuiviMensuelFilter):
+        """Appliquer les filtres de recherche (la requête doit joindre Inscription et Candidat)"""
+        if filters.inscription_id:
+            query = query.where(SuiviMensuel.inscription_id == filters.inscription_id)
         if filters.programme_id:
             query = query.where(Inscription.programme_id == filters.programme_id)
         if filters.candidat_id:
@@ -49,6 +80,26 @@ class SuiviMensuelService:
                 (Candidat.prenom.ilike(search_pattern)) |
                 (Candidat.nom.ilike(search_pattern))
             )
+        return query
+
+    def get_suivi_mensuel(self, db: Session, suivi_id: int) -> Optional[SuiviMensuel]:
+        """Récupérer un suivi mensuel par ID"""
+        return db.get(SuiviMensuel, suivi_id)
+
+    def get_suivis_mensuels(
+        self, db: Session, filters: SuiviMensuelFilter, skip: int = 0, limit: int = 100
+    ) -> List[SuiviMensuelWithCandidat]:
+        """Récupérer les suivis mensuels avec filtres"""
+        query = select(
+            SuiviMensuel,
+            Candidat.prenom,
+            Candidat.nom,
+            Programme.nom.label("programme_nom")
+        ).join(Inscription, Inscription.id == SuiviMensuel.inscription_id)\
+        .join(Candidat, Candidat.id == Inscription.candidat_id)\
+        .join(Programme, Programme.id == Inscription.programme_id)
+
+        query = self._apply_filters(query, filters)
 
         query = query.order_by(SuiviMensuel.mois.desc(), SuiviMensuel.cree_le.desc())
         
@@ -96,6 +147,8 @@ class SuiviMensuelService:
 
         suivi = SuiviMensuel(**suivi_create.dict())
         db.add(suivi)
+        db.flush()
+        self.refresh_rollup(db, [self._rollup_key(db, suivi)])
         db.commit()
         db.refresh(suivi)
         return suivi
@@ -118,6 +171,7 @@ class SuiviMensuelService:
             if existing_suivi:
                 raise ValueError("Un autre suivi existe déjà pour cette inscription et ce mois.")
 
+        ancienne_cle = self._rollup_key(db, suivi)
         update_data = suivi_update.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(suivi, key, value)
@@ -126,6 +180,8 @@ class SuiviMensuelService:
         suivi.modifie_le = datetime.now(timezone.utc)
         
         db.add(suivi)
+        db.flush()
+        self.refresh_rollup(db, [ancienne_cle, self._rollup_key(db, suivi)])
         db.commit()
         db.refresh(suivi)
         return suivi
@@ -135,80 +191,103 @@ class SuiviMensuelService:
         suivi = db.get(SuiviMensuel, suivi_id)
         if not suivi:
             return False
+        cle = self._rollup_key(db, suivi)
         db.delete(suivi)
+        self.refresh_rollup(db, [cle])
         db.commit()
         return True
 
-    def get_suivi_mensuel_stats(self, db: Session, filters: SuiviMensuelFilter) -> SuiviMensuelStats:
-        """Calculer les statistiques des suivis mensuels"""
-        query = select(SuiviMensuel).join(Inscription).join(Candidat).join(Programme)
+    # --- Rollup mensuel par programme ---
 
-        if filters.programme_id:
-            query = query.where(Inscription.programme_id == filters.programme_id)
-        if filters.candidat_id:
-            query = query.where(Inscription.candidat_id == filters.candidat_id)
-        if filters.mois_debut:
-            query = query.where(SuiviMensuel.mois >= filters.mois_debut)
-        if filters.mois_fin:
-            query = query.where(SuiviMensuel.mois <= filters.mois_fin)
-        if filters.score_min is not None:
-            query = query.where(SuiviMensuel.score_objectifs >= filters.score_min)
-        if filters.score_max is not None:
-            query = query.where(SuiviMensuel.score_objectifs <= filters.score_max)
-        if filters.has_commentaire is not None:
-            if filters.has_commentaire:
-                query = query.where(SuiviMensuel.commentaire.is_not(None))
-            else:
-                query = query.where(SuiviMensuel.commentaire.is_(None))
-        if filters.search_candidat:
-            search_pattern = f"%{filters.search_candidat}%"
-            query = query.where(
-                (Candidat.prenom.ilike(search_pattern)) |
-                (Candidat.nom.ilike(search_pattern))
-            )
+    @staticmethod
+    def _rollup_key(db: Session, suivi: SuiviMensuel) -> Tuple[int, date]:
+        """Clé (programme, mois) du rollup alimenté par un suivi"""
+        inscription = db.get(Inscription, suivi.inscription_id)
+        return inscription.programme_id, suivi.mois.replace(day=1)
 
-        suivis = db.exec(query).all()
-
-        # Calculer les statistiques business
-        total_suivis = len(suivis)
-        score_moyen = None
-        suivis_avec_commentaire = 0
-        ca_moyen = None
-        total_employes = 0
-        montant_subventions_total = 0
-        montant_dettes_total = 0
-        montant_equity_total = 0
-
-        if total_suivis > 0:
-            scores = [s.score_objectifs for s in suivis if s.score_objectifs is not None]
-            score_moyen = sum(scores) / len(scores) if scores else None
-            
-            suivis_avec_commentaire = sum(1 for s in suivis if s.commentaire)
-            
-            # Statistiques business
-            ca_values = [s.chiffre_affaires_actuel for s in suivis if s.chiffre_affaires_actuel is not None]
-            ca_moyen = sum(ca_values) / len(ca_values) if ca_values else None
-            
-            total_employes = sum(
-                (s.nb_stagiaires or 0) + (s.nb_alternants or 0) + 
-                (s.nb_cdd or 0) + (s.nb_cdi or 0) 
-                for s in suivis
+    def _rollup_query(self, db: Session, condition=None):
+        """INSERT ... SELECT des agrégats par programme et par mois"""
+        mois = debut_du_mois(db, SuiviMensuel.mois)
+        query = (
+            select(
+                Inscription.programme_id,
+                mois.label("mois"),
+                *agregats_suivis(),
+                func.current_timestamp().label("maj_le"),
             )
-            
-            montant_subventions_total = sum(
-                s.montant_subventions_obtenues for s in suivis 
-                if s.montant_subventions_obtenues is not None
-            )
-            
-            montant_dettes_total = sum(
-                (s.montant_dettes_effectuees or 0) + (s.montant_dettes_encours or 0) + 
-                (s.montant_dettes_envisagees or 0) for s in suivis
-            )
-            
-            montant_equity_total = sum(
-                (s.montant_equity_effectue or 0) + (s.montant_equity_encours or 0) 
-                for s in suivis
+            .join(Inscription, Inscription.id == SuiviMensuel.inscription_id)
+            .group_by(Inscription.programme_id, mois)
+        )
+        return query.where(condition) if condition is not None else query
+
+    def refresh_rollup(self, db: Session, keys: Iterable[Tuple[int, date]]) -> None:
+        """Recalculer les mois touchés, dans la transaction qui écrit le suivi (sans commit)"""
+        keys = {(programme_id, mois.replace(day=1)) for programme_id, mois in keys}
+        if not keys:
+            return
+        db.flush()
+        # Les mois vidés par une suppression ou un déplacement disparaissent du rollup
+        db.execute(delete(SuiviMensuelRollup).where(
+            tuple_(SuiviMensuelRollup.programme_id, SuiviMensuelRollup.mois).in_(keys)
+        ))
+        # Produit programmes x mois : les groupes recalculés en plus restent exacts
+        upsert_from_select(db, SuiviMensuelRollup, self._rollup_query(
+            db,
+            Inscription.programme_id.in_({programme_id for programme_id, _ in keys})
+            & debut_du_mois(db, SuiviMensuel.mois).in_({mois for _, mois in keys})
+        ))
+
+    def rebuild_rollup(self, db: Session) -> int:
+        """Reconstruire tout le rollup mensuel (sans commit)"""
+        db.flush()
+        db.execute(delete(SuiviMensuelRollup))
+        count = upsert_from_select(db, SuiviMensuelRollup, self._rollup_query(db))
+        print(f"📊 Rollup des suivis mensuels reconstruit: {count} mois-programmes")
+        return count
+
+    def _ensure_rollup(self, db: Session) -> None:
+        """Construire le rollup au premier usage si la table vient d'être créée"""
+        if SuiviMensuelService._rollup_verifie:
+            return
+        rollup_vide = not db.exec(select(exists(select(SuiviMensuelRollup.programme_id)))).one()
+        if rollup_vide and db.exec(select(exists(select(SuiviMensuel.id)))).one():
+            self.rebuild_rollup(db)
+            db.commit()
+        SuiviMensuelService._rollup_verifie = True
+
+    @staticmethod
+    def _rollup_suffit(filters: SuiviMensuelFilter) -> bool:
+        """Le rollup répond seul quand seuls le programme et la période sont filtrés"""
+        autres = filters.dict(exclude={"programme_id", "mois_debut", "mois_fin"}, exclude_none=True)
+        return not autres
+
+    def get_suivi_mensuel_stats(self, db: Session, filters: SuiviMensuelFilter) -> SuiviMensuelStats:
+        """Calculer les statistiques des suivis mensuels (agrégats SQL, rollup si possible)"""
+        if self._rollup_suffit(filters):
+            self._ensure_rollup(db)
+            rollup = SuiviMensuelRollup
+            query = select(*[
+                func.coalesce(func.sum(getattr(rollup, nom)), 0).label(nom) for nom in AGREGATS_ROLLUP
+            ])
+            if filters.programme_id:
+                query = query.where(rollup.programme_id == filters.programme_id)
+            if filters.mois_debut:
+                query = query.where(rollup.mois >= filters.mois_debut)
+            if filters.mois_fin:
+                query = query.where(rollup.mois <= filters.mois_fin)
+        else:
+            query = self._apply_filters(
+                select(*agregats_suivis())
+                .join(Inscription, Inscription.id == SuiviMensuel.inscription_id)
+                .join(Candidat, Candidat.id == Inscription.candidat_id),
+                filters,
             )
+        agregats = db.exec(query).one()._mapping
+
+        total_suivis = agregats["nb_suivis"]
+        suivis_avec_commentaire = agregats["nb_avec_commentaire"]
+        score_moyen = _moyenne(agregats["somme_scores"], agregats["nb_scores"])
+        ca_moyen = _moyenne(agregats["somme_ca"], agregats["nb_ca"])
 
         # Find candidates without any suivi for the given program
         candidats_sans_suivi_list = []
@@ -228,12 +307,50 @@ class SuiviMensuelService:
             suivis_sans_commentaire=total_suivis - suivis_avec_commentaire,
             candidats_sans_suivi=candidats_sans_suivi_list,
             ca_moyen=round(ca_moyen, 2) if ca_moyen is not None else None,
-            total_employes=total_employes,
-            montant_subventions_total=round(montant_subventions_total, 2),
-            montant_dettes_total=round(montant_dettes_total, 2),
-            montant_equity_total=round(montant_equity_total, 2)
+            total_employes=agregats["total_employes"],
+            montant_subventions_total=round(agregats["montant_subventions_total"], 2),
+            montant_dettes_total=round(agregats["montant_dettes_total"], 2),
+            montant_equity_total=round(agregats["montant_equity_total"], 2)
         )
 
+    def get_series_mensuelles(
+        self,
+        db: Session,
+        programme_id: Optional[int] = None,
+        mois_debut: Optional[date] = None,
+        mois_fin: Optional[date] = None,
+    ) -> List[Dict[str, Any]]:
+        """Série temporelle mensuelle (tous programmes confondus si programme_id est absent)"""
+        self._ensure_rollup(db)
+        rollup = SuiviMensuelRollup
+        query = select(
+            rollup.mois,
+            *[func.sum(getattr(rollup, nom)).label(nom) for nom in AGREGATS_ROLLUP],
+        ).group_by(rollup.mois).order_by(rollup.mois)
+        if programme_id:
+            query = query.where(rollup.programme_id == programme_id)
+        if mois_debut:
+            query = query.where(rollup.mois >= mois_debut.replace(day=1))
+        if mois_fin:
+            query = query.where(rollup.mois <= mois_fin)
+
+        series = []
+        for row in db.exec(query).all():
+            score_moyen = _moyenne(row.somme_scores, row.nb_scores)
+            ca_moyen = _moyenne(row.somme_ca, row.nb_ca)
+            series.append({
+                "mois": row.mois.strftime("%Y-%m"),
+                "nb_suivis": row.nb_suivis,
+                "suivis_avec_commentaire": row.nb_avec_commentaire,
+                "score_moyen": round(score_moyen, 1) if score_moyen is not None else None,
+                "ca_moyen": round(ca_moyen, 2) if ca_moyen is not None else None,
+                "total_employes": row.total_employes,
+                "montant_subventions_total": round(row.montant_subventions_total, 2),
+                "montant_dettes_total": round(row.montant_dettes_total, 2),
+                "montant_equity_total": round(row.montant_equity_total, 2),
+            })
+        return series
+
     def get_inscriptions_for_form(self, db: Session) -> List[dict]:
         """Récupérer les inscriptions pour le formulaire"""
         inscriptions = db.exec(
@@ -2,12 +2,17 @@
 Configuration des templates Jinja2
 """
 from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
 from pathlib import Path
 import sys
 import os
+import tempfile
+import time
 from datetime import datetime
 import logging
 
+from app_lia_web.core.template_cache import FragmentCacheExtension, render_stats, ttl_cached
+
 # Configuration du logger
 logger = logging.getLogger(__name__)
 
@@ -33,8 +38,25 @@ else:
     TEMPLATES_DIR = BASE_DIR / "app" / "templates"
 
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+templates.env.add_extension(FragmentCacheExtension)  # balise {% cache %} pour les menus
+
+_render_template_response = templates.TemplateResponse
+
+
+def timed_template_response(*args, **kwargs):
+    """TemplateResponse chronométré : durée ajoutée en en-tête Server-Timing et dans render_stats"""
+    started = time.perf_counter()
+    response = _render_template_response(*args, **kwargs)
+    duration_ms = (time.perf_counter() - started) * 1000
+    template_name = getattr(getattr(response, "template", None), "name", None) or "inconnu"
+    response.headers.append("Server-Timing", f'tpl;dur={duration_ms:.1f};desc="{template_name}"')
+    render_stats.record(template_name, duration_ms)
+    logger.debug(f"🖼️ Rendu {template_name} en {duration_ms:.1f} ms")
+    return response
 
 
+templates.TemplateResponse = timed_template_response
+
 
 # Filtres personnalisés pour Jinja2
 def format_date(value):
@@ -231,27 +253,30 @@ templates.env.filters["format_email"] = format_email
 templates.env.filters["format_number_french"] = format_number_french
 
 def get_active_programmes():
-    """Récupère tous les programmes actifs pour le menu (lazy loading)"""
+    """Récupère les programmes actifs pour le menu depuis le registre en mémoire (pas de requête par rendu)"""
     try:
-        from app_lia_web.core.database import get_session
-        from app_lia_web.app.models.base import Programme
-        from sqlmodel import Session, select
-        
-        # Créer une session temporaire
-        session = next(get_session())
-        try:
-            programmes = session.exec(select(Programme).where(Programme.actif == True).order_by(Programme.code)).all()
-            return programmes
-        finally:
-            session.close()
+        from app_lia_web.app.services.programme_service import programme_registry
+
+        return programme_registry.active_programmes()
     except Exception as e:
         print(f"Erreur lors de la récupération des programmes: {e}")
         return []
 
+# Marqueurs d'URL qui activent une entrée des menus programmes (voir base.html)
+MENU_SECTIONS = ("/accueil", "/rendez-vous", "/seminaires", "/events", "/codev", "/elearning", "/suivi-mensuel")
+
+def get_menu_section(request):
+    """Section de menu active pour la requête, utilisée comme clé du cache des menus"""
+    if not request:
+        return ""
+    path = request.url.path
+    return next((section for section in MENU_SECTIONS if section in path), "")
+
 def get_current_time():
     """Fonction pour obtenir l'heure actuelle dans les templates"""
     return datetime.now()
 
+@ttl_cached(60)
 def get_company_logo_url():
     """Obtenir l'URL du logo de l'entreprise via path_config"""
     if path_config and settings:
@@ -287,6 +312,7 @@ def get_company_logo_path():
     # Fallback
     return None
 
+@ttl_cached(60)
 def company_logo_exists():
     """Vérifier si le logo de l'entreprise existe"""
     if path_config and settings:
@@ -341,6 +367,14 @@ def list_company_files(subfolder: str = "compagnie") -> list:
 # Configuration globale des templates
 if settings:
     templates.env.auto_reload = bool(settings.DEBUG)
+    if not settings.DEBUG:
+        # Templates compilés une seule fois puis relus depuis le disque aux démarrages suivants
+        bytecode_dir = settings.TEMPLATE_BYTECODE_CACHE_DIR or os.path.join(tempfile.gettempdir(), "lia_jinja_cache")
+        try:
+            os.makedirs(bytecode_dir, exist_ok=True)
+            templates.env.bytecode_cache = FileSystemBytecodeCache(bytecode_dir)
+        except OSError as e:
+            logger.warning(f"Cache de bytecode Jinja2 désactivé ({bytecode_dir}): {e}")
     templates.env.globals.update(
         # === INFORMATIONS DE L'ENTREPRISE ===
         app_name=settings.APP_NAME,
@@ -369,6 +403,7 @@ if settings:
         get_current_programme_title=get_current_programme_title,
         get_current_programme_from_session=get_current_programme_from_session,
         get_programmes=get_active_programmes,  # ← Fonction pour éviter les conflits
+        get_menu_section=get_menu_section,
         get_company_logo_url=get_company_logo_url,
         get_company_logo_path=get_company_logo_path,
         get_company_file_url=get_company_file_url,
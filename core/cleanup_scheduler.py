@@ -1,22 +1,46 @@
+"""
+Tâches planifiées : fichiers temporaires, uploads abandonnés, rollups e-learning
+
+Chaque worker démarre le scheduler, mais une seule instance exécute les tâches :
+celle qui détient le verrou consultatif PostgreSQL VERROU_PLANIFICATEUR, pris
+sur une connexion gardée ouverte. Si ce worker s'arrête, la connexion se ferme
+et un autre worker prend le verrou à sa prochaine échéance.
+"""
+import functools
 import os
+import threading
 import time
 from apscheduler.schedulers.background import BackgroundScheduler
-from app_lia_web.core.config import STATIC_IMAGES_DIR, STATIC_MAPS_DIR, FICHIERS_DIR
+from sqlalchemy import text
+from app_lia_web.core.config import settings
+from app_lia_web.core.metrics import tache_mesuree
+
+STATIC_IMAGES_DIR = settings.STATIC_IMAGES_DIR
+STATIC_MAPS_DIR = settings.STATIC_MAPS_DIR
+FICHIERS_DIR = settings.FICHIERS_DIR
 
 # === Paramètres === 10080=Une semaine
+# Seuls les fichiers générés (préfixe dédié) sont purgés : les mêmes dossiers
+# contiennent des fichiers permanents (logo.png, utilisateur.png, entreprise_data.csv...)
 CLEANUP_CONFIG = [
     {
-        "folder": STATIC_IMAGES_DIR ,
-        "extensions": (".png", ".jpg", ".jpeg"),
+        # Captures des cartes QPV (service_qpv)
+        "folder": STATIC_IMAGES_DIR,
+        "prefixes": ("map_",),
+        "extensions": (".png",),
         "age_limit_minutes": 1440
     },
     {
+        # Feuilles d'émargement PDF, terminées ou abandonnées (feuille_emargement_service)
         "folder": FICHIERS_DIR,
-        "extensions": (".png", ".jpg", ".jpeg",".zip",".html", ".pdf", ".csv"),
+        "prefixes": ("emargement_",),
+        "extensions": (".pdf", ".part"),
         "age_limit_minutes": 3360
     },
     {
+        # Cartes QPV interactives (service_qpv)
         "folder": STATIC_MAPS_DIR,
+        "prefixes": ("map_",),
         "extensions": (".html",),
         "age_limit_minutes": 1440
     }
@@ -24,10 +48,64 @@ CLEANUP_CONFIG = [
 
 scheduler = BackgroundScheduler()
 
+VERROU_PLANIFICATEUR = "lia_cleanup_scheduler"
+_connexion_verrou = None
+_verrou_local = threading.Lock()
+
+def _detient_verrou() -> bool:
+    """Vrai si ce processus exécute les tâches (verrou consultatif pris ou déjà détenu)"""
+    global _connexion_verrou
+    from app_lia_web.core.database import engine
+
+    if engine.dialect.name != "postgresql":
+        # Base locale (SQLite) : un seul processus
+        return True
+    with _verrou_local:
+        if _connexion_verrou is not None:
+            try:
+                _connexion_verrou.execute(text("SELECT 1"))
+                return True
+            except Exception:
+                # Connexion perdue : le verrou est libéré côté serveur
+                _connexion_verrou.invalidate()
+                _connexion_verrou = None
+        connexion = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            obtenu = connexion.execute(
+                text("SELECT pg_try_advisory_lock(hashtext(:nom))"), {"nom": VERROU_PLANIFICATEUR}
+            ).scalar()
+        except Exception:
+            connexion.close()
+            raise
+        if not obtenu:
+            connexion.close()
+            return False
+        _connexion_verrou = connexion
+        print(f"🔒 Tâches planifiées exécutées par le processus {os.getpid()}")
+        return True
+
+def _liberer_verrou():
+    global _connexion_verrou
+    with _verrou_local:
+        if _connexion_verrou is not None:
+            _connexion_verrou.close()  # fin de session : verrou consultatif libéré
+            _connexion_verrou = None
+
+def tache_unique(fonction):
+    """Tâche mesurée, exécutée seulement par le processus qui détient le verrou"""
+    mesuree = tache_mesuree(fonction)
+
+    @functools.wraps(fonction)
+    def tache():
+        if _detient_verrou():
+            return mesuree()
+    return tache
+
 def cleanup_temp_files():
     now = time.time()
     for config in CLEANUP_CONFIG:
         folder = config["folder"]
+        prefixes = config["prefixes"]
         extensions = config["extensions"]
         age_limit = config["age_limit_minutes"]
 
@@ -39,7 +117,11 @@ def cleanup_temp_files():
 
         for filename in os.listdir(folder):
             file_path = os.path.join(folder, filename)
-            if os.path.isfile(file_path) and file_path.lower().endswith(extensions):
+            if (
+                filename.startswith(prefixes)
+                and filename.lower().endswith(extensions)
+                and os.path.isfile(file_path)
+            ):
                 file_age = now - os.path.getmtime(file_path)
                 if file_age > age_limit * 60:
                     try:
@@ -51,10 +133,32 @@ def cleanup_temp_files():
         if deleted_files:
             print(f"🧹 {len(deleted_files)} fichiers supprimés de {folder} :", deleted_files)
 
+def cleanup_stale_uploads():
+    """Supprime les sessions d'upload par morceaux abandonnées"""
+    from app_lia_web.app.services.chunked_upload_service import ChunkedUploadService
+
+    deleted = ChunkedUploadService.cleanup_stale_uploads()
+    if deleted:
+        print(f"🧹 {deleted} sessions d'upload abandonnées supprimées")
+
+def refresh_elearning_rollups():
+    """Recalcule les rollups de programme e-learning (modules terminés, score moyen)"""
+    from sqlmodel import Session
+    from app_lia_web.core.database import engine
+    from app_lia_web.app.services import elearning_rollup
+
+    with Session(engine) as session:
+        elearning_rollup.refresh_programmes(session)
+        session.commit()
+
 def start_cleanup_scheduler():
     if not scheduler.running:
         # Nettoyage quotidien à 01h00 du matin
-        scheduler.add_job(cleanup_temp_files, "cron", hour=1, minute=0)
+        scheduler.add_job(tache_unique(cleanup_temp_files), "cron", hour=1, minute=0)
+        # Sessions d'upload par morceaux : toutes les heures
+        scheduler.add_job(tache_unique(cleanup_stale_uploads), "interval", hours=1)
+        # Rollups de programme e-learning : toutes les 15 minutes
+        scheduler.add_job(tache_unique(refresh_elearning_rollups), "interval", minutes=15)
         scheduler.start()
         #print("✅ Scheduler de nettoyage lancé (quotidien à 01h00).")
     else:
@@ -62,5 +166,7 @@ def start_cleanup_scheduler():
         #print("🔁 Scheduler déjà actif.")
 
 def stop_cleanup_scheduler():
-    scheduler.shutdown()
+    if scheduler.running:
+        scheduler.shutdown()
+    _liberer_verrou()
     #print("🛑 Scheduler arrêté proprement.")
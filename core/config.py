@@ -92,10 +92,23 @@ class Settings(BaseSettings):
     ]
     ALLOWED_DOC_EXTENSIONS: List[str] = ['.pdf', '.jpg', '.jpeg', '.png', '.gif', '.doc', '.docx']
     
+    # === Rendez-vous ===
+    RDV_HEURE_OUVERTURE: int = 9    # Plage proposée pour les créneaux libres
+    RDV_HEURE_FERMETURE: int = 18
+    RDV_JOURS_OUVRES: List[int] = [0, 1, 2, 3, 4]  # lundi = 0
+
     # === Chemins des fichiers ===
     UPLOAD_DIR: str = "uploads"
+    CHUNKED_UPLOAD_DIR: str = "uploads_partiels"  # Sessions d'upload par morceaux (hors de /media)
     STATIC_DOCS_DIR: str = "static/documents"
-    
+
+    # === Téléchargements (voir core/file_delivery.py) ===
+    # "" = envoi par l'application, "x-accel" = nginx (X-Accel-Redirect), "x-sendfile" = Apache / lighttpd
+    FILE_OFFLOAD: str = ""
+    FILE_OFFLOAD_INTERNAL_PREFIX: str = "/_fichiers_internes"  # locations "internal" du serveur frontal
+    FILE_URL_SECRET: Optional[str] = None  # secret des liens signés (secure_link nginx), SECRET_KEY par défaut
+    SIGNED_URL_TTL_SECONDS: int = 300
+
     # === Propriétés calculées (s'exécutent seulement quand appelées) ===
     @property
     def STATIC_DIR(self) -> Path:
@@ -139,6 +152,22 @@ class Settings(BaseSettings):
     SECURITY_HEADERS_ENABLED: bool = False
     CORS_ALLOW_ALL: bool = False
 
+    # Démarrage rapide : migrations sautées si la version de schéma est inchangée,
+    # vérifications non critiques en tâche de fond
+    FAST_BOOT: bool = False
+
+    # Instrumentation SQL par requête (voir core/sql_budget.py)
+    SQL_DEBUG_HEADERS: bool = False  # en-têtes X-SQL-Queries, X-SQL-Time-Ms, X-SQL-N-Plus-One
+    SQL_BUDGET_STRICT: bool = False  # dépassement du budget @budget_sql : exception au lieu d'un avertissement
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5  # exécutions d'une même forme de requête signalées comme N+1
+
+    # Métriques Prometheus sur /metrics (voir core/metrics.py), désactivées par défaut
+    METRICS_ENABLED: bool = False
+    METRICS_TOKEN: Optional[str] = None  # en-tête "Authorization: Bearer <token>" exigé ; hors DEBUG, /metrics refusé sans jeton
+
+    # Cache de bytecode Jinja2 (activé hors DEBUG) ; None = dossier temporaire du système
+    TEMPLATE_BYTECODE_CACHE_DIR: Optional[str] = None
+
     # === Divers ===
     ADMIN_EMAIL: str = "sorolassina58@gmail.com"
     MAX_FILE_SIZE: int = 10_485_760  # 10MB
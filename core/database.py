@@ -10,6 +10,7 @@ from typing import Generator
 from sqlmodel import SQLModel, Session, create_engine
 from sqlalchemy import text
 from app_lia_web.core.config import settings
+from app_lia_web.core.metrics import instrumenter_pool
 import logging
 from fastapi import Request, Depends
 from typing import Optional
@@ -47,6 +48,7 @@ engine = create_engine(
     echo=settings.DEBUG,
     connect_args=CONNECT_ARGS
 )
+instrumenter_pool(engine)
 print("✅",settings.DATABASE_URL)
 
 def create_db_and_tables() -> None:
@@ -66,6 +68,26 @@ def get_session() -> Generator[Session, None, None]:
     with Session(engine) as session:
         yield session
 
+def upsert_from_select(session: Session, model, query) -> int:
+    """INSERT ... SELECT ... ON CONFLICT (clé primaire) DO UPDATE, pour les tables d'agrégats
+
+    Les colonnes de `query` doivent porter les noms des colonnes de la table.
+    """
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+    table = model.__table__
+    # SQLite n'est utilisé que par les tests
+    insert = sqlite_insert if session.get_bind().dialect.name == "sqlite" else pg_insert
+    columns = [column.name for column in query.selected_columns]
+    statement = insert(table).from_select(columns, query)
+    keys = [column.name for column in table.primary_key]
+    statement = statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={name: statement.excluded[name] for name in columns if name not in keys},
+    )
+    return session.execute(statement).rowcount
+
 # (facultatif) Test de connexion
 def test_db_connection() -> bool:
     with engine.connect() as conn:
@@ -16,9 +16,17 @@ logger = logging.getLogger(__name__)
 class EnumValidationMiddleware:
     """Middleware pour valider les enums au démarrage"""
     
-    def __init__(self, app: FastAPI):
+    def __init__(self, app: FastAPI, defer: bool = False):
         self.app = app
         self.validation_result: Dict[str, Any] = {}
+        if defer:
+            # La validation sera lancée par le démarrage (éventuellement en tâche de fond)
+            self.validation_result = {"status": "pending"}
+        else:
+            self._validate_on_startup()
+    
+    def validate(self):
+        """Lance (ou relance) la validation des enums"""
         self._validate_on_startup()
     
     def _validate_on_startup(self):
@@ -67,11 +75,14 @@ class EnumValidationMiddleware:
         return self.validation_result.get("status") == "success"
 
 # Fonction pour ajouter le middleware à l'application
-def add_enum_validation_middleware(app: FastAPI):
-    """Ajoute le middleware de validation des enums"""
+def add_enum_validation_middleware(app: FastAPI, defer: bool = False):
+    """
+    Ajoute le middleware de validation des enums.
+    Avec defer=True, aucune requête n'est exécutée à l'import : appeler validate() au démarrage.
+    """
     
     # Créer le middleware
-    enum_middleware = EnumValidationMiddleware(app)
+    enum_middleware = EnumValidationMiddleware(app, defer=defer)
     
     # Ajouter une route pour consulter le statut
     @app.get("/admin/enum-validation-status")
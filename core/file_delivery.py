@@ -0,0 +1,152 @@
+"""
+Envoi des fichiers : par l'application ou délégué au serveur frontal
+
+Après le contrôle d'accès, reponse_fichier() renvoie selon settings.FILE_OFFLOAD :
+- "" (défaut) : FileResponse, les octets passent par le worker Python ;
+- "x-accel" : en-tête X-Accel-Redirect vers une location interne nginx ;
+- "x-sendfile" : en-tête X-Sendfile (Apache mod_xsendfile, lighttpd).
+
+Les liens signés (signer_url) sont au format du module secure_link de nginx,
+qui peut donc les servir sans appeler l'application ; sinon la route
+/fichiers-signes/... les vérifie et répond comme ci-dessus.
+
+Configuration nginx correspondante (racine "media", à répéter par racine) :
+
+    location /_fichiers_internes/media/ {
+        internal;
+        alias /srv/lia/media/;
+    }
+    location /fichiers-signes/media/ {
+        secure_link $arg_st,$arg_expires;
+        secure_link_md5 "$secure_link_expires$uri <FILE_URL_SECRET>";
+        if ($secure_link = "") { return 403; }
+        if ($secure_link = "0") { return 410; }
+        alias /srv/lia/media/;
+    }
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import mimetypes
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+from fastapi.responses import FileResponse, Response
+
+from app_lia_web.core.config import settings
+from app_lia_web.core.path_config import path_config
+
+logger = logging.getLogger(__name__)
+
+MODES_OFFLOAD = ("", "x-accel", "x-sendfile")
+PREFIXE_URL_SIGNEE = "/fichiers-signes"
+
+
+def racines() -> Dict[str, Path]:
+    """Dossiers servis, par nom de racine (celui des locations du serveur frontal)"""
+    return {
+        "media": Path(path_config.get_mount_directory("media")),
+        "files": Path(path_config.get_mount_directory("files")),
+        "uploads": Path(settings.UPLOAD_DIR),
+    }
+
+
+def localiser(chemin: Path) -> Optional[Tuple[str, str]]:
+    """(racine, chemin relatif POSIX) du fichier, None s'il est hors des racines servies"""
+    chemin = Path(chemin).resolve()
+    for nom, dossier in racines().items():
+        try:
+            return nom, chemin.relative_to(dossier.resolve()).as_posix()
+        except ValueError:
+            continue
+    return None
+
+
+def content_disposition(filename: str, inline: bool = False) -> str:
+    """En-tête Content-Disposition, nom non ASCII encodé selon la RFC 5987 (comme FileResponse)"""
+    type_ = "inline" if inline else "attachment"
+    encode = quote(filename)
+    if encode != filename:
+        return f"{type_}; filename*=utf-8''{encode}"
+    return f'{type_}; filename="{filename}"'
+
+
+def reponse_fichier(
+    chemin: Path,
+    *,
+    filename: Optional[str] = None,
+    media_type: Optional[str] = None,
+    inline: bool = False,
+) -> Response:
+    """Réponse de téléchargement d'un fichier dont l'accès a déjà été vérifié"""
+    chemin = Path(chemin)
+    filename = filename or chemin.name
+    media_type = media_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    mode = settings.FILE_OFFLOAD
+    if mode not in MODES_OFFLOAD:
+        raise ValueError(f"FILE_OFFLOAD inconnu : {mode!r} (attendu : {', '.join(repr(m) for m in MODES_OFFLOAD)})")
+
+    if mode:
+        emplacement = localiser(chemin)
+        if emplacement is None:
+            logger.warning(f"⚠️ {chemin} hors des racines servies : envoi par l'application")
+        else:
+            racine, relatif = emplacement
+            if mode == "x-accel":
+                cible = {"X-Accel-Redirect": f"{settings.FILE_OFFLOAD_INTERNAL_PREFIX}/{racine}/{quote(relatif)}"}
+            else:
+                # Encodé en URL (décodé par mod_xsendfile >= 0.10) : un en-tête n'accepte que du latin-1
+                cible = {"X-Sendfile": quote(str(chemin.resolve()))}
+            # Le serveur frontal remplace le corps vide et conserve ces en-têtes
+            return Response(
+                media_type=media_type,
+                headers={**cible, "Content-Disposition": content_disposition(filename, inline)},
+            )
+
+    return FileResponse(
+        path=str(chemin),
+        media_type=media_type,
+        filename=filename,
+        content_disposition_type="inline" if inline else "attachment",
+    )
+
+
+# ===== LIENS SIGNÉS =====
+
+def _secret() -> str:
+    return settings.FILE_URL_SECRET or settings.SECRET_KEY
+
+
+def _signature(uri: str, expires: int) -> str:
+    # secure_link_md5 "$secure_link_expires$uri <secret>" : MD5 imposé par nginx
+    empreinte = hashlib.md5(f"{expires}{uri} {_secret()}".encode("utf-8")).digest()
+    return base64.urlsafe_b64encode(empreinte).decode("ascii").rstrip("=")
+
+
+def signer_url(racine: str, relatif: str, ttl_seconds: Optional[int] = None) -> str:
+    """Lien de téléchargement valable ttl_seconds, sans session ni requête en base"""
+    if racine not in racines():
+        raise ValueError(f"Racine inconnue : {racine}")
+    expires = int(time.time()) + (settings.SIGNED_URL_TTL_SECONDS if ttl_seconds is None else ttl_seconds)
+    uri = f"{PREFIXE_URL_SIGNEE}/{racine}/{relatif.lstrip('/')}"
+    return f"{quote(uri)}?{urlencode({'expires': expires, 'st': _signature(uri, expires)})}"
+
+
+def signer_fichier(chemin: Path, ttl_seconds: Optional[int] = None) -> str:
+    """Lien signé vers un fichier situé dans une des racines servies"""
+    emplacement = localiser(chemin)
+    if emplacement is None:
+        raise ValueError(f"{chemin} hors des racines servies")
+    return signer_url(*emplacement, ttl_seconds=ttl_seconds)
+
+
+def verifier_signature(uri: str, expires: int, signature: str) -> Optional[str]:
+    """None si le lien est valide, sinon le motif du refus ("signature" ou "expire")"""
+    if not hmac.compare_digest(_signature(uri, expires), signature):
+        return "signature"
+    if expires < time.time():
+        return "expire"
+    return None
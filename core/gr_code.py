@@ -1,11 +1,198 @@
-import qrcode
+# app/core/gr_code.py
+"""
+QR codes des liens d'invitation et d'émargement
+
+Un même lien produit toujours le même code : les codes sont gardés dans un
+cache LRU par (format, contenu, taille de module, marge). Le format SVG est
+construit directement depuis la matrice (ni Pillow ni encodage PNG) et pèse
+une fraction du PNG base64. generate_qr_batch produit les codes de toute une
+liste d'invitations en un appel, les codes manquants étant calculés dans un
+pool de processus au-delà de SEUIL_POOL.
+
+Le pool est unique par worker, créé au premier lot et arrêté avec
+l'application (arreter_pool). Ses processus démarrent en "spawn" : un fork
+depuis un worker multi-thread (pool de threads, scheduler) peut hériter d'un
+verrou tenu par un autre thread et bloquer le processus enfant.
+"""
 import base64
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
+from multiprocessing import get_context
+from typing import Dict, Iterable, Optional, Tuple
 
-def generate_qr_base64(link: str) -> str:
-    qr = qrcode.make(link)
+from app_lia_web.core.lazy_import import LazyModule
+
+# qrcode (et Pillow) ne sont chargés qu'à la première génération
+qrcode = LazyModule("qrcode")
+
+TAILLE_CACHE_QR = 2048
+SEUIL_POOL = 64  # codes manquants à partir desquels le calcul part dans un pool de processus
+FORMATS = ("png", "svg")
+
+Cle = Tuple[str, str, int, int]  # (format, contenu, taille de module, marge)
+
+
+class CacheQR:
+    """LRU des codes générés, partagé entre les threads du worker"""
+
+    def __init__(self, taille: int = TAILLE_CACHE_QR):
+        self.taille = taille
+        self._codes: "OrderedDict[Cle, str]" = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def lire(self, cle: Cle) -> Optional[str]:
+        with self._verrou:
+            code = self._codes.get(cle)
+            if code is not None:
+                self._codes.move_to_end(cle)
+            return code
+
+    def ecrire(self, cle: Cle, code: str) -> None:
+        with self._verrou:
+            self._codes[cle] = code
+            self._codes.move_to_end(cle)
+            while len(self._codes) > self.taille:
+                self._codes.popitem(last=False)
+
+    def vider(self) -> None:
+        with self._verrou:
+            self._codes.clear()
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+
+cache_qr = CacheQR()
+
+_pool: Optional[ProcessPoolExecutor] = None
+_verrou_pool = threading.Lock()
+
+
+def _pool_processus(processus: Optional[int]) -> ProcessPoolExecutor:
+    """Pool du worker, créé au premier appel avec `processus` processus (nombre de CPU par défaut)"""
+    global _pool
+    with _verrou_pool:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=processus, mp_context=get_context("spawn"))
+        return _pool
+
+
+def arreter_pool() -> None:
+    """Arrête le pool de processus (arrêt de l'application) ; le prochain lot en recrée un"""
+    global _pool
+    with _verrou_pool:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _matrice(contenu: str, marge: int):
+    qr = qrcode.QRCode(border=marge, error_correction=qrcode.constants.ERROR_CORRECT_M)
+    qr.add_data(contenu)
+    qr.make(fit=True)
+    return qr
+
+
+def _svg(contenu: str, taille_module: int, marge: int) -> str:
+    """Un seul <path> : chaque suite horizontale de modules noirs devient un rectangle"""
+    matrice = _matrice(contenu, marge).get_matrix()
+    cote = len(matrice)
+    traces = []
+    for y, ligne in enumerate(matrice):
+        x = 0
+        while x < cote:
+            if ligne[x]:
+                debut = x
+                while x < cote and ligne[x]:
+                    x += 1
+                traces.append(f"M{debut} {y}h{x - debut}v1h-{x - debut}z")
+            else:
+                x += 1
+    pixels = cote * taille_module
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+        f'viewBox="0 0 {cote} {cote}" shape-rendering="crispEdges">'
+        f'<rect width="{cote}" height="{cote}" fill="#fff"/><path fill="#000" d="{"".join(traces)}"/></svg>'
+    )
+
+
+def _png_base64(contenu: str, taille_module: int, marge: int) -> str:
+    qr = _matrice(contenu, marge)
+    qr.box_size = taille_module
     buffer = BytesIO()
-    qr.save(buffer, format="PNG")
-    buffer.seek(0)
-    img_base64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
-    return f"data:image/png;base64,{img_base64}"
\ No newline at end of file
+    qr.make_image().save(buffer, format="PNG")
+    return f"data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode('utf-8')}"
+
+
+def _generer(cle: Cle) -> str:
+    format_code, contenu, taille_module, marge = cle
+    if format_code == "svg":
+        return _svg(contenu, taille_module, marge)
+    return _png_base64(contenu, taille_module, marge)
+
+
+def _cle(contenu: str, format_code: str, taille_module: int, marge: int) -> Cle:
+    if format_code not in FORMATS:
+        raise ValueError(f"Format de QR code inconnu: {format_code}")
+    return (format_code, contenu, taille_module, marge)
+
+
+def generate_qr(contenu: str, format_code: str = "png", taille_module: int = 10, marge: int = 4) -> str:
+    """QR code en data URL PNG ou en SVG (balise complète), depuis le cache si possible"""
+    cle = _cle(contenu, format_code, taille_module, marge)
+    code = cache_qr.lire(cle)
+    if code is None:
+        code = _generer(cle)
+        cache_qr.ecrire(cle, code)
+    return code
+
+
+def generate_qr_base64(link: str) -> str:
+    return generate_qr(link, "png")
+
+
+def generate_qr_svg(link: str, taille_module: int = 4) -> str:
+    return generate_qr(link, "svg", taille_module)
+
+
+def png_depuis_data_url(code: str) -> bytes:
+    """Octets PNG d'un code data URL, à joindre en image inline (cid:) d'un email
+
+    Gmail et Outlook bloquent les images data: dans le corps des emails.
+    """
+    return base64.b64decode(code.split(",", 1)[1])
+
+
+def generate_qr_batch(
+    contenus: Iterable[str],
+    format_code: str = "png",
+    taille_module: int = 10,
+    marge: int = 4,
+    processus: Optional[int] = None,
+) -> Dict[str, str]:
+    """Codes de toute une liste en un appel : {contenu: code}
+
+    Les codes absents du cache sont calculés dans le pool de processus du
+    worker s'ils sont au moins SEUIL_POOL, sur place sinon ou si processus=0.
+    `processus` fixe la taille du pool lorsque ce lot le crée.
+    """
+    cles = {contenu: _cle(contenu, format_code, taille_module, marge) for contenu in contenus}
+    codes = {}
+    manquants = []
+    for contenu, cle in cles.items():
+        code = cache_qr.lire(cle)
+        if code is None:
+            manquants.append(cle)
+        else:
+            codes[contenu] = code
+    if len(manquants) >= SEUIL_POOL and processus != 0:
+        pool = _pool_processus(processus)
+        generes = list(pool.map(_generer, manquants, chunksize=max(1, len(manquants) // 32)))
+    else:
+        generes = [_generer(cle) for cle in manquants]
+    for cle, code in zip(manquants, generes):
+        cache_qr.ecrire(cle, code)
+        codes[cle[1]] = code
+    return codes
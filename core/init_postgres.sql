@@ -117,6 +117,8 @@ END $$;
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE EXTENSION IF NOT EXISTS "pg_trgm";
 CREATE EXTENSION IF NOT EXISTS "unaccent";
+-- Contrainte d'exclusion des rendez-vous (égalité d'entier dans un index GiST)
+CREATE EXTENSION IF NOT EXISTS "btree_gist";
 
 -- Accorder les privilèges sur les extensions
 GRANT USAGE ON SCHEMA public TO :appuser;
@@ -0,0 +1,62 @@
+# app/core/lazy_import.py
+"""
+Chargement paresseux des dépendances lourdes (cartes QPV, Office, QR codes...)
+
+Les bibliothèques comme selenium, folium, shapely ou python-docx coûtent
+plusieurs centaines de millisecondes et de la mémoire à l'import. Elles ne
+sont utiles qu'à quelques fonctionnalités : on les importe au premier usage.
+
+Usage:
+    folium = LazyModule("folium")
+    folium.Map(...)  # import réel ici, une seule fois
+"""
+import importlib
+import threading
+from types import ModuleType
+from typing import Any, Callable
+
+
+class LazyModule(ModuleType):
+    """Façade de module importée au premier accès à un attribut"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_lock"] = threading.Lock()
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self) -> ModuleType:
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            with self.__dict__["_lazy_lock"]:
+                module = self.__dict__["_lazy_module"]
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.__dict__["_lazy_module"] is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "chargé" if self.is_loaded else "non chargé"
+        return f"<LazyModule {self.__name__!r} ({state})>"
+
+
+def lazy_function(module_name: str, function_name: str) -> Callable[..., Any]:
+    """Retourne une fonction qui importe son module au premier appel"""
+    module = LazyModule(module_name)
+
+    def wrapper(*args, **kwargs):
+        return getattr(module, function_name)(*args, **kwargs)
+
+    wrapper.__name__ = function_name
+    wrapper.__qualname__ = function_name
+    wrapper.__doc__ = f"Façade paresseuse de {module_name}.{function_name}"
+    return wrapper
@@ -0,0 +1,196 @@
+"""
+Métriques Prometheus du processus (exposées sur /metrics)
+
+- lia_http_request_duration_seconds : durée des requêtes par méthode, gabarit
+  de route (/events/{event_id}, pas l'URL) et code de statut ;
+- lia_http_requests_in_progress : requêtes en cours ;
+- lia_db_pool_checked_out / lia_db_pool_overflow / lia_db_pool_size : état du
+  pool de connexions, mis à jour à chaque checkout / checkin (débordement :
+  connexions utilisées au-delà de pool_size) ;
+- lia_db_queries_per_request : requêtes SQL par requête HTTP (compteur de
+  core/sql_budget.py) ;
+- lia_external_call_duration_seconds : appels SMTP, géocodage, Selenium ;
+- lia_scheduler_job_duration_seconds : tâches APScheduler.
+
+Multi-processus (uvicorn --workers N, gunicorn) : définir
+PROMETHEUS_MULTIPROC_DIR vers un dossier vidé avant le lancement et partagé
+par les workers. Chaque worker écrit ses valeurs dans des fichiers mmap et
+/metrics les agrège quel que soit le worker qui répond ; les jauges ne
+comptent que les workers vivants (marquer_processus_termine() à l'arrêt).
+
+prometheus_client est optionnel : sans lui l'enregistrement ne fait rien et
+/metrics répond 503. Coût d'un enregistrement : quelques microsecondes
+(voir test/test_metrics.py).
+"""
+import functools
+import os
+import time
+from typing import Callable, Optional, TypeVar
+
+from sqlalchemy import event
+
+# prometheus_client — optionnel
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Gauge, Histogram, generate_latest, multiprocess,
+    )
+    _PROMETHEUS_AVAILABLE = True
+except Exception:  # pragma: no cover
+    _PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+ROUTE_INCONNUE = "<non routée>"  # 404 : une seule série au lieu d'une par URL
+BUCKETS_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BUCKETS_REQUETES_SQL = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+BUCKETS_JOBS = (0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0)
+
+F = TypeVar("F", bound=Callable)
+
+if _PROMETHEUS_AVAILABLE:
+    DUREE_REQUETES = Histogram(
+        "lia_http_request_duration_seconds", "Durée des requêtes HTTP",
+        ["method", "route", "status"], buckets=BUCKETS_DUREE,
+    )
+    REQUETES_EN_COURS = Gauge(
+        "lia_http_requests_in_progress", "Requêtes HTTP en cours", ["method"], multiprocess_mode="livesum",
+    )
+    REQUETES_SQL = Histogram(
+        "lia_db_queries_per_request", "Requêtes SQL par requête HTTP", ["route"], buckets=BUCKETS_REQUETES_SQL,
+    )
+    POOL_UTILISEES = Gauge(
+        "lia_db_pool_checked_out", "Connexions du pool en cours d'utilisation", multiprocess_mode="livesum",
+    )
+    POOL_DEBORDEMENT = Gauge(
+        "lia_db_pool_overflow", "Connexions utilisées au-delà de pool_size", multiprocess_mode="livesum",
+    )
+    POOL_TAILLE = Gauge("lia_db_pool_size", "Taille configurée du pool", multiprocess_mode="livesum")
+    APPELS_EXTERNES = Histogram(
+        "lia_external_call_duration_seconds", "Durée des appels aux services externes",
+        ["service", "resultat"], buckets=BUCKETS_DUREE,
+    )
+    JOBS = Histogram(
+        "lia_scheduler_job_duration_seconds", "Durée des tâches planifiées", ["job", "resultat"], buckets=BUCKETS_JOBS,
+    )
+
+
+def disponible() -> bool:
+    return _PROMETHEUS_AVAILABLE
+
+
+def multiprocessus() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def exposition() -> bytes:
+    """Texte au format Prometheus, agrégé sur tous les workers en mode multi-processus"""
+    if multiprocessus():
+        registre = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registre)
+        return generate_latest(registre)
+    return generate_latest(REGISTRY)
+
+
+def marquer_processus_termine(pid: Optional[int] = None) -> None:
+    """À l'arrêt d'un worker : ses jauges "livesum" ne sont plus comptées"""
+    if _PROMETHEUS_AVAILABLE and multiprocessus():
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+# ===== REQUÊTES HTTP =====
+
+def gabarit_route(scope) -> str:
+    """Gabarit de la route servie (renseigné par le routeur), ROUTE_INCONNUE sinon"""
+    return getattr(scope.get("route"), "path", None) or ROUTE_INCONNUE
+
+
+def observer_requetes_sql(route: str, requetes: int) -> None:
+    if _PROMETHEUS_AVAILABLE:
+        REQUETES_SQL.labels(route).observe(requetes)
+
+
+class MetricsMiddleware:
+    """Durée et requêtes en cours (ASGI pur : pas de tâche ni de copie de réponse par requête)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _PROMETHEUS_AVAILABLE:
+            await self.app(scope, receive, send)
+            return
+
+        methode = scope["method"]
+        en_cours = REQUETES_EN_COURS.labels(methode)
+        statut = 500
+
+        async def send_avec_statut(message):
+            nonlocal statut
+            if message["type"] == "http.response.start":
+                statut = message["status"]
+            await send(message)
+
+        en_cours.inc()
+        debut = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_avec_statut)
+        finally:
+            DUREE_REQUETES.labels(methode, gabarit_route(scope), str(statut)).observe(time.perf_counter() - debut)
+            en_cours.dec()
+
+
+# ===== POOL DE CONNEXIONS =====
+
+def instrumenter_pool(engine) -> None:
+    """Suit l'occupation du pool de l'engine (QueuePool ; sans effet pour les pools SQLite)"""
+    pool = engine.pool
+    if not _PROMETHEUS_AVAILABLE or not hasattr(pool, "checkedout"):
+        return
+    taille = pool.size()
+    POOL_TAILLE.set(taille)
+
+    def _publier(utilisees: int):
+        POOL_UTILISEES.set(utilisees)
+        POOL_DEBORDEMENT.set(max(utilisees - taille, 0))
+
+    event.listen(engine, "checkout", lambda *_: _publier(pool.checkedout()))
+    # checkin est émis avant le retour de la connexion dans le pool : elle est encore comptée
+    event.listen(engine, "checkin", lambda *_: _publier(pool.checkedout() - 1))
+
+
+# ===== APPELS EXTERNES ET TÂCHES PLANIFIÉES =====
+
+class appel_externe:
+    """Chronomètre un appel à un service externe : `with appel_externe("smtp"): ...`
+
+    Utilisable dans du code sync comme async ; une exception est comptée en
+    résultat "erreur" puis propagée.
+    """
+    __slots__ = ("service", "debut")
+
+    def __init__(self, service: str):
+        self.service = service
+
+    def __enter__(self):
+        self.debut = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if _PROMETHEUS_AVAILABLE:
+            APPELS_EXTERNES.labels(self.service, "erreur" if exc_type else "ok").observe(time.perf_counter() - self.debut)
+        return False
+
+
+def tache_mesuree(fonction: F) -> F:
+    """Enveloppe une tâche planifiée pour en mesurer la durée (libellé : nom de la fonction)"""
+    @functools.wraps(fonction)
+    def tache(*args, **kwargs):
+        debut = time.perf_counter()
+        resultat = "erreur"
+        try:
+            retour = fonction(*args, **kwargs)
+            resultat = "ok"
+            return retour
+        finally:
+            if _PROMETHEUS_AVAILABLE:
+                JOBS.labels(fonction.__name__, resultat).observe(time.perf_counter() - debut)
+    return tache
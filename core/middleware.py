@@ -17,6 +17,9 @@ from starlette.middleware.gzip import GZipMiddleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 
+from app_lia_web.core.metrics import MetricsMiddleware
+from app_lia_web.core.sql_budget import SQLBudgetMiddleware
+
 # SlowAPI (rate limiting) — optionnel
 try:
     from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -261,6 +264,20 @@ def setup_request_id_middleware(app: FastAPI):
     logger.info("🆔 Request ID configuré")
 
 
+def setup_metrics_middleware(app: FastAPI):
+    s = _s(app)
+    if s and not s.METRICS_ENABLED:
+        logger.info("📈 Métriques désactivées")
+        return
+    app.add_middleware(MetricsMiddleware)
+    logger.info("📈 Métriques Prometheus configurées")
+
+
+def setup_sql_budget_middleware(app: FastAPI):
+    app.add_middleware(SQLBudgetMiddleware)
+    logger.info("🧮 Budget SQL par requête configuré")
+
+
 def setup_compression_middleware(app: FastAPI):
     s = _s(app)
     if s and not s.GZIP_ENABLED:
@@ -318,10 +335,13 @@ def setup_all_middlewares(app: FastAPI, allowed_hosts: List[str], secret_key: st
     setup_user_agent_filter_middleware(app)
     setup_logging_middleware(app)
     setup_request_id_middleware(app)
+    setup_sql_budget_middleware(app)
     setup_compression_middleware(app)
     setup_cache_control_middleware(app)
     setup_security_middleware(app)
     setup_rate_limiting_middleware(app)
     setup_session_middleware(app, secret_key)
+    # Ajouté en dernier : le plus externe, il chronomètre toute la pile
+    setup_metrics_middleware(app)
 
     logger.info("✅ Tous les middlewares ont été configurés")
@@ -1,12 +1,13 @@
 
 import os
 import base64
-from app_lia_web.core.config import FICHIERS_DIR
+from typing import BinaryIO, Dict, List, Optional
+from app_lia_web.core.config import settings
 
 
 # 🔧 Exemple de fonction à adapter à ton projet
 def get_pdf_path(filename: str) -> str:
-    output_dir = FICHIERS_DIR
+    output_dir = settings.FICHIERS_DIR
     os.makedirs(output_dir, exist_ok=True)
     return os.path.join(output_dir, filename)
 
@@ -14,3 +15,113 @@ def encode_file_to_base64(file_path: str) -> str:
     with open(file_path, "rb") as f:
         return base64.b64encode(f.read()).decode("utf-8")
 
+
+# ===== PDF ÉCRIT AU FIL DE L'EAU =====
+
+A4 = (595.28, 841.89)
+POLICES = {"F1": "Helvetica", "F2": "Helvetica-Bold"}
+
+
+def texte_pdf(texte: str) -> bytes:
+    """Chaîne PDF littérale en WinAnsi (accents français), caractères spéciaux échappés"""
+    brut = texte.encode("cp1252", errors="replace")
+    return b"(" + brut.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class Canevas:
+    """Opérateurs de dessin d'une page (coordonnées en points, origine en bas à gauche)"""
+
+    def __init__(self):
+        self._operations: List[bytes] = []
+        self.images: List[str] = []
+
+    def texte(self, x: float, y: float, texte: str, taille: float = 9, gras: bool = False) -> None:
+        police = "F2" if gras else "F1"
+        self._operations.append(b"BT /%s %.1f Tf %.2f %.2f Td %s Tj ET" % (police.encode(), taille, x, y, texte_pdf(texte)))
+
+    def ligne(self, x1: float, y1: float, x2: float, y2: float, epaisseur: float = 0.5) -> None:
+        self._operations.append(b"%.2f w %.2f %.2f m %.2f %.2f l S" % (epaisseur, x1, y1, x2, y2))
+
+    def rectangle(self, x: float, y: float, largeur: float, hauteur: float, gris: float = 0.9) -> None:
+        self._operations.append(b"q %.2f g %.2f %.2f %.2f %.2f re f Q" % (gris, x, y, largeur, hauteur))
+
+    def image(self, nom: str, x: float, y: float, largeur: float, hauteur: float) -> None:
+        if nom not in self.images:
+            self.images.append(nom)
+        self._operations.append(b"q %.2f 0 0 %.2f %.2f %.2f cm /%s Do Q" % (largeur, hauteur, x, y, nom.encode()))
+
+    def contenu(self) -> bytes:
+        return b"\n".join(self._operations)
+
+
+class PdfFlux:
+    """Écriture d'un PDF directement dans un fichier
+
+    Chaque page et chaque image sont écrites dès qu'elles sont prêtes : seuls
+    les décalages des objets (table xref) restent en mémoire. Une image
+    ajoutée plusieurs fois (même clé) n'est écrite qu'une fois par document.
+    """
+
+    def __init__(self, fichier: BinaryIO, format_page=A4):
+        self.fichier = fichier
+        self.largeur, self.hauteur = format_page
+        self._decalages: Dict[int, int] = {}
+        self._pages: List[int] = []
+        self._images: Dict[str, int] = {}
+        self._prochain_objet = 3 + len(POLICES)  # 1 catalogue, 2 arbre des pages, puis polices
+        self.fichier.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        for numero, police in enumerate(POLICES.values(), start=3):
+            self._ecrire(numero, b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % police.encode())
+
+    @property
+    def nb_pages(self) -> int:
+        return len(self._pages)
+
+    def _nouvel_objet(self) -> int:
+        numero = self._prochain_objet
+        self._prochain_objet += 1
+        return numero
+
+    def _ecrire(self, numero: int, corps: bytes, flux: Optional[bytes] = None) -> None:
+        self._decalages[numero] = self.fichier.tell()
+        self.fichier.write(b"%d 0 obj\n" % numero + corps)
+        if flux is not None:
+            self.fichier.write(b"\nstream\n" + flux + b"\nendstream")
+        self.fichier.write(b"\nendobj\n")
+
+    def ajouter_image_grise(self, cle: str, largeur_px: int, hauteur_px: int, pixels_deflate: bytes) -> str:
+        """Image en niveaux de gris 8 bits déjà compressée (zlib) ; renvoie son nom de ressource"""
+        if cle not in self._images:
+            numero = self._nouvel_objet()
+            self._ecrire(numero, (
+                b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+                b"/BitsPerComponent 8 /Filter /FlateDecode /Length %d >>" % (largeur_px, hauteur_px, len(pixels_deflate))
+            ), pixels_deflate)
+            self._images[cle] = numero
+        return f"Im{self._images[cle]}"
+
+    def ajouter_page(self, canevas: Canevas) -> None:
+        contenu = canevas.contenu()
+        numero_contenu = self._nouvel_objet()
+        self._ecrire(numero_contenu, b"<< /Length %d >>" % len(contenu), contenu)
+        polices = b" ".join(b"/%s %d 0 R" % (nom.encode(), numero) for numero, nom in enumerate(POLICES, start=3))
+        images = b" ".join(b"/%s %s 0 R" % (nom.encode(), nom[2:].encode()) for nom in canevas.images)
+        numero_page = self._nouvel_objet()
+        self._ecrire(numero_page, (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] /Contents %d 0 R "
+            b"/Resources << /Font << %s >> /XObject << %s >> >> >>"
+            % (self.largeur, self.hauteur, numero_contenu, polices, images)
+        ))
+        self._pages.append(numero_page)
+
+    def fermer(self) -> None:
+        """Arbre des pages, catalogue, table xref et trailer"""
+        kids = b" ".join(b"%d 0 R" % numero for numero in self._pages)
+        self._ecrire(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._pages)))
+        self._ecrire(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        debut_xref = self.fichier.tell()
+        taille = self._prochain_objet
+        self.fichier.write(b"xref\n0 %d\n0000000000 65535 f \n" % taille)
+        for numero in range(1, taille):
+            self.fichier.write(b"%010d 00000 n \n" % self._decalages[numero])
+        self.fichier.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (taille, debut_xref))
@@ -2,17 +2,21 @@
 Système de schémas par programme - Tout en un
 Gère la création dynamique des schémas, le routage des requêtes et les modèles conscients des schémas
 """
-from typing import Optional, Union, Type, Dict, Any, List
+from typing import Optional, Union, Type, Dict, Any, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import time
 from fastapi import FastAPI, Request, Depends, HTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
 from sqlmodel import SQLModel, Session, create_engine, text, Field
-from app_lia_web.core.database import get_session
+from app_lia_web.core.database import get_session, engine
 from app_lia_web.app.models.base import (
     Programme, User, Partenaire, Groupe, PasswordRecoveryCode,
     Candidat, Preinscription, Inscription, Entreprise, Document, 
     Eligibilite, Jury, MembreJury, DecisionJuryTable, EtapePipeline,
     AvancementEtape, ActionHandicap, RendezVous, SessionProgramme,
-    SessionParticipant, SuiviMensuel, DecisionJuryCandidat,
+    SessionParticipant, SuiviMensuel, SuiviMensuelRollup, DecisionJuryCandidat,
     ReorientationCandidat, EmargementRDV, ProgrammeUtilisateur, Promotion
 )
 from app_lia_web.app.models.seminaire import (
@@ -25,7 +29,7 @@ from app_lia_web.app.models.event import (
 from app_lia_web.app.models.elearning import (
     RessourceElearning, ModuleElearning, ProgressionElearning, 
     ObjectifElearning, QuizElearning, ReponseQuiz, CertificatElearning, 
-    ModuleRessource
+    ModuleRessource, RollupElearningInscription, RollupElearningProgramme
 )
 from app_lia_web.app.models.codev import (
     SeanceCodev, PresentationCodev, ContributionCodev, ParticipationSeance,
@@ -515,6 +519,20 @@ class ProgramSchemaService:
 
 # ===== GESTIONNAIRE PRINCIPAL DES SCHÉMAS =====
 
+# Incrémenter pour forcer un re-provisionnement après une modification du générateur DDL
+PROVISIONING_VERSION = 1
+# Nombre de schémas provisionnés en parallèle au démarrage
+PROVISIONING_MAX_WORKERS = 4
+# Registre des empreintes de modèles appliquées par schéma
+PROVISIONING_REGISTRY_DDL = """
+    CREATE TABLE IF NOT EXISTS public.schema_provisioning (
+        schema_name VARCHAR(63) PRIMARY KEY,
+        fingerprint VARCHAR(64) NOT NULL,
+        manifest TEXT NOT NULL,
+        applique_le TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
 class ProgramSchemaManager:
     """Gestionnaire centralisé des schémas par programme"""
     
@@ -532,7 +550,7 @@ class ProgramSchemaManager:
             Candidat, Preinscription, Inscription, Entreprise, Document,
             Eligibilite, Jury, MembreJury, DecisionJuryTable, EtapePipeline,
             AvancementEtape, ActionHandicap, RendezVous, SessionProgramme,
-            SessionParticipant, SuiviMensuel, DecisionJuryCandidat,
+            SessionParticipant, SuiviMensuel, SuiviMensuelRollup, DecisionJuryCandidat,
             ReorientationCandidat, EmargementRDV, ProgrammeUtilisateur, Promotion,
             
             # Seminaire models
@@ -545,7 +563,7 @@ class ProgramSchemaManager:
             # E-learning models
             RessourceElearning, ModuleElearning, ProgressionElearning,
             ObjectifElearning, QuizElearning, ReponseQuiz, CertificatElearning,
-            ModuleRessource,
+            ModuleRessource, RollupElearningInscription, RollupElearningProgramme,
             
             # Codev models
             SeanceCodev, PresentationCodev, ContributionCodev, ParticipationSeance,
@@ -636,25 +654,19 @@ class ProgramSchemaManager:
     def _generate_create_table_sql(self, model, schema_name: str) -> str:
         """Génère le SQL CREATE TABLE pour un modèle SQLModel"""
         table_name = model.__tablename__
-        
-        # Obtenir les colonnes du modèle
-        columns = []
-        for field_name, field_info in model.__fields__.items():
-            if field_name == 'id' and field_info.default is None:
-                columns.append("id SERIAL PRIMARY KEY")
-            else:
-                column_def = self._get_column_definition(field_name, field_info)
-                if column_def:
-                    columns.append(column_def)
+        columns, fk_tables = self._model_ddl(model)
         
         # Obtenir les clés étrangères
-        foreign_keys = self._get_foreign_keys(model, schema_name)
+        foreign_keys = [
+            f"FOREIGN KEY ({field_name}) REFERENCES {self._fk_schema(fk_table, schema_name)}.{fk_table}(id)"
+            for field_name, fk_table in fk_tables
+        ]
         
         # Assembler le SQL
         sql_parts = [f"CREATE TABLE IF NOT EXISTS {schema_name}.{table_name} ("]
         
         # Ajouter les colonnes avec virgules
-        all_items = columns + foreign_keys
+        all_items = list(columns) + foreign_keys
         for i, item in enumerate(all_items):
             if i == len(all_items) - 1:
                 sql_parts.append(f"    {item}")  # Dernier élément sans virgule
@@ -665,6 +677,40 @@ class ProgramSchemaManager:
         
         return "\n".join(sql_parts)
     
+    # Définitions de colonnes par modèle, indépendantes du schéma (calculées une fois par processus)
+    _ddl_cache: Dict[type, Tuple[Tuple[str, ...], Tuple[Tuple[str, str], ...]]] = {}
+    
+    def _model_ddl(self, model) -> Tuple[Tuple[str, ...], Tuple[Tuple[str, str], ...]]:
+        """Retourne (définitions de colonnes, [(colonne, table référencée)]) pour un modèle"""
+        cached = self._ddl_cache.get(model)
+        if cached is not None:
+            return cached
+        
+        columns = []
+        for field_name, field_info in model.__fields__.items():
+            if field_name == 'id' and field_info.default is None:
+                columns.append("id SERIAL PRIMARY KEY")
+            else:
+                column_def = self._get_column_definition(field_name, field_info)
+                if column_def:
+                    columns.append(column_def)
+        
+        fk_tables = []
+        for field_name, field_info in model.__fields__.items():
+            foreign_key = getattr(field_info, 'foreign_key', None)
+            if foreign_key is not None and str(foreign_key) != 'PydanticUndefined':
+                try:
+                    fk_tables.append((field_name, foreign_key.split('.')[0]))
+                except (AttributeError, TypeError) as e:
+                    print(f"⚠️ Erreur clé étrangère pour {field_name}: {e}")
+        
+        cached = (tuple(columns), tuple(fk_tables))
+        self._ddl_cache[model] = cached
+        return cached
+    
+    def _fk_schema(self, fk_table: str, schema_name: str) -> str:
+        return "public" if fk_table in self.public_tables else schema_name
+    
     def _get_column_definition(self, field_name: str, field_info) -> str:
         """Génère la définition d'une colonne"""
         field_type = field_info.annotation
@@ -711,27 +757,145 @@ class ProgramSchemaManager:
     
     def _get_foreign_keys(self, model, schema_name: str) -> list:
         """Génère les définitions de clés étrangères"""
-        foreign_keys = []
+        _, fk_tables = self._model_ddl(model)
+        return [
+            f"FOREIGN KEY ({field_name}) REFERENCES {self._fk_schema(fk_table, schema_name)}.{fk_table}(id)"
+            for field_name, fk_table in fk_tables
+        ]
+    
+    # ===== PROVISIONNEMENT PAR EMPREINTE =====
+    
+    def _ordered_models(self) -> list:
+        """Modèles triés selon les dépendances de clés étrangères"""
+        order = {table.name: index for index, table in enumerate(SQLModel.metadata.sorted_tables)}
+        return sorted(self.program_models, key=lambda model: order.get(model.__tablename__, len(order)))
+    
+    def models_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Description canonique des tables à créer dans chaque schéma"""
+        manifest = {}
+        for model in self._ordered_models():
+            columns, fk_tables = self._model_ddl(model)
+            manifest[model.__tablename__] = {
+                "columns": list(columns),
+                "foreign_keys": [list(fk) for fk in fk_tables],
+            }
+        return manifest
+    
+    def models_fingerprint(self, manifest: Dict[str, Dict[str, Any]] = None) -> str:
+        """Empreinte SHA-256 des métadonnées de modèles"""
+        payload = json.dumps(
+            {"version": PROVISIONING_VERSION, "tables": manifest or self.models_manifest()},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _diff_statements(self, schema_name: str, manifest: Dict[str, Dict[str, Any]],
+                         previous: Optional[Dict[str, Dict[str, Any]]]) -> List[str]:
+        """DDL nécessaire pour passer de l'état enregistré (previous) au manifeste courant"""
+        statements = [f"CREATE SCHEMA IF NOT EXISTS {schema_name}"]
+        models = {model.__tablename__: model for model in self.program_models}
         
-        for field_name, field_info in model.__fields__.items():
-            # Vérifier que foreign_key existe et n'est pas PydanticUndefinedType
-            if (hasattr(field_info, 'foreign_key') and 
-                field_info.foreign_key is not None and 
-                str(field_info.foreign_key) != 'PydanticUndefined'):
-                
-                try:
-                    fk_table = field_info.foreign_key.split('.')[0]
-                    if fk_table in self.public_tables:
-                        fk_ref = f"public.{fk_table}(id)"
-                    else:
-                        fk_ref = f"{schema_name}.{fk_table}(id)"
-                    
-                    foreign_keys.append(f"FOREIGN KEY ({field_name}) REFERENCES {fk_ref}")
-                except (AttributeError, TypeError) as e:
-                    print(f"⚠️ Erreur clé étrangère pour {field_name}: {e}")
+        for table_name, definition in manifest.items():
+            known = (previous or {}).get(table_name)
+            if known is None:
+                statements.append(self._generate_create_table_sql(models[table_name], schema_name))
+                if previous is not None:
+                    continue
+                # Pas d'état enregistré : la table peut exister avec des colonnes manquantes
+                known = {"columns": []}
+            
+            known_names = {column.split()[0] for column in known.get("columns", [])}
+            for column in definition["columns"]:
+                name = column.split()[0]
+                if name in known_names or name == "id":
                     continue
+                # NOT NULL impossible à ajouter sur une table peuplée sans valeur par défaut
+                column = column.replace(" NOT NULL", "")
+                statements.append(
+                    f"ALTER TABLE {schema_name}.{table_name} ADD COLUMN IF NOT EXISTS {column}"
+                )
+        return statements
+    
+    def _provision_schema(self, schema_name: str, fingerprint: str, manifest: Dict[str, Dict[str, Any]],
+                          previous: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Applique le diff DDL d'un schéma dans sa propre session (exécuté en thread)"""
+        statements = self._diff_statements(schema_name, manifest, previous)
+        errors = []
+        
+        with Session(engine) as session:
+            # Un seul worker provisionne un schéma donné à la fois
+            session.exec(text("SELECT pg_advisory_xact_lock(hashtext(:name))").bindparams(name=schema_name))
+            for statement in statements:
+                savepoint = session.begin_nested()
+                try:
+                    session.exec(text(statement))
+                    savepoint.commit()
+                except Exception as e:
+                    savepoint.rollback()
+                    errors.append(f"{statement.split('(')[0].strip()}: {e}")
+            
+            if not errors:
+                session.exec(text("""
+                    INSERT INTO public.schema_provisioning (schema_name, fingerprint, manifest, applique_le)
+                    VALUES (:schema_name, :fingerprint, :manifest, CURRENT_TIMESTAMP)
+                    ON CONFLICT (schema_name) DO UPDATE
+                    SET fingerprint = EXCLUDED.fingerprint,
+                        manifest = EXCLUDED.manifest,
+                        applique_le = EXCLUDED.applique_le
+                """).bindparams(schema_name=schema_name, fingerprint=fingerprint, manifest=json.dumps(manifest)))
+            session.commit()
+        
+        return {"statements": len(statements), "errors": errors}
+    
+    def provision_program_schemas(self, program_codes: List[str],
+                                  max_workers: int = PROVISIONING_MAX_WORKERS) -> Dict[str, Any]:
+        """
+        Provisionne les schémas des programmes en ne touchant que ceux dont l'empreinte
+        diffère de celle des modèles. Les schémas à jour coûtent une seule requête au total.
+        """
+        started = time.perf_counter()
+        manifest = self.models_manifest()
+        fingerprint = self.models_fingerprint(manifest)
+        schema_names = sorted({code.lower() for code in program_codes})
+        report = {"fingerprint": fingerprint, "up_to_date": [], "provisioned": {}, "errors": {}}
         
-        return foreign_keys
+        if schema_names:
+            self.session.exec(text(PROVISIONING_REGISTRY_DDL))
+            self.session.commit()
+            rows = self.session.exec(text("""
+                SELECT s.schema_name, r.fingerprint, r.manifest
+                FROM unnest(CAST(:names AS text[])) AS s(schema_name)
+                LEFT JOIN information_schema.schemata i ON i.schema_name = s.schema_name
+                LEFT JOIN public.schema_provisioning r
+                       ON r.schema_name = s.schema_name AND i.schema_name IS NOT NULL
+            """).bindparams(names=schema_names)).all()
+            
+            pending = {}
+            for schema_name, stored_fingerprint, stored_manifest in rows:
+                if stored_fingerprint == fingerprint:
+                    report["up_to_date"].append(schema_name)
+                else:
+                    pending[schema_name] = json.loads(stored_manifest) if stored_manifest else None
+            
+            if pending:
+                workers = max(1, min(max_workers, len(pending)))
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="schema-provision") as pool:
+                    futures = {
+                        schema_name: pool.submit(self._provision_schema, schema_name, fingerprint, manifest, previous)
+                        for schema_name, previous in pending.items()
+                    }
+                    for schema_name, future in futures.items():
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            result = {"statements": 0, "errors": [str(e)]}
+                        if result["errors"]:
+                            report["errors"][schema_name] = result["errors"]
+                        else:
+                            report["provisioned"][schema_name] = result["statements"]
+        
+        report["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return report
     
     def drop_program_schema(self, program_code: str, backup_data: bool = True) -> bool:
         """Supprime un schéma de programme"""
@@ -884,17 +1048,8 @@ def setup_program_schemas(app: FastAPI):
             
             print(f"📋 Programmes trouvés: {[p[0] for p in programmes]}")
             
-            for programme_code in programmes:
-                if not manager.schema_exists(programme_code[0]):
-                    print(f"🔨 Création du schéma pour le programme {programme_code[0]}")
-                    success = manager.create_program_schema(programme_code[0])
-                    if success:
-                        print(f"✅ Schéma {programme_code[0]} créé avec succès")
-                    else:
-                        pass
-                        # logger.error(f"❌ Échec de création du schéma {programme_code[0]}")
-                else:
-                    print(f"ℹ️ Schéma {programme_code[0]} existe déjà")
+            report = manager.provision_program_schemas([p[0] for p in programmes])
+            print(f"ℹ️ Schémas à jour: {report['up_to_date']} - provisionnés: {list(report['provisioned'])} ({report['duration_ms']} ms)")
             
             session.close()
             print("🎉 Initialisation des schémas par programme terminée")
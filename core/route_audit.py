@@ -0,0 +1,222 @@
+# app/core/route_audit.py
+"""
+Audit des routes async qui bloquent la boucle d'événements
+
+Une route `async def` s'exécute dans la boucle d'événements : une requête SQL
+via la Session synchrone, un appel `requests`/`smtplib`, un `open()` ou un
+`time.sleep()` y bloque toutes les requêtes concurrentes du worker. Une route
+`def` est au contraire exécutée par FastAPI dans le pool de threads.
+
+L'audit analyse le code source (AST) des routes et des dépendances et signale
+les fonctions `async def` concernées. Celles qui n'attendent rien (`await`,
+`async for`, `async with`) peuvent être converties en `def` automatiquement.
+
+    python -m app_lia_web.core.route_audit            # rapport, code retour 1 si blocage
+    python -m app_lia_web.core.route_audit --fix      # conversion des routes sans await
+"""
+import argparse
+import ast
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Périmètre par défaut : routeurs et dépendances d'authentification
+CHEMINS_PAR_DEFAUT = ("app/routers", "core/security.py")
+
+METHODES_ROUTE = {"get", "post", "put", "patch", "delete", "head", "options", "api_route", "websocket"}
+MODULES_IO_SYNCHRONES = {"requests", "smtplib"}
+APPELS_BLOQUANTS = {("time", "sleep"), ("subprocess", "run"), ("subprocess", "check_output")}
+# Appels dont les arguments s'exécutent hors de la boucle
+DELEGATIONS_THREAD = {"run_in_threadpool", "to_thread", "run_sync"}
+
+# Routes async volontairement tolérées (clé "fichier:fonction"). Les routes mixtes
+# (formulaire, upload aiofiles, client HTTP async) délèguent leurs accès base et
+# fichiers à run_in_threadpool : la liste reste vide, toute nouvelle entrée se justifie
+EXCEPTIONS_CONNUES: set = set()
+
+
+@dataclass
+class FonctionBloquante:
+    """Fonction async faisant des entrées/sorties synchrones"""
+    fichier: Path
+    ligne: int
+    nom: str
+    route: bool  # route (décorateur de routeur) ou dépendance
+    motifs: List[str] = field(default_factory=list)
+    attend: bool = False  # contient await / async for / async with : conversion manuelle
+
+    @property
+    def convertible(self) -> bool:
+        return not self.attend
+
+    @property
+    def cle(self) -> str:
+        try:
+            fichier = self.fichier.relative_to(BASE_DIR).as_posix()
+        except ValueError:
+            fichier = self.fichier.as_posix()
+        return f"{fichier}:{self.nom}"
+
+    @property
+    def connue(self) -> bool:
+        return self.cle in EXCEPTIONS_CONNUES
+
+    def __str__(self) -> str:
+        genre = "route" if self.route else "dépendance"
+        if self.convertible:
+            action = "→ def"
+        elif self.connue:
+            action = "(connue) contient await"
+        else:
+            action = "⚠️ contient await, à traiter manuellement"
+        fichier, nom = self.cle.rsplit(":", 1)
+        return f"{fichier}:{self.ligne} {genre} {nom}: {', '.join(self.motifs)} {action}"
+
+
+def _corps(fonction: ast.AsyncFunctionDef) -> Iterator[ast.AST]:
+    """Nœuds du corps, sans descendre dans les fonctions imbriquées ni les appels délégués au pool de threads"""
+    imbriques = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)
+    pile = [noeud for noeud in fonction.body if not isinstance(noeud, imbriques)]
+    while pile:
+        noeud = pile.pop()
+        yield noeud
+        if isinstance(noeud, ast.Call) and _nom(noeud.func) in DELEGATIONS_THREAD:
+            continue
+        for enfant in ast.iter_child_nodes(noeud):
+            if not isinstance(enfant, imbriques):
+                pile.append(enfant)
+
+
+def _est_route(fonction: ast.AsyncFunctionDef) -> bool:
+    for decorateur in fonction.decorator_list:
+        if (
+            isinstance(decorateur, ast.Call)
+            and isinstance(decorateur.func, ast.Attribute)
+            and decorateur.func.attr in METHODES_ROUTE
+        ):
+            return True
+    return False
+
+
+def _nom(noeud: ast.AST) -> Optional[str]:
+    if isinstance(noeud, ast.Name):
+        return noeud.id
+    if isinstance(noeud, ast.Attribute):
+        return noeud.attr
+    return None
+
+
+def _sessions_synchrones(fonction: ast.AsyncFunctionDef) -> List[str]:
+    """Paramètres recevant une Session synchrone (annotation Session ou Depends(get_session))"""
+    arguments = fonction.args.args + fonction.args.kwonlyargs
+    defauts = [None] * (len(fonction.args.args) - len(fonction.args.defaults)) + list(fonction.args.defaults)
+    defauts += list(fonction.args.kw_defaults)
+    noms = []
+    for argument, defaut in zip(arguments, defauts):
+        annotation = _nom(argument.annotation) if argument.annotation is not None else None
+        depend_session = (
+            isinstance(defaut, ast.Call)
+            and _nom(defaut.func) == "Depends"
+            and defaut.args
+            and _nom(defaut.args[0]) == "get_session"
+        )
+        if annotation == "Session" or depend_session:
+            noms.append(argument.arg)
+    return noms
+
+
+def _analyser(fonction: ast.AsyncFunctionDef, fichier: Path) -> Optional[FonctionBloquante]:
+    route = _est_route(fonction)
+    sessions = _sessions_synchrones(fonction)
+    if not route and not sessions:
+        return None
+
+    resultat = FonctionBloquante(fichier=fichier, ligne=fonction.lineno, nom=fonction.name, route=route)
+    sessions_utilisees = set()
+    for noeud in _corps(fonction):
+        if isinstance(noeud, (ast.Await, ast.AsyncFor, ast.AsyncWith)):
+            resultat.attend = True
+        elif isinstance(noeud, ast.Name) and noeud.id in sessions:
+            sessions_utilisees.add(noeud.id)
+        elif isinstance(noeud, ast.Call):
+            appel = noeud.func
+            if isinstance(appel, ast.Name) and appel.id == "open":
+                resultat.motifs.append(f"open() ligne {noeud.lineno}")
+            elif isinstance(appel, ast.Attribute) and isinstance(appel.value, ast.Name):
+                if appel.value.id in MODULES_IO_SYNCHRONES:
+                    resultat.motifs.append(f"{appel.value.id}.{appel.attr}() ligne {noeud.lineno}")
+                elif (appel.value.id, appel.attr) in APPELS_BLOQUANTS:
+                    resultat.motifs.append(f"{appel.value.id}.{appel.attr}() ligne {noeud.lineno}")
+    for nom in sorted(sessions_utilisees):
+        resultat.motifs.insert(0, f"Session synchrone '{nom}'")
+    return resultat if resultat.motifs else None
+
+
+def auditer_fichier(fichier: Path) -> List[FonctionBloquante]:
+    arbre = ast.parse(fichier.read_text(encoding="utf-8"), filename=str(fichier))
+    resultats = []
+    for noeud in ast.walk(arbre):
+        if isinstance(noeud, ast.AsyncFunctionDef):
+            resultat = _analyser(noeud, fichier)
+            if resultat:
+                resultats.append(resultat)
+    return sorted(resultats, key=lambda r: r.ligne)
+
+
+def _fichiers(chemins: Iterable[Path]) -> Iterator[Path]:
+    for chemin in chemins:
+        if chemin.is_dir():
+            yield from sorted(p for p in chemin.rglob("*.py") if "__pycache__" not in p.parts)
+        elif chemin.suffix == ".py":
+            yield chemin
+
+
+def auditer(chemins: Optional[Sequence[Path]] = None) -> List[FonctionBloquante]:
+    """Fonctions async bloquantes des fichiers/dossiers donnés (périmètre par défaut sinon)"""
+    chemins = chemins or [BASE_DIR / chemin for chemin in CHEMINS_PAR_DEFAUT]
+    resultats = []
+    for fichier in _fichiers(chemins):
+        resultats.extend(auditer_fichier(fichier))
+    return resultats
+
+
+def convertir(resultats: Iterable[FonctionBloquante]) -> int:
+    """Réécrit en `def` les fonctions convertibles ; renvoie le nombre de conversions"""
+    par_fichier = {}
+    for resultat in resultats:
+        if resultat.convertible:
+            par_fichier.setdefault(resultat.fichier, []).append(resultat.ligne)
+    total = 0
+    for fichier, lignes in par_fichier.items():
+        contenu = fichier.read_text(encoding="utf-8").splitlines(keepends=True)
+        for ligne in lignes:
+            texte = contenu[ligne - 1]
+            if texte.lstrip().startswith("async def "):
+                contenu[ligne - 1] = texte.replace("async def ", "def ", 1)
+                total += 1
+        fichier.write_text("".join(contenu), encoding="utf-8")
+    return total
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Audit des routes async bloquant la boucle d'événements")
+    parser.add_argument("chemins", nargs="*", type=Path, help="Fichiers ou dossiers (défaut: routeurs et sécurité)")
+    parser.add_argument("--fix", action="store_true", help="Convertir en def les fonctions sans await")
+    args = parser.parse_args(argv)
+
+    resultats = auditer(args.chemins)
+    for resultat in resultats:
+        print(resultat)
+    if args.fix and resultats:
+        print(f"🔧 {convertir(resultats)} fonction(s) converties en def")
+        resultats = auditer(args.chemins)
+    restants = len([r for r in resultats if not r.connue])
+    print(f"{'✅' if not restants else '❌'} {restants} fonction(s) async bloquante(s), {len(resultats) - restants} connue(s)")
+    return 1 if restants else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
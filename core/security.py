@@ -41,7 +41,7 @@ ADMIN_NAME = os.getenv("ADMIN_NAME", "Soro wangboho lassina")
 
 # Current user
 # ----------------------------
-async def get_current_user(
+def get_current_user(
     request: Request,
     bearer_token: Optional[str] = Depends(oauth2_scheme),
     session: Session = Depends(get_session),
@@ -125,7 +125,7 @@ async def get_current_user(
     return user
 
 
-async def get_current_user_optional(
+def get_current_user_optional(
     request: Request,
     session: Session = Depends(get_session),
 ) -> Optional[User]:
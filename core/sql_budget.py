@@ -0,0 +1,163 @@
+"""
+Budget de requêtes SQL par requête HTTP et détection des N+1
+
+Un écouteur before_cursor_execute posé sur tous les moteurs compte, pour la
+requête HTTP en cours (ContextVar, propagée au threadpool des routes sync),
+les ordres SQL envoyés et leur « forme » : le texte SQL aux espaces et listes
+de paramètres près. Une même forme exécutée SQL_N_PLUS_ONE_THRESHOLD fois ou
+plus signale une boucle de session.get / select par ligne (N+1).
+
+Une route déclare son budget avec @budget_sql(n) ; SQLBudgetMiddleware le
+compare au nombre de requêtes exécutées :
+- SQL_BUDGET_STRICT (activé par la suite de tests) : BudgetSQLDepasse est levée ;
+- sinon : avertissement dans les logs.
+Avec SQL_DEBUG_HEADERS, la réponse porte X-SQL-Queries, X-SQL-Time-Ms,
+X-SQL-N-Plus-One (nombre de formes répétées) et X-SQL-Budget.
+Le nombre de requêtes alimente aussi lia_db_queries_per_request (core/metrics.py).
+
+Hors requête HTTP (scripts, tâches planifiées, tests), mesurer() ouvre le même
+compteur autour d'un bloc de code.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, Optional, TypeVar
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app_lia_web.core.config import settings
+from app_lia_web.core.metrics import gabarit_route, observer_requetes_sql
+
+logger = logging.getLogger(__name__)
+
+ATTRIBUT_BUDGET = "__budget_sql__"
+
+_PARAMETRE = r"(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)"
+_LISTE_PARAMETRES = re.compile(rf"\(\s*{_PARAMETRE}(?:\s*,\s*{_PARAMETRE})*\s*\)")
+_LIGNES_VALUES = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_ESPACES = re.compile(r"\s+")
+
+_compteur: ContextVar[Optional["CompteurSQL"]] = ContextVar("compteur_sql", default=None)
+
+F = TypeVar("F", bound=Callable)
+
+
+class BudgetSQLDepasse(AssertionError):
+    """Une route a exécuté plus de requêtes SQL que son budget déclaré"""
+
+
+@lru_cache(maxsize=2048)
+def forme(statement: str) -> str:
+    """Texte SQL normalisé : IN (?, ?, ...) et VALUES (...), (...) réduits à (?)"""
+    sql = _ESPACES.sub(" ", statement).strip()
+    sql = _LISTE_PARAMETRES.sub("(?)", sql)
+    return _LIGNES_VALUES.sub("(?)", sql)
+
+
+@dataclass
+class CompteurSQL:
+    """Requêtes SQL exécutées pendant une requête HTTP (ou un bloc mesurer())"""
+    requetes: int = 0
+    duree: float = 0.0
+    formes: Counter = field(default_factory=Counter)
+
+    def repetitions(self, seuil: Optional[int] = None) -> Dict[str, int]:
+        """Formes exécutées au moins `seuil` fois (N+1 probables), les plus fréquentes d'abord"""
+        seuil = settings.SQL_N_PLUS_ONE_THRESHOLD if seuil is None else seuil
+        return {sql: n for sql, n in self.formes.most_common() if n >= seuil}
+
+
+# ===== ÉCOUTEURS SQLALCHEMY =====
+
+def _avant_execution(conn, cursor, statement, parameters, context, executemany):
+    compteur = _compteur.get()
+    if compteur is None:
+        return
+    compteur.requetes += 1
+    compteur.formes[forme(statement)] += 1
+    conn.info["sql_budget_debut"] = time.perf_counter()
+
+
+def _apres_execution(conn, cursor, statement, parameters, context, executemany):
+    compteur = _compteur.get()
+    debut = conn.info.pop("sql_budget_debut", None)
+    if compteur is not None and debut is not None:
+        compteur.duree += time.perf_counter() - debut
+
+
+def installer() -> None:
+    """Pose les écouteurs sur tous les moteurs (idempotent)"""
+    if not event.contains(Engine, "before_cursor_execute", _avant_execution):
+        event.listen(Engine, "before_cursor_execute", _avant_execution)
+        event.listen(Engine, "after_cursor_execute", _apres_execution)
+
+
+@contextmanager
+def mesurer() -> Iterator[CompteurSQL]:
+    """Compte les requêtes SQL exécutées dans le bloc (imbriquable, le bloc interne a son propre compteur)"""
+    installer()
+    compteur = CompteurSQL()
+    jeton = _compteur.set(compteur)
+    try:
+        yield compteur
+    finally:
+        _compteur.reset(jeton)
+
+
+# ===== BUDGET PAR ROUTE =====
+
+def budget_sql(max_requetes: int) -> Callable[[F], F]:
+    """Déclare le nombre maximal de requêtes SQL d'une route
+
+    La fonction est seulement annotée (pas enveloppée) : FastAPI continue d'en
+    lire la signature et les annotations telles quelles.
+    """
+    def decorer(endpoint: F) -> F:
+        setattr(endpoint, ATTRIBUT_BUDGET, max_requetes)
+        return endpoint
+    return decorer
+
+
+def budget_de(endpoint) -> Optional[int]:
+    """Budget déclaré par @budget_sql, None si la route n'en a pas"""
+    return getattr(endpoint, ATTRIBUT_BUDGET, None)
+
+
+class SQLBudgetMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        with mesurer() as compteur:
+            response = await call_next(request)
+            # Les tâches de fond s'exécutent après l'envoi de la réponse : hors budget
+            requetes, duree, repetees = compteur.requetes, compteur.duree, compteur.repetitions()
+
+        observer_requetes_sql(gabarit_route(request.scope), requetes)
+        route = f"{request.method} {request.url.path}"
+        for sql, n in repetees.items():
+            logger.warning(f"🔁 N+1 probable sur {route} : {n}× {sql[:200]}")
+
+        # Renseigné par le routeur pendant call_next (même dict scope)
+        budget = budget_de(request.scope.get("endpoint"))
+        if budget is not None and requetes > budget:
+            message = f"{route} : {requetes} requêtes SQL pour un budget de {budget}"
+            if repetees:
+                sql, n = next(iter(repetees.items()))
+                message += f" (la plus répétée, {n}× : {sql[:200]})"
+            if settings.SQL_BUDGET_STRICT:
+                raise BudgetSQLDepasse(message)
+            logger.warning(f"⚠️ Budget SQL dépassé — {message}")
+
+        if settings.SQL_DEBUG_HEADERS:
+            response.headers["X-SQL-Queries"] = str(requetes)
+            response.headers["X-SQL-Time-Ms"] = f"{duree * 1000:.1f}"
+            response.headers["X-SQL-N-Plus-One"] = str(len(repetees))
+            if budget is not None:
+                response.headers["X-SQL-Budget"] = str(budget)
+        return response
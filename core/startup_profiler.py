@@ -0,0 +1,103 @@
+# app/core/startup_profiler.py
+"""
+Chronométrage des étapes de démarrage de l'application
+
+Chaque étape du démarrage (bootstrap SQL, migrations, schémas...) est mesurée
+puis résumée dans les logs et exposée sur /health. Les vérifications non
+critiques peuvent être lancées en tâche de fond une fois le serveur prêt.
+"""
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfiler:
+    """Collecte la durée de chaque étape de démarrage"""
+
+    def __init__(self):
+        self.process_started = time.perf_counter()
+        self.stages: List[Dict[str, Any]] = []
+        self.background: Dict[str, Dict[str, Any]] = {}
+        self.completed_at: Optional[str] = None
+        self.fast_boot = False
+        self._tasks: set = set()  # Références fortes sur les tâches de fond
+
+    def record(self, name: str, duration_ms: float, status: str = "ok", detail: Optional[str] = None) -> None:
+        entry = {"stage": name, "duration_ms": round(duration_ms, 1), "status": status}
+        if detail:
+            entry["detail"] = detail
+        self.stages.append(entry)
+
+    def record_since_start(self, name: str) -> None:
+        """Enregistre le temps écoulé depuis l'import du module (imports, montage...)"""
+        self.record(name, (time.perf_counter() - self.process_started) * 1000)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Chronomètre une étape ; une exception est tracée puis propagée"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record(name, (time.perf_counter() - started) * 1000, "error", str(e))
+            raise
+        self.record(name, (time.perf_counter() - started) * 1000)
+
+    def skip(self, name: str, reason: str) -> None:
+        self.record(name, 0.0, "skipped", reason)
+
+    def run_in_background(self, name: str, func: Callable[[], Any]) -> "asyncio.Task":
+        """Exécute une vérification non critique dans un thread, après le démarrage"""
+        self.background[name] = {"status": "pending"}
+
+        async def runner():
+            started = time.perf_counter()
+            self.background[name] = {"status": "running"}
+            try:
+                await asyncio.to_thread(func)
+                status, detail = "ok", None
+            except Exception as e:
+                status, detail = "error", str(e)
+                logger.error(f"❌ Tâche de démarrage {name} en échec: {e}")
+            self.background[name] = {
+                "status": status,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+            if detail:
+                self.background[name]["detail"] = detail
+
+        task = asyncio.get_running_loop().create_task(runner())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def finish(self) -> None:
+        self.completed_at = datetime.now(timezone.utc).isoformat()
+        self.log_summary()
+
+    def total_ms(self) -> float:
+        return round(sum(entry["duration_ms"] for entry in self.stages), 1)
+
+    def log_summary(self) -> None:
+        logger.info(f"⏱️ Démarrage en {self.total_ms()} ms (fast boot: {self.fast_boot})")
+        for entry in sorted(self.stages, key=lambda e: e["duration_ms"], reverse=True):
+            suffix = f" [{entry['status']}]" if entry["status"] != "ok" else ""
+            logger.info(f"   - {entry['stage']}: {entry['duration_ms']} ms{suffix}")
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "fast_boot": self.fast_boot,
+            "total_ms": self.total_ms(),
+            "completed_at": self.completed_at,
+            "stages": list(self.stages),
+            "background": dict(self.background),
+        }
+
+
+# Instance unique par processus
+startup_profiler = StartupProfiler()
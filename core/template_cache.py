@@ -0,0 +1,155 @@
+# app/core/template_cache.py
+"""
+Cache de rendu des templates Jinja2
+
+- `FragmentCacheExtension` ajoute la balise `{% cache "nom", cle1, cle2 %}...{% endcache %}`
+  qui mémorise le HTML d'un fragment (menus de navigation...) en mémoire.
+- `ttl_cached` mémorise le résultat d'une fonction sans argument (accès disque
+  des globals comme l'existence du logo).
+- `TemplateRenderStats` agrège les temps de rendu par template.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+FRAGMENT_CACHE_TTL_SECONDS = 300
+FRAGMENT_CACHE_MAX_ENTRIES = 512
+
+
+class FragmentCache:
+    """Stockage mémoire (LRU + TTL) des fragments HTML rendus"""
+
+    def __init__(self, ttl_seconds: int = FRAGMENT_CACHE_TTL_SECONDS, max_entries: int = FRAGMENT_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Markup]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Markup]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Markup) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, prefix: Optional[str] = None) -> None:
+        """Vide tout le cache, ou seulement les fragments dont le nom commence par prefix"""
+        with self._lock:
+            if prefix is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k.startswith(prefix)]:
+                    del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "ttl_seconds": self.ttl_seconds}
+
+
+# Instance unique par processus
+fragment_cache = FragmentCache()
+
+
+class FragmentCacheExtension(Extension):
+    """Balise {% cache "nom", cle... %}...{% endcache %}
+
+    La clé doit contenir tout ce qui fait varier le HTML du fragment
+    (rôle, programme courant, section active, URL de base...).
+    """
+
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=fragment_cache)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key_parts = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            key_parts.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        call = self.call_method("_render_cached", [nodes.List(key_parts)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, key_parts, caller) -> Markup:
+        key = "|".join("" if part is None else str(part) for part in key_parts)
+        cache = self.environment.fragment_cache
+        html = cache.get(key)
+        if html is None:
+            html = Markup(caller())
+            cache.set(key, html)
+        return html
+
+
+def ttl_cached(seconds: int) -> Callable:
+    """Mémorise le résultat d'une fonction sans argument pendant `seconds` secondes"""
+
+    def decorator(func: Callable[[], Any]) -> Callable[[], Any]:
+        state: Dict[str, Any] = {"expires": 0.0, "value": None}
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper():
+            now = time.monotonic()
+            if state["expires"] > now:
+                return state["value"]
+            with lock:
+                if state["expires"] <= now:
+                    state["value"] = func()
+                    state["expires"] = now + seconds
+                return state["value"]
+
+        def cache_clear() -> None:
+            state["expires"] = 0.0
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
+
+
+class TemplateRenderStats:
+    """Temps de rendu cumulés par template"""
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, template_name: str, duration_ms: float) -> None:
+        with self._lock:
+            entry = self._stats.setdefault(template_name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {
+                    "count": int(entry["count"]),
+                    "avg_ms": round(entry["total_ms"] / entry["count"], 2),
+                    "max_ms": round(entry["max_ms"], 2),
+                }
+                for name, entry in sorted(self._stats.items(), key=lambda item: item[1]["total_ms"], reverse=True)
+            }
+
+
+render_stats = TemplateRenderStats()
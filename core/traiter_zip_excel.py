@@ -5,11 +5,14 @@ import shutil
 import re
 from datetime import datetime
 import html
-from app_lia_web.core.Excel_functions import modifier_contenu_excel
-from app_lia_web.core.Word_functions import modifier_contenu_word
 from app_lia_web.core.Text_functions import modifier_contenu_texte
-from app_lia_web.core.Powerpoint_functions import modifier_contenu_powerpoint
 from app_lia_web.core.temp_dir import create_temp_file
+from app_lia_web.core.lazy_import import lazy_function
+
+# Helpers Office (openpyxl, python-docx, python-pptx) importés au premier fichier traité
+modifier_contenu_excel = lazy_function("app_lia_web.core.Excel_functions", "modifier_contenu_excel")
+modifier_contenu_word = lazy_function("app_lia_web.core.Word_functions", "modifier_contenu_word")
+modifier_contenu_powerpoint = lazy_function("app_lia_web.core.Powerpoint_functions", "modifier_contenu_powerpoint")
 
 IGNORED_EXTENSIONS = [".pdf", ".zip", ".png", ".jpg", ".jpeg"]
 TEXT_EXTENSIONS = [".txt", ".html", ".csv", ".json"]
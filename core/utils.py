@@ -12,6 +12,7 @@ from pathlib import Path
 import requests
 from fastapi import UploadFile
 from app_lia_web.core.config import settings
+from app_lia_web.core.metrics import appel_externe
 
 logger = logging.getLogger(__name__)
 
@@ -348,7 +349,7 @@ class EmailUtils:
                 return True
             
             # Connexion SMTP
-            with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
+            with appel_externe("smtp"), smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
                 server.starttls()
                 server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
                 server.send_message(msg)
@@ -45,6 +45,14 @@ CREATE INDEX IF NOT EXISTS idx_logpermission_utilisateur_id ON logpermission(uti
 CREATE INDEX IF NOT EXISTS idx_logpermission_utilisateur_cible_id ON logpermission(utilisateur_cible_id);
 CREATE INDEX IF NOT EXISTS idx_logpermission_cree_le ON logpermission(cree_le);
 
+-- Compteur de version lu par les workers pour invalider leur matrice compilée
+CREATE TABLE IF NOT EXISTS versionpermissions (
+    id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    modifie_le TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+INSERT INTO versionpermissions (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
+
 -- 2. Créer les tables d'archivage
 CREATE TABLE IF NOT EXISTS archive (
     id SERIAL PRIMARY KEY,
@@ -0,0 +1,58 @@
+"""
+Configuration commune des tests (SQLite)
+
+`engine` / `db` : base SQLite en mémoire avec les tables du schéma par défaut,
+connexion partagée entre threads (TestClient, run_in_threadpool).
+`engine_sqlite` : même schéma sur une autre URL (fichier) ou d'autres options.
+"""
+import pytest
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine
+
+# Modèles liés par relations : importés pour que les mappers se résolvent
+import app_lia_web.app.models.seminaire  # noqa: F401
+import app_lia_web.app.models.event  # noqa: F401
+import app_lia_web.app.models.codev  # noqa: F401
+import app_lia_web.app.models.elearning  # noqa: F401
+from app_lia_web.core.config import settings
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_sqlite(type_, compiler, **kw):
+    # Le journal d'audit utilise JSONB : stocké en JSON sur la base de test
+    return "JSON"
+
+
+@pytest.fixture(autouse=True)
+def budget_sql_strict(monkeypatch):
+    # Une route qui dépasse son @budget_sql fait échouer le test (core/sql_budget.py)
+    monkeypatch.setattr(settings, "SQL_BUDGET_STRICT", True)
+
+
+@pytest.fixture
+def engine_sqlite():
+    """Fabrique d'engines SQLite : create_engine(url, **options) puis tables hors schémas PostgreSQL dédiés"""
+    engines = []
+
+    def creer(url: str = "sqlite://", **options):
+        engine = create_engine(url, **options)
+        SQLModel.metadata.create_all(engine, tables=[t for t in SQLModel.metadata.sorted_tables if t.schema is None])
+        engines.append(engine)
+        return engine
+
+    yield creer
+    for engine in engines:
+        engine.dispose()
+
+
+@pytest.fixture
+def engine(engine_sqlite):
+    return engine_sqlite(connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+@pytest.fixture
+def db(engine):
+    with Session(engine) as session:
+        yield session
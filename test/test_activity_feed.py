@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests du fil d'activité unifié
+
+Le fil fusionne préinscriptions, inscriptions, décisions de jury et journal
+d'audit en une requête ; le défilement par curseur doit restituer chaque
+événement une seule fois, dans l'ordre, même à horodatage identique.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event as sa_event
+
+from app_lia_web.app.models.ACD.activity import ActivityLog
+from app_lia_web.app.models.base import Candidat, DecisionJuryCandidat, Inscription, Jury, Preinscription, Programme, User
+from app_lia_web.app.models.enums import DecisionJury, UserRole
+from app_lia_web.app.services.activity_feed_service import ActivityFeedService
+
+
+DEBUT = datetime(2025, 5, 1, 9, 0)
+
+
+@pytest.fixture
+def programmes(db):
+    responsable = User(email="resp@test.fr", nom_complet="Resp", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR)
+    db.add(responsable)
+    db.flush()
+    programmes = [Programme(code=code, nom=f"Programme {code}", responsable_id=responsable.id) for code in ("AAA", "BBB")]
+    db.add_all(programmes)
+    db.flush()
+    jurys = [Jury(programme_id=p.id, session_le=DEBUT) for p in programmes]
+    db.add_all(jurys)
+    db.flush()
+
+    for i in range(12):
+        programme, jury = (programmes[0], jurys[0]) if i % 3 else (programmes[1], jurys[1])
+        # Deux événements par minute : les horodatages se répètent d'une table à l'autre
+        quand = DEBUT + timedelta(minutes=i // 2)
+        candidat = Candidat(nom=f"Nom{i:02d}", prenom="Prénom", email=f"c{i}@test.fr")
+        db.add(candidat)
+        db.flush()
+        db.add(Preinscription(programme_id=programme.id, candidat_id=candidat.id, cree_le=quand))
+        db.add(Inscription(programme_id=programme.id, candidat_id=candidat.id, cree_le=quand))
+        db.add(DecisionJuryCandidat(candidat_id=candidat.id, jury_id=jury.id, decision=DecisionJury.VALIDE, date_decision=quand))
+        db.add(ActivityLog(
+            user_nom_complet="Resp", action="PROGRAMME_UPDATE", entity="Programme", entity_id=programme.id,
+            created_at=quand.replace(tzinfo=timezone.utc),
+        ))
+    db.commit()
+    return [p.id for p in programmes]
+
+
+def parcourir(db, taille, **filtres):
+    items, curseur = [], None
+    while True:
+        page = ActivityFeedService.get_feed(db, limit=taille, curseur=curseur, **filtres)
+        items += page["items"]
+        curseur = page["next_cursor"]
+        if not curseur:
+            return items
+
+
+def test_ordre_et_descriptions(db, programmes):
+    page = ActivityFeedService.get_feed(db, limit=8)
+    # Même minute : ordre par type puis id décroissants
+    assert [(i["type"], i["date"]) for i in page["items"]] == [
+        (t, DEBUT + timedelta(minutes=5))
+        for t in ("preinscription", "inscription", "decision_jury", "activite") for _ in range(2)
+    ]
+    assert page["items"][0]["description"] == "Nouvelle préinscription de Prénom Nom11 pour Programme AAA"
+    assert page["items"][1]["description"] == "Nouvelle préinscription de Prénom Nom10 pour Programme AAA"
+    assert page["items"][4]["statut"] == DecisionJury.VALIDE.value
+    assert page["items"][6]["description"] == f"PROGRAMME_UPDATE Programme #{programmes[0]} par Resp"
+    assert page["next_cursor"]
+
+
+@pytest.mark.parametrize("taille", [1, 3, 7, 100])
+def test_defilement_sans_doublon(db, programmes, taille):
+    items = parcourir(db, taille)
+    cles = [(i["type"], i["id"]) for i in items]
+    assert len(cles) == 48 and len(set(cles)) == 48
+    dates = [i["date"] for i in items]
+    assert dates == sorted(dates, reverse=True)
+
+
+def test_filtres(db, programmes):
+    items = parcourir(db, 5, programme_id=programmes[1])
+    assert len(items) == 16
+    assert {i["programme_id"] for i in items if i["type"] != "activite"} == {programmes[1]}
+    assert {i["entite_id"] for i in items if i["type"] == "activite"} == {programmes[1]}
+
+    items = parcourir(db, 5, types=["decision_jury", "inconnu"])
+    assert len(items) == 12 and {i["type"] for i in items} == {"decision_jury"}
+
+    with pytest.raises(ValueError):
+        ActivityFeedService.get_feed(db, curseur="pas-un-curseur")
+
+
+def test_une_requete_par_page(db, programmes):
+    requetes = []
+    ecouteur = lambda *args: requetes.append(args[2])  # noqa: E731
+    sa_event.listen(db.get_bind(), "before_cursor_execute", ecouteur)
+    try:
+        premiere = ActivityFeedService.get_feed(db, limit=10)
+        ActivityFeedService.get_feed(db, limit=10, curseur=premiere["next_cursor"])
+    finally:
+        sa_event.remove(db.get_bind(), "before_cursor_execute", ecouteur)
+    assert len(requetes) == 2
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Routes async et boucle d'événements
+
+- L'audit des routeurs ne doit signaler aucune nouvelle route `async def`
+  faisant des entrées/sorties synchrones.
+- Benchmark de concurrence : pendant qu'une route lente (requête SQL
+  synchrone) est sollicitée en boucle, la latence p99 d'une route sans
+  rapport reste plate si la route lente est en `def` (pool de threads) et
+  s'effondre si elle est en `async def` (boucle bloquée).
+"""
+import asyncio
+import statistics
+import time
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+from sqlalchemy import event as sa_event
+from sqlmodel import Session
+
+from app_lia_web.app.models.base import User
+from app_lia_web.app.models.enums import UserRole
+from app_lia_web.app.routers import jury
+from app_lia_web.core import route_audit
+from app_lia_web.core.database import get_session
+from app_lia_web.core.security import get_current_user
+
+DELAI_REQUETE_LENTE = 0.2  # secondes ajoutées à chaque requête sur les jurys
+CLIENTS_ROUTE_LENTE = 8
+ECHANTILLONS_PING = 30
+INTERVALLE_PING = 0.02
+
+
+def test_aucune_route_async_bloquante():
+    resultats = route_audit.auditer()
+    nouvelles = [str(r) for r in resultats if not r.connue]
+    assert not nouvelles, "\n".join(nouvelles)
+    # Une route corrigée doit sortir de la liste des exceptions
+    obsoletes = route_audit.EXCEPTIONS_CONNUES - {r.cle for r in resultats}
+    assert not obsoletes, obsoletes
+
+
+def test_detection_et_conversion(tmp_path):
+    source = tmp_path / "routes.py"
+    source.write_text(
+        "@router.get('/a')\n"
+        "async def lecture(session: Session = Depends(get_session)):\n"
+        "    return session.exec(select(User)).all()\n"
+        "\n"
+        "@router.post('/b')\n"
+        "async def upload(file: UploadFile, session: Session = Depends(get_session)):\n"
+        "    contenu = await file.read()\n"
+        "    return session.get(User, 1)\n"
+        "\n"
+        "@router.get('/c')\n"
+        "async def delegue(session: Session = Depends(get_session)):\n"
+        "    return await run_in_threadpool(session.get, User, 1)\n"
+        "\n"
+        "@router.get('/d')\n"
+        "async def appel_http():\n"
+        "    return requests.get('https://exemple.fr').json()\n"
+        "\n"
+        "@router.get('/e')\n"
+        "def deja_sync(session: Session = Depends(get_session)):\n"
+        "    return session.exec(select(User)).all()\n"
+        "\n"
+        "@router.post('/f')\n"
+        "async def imbriquee(request: Request, session: Session = Depends(get_session)):\n"
+        "    def charger():\n"
+        "        return session.get(User, 1)\n"
+        "    form = await request.form()\n"
+        "    return await run_in_threadpool(charger)\n",
+        encoding="utf-8",
+    )
+    resultats = {r.nom: r for r in route_audit.auditer([source])}
+    assert set(resultats) == {"lecture", "upload", "appel_http"}
+    assert resultats["lecture"].convertible and not resultats["upload"].convertible
+    assert "requests.get() ligne 16" in resultats["appel_http"].motifs
+
+    assert route_audit.convertir(resultats.values()) == 2
+    assert {r.nom for r in route_audit.auditer([source])} == {"upload"}
+    assert "\ndef lecture(" in source.read_text(encoding="utf-8")
+
+
+@pytest.fixture
+def application(tmp_path, engine_sqlite):
+    """Routeur des jurys sur SQLite, chaque requête SQL sur les jurys ralentie artificiellement"""
+    engine = engine_sqlite(f"sqlite:///{tmp_path / 'bench.db'}", connect_args={"check_same_thread": False})
+
+    @sa_event.listens_for(engine, "before_cursor_execute")
+    def requete_lente(conn, cursor, statement, *args):
+        if "FROM jury" in statement:
+            time.sleep(DELAI_REQUETE_LENTE)
+
+    utilisateur = User(id=1, email="bench@test.fr", nom_complet="Bench", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR)
+
+    def session_de_test():
+        with Session(engine) as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(jury.router)
+    app.dependency_overrides[get_session] = session_de_test
+    app.dependency_overrides[get_current_user] = lambda: utilisateur
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/jurys-async")
+    async def jurys_async(session: Session = Depends(get_session)):
+        # Schéma d'avant correction : même code synchrone, exécuté dans la boucle
+        return jury.get_jurys(programme_id=None, statut=None, session=session, current_user=utilisateur)
+
+    return app
+
+
+async def _p99_ping_sous_charge(app: FastAPI, route_lente: str) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        fin = False
+
+        async def marteler():
+            while not fin:
+                assert (await client.get(route_lente)).status_code == 200
+
+        charge = [asyncio.create_task(marteler()) for _ in range(CLIENTS_ROUTE_LENTE)]
+        await asyncio.sleep(DELAI_REQUETE_LENTE / 2)
+        # Pings à intervalle fixe : la latence part de l'heure d'envoi prévue,
+        # le temps passé à attendre une boucle bloquée est donc compté
+        latences = []
+        depart = time.perf_counter()
+        for i in range(ECHANTILLONS_PING):
+            prevu = depart + i * INTERVALLE_PING
+            await asyncio.sleep(max(0.0, prevu - time.perf_counter()))
+            assert (await client.get("/ping")).status_code == 200
+            latences.append(time.perf_counter() - prevu)
+        fin = True
+        await asyncio.gather(*charge)
+    return statistics.quantiles(latences, n=100)[98]
+
+
+def test_latence_p99_route_independante(application):
+    p99_def = asyncio.run(_p99_ping_sous_charge(application, "/jurys"))
+    p99_async = asyncio.run(_p99_ping_sous_charge(application, "/jurys-async"))
+    print(f"⏱️ p99 /ping pendant /jurys (def): {p99_def * 1000:.1f} ms")
+    print(f"⏱️ p99 /ping pendant /jurys-async (async bloquante): {p99_async * 1000:.1f} ms")
+
+    assert p99_def < DELAI_REQUETE_LENTE / 2
+    assert p99_async >= DELAI_REQUETE_LENTE / 2
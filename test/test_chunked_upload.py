@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests de l'upload par morceaux des médias e-learning
+
+Envoi parallèle et dans le désordre, morceaux corrompus ou tronqués (sans effet
+sur les plages déjà reçues), reprise, assemblage final et nettoyage des sessions abandonnées.
+"""
+import asyncio
+import base64
+import hashlib
+import inspect
+import os
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app_lia_web.core.config import settings
+from app_lia_web.app.services.chunked_upload_service import ChunkedUploadService, STATUS_CHECKSUM_MISMATCH
+
+CHUNK = 64 * 1024
+USER_ID = 7
+
+
+@pytest.fixture(autouse=True)
+def dossiers(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(settings, "CHUNKED_UPLOAD_DIR", str(tmp_path / "partiels"))
+    return tmp_path
+
+
+def checksum(data: bytes) -> str:
+    return "sha256 " + base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+
+async def flux(data: bytes, taille_paquet: int = 8192):
+    """Corps de requête reçu par paquets, comme request.stream()"""
+    for i in range(0, len(data), taille_paquet):
+        yield data[i:i + taille_paquet]
+
+
+async def envoyer(upload_id: str, contenu: bytes, offset: int, taille: int = CHUNK):
+    morceau = contenu[offset:offset + taille]
+    return await ChunkedUploadService.write_chunk(
+        upload_id, USER_ID, offset, len(morceau), checksum(morceau), flux(morceau)
+    )
+
+
+def test_envoi_parallele_dans_le_desordre(dossiers):
+    contenu = os.urandom(10 * CHUNK + 123)
+    meta = ChunkedUploadService.create_upload("cours.mp4", "video", len(contenu), USER_ID)
+    offsets = list(range(0, len(contenu), CHUNK))[::-1]
+
+    async def tout_envoyer():
+        await asyncio.gather(*(envoyer(meta["upload_id"], contenu, offset) for offset in offsets))
+
+    asyncio.run(tout_envoyer())
+    assert ChunkedUploadService.status(meta["upload_id"])["complete"]
+
+    info = ChunkedUploadService.finalize(meta["upload_id"], USER_ID, "video", "elearning", 3)
+    assert info["relative_path"].startswith("elearning/video/id_3/")
+    assert (dossiers / "uploads" / info["relative_path"]).read_bytes() == contenu
+    assert not (dossiers / "partiels" / meta["upload_id"]).exists()
+
+
+def test_morceau_corrompu_ou_tronque_non_enregistre():
+    contenu = os.urandom(3 * CHUNK)
+    upload_id = ChunkedUploadService.create_upload("podcast.mp3", "audio", len(contenu), USER_ID)["upload_id"]
+    morceau = contenu[:CHUNK]
+
+    with pytest.raises(HTTPException) as erreur:
+        asyncio.run(ChunkedUploadService.write_chunk(
+            upload_id, USER_ID, 0, CHUNK, checksum(b"autre contenu"), flux(morceau)
+        ))
+    assert erreur.value.status_code == STATUS_CHECKSUM_MISMATCH
+
+    with pytest.raises(HTTPException):
+        # Connexion coupée au milieu du morceau
+        asyncio.run(ChunkedUploadService.write_chunk(
+            upload_id, USER_ID, 0, CHUNK, checksum(morceau), flux(morceau[:CHUNK // 2])
+        ))
+    assert ChunkedUploadService.status(upload_id)["received"] == []
+
+    # Reprise : l'offset contigu indique où repartir
+    asyncio.run(envoyer(upload_id, contenu, 0))
+    asyncio.run(envoyer(upload_id, contenu, 2 * CHUNK))
+    etat = ChunkedUploadService.status(upload_id)
+    assert etat["offset"] == CHUNK
+    assert etat["received"] == [[0, CHUNK], [2 * CHUNK, 3 * CHUNK]]
+    with pytest.raises(HTTPException) as erreur:
+        ChunkedUploadService.finalize(upload_id, USER_ID, "audio")
+    assert erreur.value.status_code == 409
+
+
+def test_renvoi_corrompu_d_une_plage_recue_sans_effet(dossiers):
+    contenu = os.urandom(2 * CHUNK)
+    upload_id = ChunkedUploadService.create_upload("cours.mp4", "video", len(contenu), USER_ID)["upload_id"]
+    asyncio.run(envoyer(upload_id, contenu, 0, 2 * CHUNK))
+
+    # Renvoi corrompu puis tronqué d'une plage déjà validée (et d'une plage chevauchante)
+    faux = os.urandom(CHUNK)
+    for offset, corps in ((0, faux), (CHUNK // 2, faux[:CHUNK // 3])):
+        with pytest.raises(HTTPException):
+            asyncio.run(ChunkedUploadService.write_chunk(
+                upload_id, USER_ID, offset, CHUNK, checksum(contenu[offset:offset + CHUNK]), flux(corps)
+            ))
+    assert list((dossiers / "partiels" / upload_id).glob("*.tmp")) == []
+
+    info = ChunkedUploadService.finalize(upload_id, USER_ID, "video")
+    assert (dossiers / "uploads" / info["relative_path"]).read_bytes() == contenu
+
+
+def test_validation_et_proprietaire():
+    with pytest.raises(HTTPException):
+        ChunkedUploadService.create_upload("script.exe", "video", 1000, USER_ID)
+    with pytest.raises(HTTPException):
+        ChunkedUploadService.create_upload("cours.mp4", "video", 10 * 1024 ** 3, USER_ID)
+    upload_id = ChunkedUploadService.create_upload("cours.mp4", "video", 1000, USER_ID)["upload_id"]
+    with pytest.raises(HTTPException) as erreur:
+        ChunkedUploadService.status(upload_id, user_id=USER_ID + 1)
+    assert erreur.value.status_code == 404
+    with pytest.raises(HTTPException):
+        ChunkedUploadService.status("../../etc")
+
+
+def test_nettoyage_sessions_abandonnees(dossiers):
+    ancienne = ChunkedUploadService.create_upload("a.mp4", "video", 1000, USER_ID)["upload_id"]
+    recente = ChunkedUploadService.create_upload("b.mp4", "video", 1000, USER_ID)["upload_id"]
+    il_y_a_deux_jours = time.time() - 2 * 86400
+    session_dir = dossiers / "partiels" / ancienne
+    for chemin in (session_dir / "data.part", session_dir / "ranges", session_dir):
+        os.utime(chemin, (il_y_a_deux_jours, il_y_a_deux_jours))
+
+    assert ChunkedUploadService.cleanup_stale_uploads() == 1
+    assert not session_dir.exists()
+    assert ChunkedUploadService.status(recente)["length"] == 1000
+
+
+def test_routes_sans_corps_en_flux_hors_boucle():
+    # Seul le PATCH lit le corps en flux ; les autres routes font des accès disque synchrones (pool de threads)
+    from app_lia_web.app.routers import elearning
+
+    asynchrones = {
+        route.endpoint.__name__ for route in elearning.router.routes
+        if "/api/uploads" in route.path and inspect.iscoroutinefunction(route.endpoint)
+    }
+    assert asynchrones == {"chunked_upload_patch"}
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests du nettoyage planifié des fichiers temporaires (core/cleanup_scheduler.py)
+
+Seuls les fichiers générés (cartes map_*, feuilles emargement_*) trop anciens
+sont supprimés ; les fichiers permanents des mêmes dossiers (logos, CSV de
+référence) sont conservés quel que soit leur âge. Une tâche n'est exécutée que
+par le processus qui détient le verrou du planificateur.
+"""
+import os
+import time
+
+from app_lia_web.core import cleanup_scheduler
+
+
+def test_fichiers_generes_seuls_purges(tmp_path, monkeypatch):
+    dossiers = {"images": tmp_path / "images", "fichiers": tmp_path / "fichiers", "maps": tmp_path / "maps"}
+    for dossier in dossiers.values():
+        dossier.mkdir()
+    config = [
+        dict(entree, folder=str(dossier))
+        for entree, dossier in zip(cleanup_scheduler.CLEANUP_CONFIG, (dossiers["images"], dossiers["fichiers"], dossiers["maps"]))
+    ]
+    monkeypatch.setattr(cleanup_scheduler, "CLEANUP_CONFIG", config)
+
+    anciens = {
+        "images": ["logo.png", "utilisateur.png", "logo1.jpg", "map_Paris.png"],
+        "fichiers": ["entreprise_data.csv", "emargement_abc.pdf", "emargement_def.pdf.part"],
+        "maps": ["map_Paris.html"],
+    }
+    il_y_a_une_semaine = time.time() - 7 * 24 * 3600
+    for dossier, noms in anciens.items():
+        for nom in noms:
+            chemin = dossiers[dossier] / nom
+            chemin.write_bytes(b"x")
+            os.utime(chemin, (il_y_a_une_semaine, il_y_a_une_semaine))
+    (dossiers["images"] / "map_recente.png").write_bytes(b"x")
+
+    cleanup_scheduler.cleanup_temp_files()
+
+    assert sorted(os.listdir(dossiers["images"])) == ["logo.png", "logo1.jpg", "map_recente.png", "utilisateur.png"]
+    assert os.listdir(dossiers["fichiers"]) == ["entreprise_data.csv"]
+    assert os.listdir(dossiers["maps"]) == []
+
+
+def test_taches_executees_par_un_seul_processus(monkeypatch):
+    executions = []
+
+    def tache():
+        executions.append(1)
+        return "fait"
+
+    unique = cleanup_scheduler.tache_unique(tache)
+    monkeypatch.setattr(cleanup_scheduler, "_detient_verrou", lambda: False)
+    assert unique() is None and executions == []
+    monkeypatch.setattr(cleanup_scheduler, "_detient_verrou", lambda: True)
+    assert unique() == "fait" and executions == [1]
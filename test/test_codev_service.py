@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tests du service de codéveloppement
+
+Planification des présentations en un INSERT, ordre des contributions réservé
+par incrément du compteur de la présentation et statistiques globales en une
+requête.
+"""
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import event as sa_event
+from sqlmodel import Session, select
+
+from app_lia_web.app.models.base import Candidat, Groupe, Inscription, Programme, User
+from app_lia_web.app.models.codev import ContributionCodev, PresentationCodev
+from app_lia_web.app.models.enums import TypeContribution, UserRole
+from app_lia_web.app.services.codev_service import CodevService
+
+
+@pytest.fixture
+def contexte(db):
+    responsable = User(email="resp@test.fr", nom_complet="Resp", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR)
+    db.add(responsable)
+    db.flush()
+    programme = Programme(code="CDV", nom="Codev", responsable_id=responsable.id)
+    groupe = Groupe(nom="Groupe A")
+    db.add_all([programme, groupe])
+    db.flush()
+    inscriptions = []
+    for i in range(4):
+        candidat = Candidat(nom=f"Nom{i}", prenom="Prénom", email=f"c{i}@test.fr")
+        db.add(candidat)
+        db.flush()
+        inscription = Inscription(programme_id=programme.id, candidat_id=candidat.id)
+        db.add(inscription)
+        inscriptions.append(inscription)
+    db.commit()
+
+    cycle = CodevService.create_cycle_codev(db, "Cycle 1", programme.id, date_debut=date(2025, 1, 6))
+    groupe_codev = CodevService.create_groupe_codev(db, cycle.id, groupe.id, "Alpha")
+    for inscription in inscriptions:
+        CodevService.add_membre_groupe(db, groupe_codev.id, inscription.id)
+    seance = CodevService.create_seance_codev(db, groupe.id, 1, datetime(2025, 1, 6, 14))
+    return {"seance_id": seance.id, "inscriptions": [i.id for i in inscriptions]}
+
+
+def compter_requetes(db: Session, action):
+    requetes = []
+    ecouteur = lambda *args: requetes.append(args[2])  # noqa: E731
+    sa_event.listen(db.get_bind(), "before_cursor_execute", ecouteur)
+    try:
+        resultat = action()
+    finally:
+        sa_event.remove(db.get_bind(), "before_cursor_execute", ecouteur)
+    return resultat, len(requetes)
+
+
+def test_planification_en_un_insert(db, contexte):
+    candidats = contexte["inscriptions"]
+    presentations, requetes = compter_requetes(db, lambda: CodevService.planifier_presentations_seance(
+        db, contexte["seance_id"], candidats, ordre_presentations=[3, 1, 4, 2]
+    ))
+    # Lecture de la séance, INSERT ... RETURNING, relecture des présentations
+    assert requetes == 3, requetes
+    assert [(p.ordre_presentation, p.candidat_id) for p in presentations] == [
+        (1, candidats[1]), (2, candidats[3]), (3, candidats[0]), (4, candidats[2])
+    ]
+    assert all(p.cree_le and p.probleme_expose == "" for p in presentations)
+
+    with pytest.raises(ValueError):
+        CodevService.planifier_presentations_seance(db, contexte["seance_id"], candidats, ordre_presentations=[1, 2])
+
+
+def test_ordre_des_contributions(db, contexte):
+    presentation = CodevService.planifier_presentations_seance(db, contexte["seance_id"], contexte["inscriptions"][:1])[0]
+    contributeur = contexte["inscriptions"][1]
+    # Contributions antérieures au compteur : il démarre après la plus haute
+    db.add(ContributionCodev(presentation_id=presentation.id, contributeur_id=contributeur, contenu="ancienne", ordre_contribution=2))
+    db.commit()
+
+    def ajouter(ordre=None):
+        return CodevService.add_contribution(
+            db, presentation.id, contributeur, TypeContribution.SUGGESTION.value, "idée", ordre
+        ).ordre_contribution
+
+    assert [ajouter(), ajouter()] == [3, 4]
+    assert ajouter(10) == 10
+    assert ajouter() == 11
+    assert ajouter(5) == 5
+    assert ajouter() == 12
+    assert db.get(PresentationCodev, presentation.id).dernier_ordre_contribution == 12
+    with pytest.raises(ValueError):
+        CodevService.add_contribution(db, 9999, contributeur, TypeContribution.SUGGESTION.value, "idée")
+
+
+def test_statistiques_globales(db, contexte):
+    CodevService.planifier_presentations_seance(db, contexte["seance_id"], contexte["inscriptions"])
+    stats, requetes = compter_requetes(db, lambda: CodevService.get_statistiques_globales(db))
+    assert requetes == 1
+    assert (stats["nb_cycles"], stats["nb_groupes"], stats["nb_membres"], stats["nb_seances"], stats["nb_presentations"]) == (1, 1, 4, 1, 4)
+    assert stats["presentations_par_statut"] == [("en_attente", 4)]
+    assert stats["cycles_par_statut"] == [("planifie", 1)]
+    assert db.exec(select(ContributionCodev)).all() == []
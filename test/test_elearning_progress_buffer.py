@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test de charge du tampon de progression e-learning
+
+Simule une cohorte qui regarde des vidéos (un heartbeat toutes les 10 s par
+candidat) et compare le nombre de commits par minute : un par heartbeat avant,
+un par lot avec le tampon. Vérifie aussi que les temps cumulés sont exacts et
+que la route de heartbeat refuse une inscription d'un autre utilisateur.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app_lia_web.app.models.base import Candidat, Inscription, Programme, User
+from app_lia_web.app.models.enums import UserRole
+from app_lia_web.app.routers import elearning
+from app_lia_web.app.services.elearning_progress_buffer import ProgressBuffer
+from app_lia_web.app.services.elearning_service import ElearningService
+from app_lia_web.core.database import get_session
+from app_lia_web.core.security import get_current_user
+
+CANDIDATS = 200
+HEARTBEAT_SECONDES = 10
+DUREE_MINUTES = 10
+FLUSH_SECONDES = 30
+
+
+class CompteurEcritures:
+    """Writer de test : chaque appel correspond à un commit en base"""
+
+    def __init__(self):
+        self.commits = 0
+        self.minutes = defaultdict(int)
+        self.derniere_activite = {}
+
+    def __call__(self, rows):
+        self.commits += 1
+        for row in rows:
+            key = (row["inscription_id"], row["ressource_id"])
+            self.minutes[key] += row["minutes"]
+            self.derniere_activite[key] = max(self.derniere_activite.get(key, row["derniere_activite"]), row["derniere_activite"])
+
+
+def simuler_cohorte():
+    compteur = CompteurEcritures()
+    buffer = ProgressBuffer(writer=compteur, flush_interval=FLUSH_SECONDES, max_pending=CANDIDATS * 10)
+    debut = datetime(2025, 1, 6, 9, 0, tzinfo=timezone.utc)
+    heartbeats = 0
+
+    for seconde in range(HEARTBEAT_SECONDES, DUREE_MINUTES * 60 + 1, HEARTBEAT_SECONDES):
+        instant = debut + timedelta(seconds=seconde)
+        for candidat in range(CANDIDATS):
+            buffer.record(inscription_id=candidat, ressource_id=1, secondes=HEARTBEAT_SECONDES, module_id=1, at=instant)
+            heartbeats += 1
+        if seconde % FLUSH_SECONDES == 0:
+            buffer.flush()
+    buffer.stop()
+
+    return heartbeats, compteur, debut + timedelta(minutes=DUREE_MINUTES)
+
+
+def test_commits_par_minute():
+    heartbeats, compteur, _ = simuler_cohorte()
+    commits_avant = heartbeats / DUREE_MINUTES  # un commit par heartbeat
+    commits_apres = compteur.commits / DUREE_MINUTES
+    print(f"📉 Commits/minute : {commits_avant:.0f} sans tampon -> {commits_apres:.1f} avec tampon")
+    assert commits_avant / commits_apres >= 100
+
+
+def test_temps_cumules_exacts():
+    _, compteur, fin = simuler_cohorte()
+    assert len(compteur.minutes) == CANDIDATS
+    assert all(minutes == DUREE_MINUTES for minutes in compteur.minutes.values())
+    assert all(instant == fin for instant in compteur.derniere_activite.values())
+
+
+def test_seuil_de_taille():
+    buffer = ProgressBuffer(writer=CompteurEcritures(), max_pending=3)
+    assert not buffer.record(1, 1, 10)
+    assert not buffer.record(1, 1, 10)  # même clé : cumulée, pas de nouvelle entrée
+    assert not buffer.record(2, 1, 10)
+    assert buffer.record(3, 1, 10)
+
+
+def test_echec_ecriture_conserve_le_tampon():
+    def writer_en_panne(rows):
+        raise RuntimeError("base indisponible")
+
+    buffer = ProgressBuffer(writer=writer_en_panne)
+    buffer.record(1, 1, 120)
+    assert buffer.flush() == 0
+    compteur = CompteurEcritures()
+    buffer.writer = compteur
+    buffer.flush()
+    assert compteur.minutes[(1, 1)] == 2
+
+
+def test_heartbeat_inscription_d_un_autre_utilisateur(monkeypatch, engine):
+    with Session(engine) as db:
+        responsable = User(email="resp@test.fr", nom_complet="Resp", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR)
+        db.add(responsable)
+        db.flush()
+        programme = Programme(code="ACD", nom="ACD", responsable_id=responsable.id)
+        candidats = [Candidat(nom=f"Nom{i}", prenom="Léa", email=f"c{i}@test.fr") for i in range(2)]
+        db.add_all([programme, *candidats])
+        db.flush()
+        inscriptions = [Inscription(programme_id=programme.id, candidat_id=candidat.id) for candidat in candidats]
+        db.add_all(inscriptions)
+        db.commit()
+        candidat_id, mienne, autre = candidats[0].id, inscriptions[0].id, inscriptions[1].id
+
+    enregistres = []
+    monkeypatch.setattr(ElearningService, "record_heartbeat", lambda *args: enregistres.append(args))
+
+    def session():
+        with Session(engine) as s:
+            yield s
+
+    app = FastAPI()
+    app.include_router(elearning.router, prefix="/elearning")
+    app.dependency_overrides[get_session] = session
+    app.dependency_overrides[get_current_user] = lambda: User(
+        id=candidat_id, email="c0@test.fr", nom_complet="Léa", role=UserRole.CANDIDAT.value
+    )
+    client = TestClient(app)
+
+    def heartbeat(inscription_id):
+        return client.post("/elearning/api/progression/heartbeat",
+                           data={"inscription_id": inscription_id, "ressource_id": 1, "secondes": 900})
+
+    assert heartbeat(mienne).status_code == 202
+    assert heartbeat(autre).status_code == 404
+    assert heartbeat(9999).status_code == 404
+    assert enregistres == [(mienne, 1, elearning.HEARTBEAT_MAX_SECONDES, None)]
+
+
+if __name__ == "__main__":
+    heartbeats, compteur, _ = simuler_cohorte()
+    print(f"👥 {CANDIDATS} candidats, {heartbeats} heartbeats sur {DUREE_MINUTES} minutes")
+    print(f"📉 Commits/minute : {heartbeats / DUREE_MINUTES:.0f} sans tampon -> {compteur.commits / DUREE_MINUTES:.1f} avec tampon")
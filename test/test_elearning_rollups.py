@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Tests des rollups e-learning
+
+Les statistiques sont maintenues à chaque écriture de progression : on vérifie
+qu'elles correspondent à une reconstruction complète (modules terminés et score
+moyen du programme après refresh_programmes), qu'un nouvel objectif est pris en
+compte aussitôt, et que la lecture des statistiques de programme se fait en un
+nombre de requêtes constant.
+"""
+import pytest
+from sqlalchemy import event as sa_event
+from sqlmodel import Session, select
+
+from app_lia_web.app.models.base import Candidat, Inscription, Programme, User
+from app_lia_web.app.models.enums import UserRole
+from app_lia_web.app.schemas.elearning import ObjectifElearningCreate
+from app_lia_web.app.models.elearning import (
+    ModuleElearning, ModuleRessource, ObjectifElearning, RessourceElearning,
+    RollupElearningInscription, RollupElearningProgramme
+)
+from app_lia_web.app.services import elearning_rollup
+from app_lia_web.app.services.elearning_service import ElearningService
+
+
+def creer_programme(db: Session, code: str, responsable_id: int, nb_candidats: int) -> dict:
+    programme = Programme(code=code, nom=f"Programme {code}", responsable_id=responsable_id)
+    db.add(programme)
+    db.flush()
+    modules = [ModuleElearning(titre=f"Module {i}", programme_id=programme.id) for i in range(2)]
+    ressources = [RessourceElearning(titre=f"Ressource {t}", type_ressource=t) for t in ("video", "quiz", "document")]
+    db.add_all(modules + ressources)
+    db.flush()
+    db.add_all([
+        ModuleRessource(module_id=modules[0].id, ressource_id=ressources[0].id),
+        ModuleRessource(module_id=modules[0].id, ressource_id=ressources[1].id),
+        ModuleRessource(module_id=modules[1].id, ressource_id=ressources[2].id),
+    ])
+    db.add(ObjectifElearning(programme_id=programme.id, titre="Minimum", temps_minimum_minutes=30))
+    inscriptions = []
+    for i in range(nb_candidats):
+        candidat = Candidat(nom=f"Nom{code}{i}", prenom="Prénom", email=f"{code.lower()}{i}@test.fr")
+        db.add(candidat)
+        db.flush()
+        inscription = Inscription(programme_id=programme.id, candidat_id=candidat.id)
+        db.add(inscription)
+        inscriptions.append(inscription)
+    db.commit()
+    return {
+        "programme_id": programme.id,
+        "ressources": [r.id for r in ressources],
+        "inscriptions": [i.id for i in inscriptions],
+    }
+
+
+@pytest.fixture
+def donnees(db):
+    responsable = User(email="resp@test.fr", nom_complet="Resp", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR)
+    db.add(responsable)
+    db.flush()
+    data = creer_programme(db, "AAA", responsable.id, nb_candidats=3)
+    video, quiz, document = data["ressources"]
+    premier, second, _ = data["inscriptions"]
+
+    # Premier candidat : vidéo terminée (40 min) et quiz terminé (score 80)
+    progression = ElearningService.start_ressource(db, premier, video)
+    ElearningService.update_progression(db, progression.id, 40)
+    ElearningService.complete_ressource(db, progression.id)
+    progression = ElearningService.start_ressource(db, premier, quiz)
+    ElearningService.complete_ressource(db, progression.id, score=80)
+    # Second candidat : document en cours (10 min)
+    progression = ElearningService.start_ressource(db, second, document)
+    ElearningService.update_progression(db, progression.id, 10)
+    return data
+
+
+def lire_rollups(db: Session) -> tuple:
+    inscriptions = {r.inscription_id: r.model_dump(exclude={"maj_le"}) for r in db.exec(select(RollupElearningInscription))}
+    programmes = {r.programme_id: r.model_dump(exclude={"maj_le"}) for r in db.exec(select(RollupElearningProgramme))}
+    return inscriptions, programmes
+
+
+def test_rollups_incrementaux(db, donnees):
+    premier, second, troisieme = donnees["inscriptions"]
+    rollups, programmes = lire_rollups(db)
+
+    assert rollups[premier]["temps_total_minutes"] == 40
+    assert rollups[premier]["ressources_terminees"] == 2
+    assert rollups[premier]["modules_termines"] == 1
+    assert rollups[premier]["terminees_video"] == 1 and rollups[premier]["terminees_quiz"] == 1
+    assert rollups[premier]["score_moyen"] == 80
+    assert rollups[premier]["objectifs_atteints"] == rollups[premier]["objectifs_total"] == 1
+    assert rollups[second]["ressources_commencees"] == 1 and rollups[second]["ressources_terminees"] == 0
+    assert rollups[second]["objectifs_atteints"] == 0
+    assert troisieme not in rollups  # aucune activité
+
+    programme = programmes[donnees["programme_id"]]
+    assert programme["candidats_actifs"] == 2
+    assert programme["temps_total_minutes"] == 50
+    assert programme["temps_moyen_minutes"] == 25
+    assert programme["candidats_objectifs_atteints"] == 1
+    assert programme["ressources_terminees"] == 2 and programme["terminees_quiz"] == 1
+    # Non déductibles d'un delta : calculés par refresh_programmes
+    assert programme["modules_termines"] == 0 and programme["score_moyen"] is None
+    elearning_rollup.refresh_programmes(db)
+    db.commit()
+    programme = lire_rollups(db)[1][donnees["programme_id"]]
+    assert programme["modules_termines"] == 1 and programme["score_moyen"] == 80
+
+
+def test_reconstruction_identique(db, donnees):
+    elearning_rollup.refresh_programmes(db)
+    db.commit()
+    avant = lire_rollups(db)
+    db.exec(RollupElearningInscription.__table__.delete())
+    db.exec(RollupElearningProgramme.__table__.delete())
+    resultat = elearning_rollup.rebuild(db)
+    db.commit()
+    inscriptions, programmes = lire_rollups(db)
+
+    assert resultat["inscriptions"] == 3
+    # La reconstruction crée aussi les lignes des inscriptions sans activité
+    troisieme = donnees["inscriptions"][2]
+    assert inscriptions.pop(troisieme)["ressources_commencees"] == 0
+    assert (inscriptions, programmes) == avant
+
+
+def test_nouvel_objectif(db, donnees):
+    premier, second, _ = donnees["inscriptions"]
+    ElearningService.create_objectif(db, ObjectifElearningCreate(
+        programme_id=donnees["programme_id"], titre="Approfondi", temps_minimum_minutes=20,
+    ))
+    rollups, programmes = lire_rollups(db)
+    assert rollups[premier]["objectifs_total"] == 2 and rollups[premier]["objectifs_atteints"] == 2
+    assert rollups[second]["objectifs_total"] == 2 and rollups[second]["objectifs_atteints"] == 0
+    # Troisième candidat (sans activité) : 0 objectif atteint sur 2
+    assert programmes[donnees["programme_id"]]["candidats_objectifs_atteints"] == 1
+
+
+def test_statistiques_lues_dans_les_rollups(db, donnees):
+    premier = donnees["inscriptions"][0]
+    elearning_rollup.refresh_programmes(db)  # tâche planifiée : modules terminés du programme
+    db.commit()
+    stats = ElearningService.get_statistiques_candidat(db, premier)
+    assert stats.temps_total_minutes == 40
+    assert stats.modules_termines == 1 and stats.modules_total == 2
+    assert stats.objectif_atteint
+    assert stats.terminees_par_type["video"] == 1
+
+    stats_programme = ElearningService.get_statistiques_programme(db, donnees["programme_id"])
+    assert stats_programme.candidats_inscrits == 3
+    assert stats_programme.taux_completion == 50
+    assert stats_programme.nb_ressources == 3
+    assert stats_programme.modules_populaires[0] == {"titre": "Module 0", "participations": 2}
+
+    assert ElearningService.get_stats_ressources_par_type(db) == {"video": 1, "document": 1, "quiz": 1, "lien": 0, "audio": 0}
+
+
+@pytest.mark.parametrize("nb_programmes", [1, 5])
+def test_statistiques_programmes_requetes_constantes(db, nb_programmes):
+    responsable = User(email="resp@test.fr", nom_complet="Resp", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR)
+    db.add(responsable)
+    db.flush()
+    programme_ids = [creer_programme(db, f"P{i}", responsable.id, nb_candidats=2)["programme_id"] for i in range(nb_programmes)]
+    elearning_rollup.rebuild(db)
+    db.commit()
+
+    requetes = []
+    sa_event.listen(db.get_bind(), "before_cursor_execute", lambda *args: requetes.append(args[2]))
+    stats = ElearningService.get_statistiques_programmes(db, programme_ids)
+
+    assert [s.programme_id for s in stats] == programme_ids
+    assert len(requetes) == 2
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests du recalcul en masse de l'éligibilité
+
+Un programme entier est évalué en une jointure et quelques upserts (durée
+affichée face au recalcul unitaire), les tranches de CA ne sont parsées qu'une
+fois, un recalcul met à jour les lignes existantes sans doublon, et la
+modification des seuils d'un programme relance le recalcul en tâche de fond.
+"""
+import time
+from datetime import date
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event as sa_event
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, func, select
+
+from app_lia_web.app.models.base import Candidat, Eligibilite, Entreprise, Preinscription, Programme, User
+from app_lia_web.app.models.enums import UserRole
+from app_lia_web.app.routers import programmes
+from app_lia_web.app.services import eligibilite_service as service
+from app_lia_web.app.services.ACD.eligibilite import entreprise_age_annees, evaluate_eligibilite, parse_ca_intervalle
+from app_lia_web.core.database import get_session
+from app_lia_web.core.security import get_current_user
+
+DOSSIERS = 3000
+TRANCHES = ["0 - 10 000 €", "10 000 - 50 000 €", "50 000 - 150 000 €", "150 000 - 500 000 €", None]
+
+
+@pytest.fixture
+def programme(db):
+    directeur = User(email="dt@test.fr", nom_complet="DT", mot_de_passe_hash="x", role=UserRole.DIRECTEUR_TECHNIQUE)
+    db.add(directeur)
+    db.flush()
+    programme = Programme(code="ACD", nom="ACD", responsable_id=directeur.id, ca_seuil_min=20000, anciennete_min_annees=2)
+    autre = Programme(code="AUT", nom="Autre", responsable_id=directeur.id)
+    db.add_all([programme, autre])
+    db.flush()
+    candidats = [Candidat(nom=f"Nom{i}", prenom="Léa", email=f"c{i}@test.fr", adresse_personnelle=f"{i} rue") for i in range(DOSSIERS)]
+    db.add_all(candidats)
+    db.flush()
+    for i, candidat in enumerate(candidats):
+        db.add(Preinscription(programme_id=programme.id if i % 10 else autre.id, candidat_id=candidat.id))
+        if i % 7:  # quelques candidats sans entreprise
+            db.add(Entreprise(
+                candidat_id=candidat.id, chiffre_affaires=TRANCHES[i % len(TRANCHES)],
+                date_creation=date(2015 + i % 10, 1, 1), adresse=f"{i} avenue",
+            ))
+    db.add(Entreprise(candidat_id=candidats[1].id, chiffre_affaires="0 - 10 000 €"))  # deuxième entreprise ignorée
+    db.commit()
+    return programme
+
+
+@pytest.fixture
+def requetes():
+    journal = []
+    ecouteur = lambda *args: journal.append(args[2])  # noqa: E731
+    sa_event.listen(Engine, "before_cursor_execute", ecouteur)
+    yield journal
+    sa_event.remove(Engine, "before_cursor_execute", ecouteur)
+
+
+def recalcul_unitaire(session, pre_id):
+    """elig_recalc d'avant le moteur : quatre lectures puis l'évaluation, par préinscription"""
+    pre = session.get(Preinscription, pre_id)
+    prog = session.get(Programme, pre.programme_id)
+    cand = session.get(Candidat, pre.candidat_id)
+    ent = session.exec(select(Entreprise).where(Entreprise.candidat_id == cand.id)).first()
+    return evaluate_eligibilite(
+        adresse_perso=cand.adresse_personnelle, adresse_entreprise=ent.adresse if ent else None,
+        chiffre_affaires=ent.chiffre_affaires if ent else None,
+        anciennete_annees=entreprise_age_annees(ent.date_creation) if ent else None,
+        ca_min=prog.ca_seuil_min, ca_max=prog.ca_seuil_max, anciennete_min_annees=prog.anciennete_min_annees,
+    )
+
+
+def verdicts(db, programme_id):
+    return dict(db.exec(
+        select(Eligibilite.preinscription_id, Eligibilite.verdict)
+        .join(Preinscription, Preinscription.id == Eligibilite.preinscription_id)
+        .where(Preinscription.programme_id == programme_id)
+    ).all())
+
+
+def test_recalcul_du_programme(db, programme, requetes):
+    ids = db.exec(select(Preinscription.id).where(Preinscription.programme_id == programme.id)).all()
+    debut = time.perf_counter()
+    attendus = {pre_id: recalcul_unitaire(db, pre_id)[0] for pre_id in ids}
+    unitaire = time.perf_counter() - debut
+
+    programme_id = programme.id
+    db.expire_all()
+    parse_ca_intervalle.cache_clear()
+    requetes.clear()
+    debut = time.perf_counter()
+    nb = service.recalculer_eligibilites(db, programme_id=programme_id)
+    lot = time.perf_counter() - debut
+    print(f"⏱️ {nb} éligibilités : unitaire {unitaire:.2f} s, en masse {lot:.2f} s, {len(requetes)} requêtes")
+
+    assert nb == len(ids) == DOSSIERS - DOSSIERS // 10
+    # Une jointure, un upsert par lot de 1000, le COMMIT
+    ecritures = [r for r in requetes if not r.startswith(("BEGIN", "COMMIT"))]
+    assert len(ecritures) == 1 + -(-nb // service.LOT_ELIGIBILITE)
+    assert parse_ca_intervalle.cache_info().misses == len(TRANCHES)
+    assert verdicts(db, programme.id) == attendus
+    assert set(attendus.values()) == {"attention", "ko"}  # QPV toujours faux (is_qpv_address à brancher)
+
+    # Recalcul : mise à jour en place, l'autre programme n'est pas touché
+    db.exec(select(Programme).where(Programme.id == programme.id)).one().anciennete_min_annees = None
+    db.commit()
+    assert service.recalculer_eligibilites(db, programme_id=programme.id) == nb
+    assert db.exec(select(func.count()).select_from(Eligibilite)).one() == nb
+    assert verdicts(db, programme.id) != attendus
+
+    assert service.recalculer_eligibilites(db, preinscription_ids=ids[:3] + [999_999]) == 3
+    with pytest.raises(ValueError):
+        service.recalculer_eligibilites(db)
+
+
+def test_recalcul_quand_les_seuils_changent(engine, db, programme, monkeypatch):
+    monkeypatch.setattr(service, "engine", engine)
+
+    def session():
+        with Session(engine) as s:
+            yield s
+
+    app = FastAPI()
+    app.include_router(programmes.router)
+    app.dependency_overrides[get_session] = session
+    app.dependency_overrides[get_current_user] = lambda: User(
+        email="dt@test.fr", nom_complet="DT", role=UserRole.DIRECTEUR_TECHNIQUE.value
+    )
+    client = TestClient(app)
+
+    # Sans changement de seuil, pas de recalcul
+    assert client.put(f"/programmes/{programme.id}", json={"nom": "Nouveau nom"}).status_code == 200
+    assert db.exec(select(func.count()).select_from(Eligibilite)).one() == 0
+
+    # TestClient exécute les tâches de fond avant de rendre la réponse
+    reponse = client.put(f"/programmes/{programme.id}", json={"ca_seuil_max": 100000})
+    assert reponse.status_code == 200 and reponse.json()["ca_seuil_max"] == 100000
+    assert db.exec(select(func.count()).select_from(Eligibilite)).one() == DOSSIERS - DOSSIERS // 10
+    assert db.exec(select(func.count()).select_from(Eligibilite).where(Eligibilite.ca_seuil_ok == False)).one() > 0  # noqa: E712
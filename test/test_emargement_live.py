@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Tests de l'émargement en direct (SSE)
+
+Les notifications des triggers sont redistribuées par le diffuseur du worker
+à tous les flux abonnés au canal concerné, sans aucune requête SQL pendant
+le flux : 200 écrans ouverts sur une session ne coûtent plus 200 requêtes
+toutes les 5 secondes.
+"""
+import asyncio
+import json
+from datetime import datetime
+
+from sqlalchemy import event as sa_event
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from app_lia_web.app.models.base import EmargementRDV
+from app_lia_web.app.routers.emargement_router import _statuts_initiaux
+from app_lia_web.app.services.emargement_live import (
+    TABLES_SUIVIES, DiffuseurEmargement, canal, evenement_depuis_notification, flux_sse, nom_trigger, sql_declencheurs,
+)
+
+ECRANS = 200
+
+
+def lire(message: str) -> dict:
+    assert message.startswith("data: ") and message.endswith("\n\n")
+    return json.loads(message[len("data: "):])
+
+
+def notification_presence(session_id: int, inscription_id: int, operation: str = "UPDATE") -> dict:
+    return {
+        "canal": canal("session", session_id),
+        "table": "presenceseminaire",
+        "operation": operation,
+        "ligne": {
+            "session_id": session_id, "inscription_id": inscription_id, "presence": "present",
+            "methode_signature": "digital", "heure_arrivee": "2025-05-01T09:05:00",
+        },
+        "signatures": {"signature_digitale": True, "signature_manuelle": False, "photo_signature": False},
+    }
+
+
+async def _diffusion_a_200_ecrans():
+    diffuseur = DiffuseurEmargement()
+    flux = [flux_sse(diffuseur, [canal("session", 1)], heartbeat=60) for _ in range(ECRANS)]
+    # retry: puis abonnement effectif
+    assert all([(await f.__anext__()).startswith("retry:") for f in flux])
+    autre = flux_sse(diffuseur, [canal("session", 2)], heartbeat=60)
+    await autre.__anext__()
+    assert diffuseur.nb_abonnes == ECRANS + 1
+
+    recus = [asyncio.ensure_future(f.__anext__()) for f in flux]
+    assert diffuseur.publier(notification_presence(1, 42)) == ECRANS
+    messages = [lire(m) for m in await asyncio.gather(*recus)]
+    assert all(m == messages[0] for m in messages)
+    assert messages[0] == {
+        "type": "presence", "session_id": 1, "inscription_id": 42, "presence": "present",
+        "methode_signature": "digital", "heure_arrivee": "2025-05-01T09:05:00", "signe": True,
+    }
+    # Le canal de l'autre session n'a rien reçu
+    attente = asyncio.ensure_future(autre.__anext__())
+    await asyncio.sleep(0.01)
+    assert not attente.done()
+    # Écran fermé pendant l'attente : le générateur se termine et se désabonne
+    attente.cancel()
+    await asyncio.gather(attente, return_exceptions=True)
+    assert diffuseur.nb_abonnes == ECRANS
+
+    for f in flux:
+        await f.aclose()
+    assert diffuseur.nb_abonnes == 0
+    assert diffuseur.publier(notification_presence(1, 42)) == 0
+
+
+def test_diffusion_sans_requete_sql():
+    requetes = []
+    ecouteur = lambda *args: requetes.append(args[2])  # noqa: E731
+    # Écoute sur tous les moteurs : le flux ne doit toucher à aucune base
+    sa_event.listen(Engine, "before_cursor_execute", ecouteur)
+    try:
+        asyncio.run(_diffusion_a_200_ecrans())
+    finally:
+        sa_event.remove(Engine, "before_cursor_execute", ecouteur)
+    assert requetes == []
+
+
+def test_heartbeat_et_etat_initial():
+    async def scenario():
+        flux = flux_sse(DiffuseurEmargement(), [canal("rdv", 7)], [{"type": "statut", "rdv_id": 7}], heartbeat=0.01)
+        messages = [await flux.__anext__() for _ in range(3)]
+        await flux.aclose()
+        return messages
+
+    retry, initial, ping = asyncio.run(scenario())
+    assert retry == "retry: 5000\n\n"
+    assert lire(initial) == {"type": "statut", "rdv_id": 7}
+    assert ping == ": ping\n\n"
+
+
+def test_evenements_rdv():
+    message = {
+        "canal": canal("rdv", 7), "table": "emargementrdv", "operation": "UPDATE",
+        "ligne": {"rdv_id": 7, "date_signature_conseiller": "2025-05-01T09:00:00", "date_signature_candidat": None},
+        "signatures": {"signature_conseiller": True, "signature_candidat": False},
+    }
+    evenement = evenement_depuis_notification(message)
+    assert (evenement["type"], evenement["rdv_id"], evenement["status"]) == ("statut", 7, "found")
+    assert (evenement["conseiller_signe"], evenement["candidat_signe"], evenement["peut_commencer"]) == (True, False, False)
+
+    evenement = evenement_depuis_notification({**message, "operation": "DELETE"})
+    assert (evenement["status"], evenement["peut_commencer"]) == ("not_found", False)
+
+    evenement = evenement_depuis_notification(notification_presence(3, 5, "DELETE"))
+    assert (evenement["type"], evenement["inscription_id"]) == ("suppression", 5)
+
+
+def test_statuts_initiaux_en_une_requete(engine):
+    with Session(engine) as session:
+        session.add(EmargementRDV(
+            rdv_id=1, type_signataire="conseiller", signature_conseiller="x", signature_candidat="y",
+            date_signature_conseiller=datetime(2025, 5, 1, 9), date_signature_candidat=datetime(2025, 5, 1, 9, 1),
+        ))
+        session.add(EmargementRDV(rdv_id=2, type_signataire="conseiller", signature_conseiller="x", date_signature_conseiller=datetime(2025, 5, 1, 9)))
+        session.commit()
+
+    requetes = []
+    sa_event.listen(engine, "before_cursor_execute", lambda *args: requetes.append(args[2]))
+    etats = _statuts_initiaux(Session(engine), [1, 2, 3])
+    assert len(requetes) == 1
+    assert [(e["rdv_id"], e["status"], e["peut_commencer"]) for e in etats] == [
+        (1, "found", True), (2, "found", False), (3, "not_found", False)
+    ]
+    assert etats[0]["date_signature_candidat"] == "2025-05-01T09:01:00"
+
+
+def test_sql_des_triggers():
+    instructions = sql_declencheurs()
+    assert "pg_notify('emargement'" in instructions[0]
+    for table, (portee, colonne) in TABLES_SUIVIES.items():
+        assert any(i.startswith(f"CREATE TRIGGER {nom_trigger(table)}") and f"('{portee}', '{colonne}')" in i for i in instructions)
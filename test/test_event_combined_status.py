@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests du statut imbriqué des participants aux événements
+
+Le statut est calculé en SQL (combined_status_expression) : on vérifie chaque
+combinaison invitation / présence / date sur une base SQLite en mémoire, ainsi
+que les compteurs et le nombre de requêtes de get_event_roster.
+"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event as sa_event
+from sqlmodel import Session
+
+from app_lia_web.app.models.base import Candidat, Inscription, Programme, User
+from app_lia_web.app.models.enums import UserRole
+from app_lia_web.app.models.event import (
+    Event, InvitationEvent, PresenceEvent, StatutInvitationEvent, TypeInvitationEvent
+)
+from app_lia_web.app.services.event_service import EventService
+
+# (statut d'invitation, présence enregistrée, statut attendu avant, statut attendu après l'événement)
+CAS = [
+    (StatutInvitationEvent.EN_ATTENTE, None, "en_attente", "absent"),
+    (StatutInvitationEvent.ACCEPTEE, None, "acceptee", "absent"),
+    (StatutInvitationEvent.REFUSEE, None, "refusee", "absent"),
+    (StatutInvitationEvent.ACCEPTEE, "en_attente", "acceptee", "absent"),
+    (StatutInvitationEvent.ACCEPTEE, "present", "present", "present"),
+    (StatutInvitationEvent.REFUSEE, "absent", "absent", "absent"),
+    (StatutInvitationEvent.EN_ATTENTE, "excuse", "excuse", "excuse"),
+]
+
+
+def creer_evenement(db: Session, passe: bool) -> int:
+    organisateur = User(email="orga@test.fr", nom_complet="Orga", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR)
+    db.add(organisateur)
+    db.flush()
+    programme = Programme(code="TST", nom="Test", responsable_id=organisateur.id)
+    db.add(programme)
+    db.flush()
+    jour = date.today() + timedelta(days=-3 if passe else 3)
+    evenement = Event(titre="Événement", date_debut=jour, date_fin=jour,
+                      programme_id=programme.id, organisateur_id=organisateur.id)
+    db.add(evenement)
+    db.flush()
+    for i, (statut, presence, _, _) in enumerate(CAS):
+        candidat = Candidat(nom=f"Nom{i}", prenom="Prénom", email=f"candidat{i}@test.fr")
+        db.add(candidat)
+        db.flush()
+        inscription = Inscription(programme_id=programme.id, candidat_id=candidat.id)
+        db.add(inscription)
+        db.flush()
+        db.add(InvitationEvent(event_id=evenement.id, inscription_id=inscription.id, statut=statut,
+                               type_invitation=TypeInvitationEvent.INDIVIDUELLE, token_invitation=f"jeton-{i}"))
+        if presence:
+            db.add(PresenceEvent(event_id=evenement.id, inscription_id=inscription.id, presence=presence))
+    db.commit()
+    event_id = evenement.id
+    db.expunge_all()
+    return event_id
+
+
+@pytest.mark.parametrize("passe", [False, True], ids=["avant", "apres"])
+def test_statut_imbrique(db, passe):
+    event_id = creer_evenement(db, passe)
+    attendus = [apres if passe else avant for _, _, avant, apres in CAS]
+
+    requetes = []
+    sa_event.listen(db.get_bind(), "before_cursor_execute", lambda *args: requetes.append(args[2]))
+    presences_data, stats = EventService().get_event_roster(event_id, db)
+
+    assert [p["combined_status"] for p in presences_data] == attendus
+    assert len(requetes) == 1
+    assert stats["total"] == len(CAS)
+    for statut in ("en_attente", "acceptee", "refusee", "present", "absent", "excuse"):
+        assert stats[statut] == attendus.count(statut)
+    # Les candidats sont chargés par la même requête
+    assert presences_data[0]["invitation"].inscription.candidat.nom == "Nom0"
+    assert len(requetes) == 1
+
+
+def test_statut_imbrique_unitaire(db):
+    event_id = creer_evenement(db, passe=False)
+    service = EventService()
+    presences_data, _ = service.get_event_roster(event_id, db)
+    for presence_data in presences_data:
+        assert service.get_combined_status(event_id, presence_data["inscription_id"], db) == presence_data["combined_status"]
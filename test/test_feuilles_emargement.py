@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Tests des feuilles d'émargement PDF par lot
+
+Lecture des lignes en une requête par document, signatures décodées une
+seule fois (cache par empreinte, une image par document), PDF écrit sur
+disque avec une table xref valide, génération en tâche de fond au-delà du
+seuil. Le débit (feuilles par seconde) est affiché.
+"""
+import asyncio
+import base64
+import io
+import re
+import time
+from datetime import date, datetime
+
+import pytest
+from fastapi import BackgroundTasks
+from sqlalchemy import event as sa_event
+from sqlmodel import select
+
+from app_lia_web.app.models.base import Candidat, Entreprise, Inscription, Programme, User
+from app_lia_web.app.models.enums import UserRole
+from app_lia_web.app.models.seminaire import PresenceSeminaire, Seminaire, SessionSeminaire
+from app_lia_web.app.services import feuille_emargement_service as service
+
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+
+SESSIONS = 6
+PARTICIPANTS = 40
+SIGNATURES_DISTINCTES = 10
+
+
+def signature_png(graine: int) -> str:
+    image = Image.new("RGBA", (600, 200), (0, 0, 0, 0))
+    ImageDraw.Draw(image).line([(20, 150), (200 + graine * 30, 40), (580, 160 - graine * 5)], fill=(0, 0, 80, 255), width=6)
+    tampon = io.BytesIO()
+    image.save(tampon, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(tampon.getvalue()).decode()
+
+
+@pytest.fixture
+def seminaire_id(db):
+    organisateur = User(email="org@test.fr", nom_complet="Org", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR)
+    db.add(organisateur)
+    db.flush()
+    programme = Programme(code="SEM", nom="Séminaires", responsable_id=organisateur.id)
+    db.add(programme)
+    db.flush()
+    seminaire = Seminaire(
+        titre="Séminaire « Création d'entreprise »", programme_id=programme.id, organisateur_id=organisateur.id,
+        date_debut=date(2025, 5, 5), date_fin=date(2025, 5, 10), lieu="Salle (A)",
+    )
+    db.add(seminaire)
+    db.flush()
+    sessions = [
+        SessionSeminaire(seminaire_id=seminaire.id, titre=f"Atelier {i}", date_session=date(2025, 5, 5 + i), heure_debut=datetime(2025, 5, 5 + i, 9))
+        for i in range(SESSIONS)
+    ]
+    db.add_all(sessions)
+    inscriptions = []
+    for i in range(PARTICIPANTS):
+        candidat = Candidat(nom=f"Nom{i:02d}", prenom="Éloïse", email=f"c{i}@test.fr")
+        db.add(candidat)
+        db.flush()
+        db.add(Entreprise(candidat_id=candidat.id, raison_sociale=f"Société {i}"))
+        inscription = Inscription(programme_id=programme.id, candidat_id=candidat.id)
+        db.add(inscription)
+        inscriptions.append(inscription)
+    db.flush()
+    signatures = [signature_png(i) for i in range(SIGNATURES_DISTINCTES)]
+    for s in sessions:
+        for i, inscription in enumerate(inscriptions):
+            db.add(PresenceSeminaire(
+                session_id=s.id, inscription_id=inscription.id, presence="present" if i % 4 else "absent",
+                heure_arrivee=datetime(2025, 5, 5, 9, i % 60) if i % 4 else None,
+                signature_digitale=signatures[(i // 4) % SIGNATURES_DISTINCTES] if i % 4 == 1 else None,
+                signature_manuelle=f"Nom{i:02d}" if i % 4 == 2 else None,
+                photo_signature="x" * 10_000,
+            ))
+    db.commit()
+    return seminaire.id
+
+
+@pytest.fixture(autouse=True)
+def dossier(tmp_path, monkeypatch):
+    monkeypatch.setattr(service, "get_pdf_path", lambda nom: str(tmp_path / nom))
+    service.cache_signatures.vider()
+    return tmp_path
+
+
+def verifier_pdf(chemin) -> bytes:
+    contenu = open(chemin, "rb").read()
+    assert contenu.startswith(b"%PDF-1.4") and contenu.endswith(b"%%EOF\n")
+    debut_xref = int(re.search(rb"startxref\n(\d+)\n", contenu).group(1))
+    assert contenu[debut_xref:debut_xref + 4] == b"xref"
+    decalages = re.findall(rb"(\d{10}) 00000 n ", contenu[debut_xref:])
+    for numero, decalage in enumerate(decalages, start=1):
+        assert contenu[int(decalage):].startswith(b"%d 0 obj" % numero)
+    return contenu
+
+
+def test_lecture_en_une_requete(db, seminaire_id):
+    requetes = []
+    ecouteur = lambda *args: requetes.append(args[2])  # noqa: E731
+    sa_event.listen(db.get_bind(), "before_cursor_execute", ecouteur)
+    try:
+        feuilles = service.feuilles_seminaire(db, seminaire_id)
+    finally:
+        sa_event.remove(db.get_bind(), "before_cursor_execute", ecouteur)
+    # Séminaire, sessions, lignes : indépendant du nombre de participants
+    assert len(requetes) == 3
+    assert not any("photo_signature" in r for r in requetes)
+    assert [len(f.lignes) for f in feuilles] == [PARTICIPANTS] * SESSIONS
+    premiere = feuilles[0].lignes[1]
+    assert (premiere.nom, premiere.entreprise, premiere.presence) == ("Nom01 Éloïse", "Société 1", "present")
+    assert premiere.signature_image and feuilles[0].lignes[2].signature_texte == "Nom02"
+    assert feuilles[0].sous_titre.startswith("Atelier 0 · 05/05/2025 · 09:00")
+
+    session_id = db.exec(select(SessionSeminaire.id).where(SessionSeminaire.titre == "Atelier 2")).one()
+    assert [f.sous_titre[:9] for f in service.feuilles_seminaire(db, seminaire_id, session_id)] == ["Atelier 2"]
+    assert service.feuilles_seminaire(db, 9999) == []
+
+
+def test_pdf_et_cache_des_signatures(db, seminaire_id, dossier):
+    feuilles = service.feuilles_seminaire(db, seminaire_id)
+    nb_pages = service.generer_pdf(feuilles, str(dossier / "seminaire.pdf"))
+    pages_par_feuille = -(-PARTICIPANTS // service.LIGNES_PAR_PAGE)
+    assert nb_pages == SESSIONS * pages_par_feuille
+
+    contenu = verifier_pdf(dossier / "seminaire.pdf")
+    assert contenu.count(b"/Type /Page ") == nb_pages
+    # Chaque signature distincte est décodée une fois et écrite une fois dans le document
+    assert contenu.count(b"/Subtype /Image") == SIGNATURES_DISTINCTES
+    assert service.cache_signatures.echecs == SIGNATURES_DISTINCTES
+    assert service.cache_signatures.succes == SESSIONS * PARTICIPANTS // 4 - SIGNATURES_DISTINCTES
+    assert "Séminaire « Création d'entreprise »".encode("cp1252") in contenu
+    assert b"Salle \\(A\\)" in contenu
+    assert not list(dossier.glob("*.part"))
+
+
+def test_signature_illisible(dossier):
+    ligne = service.LigneFeuille("Nom", "", "present", None, "data:image/png;base64,pas-une-image", None, signe=True)
+    service.generer_pdf([service.Feuille("Titre", "", [ligne])], str(dossier / "illisible.pdf"))
+    contenu = verifier_pdf(dossier / "illisible.pdf")
+    assert b"/Subtype /Image" not in contenu
+    assert "Signature électronique enregistrée".encode("cp1252") in contenu
+
+
+def test_generation_en_arriere_plan(db, seminaire_id, monkeypatch):
+    feuilles = service.feuilles_seminaire(db, seminaire_id)
+
+    reponse = service.servir_feuilles(feuilles[:1], BackgroundTasks(), "session.pdf")
+    assert reponse.media_type == "application/pdf"
+
+    monkeypatch.setattr(service, "SEUIL_ARRIERE_PLAN", PARTICIPANTS)
+    taches = BackgroundTasks()
+    reponse = service.servir_feuilles(feuilles, taches, "seminaire.pdf")
+    assert reponse.status_code == 202 and "Refresh" in reponse.headers
+    travail = reponse.headers["Refresh"].rsplit("/", 1)[-1]
+    assert service.etat_travail(travail)[0] == "en_cours"
+
+    asyncio.run(taches())
+    etat, chemin = service.etat_travail(travail)
+    assert etat == "termine"
+    verifier_pdf(chemin)
+    assert service.etat_travail("../../etc/passwd") == ("inconnu", None)
+
+
+def test_debit_feuilles_par_seconde(db, seminaire_id, dossier):
+    feuilles = service.feuilles_seminaire(db, seminaire_id) * 5
+    debut = time.perf_counter()
+    service.generer_pdf(feuilles, str(dossier / "debit.pdf"))
+    duree = time.perf_counter() - debut
+    debit = len(feuilles) / duree
+    print(f"📄 {len(feuilles)} feuilles de {PARTICIPANTS} lignes en {duree:.2f}s : {debit:.0f} feuilles/s")
+    assert debit > 5
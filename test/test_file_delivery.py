@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Tests de l'envoi des fichiers (core/file_delivery.py)
+
+Sans FILE_OFFLOAD les octets passent par l'application comme avant ; en mode
+x-accel / x-sendfile la réponse ne porte que l'en-tête destiné au serveur
+frontal. Les liens signés suivent le format secure_link de nginx et sont
+refusés s'ils sont altérés ou expirés. Le temps CPU du worker par Go servi est
+affiché pour les deux modes.
+"""
+import base64
+import hashlib
+import time
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app_lia_web.app.routers import fichiers
+from app_lia_web.core import file_delivery
+from app_lia_web.core.config import settings
+
+TAILLE_BENCHMARK = 64 * 1024 * 1024
+TELECHARGEMENTS = 3
+
+
+@pytest.fixture
+def dossiers(tmp_path, monkeypatch):
+    media = tmp_path / "media"
+    (media / "documents").mkdir(parents=True)
+    (media / "documents" / "relevé.pdf").write_bytes(b"%PDF-1.4 " + b"x" * 1000)
+    (tmp_path / "secret.txt").write_text("hors racine")
+    monkeypatch.setattr(file_delivery, "racines", lambda: {"media": media, "files": tmp_path / "files"})
+    monkeypatch.setattr(settings, "FILE_URL_SECRET", "secret-de-test")
+    return tmp_path
+
+
+@pytest.fixture
+def client(dossiers):
+    app = FastAPI()
+    app.include_router(fichiers.router)
+
+    @app.get("/telecharger/{nom:path}")
+    def telecharger(nom: str):
+        return file_delivery.reponse_fichier(dossiers / nom)
+
+    return TestClient(app)
+
+
+def test_modes_d_envoi(dossiers, client, monkeypatch):
+    attendu = (dossiers / "media" / "documents" / "relevé.pdf").read_bytes()
+
+    reponse = client.get("/telecharger/media/documents/relevé.pdf")
+    assert reponse.content == attendu
+    assert reponse.headers["content-type"] == "application/pdf"
+    assert reponse.headers["content-disposition"] == "attachment; filename*=utf-8''relev%C3%A9.pdf"
+    assert client.get("/telecharger/media/documents/relevé.pdf", headers={"Range": "bytes=0-3"}).content == b"%PDF"
+
+    monkeypatch.setattr(settings, "FILE_OFFLOAD", "x-accel")
+    reponse = client.get("/telecharger/media/documents/relevé.pdf")
+    assert reponse.status_code == 200 and reponse.content == b""
+    assert reponse.headers["x-accel-redirect"] == "/_fichiers_internes/media/documents/relev%C3%A9.pdf"
+    assert reponse.headers["content-type"] == "application/pdf"
+    assert reponse.headers["content-disposition"] == "attachment; filename*=utf-8''relev%C3%A9.pdf"
+    # Hors des racines servies : envoi par l'application
+    assert client.get("/telecharger/secret.txt").content == b"hors racine"
+
+    monkeypatch.setattr(settings, "FILE_OFFLOAD", "x-sendfile")
+    reponse = client.get("/telecharger/media/documents/relevé.pdf")
+    assert unquote(reponse.headers["x-sendfile"]) == str((dossiers / "media" / "documents" / "relevé.pdf").resolve())
+
+    monkeypatch.setattr(settings, "FILE_OFFLOAD", "apache")
+    with pytest.raises(ValueError):
+        file_delivery.reponse_fichier(dossiers / "secret.txt")
+
+
+def test_liens_signes(dossiers, client, monkeypatch):
+    url = file_delivery.signer_fichier(dossiers / "media" / "documents" / "relevé.pdf", ttl_seconds=60)
+    assert client.get(url).content.startswith(b"%PDF")
+
+    # Signature recalculée comme le fait secure_link_md5 "$secure_link_expires$uri <secret>"
+    parametres = {k: v[0] for k, v in parse_qs(urlsplit(url).query).items()}
+    uri = "/fichiers-signes/media/documents/relevé.pdf"
+    nginx = base64.urlsafe_b64encode(
+        hashlib.md5(f"{parametres['expires']}{uri} secret-de-test".encode()).digest()
+    ).decode().rstrip("=")
+    assert parametres["st"] == nginx
+
+    assert client.get(url.replace("st=", "st=x")).status_code == 403
+    assert client.get(url.replace("media/documents", "media/autre")).status_code == 403
+    expire = file_delivery.signer_url("media", "documents/relevé.pdf", ttl_seconds=-1)
+    assert client.get(expire).status_code == 410
+
+    # Chemin signé mais sortant de la racine
+    parametres = parse_qs(urlsplit(file_delivery.signer_url("media", "../secret.txt")).query)
+    with pytest.raises(HTTPException) as erreur:
+        fichiers.fichier_signe("media", "../secret.txt", int(parametres["expires"][0]), parametres["st"][0])
+    assert erreur.value.status_code == 403
+    with pytest.raises(ValueError):
+        file_delivery.signer_fichier(dossiers / "secret.txt")
+
+    monkeypatch.setattr(settings, "FILE_OFFLOAD", "x-accel")
+    reponse = client.get(url)
+    assert reponse.content == b"" and reponse.headers["x-accel-redirect"].startswith("/_fichiers_internes/media/")
+
+
+def cpu_par_go(client, url) -> float:
+    debut = time.process_time()
+    for _ in range(TELECHARGEMENTS):
+        assert client.get(url).status_code == 200
+    return (time.process_time() - debut) / (TELECHARGEMENTS * TAILLE_BENCHMARK / 1024 ** 3)
+
+
+def test_cpu_par_go_servi(dossiers, client, monkeypatch):
+    with open(dossiers / "media" / "video.mp4", "wb") as f:
+        f.truncate(TAILLE_BENCHMARK)
+
+    application = cpu_par_go(client, "/telecharger/media/video.mp4")
+    monkeypatch.setattr(settings, "FILE_OFFLOAD", "x-accel")
+    delegue = cpu_par_go(client, "/telecharger/media/video.mp4")
+    print(f"⏱️ CPU du worker par Go servi : FileResponse {application:.2f} s, X-Accel-Redirect {delegue:.4f} s")
+
+    assert delegue < application / 10
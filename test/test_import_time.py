@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark d'import à froid (python -X importtime)
+
+Vérifie que les routers se chargent sans tirer les dépendances lourdes
+(selenium, folium, shapely, Office, QR codes...) et que le temps d'import
+cumulé et la mémoire résidente restent sous les budgets.
+
+Budgets ajustables via IMPORT_TIME_BUDGET_MS et IMPORT_RSS_BUDGET_MB.
+"""
+import importlib.util
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+TARGET_MODULE = "app_lia_web.app.routers"
+
+# Modules qui ne doivent être chargés qu'au premier usage de leur fonctionnalité
+LAZY_MODULES = {
+    "selenium", "webdriver_manager", "folium", "geopy", "shapely",
+    "PIL", "openpyxl", "docx", "pptx", "qrcode",
+}
+
+IMPORT_TIME_BUDGET_MS = float(os.environ.get("IMPORT_TIME_BUDGET_MS", "4000"))
+IMPORT_RSS_BUDGET_MB = float(os.environ.get("IMPORT_RSS_BUDGET_MB", "140"))
+
+PROBE = "\n".join([
+    f"import sys, {TARGET_MODULE}",
+    # Linux : VmHWM est propre au processus, ru_maxrss conserve le pic du parent avant exec
+    "try:",
+    "    print(next(l.split()[1] for l in open('/proc/self/status') if l.startswith('VmHWM:')))",
+    "except (OSError, StopIteration):",
+    "    try:",
+    "        import resource",
+    "        print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)",
+    "    except ImportError:  # Windows",
+    "        print(0)",
+    "print(','.join(sorted(m for m in sys.modules if '.' not in m)))",
+])
+
+
+def _package_available() -> bool:
+    if REPO_ROOT.name == "app_lia_web":
+        return True
+    return importlib.util.find_spec("app_lia_web") is not None
+
+
+def run_import_probe() -> dict:
+    """Importe TARGET_MODULE dans un interpréteur neuf et mesure temps, RSS et modules chargés"""
+    env = os.environ.copy()
+    if REPO_ROOT.name == "app_lia_web":
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT.parent), env.get("PYTHONPATH")]))
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        capture_output=True, text=True, env=env, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    cumulative_us = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumul_us, name = line[len("import time:"):].split("|")
+        cumulative_us[name.strip()] = int(cumul_us)
+
+    stdout_lines = result.stdout.strip().splitlines()
+    maxrss_kb = int(stdout_lines[-2])
+    top_level_modules = set(stdout_lines[-1].split(","))
+    # macOS renvoie ru_maxrss en octets, Linux en kilo-octets
+    rss_mb = maxrss_kb / (1024 * 1024) if sys.platform == "darwin" else maxrss_kb / 1024
+
+    return {
+        "import_ms": cumulative_us.get(TARGET_MODULE, 0) / 1000,
+        "rss_mb": rss_mb,
+        "modules": top_level_modules,
+        "cumulative_us": cumulative_us,
+    }
+
+
+@pytest.fixture(scope="module")
+def probe():
+    if not _package_available():
+        pytest.skip("Le paquet app_lia_web n'est pas importable depuis cet emplacement")
+    # Premier passage pour compiler les .pyc, second passage mesuré
+    run_import_probe()
+    return run_import_probe()
+
+
+def test_heavy_dependencies_are_lazy(probe):
+    loaded = sorted(LAZY_MODULES & probe["modules"])
+    assert not loaded, f"Dépendances lourdes importées au démarrage: {loaded}"
+
+
+def test_cold_import_time_budget(probe):
+    slowest = sorted(probe["cumulative_us"].items(), key=lambda item: item[1], reverse=True)[:5]
+    print(f"⏱️ Import {TARGET_MODULE}: {probe['import_ms']:.0f} ms (budget {IMPORT_TIME_BUDGET_MS:.0f} ms)")
+    assert probe["import_ms"] <= IMPORT_TIME_BUDGET_MS, f"Import trop lent, modules les plus coûteux: {slowest}"
+
+
+def test_import_rss_budget(probe):
+    if not probe["rss_mb"]:
+        pytest.skip("Mesure RSS indisponible sur cette plateforme")
+    print(f"🧠 RSS après import: {probe['rss_mb']:.0f} Mo (budget {IMPORT_RSS_BUDGET_MB:.0f} Mo)")
+    assert probe["rss_mb"] <= IMPORT_RSS_BUDGET_MB
+
+
+if __name__ == "__main__":
+    measures = run_import_probe()
+    print(f"⏱️ Import: {measures['import_ms']:.0f} ms")
+    print(f"🧠 RSS: {measures['rss_mb']:.0f} Mo")
+    print(f"📦 Dépendances lourdes chargées: {sorted(LAZY_MODULES & measures['modules']) or 'aucune'}")
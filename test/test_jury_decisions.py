@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Tests du poste de travail des décisions de jury
+
+Pagination par curseur (date_decision, id) sans doublon ni trou, recherche par
+préfixe, listes de référence en cache (invalidées dans tous les workers), et décision par lot : nombre de
+requêtes constant quel que soit le nombre de candidats, mise à jour des
+décisions existantes via ON CONFLICT et journal d'audit écrit en un INSERT.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event as sa_event
+from sqlalchemy.engine import Engine
+from sqlmodel import func, select
+
+from app_lia_web.app.models.ACD.activity import ActivityLog
+from app_lia_web.app.models.base import (
+    Candidat, DecisionJuryCandidat, Jury, Partenaire, Programme, Promotion, ReorientationCandidat, User,
+)
+from app_lia_web.app.models.enums import DecisionJury, UserRole
+from app_lia_web.app.services import jury_decision_service as service
+
+DEBUT = datetime(2025, 6, 1, 9, 0)
+CANDIDATS = 300
+
+
+@pytest.fixture
+def donnees(db):
+    admin = User(email="admin@test.fr", nom_complet="Admin", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR)
+    conseiller = User(email="cons@test.fr", nom_complet="Conseiller", mot_de_passe_hash="x", role=UserRole.CONSEILLER.value)
+    db.add_all([admin, conseiller])
+    db.flush()
+    programme = Programme(code="ACD", nom="ACD", responsable_id=admin.id)
+    db.add(programme)
+    db.flush()
+    jurys = [Jury(programme_id=programme.id, session_le=DEBUT + timedelta(days=i), statut=s) for i, s in enumerate(("planifie", "termine"))]
+    partenaire = Partenaire(nom="Partenaire")
+    promotion = Promotion(programme_id=programme.id, libelle="Promo 1")
+    db.add_all([*jurys, partenaire, promotion])
+    db.flush()
+    candidats = []
+    for i in range(CANDIDATS):
+        candidat = Candidat(nom=f"{'Martin' if i % 10 == 0 else 'Durand'}{i:03d}", prenom="Léa", email=f"c{i}@test.fr")
+        db.add(candidat)
+        candidats.append(candidat)
+    db.add(Candidat(nom="100%_Sûr", prenom="X", email="pourcent@test.fr"))
+    db.flush()
+    for i, candidat in enumerate(candidats[:200]):
+        # Trois décisions par minute : les dates se répètent
+        db.add(DecisionJuryCandidat(
+            candidat_id=candidat.id, jury_id=jurys[i % 2].id,
+            decision=DecisionJury.VALIDE if i % 3 else DecisionJury.REJETE,
+            date_decision=DEBUT + timedelta(minutes=i // 3),
+        ))
+    db.commit()
+    return {"admin": admin, "jurys": [j.id for j in jurys], "candidats": [c.id for c in candidats],
+            "partenaire": partenaire.id, "conseiller": conseiller.id, "promotion": promotion.id}
+
+
+@pytest.fixture
+def requetes():
+    journal = []
+    ecouteur = lambda *args: journal.append(args[2])  # noqa: E731
+    sa_event.listen(Engine, "before_cursor_execute", ecouteur)
+    yield journal
+    sa_event.remove(Engine, "before_cursor_execute", ecouteur)
+
+
+def parcourir(db, taille, **filtres):
+    lignes, curseur = [], None
+    while True:
+        page = service.page_decisions(db, curseur=curseur, limite=taille, **filtres)
+        lignes += page.lignes
+        curseur = page.curseur_suivant
+        if not curseur:
+            return lignes
+
+
+def test_pagination_par_curseur(db, donnees, requetes):
+    lignes = parcourir(db, 7)
+    assert len(lignes) == 200 and len({l.id for l in lignes}) == 200
+    cles = [(l.date_decision, l.id) for l in lignes]
+    assert cles == sorted(cles, reverse=True)
+    # Une requête par page, LIMIT compris
+    assert len(requetes) == -(-200 // 7) + (1 if 200 % 7 == 0 else 0)
+    assert all("LIMIT" in r for r in requetes)
+
+    jury = donnees["jurys"][0]
+    assert {l.jury_id for l in parcourir(db, 9, jury_id=jury)} == {jury}
+    rejets = parcourir(db, 9, decision=DecisionJury.REJETE)
+    assert len(rejets) == 67 and {l.decision for l in rejets} == {DecisionJury.REJETE}
+
+    with pytest.raises(ValueError):
+        service.page_decisions(db, curseur="pas-un-curseur")
+
+
+def test_recherche_par_prefixe(db, donnees, requetes):
+    lignes = parcourir(db, 50, q="  MARTIN")
+    assert len(lignes) == 20 and all(l.candidat_nom.startswith("Martin") for l in lignes)
+    assert "lower(candidat.nom) LIKE" in requetes[0]
+    # Plus de recherche « contient » : le milieu du nom ne correspond pas
+    assert parcourir(db, 50, q="artin") == []
+    assert len(parcourir(db, 50, q="C19")) == 11  # c19, c190 à c199
+
+    # Les jokers saisis sont pris littéralement
+    service.appliquer_decision_lot(
+        db, user=None, jury_id=donnees["jurys"][0], candidat_ids=[db.exec(select(Candidat.id).where(Candidat.email == "pourcent@test.fr")).one()],
+        champs=service.champs_decision(DecisionJury.EN_ATTENTE),
+    )
+    assert [l.candidat_nom for l in parcourir(db, 50, q="100%_")] == ["100%_Sûr"]
+    assert parcourir(db, 50, q="%") == []
+
+
+def test_decision_par_lot(db, donnees, requetes):
+    jury = donnees["jurys"][0]
+    # 150 décisions existantes (mises à jour) + 100 nouvelles
+    ids = donnees["candidats"][50:]
+    champs = service.champs_decision(
+        DecisionJury.REORIENTE, "Réorientation collective", conseiller_id=donnees["conseiller"],
+        partenaire_id=donnees["partenaire"], envoyer_mail_partenaire=True,
+    )
+    db.refresh(donnees["admin"])
+    requetes.clear()
+    resultat = service.appliquer_decision_lot(
+        db, user=donnees["admin"], jury_id=jury, candidat_ids=ids + ids[:5], champs=champs,
+    )
+    # Vérification des candidats, upsert, statuts, réorientations (remplacées), audit
+    ecritures = [r for r in requetes if not r.startswith(("BEGIN", "COMMIT"))]
+    assert len(ecritures) == 6
+    assert len(resultat["decisions"]) == len(ids)
+
+    decisions = db.exec(select(DecisionJuryCandidat).where(DecisionJuryCandidat.jury_id == jury)).all()
+    par_candidat = {d.candidat_id: d for d in decisions}
+    assert len(decisions) == len(par_candidat)  # aucun doublon (candidat, jury)
+    for candidat_id in ids:
+        decision = par_candidat[candidat_id]
+        assert decision.decision == DecisionJury.REORIENTE
+        assert decision.partenaire_id == donnees["partenaire"] and decision.conseiller_id is None
+    # Les décisions de l'autre jury ne sont pas touchées
+    autre = db.exec(select(DecisionJuryCandidat).where(DecisionJuryCandidat.jury_id == donnees["jurys"][1])).all()
+    assert {d.decision for d in autre} <= {DecisionJury.VALIDE, DecisionJury.REJETE}
+
+    assert set(db.exec(select(Candidat.statut).where(Candidat.id.in_(ids))).all()) == {"REORIENTE"}
+    assert db.exec(select(func.count()).select_from(ReorientationCandidat)).one() == len(ids)
+    journal = db.exec(select(ActivityLog)).all()
+    assert len(journal) == len(ids)
+    assert {a.user_email for a in journal} == {"admin@test.fr"}
+    assert {a.entity_id for a in journal} == set(resultat["decisions"])
+
+    # Lot réappliqué : une seule réorientation par décision ; décision changée : plus aucune
+    service.appliquer_decision_lot(db, user=None, jury_id=jury, candidat_ids=ids, champs=champs)
+    reorientations = db.exec(select(ReorientationCandidat.decision_jury_id)).all()
+    assert sorted(reorientations) == sorted(resultat["decisions"])
+    service.appliquer_decision_lot(
+        db, user=None, jury_id=jury, candidat_ids=ids[:10], champs=service.champs_decision(DecisionJury.REJETE, "Revu"),
+    )
+    assert db.exec(select(func.count()).select_from(ReorientationCandidat)).one() == len(ids) - 10
+
+    with pytest.raises(ValueError):
+        service.appliquer_decision_lot(db, user=None, jury_id=jury, candidat_ids=[], champs=champs)
+    with pytest.raises(ValueError, match="introuvable"):
+        service.appliquer_decision_lot(db, user=None, jury_id=jury, candidat_ids=[ids[0], 999_999], champs=champs)
+
+
+def test_listes_de_reference_en_cache(engine, db, donnees, requetes, monkeypatch):
+    monkeypatch.setattr(service, "engine", engine)
+    references = service.ReferencesJury()
+
+    premier = references.get()
+    nb = len(requetes)
+    assert nb == 5  # version du cache + 4 listes
+    assert [j.id for j in premier.jurys] == donnees["jurys"][:1]  # jury terminé exclu
+    assert premier.jurys[0].libelle.startswith("ACD — 01/06/2025")
+    assert [c.libelle for c in premier.conseillers] == ["Conseiller"]
+    assert [p.libelle for p in premier.promotions] == ["Promo 1"]
+
+    assert references.get() is premier and len(requetes) == nb
+    references.invalidate()
+    del requetes[:]
+    assert references.get() == premier and len(requetes) == nb
+
+
+def test_listes_de_reference_invalidees_dans_les_autres_workers(engine, db, donnees, monkeypatch):
+    monkeypatch.setattr(service, "engine", engine)
+    worker, autre_worker = service.ReferencesJury(), service.ReferencesJury()
+    assert [p.libelle for p in autre_worker.get().promotions] == ["Promo 1"]
+
+    db.add(Promotion(programme_id=db.get(Jury, donnees["jurys"][0]).programme_id, libelle="Promo 2"))
+    db.commit()
+    worker.invalidate()
+    # Encore en cache jusqu'à la vérification suivante du compteur, puis rechargé
+    assert [p.libelle for p in autre_worker.get().promotions] == ["Promo 1"]
+    monkeypatch.setattr(autre_worker._version, "intervalle", 0)
+    assert [p.libelle for p in autre_worker.get().promotions] == ["Promo 1", "Promo 2"]
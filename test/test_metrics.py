@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Tests des métriques Prometheus (core/metrics.py)
+
+Durées par gabarit de route, requêtes en cours, requêtes SQL par requête, pool
+de connexions, appels externes et tâches planifiées ; agrégation de plusieurs
+processus via PROMETHEUS_MULTIPROC_DIR. Le surcoût d'enregistrement par
+requête est affiché et doit rester de l'ordre de la microseconde.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+from sqlmodel import Session, create_engine
+
+from app_lia_web.app.routers import metrics as metrics_router
+from app_lia_web.core import metrics
+from app_lia_web.core.config import settings
+from app_lia_web.core.sql_budget import SQLBudgetMiddleware
+
+REQUETES_BENCHMARK = 20_000
+
+
+def valeur(nom: str, **labels) -> float:
+    return REGISTRY.get_sample_value(nom, labels) or 0.0
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    monkeypatch.setattr(settings, "DEBUG", True)
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+
+    def session():
+        with Session(engine) as s:
+            yield s
+
+    app = FastAPI()
+    app.include_router(metrics_router.router)
+
+    @app.get("/articles/{article_id}")
+    def article(article_id: int, db: Session = Depends(session)):
+        db.exec(text("SELECT 1"))
+        db.exec(text("SELECT 2"))
+        return {"id": article_id}
+
+    @app.get("/erreur")
+    def erreur():
+        raise RuntimeError("boum")
+
+    app.add_middleware(SQLBudgetMiddleware)
+    app.add_middleware(metrics.MetricsMiddleware)
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_requetes_http(client, monkeypatch):
+    duree = {"method": "GET", "route": "/articles/{article_id}", "status": "200"}
+    avant = valeur("lia_http_request_duration_seconds_count", **duree)
+    sql_avant = valeur("lia_db_queries_per_request_sum", route="/articles/{article_id}")
+    inconnue = valeur("lia_http_request_duration_seconds_count", method="GET", route=metrics.ROUTE_INCONNUE, status="404")
+
+    assert client.get("/articles/1").status_code == 200
+    assert client.get("/articles/2").status_code == 200
+    assert client.get("/nulle-part").status_code == 404
+    assert client.get("/erreur").status_code == 500
+
+    assert valeur("lia_http_request_duration_seconds_count", **duree) == avant + 2
+    assert valeur("lia_db_queries_per_request_sum", route="/articles/{article_id}") == sql_avant + 4
+    assert valeur("lia_http_request_duration_seconds_count", method="GET", route=metrics.ROUTE_INCONNUE, status="404") == inconnue + 1
+    assert valeur("lia_http_request_duration_seconds_count", method="GET", route="/erreur", status="500") >= 1
+    assert valeur("lia_http_requests_in_progress", method="GET") == 0
+
+    reponse = client.get("/metrics")
+    assert reponse.status_code == 200 and reponse.headers["content-type"].startswith("text/plain")
+    assert 'lia_http_request_duration_seconds_bucket{le="0.005",method="GET",route="/articles/{article_id}",status="200"}' in reponse.text
+    assert "# TYPE lia_scheduler_job_duration_seconds histogram" in reponse.text
+
+    # Hors DEBUG : refusé sans jeton configuré, puis exigé dans l'en-tête
+    monkeypatch.setattr(settings, "DEBUG", False)
+    assert client.get("/metrics").status_code == 403
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "jeton")
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer autre"}).status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer jeton"}).status_code == 200
+    monkeypatch.setattr(settings, "METRICS_ENABLED", False)
+    assert client.get("/metrics", headers={"Authorization": "Bearer jeton"}).status_code == 503
+
+
+def test_pool_appels_et_taches(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=QueuePool, pool_size=2, max_overflow=3)
+    metrics.instrumenter_pool(engine)
+    assert valeur("lia_db_pool_size") == 2
+
+    connexions = [engine.connect() for _ in range(3)]
+    assert valeur("lia_db_pool_checked_out") == 3 and valeur("lia_db_pool_overflow") == 1
+    for connexion in connexions:
+        connexion.close()
+    assert valeur("lia_db_pool_checked_out") == 0 and valeur("lia_db_pool_overflow") == 0
+
+    avant = valeur("lia_external_call_duration_seconds_count", service="smtp", resultat="ok")
+    with metrics.appel_externe("smtp"):
+        time.sleep(0.01)
+    with pytest.raises(ConnectionError):
+        with metrics.appel_externe("smtp"):
+            raise ConnectionError()
+    assert valeur("lia_external_call_duration_seconds_count", service="smtp", resultat="ok") == avant + 1
+    assert valeur("lia_external_call_duration_seconds_sum", service="smtp", resultat="ok") >= 0.01
+    assert valeur("lia_external_call_duration_seconds_count", service="smtp", resultat="erreur") >= 1
+
+    async def geocoder():
+        with metrics.appel_externe("geocodage"):
+            await asyncio.sleep(0.01)
+    asyncio.run(geocoder())
+    assert valeur("lia_external_call_duration_seconds_sum", service="geocodage", resultat="ok") >= 0.01
+
+    def nettoyage():
+        return 3
+
+    tache = metrics.tache_mesuree(nettoyage)
+    assert tache.__name__ == "nettoyage" and tache() == 3
+    assert valeur("lia_scheduler_job_duration_seconds_count", job="nettoyage", resultat="ok") >= 1
+
+
+def test_agregation_multi_processus(tmp_path):
+    dossier = tmp_path / "prometheus"
+    dossier.mkdir()
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(dossier), "PYTHONPATH": os.pathsep.join(sys.path)}
+
+    def executer(code: str) -> str:
+        return subprocess.run(
+            [sys.executable, "-c", textwrap.dedent(code)], env=env, check=True, capture_output=True, text=True,
+        ).stdout
+
+    # Deux "workers" : chacun sert trois requêtes ; le second garde une requête en cours
+    for en_cours in (0, 1):
+        executer(f"""
+            from app_lia_web.core import metrics
+            for _ in range(3):
+                metrics.DUREE_REQUETES.labels("GET", "/articles/{{article_id}}", "200").observe(0.02)
+            metrics.REQUETES_EN_COURS.labels("GET").inc({en_cours})
+        """)
+    sortie = executer("""
+        from app_lia_web.core import metrics
+        print(metrics.exposition().decode())
+    """)
+    assert 'lia_http_request_duration_seconds_count{method="GET",route="/articles/{article_id}",status="200"} 6.0' in sortie
+    assert 'lia_http_requests_in_progress{method="GET"}' in sortie
+
+
+def test_cout_enregistrement():
+    async def application(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    class Route:
+        path = "/articles/{article_id}"
+
+    instrumentee = metrics.MetricsMiddleware(application)
+
+    async def envoyer(message):
+        pass
+
+    async def servir(app) -> float:
+        debut = time.perf_counter()
+        for _ in range(REQUETES_BENCHMARK):
+            await app({"type": "http", "method": "GET", "route": Route}, None, envoyer)
+        return time.perf_counter() - debut
+
+    async def mesurer():
+        return await servir(application), await servir(instrumentee)
+
+    nue, avec_metriques = asyncio.run(mesurer())
+    surcout = (avec_metriques - nue) / REQUETES_BENCHMARK * 1e6
+    print(f"⏱️ Surcoût des métriques : {surcout:.1f} µs par requête")
+    assert surcout < 50
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests de la suppression des doublons avant la pose d'une contrainte unique (SQLite)
+
+Sur une base antérieure à uq_decisionjurycandidat_candidat_jury, les décisions
+en double sont supprimées en gardant la plus récente ; les réorientations qui
+référençaient une décision supprimée sont rattachées à celle qui est gardée
+(la clé étrangère bloquerait sinon la suppression).
+"""
+from datetime import datetime
+
+from sqlalchemy import MetaData, UniqueConstraint, event as sa_event
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from app_lia_web.app.models.base import (
+    Candidat, DecisionJuryCandidat, Jury, Partenaire, Programme, ReorientationCandidat, User
+)
+from app_lia_web.app.models.enums import UserRole
+from app_lia_web.app.services.database_migration import DEDUP_KEEP_ORDER, DatabaseMigrationService
+
+
+def creer_engine_heritee():
+    engine = create_engine("sqlite://")
+    # Clés étrangères vérifiées, comme sur PostgreSQL
+    sa_event.listen(engine, "connect", lambda connexion, _: connexion.execute("PRAGMA foreign_keys=ON"))
+    heritee = MetaData()
+    for table in SQLModel.metadata.sorted_tables:
+        if table.schema is None:
+            table.to_metadata(heritee)
+    decisions = heritee.tables["decisionjurycandidat"]
+    decisions.constraints = {c for c in decisions.constraints if not isinstance(c, UniqueConstraint)}
+    heritee.create_all(engine)
+    return engine
+
+
+def test_doublons_references_rattaches_a_la_ligne_gardee():
+    engine = creer_engine_heritee()
+    with Session(engine) as db:
+        responsable = User(email="resp@test.fr", nom_complet="Resp", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR)
+        db.add(responsable)
+        db.flush()
+        programme = Programme(code="ACD", nom="ACD", responsable_id=responsable.id)
+        candidat = Candidat(nom="Nom", prenom="Prénom", email="candidat@test.fr")
+        partenaire = Partenaire(nom="Partenaire")
+        db.add_all([programme, candidat, partenaire])
+        db.flush()
+        jury = Jury(programme_id=programme.id, promotion_id=None, session_le=datetime(2025, 3, 1))
+        db.add(jury)
+        db.flush()
+        ancienne, recente = (
+            DecisionJuryCandidat(candidat_id=candidat.id, jury_id=jury.id, date_decision=datetime(2025, 3, jour))
+            for jour in (1, 2)
+        )
+        db.add_all([ancienne, recente])
+        db.flush()
+        db.add(ReorientationCandidat(candidat_id=candidat.id, partenaire_id=partenaire.id, decision_jury_id=ancienne.id))
+        db.commit()
+        ancienne_id, recente_id = ancienne.id, recente.id
+
+    with Session(engine) as db:
+        supprimes = DatabaseMigrationService(db)._supprimer_doublons(
+            DecisionJuryCandidat.__table__, "candidat_id, jury_id", DEDUP_KEEP_ORDER["decisionjurycandidat"]
+        )
+        db.commit()
+        assert supprimes == 1
+        assert db.exec(select(DecisionJuryCandidat.id)).all() == [recente_id]
+        assert db.exec(select(ReorientationCandidat.decision_jury_id)).all() == [recente_id] != [ancienne_id]
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests du résolveur de permissions compilé (app/services/ACD/permissions.py)
+
+Deux instances de PermissionResolver jouent deux workers sur la même base :
+un octroi, une révocation ou une modification de rôle faits par l'un doivent
+s'appliquer chez l'autre dès sa requête suivante, sans attendre le TTL.
+"""
+import pytest
+from sqlalchemy import event as sa_event
+from sqlmodel import Session
+
+from app_lia_web.app.models.ACD.permissions import NiveauPermission, TypeRessource
+from app_lia_web.app.models.base import User
+from app_lia_web.app.models.enums import UserRole
+from app_lia_web.app.services.ACD.permissions import PermissionResolver, PermissionService
+
+
+@pytest.fixture
+def engine(tmp_path, engine_sqlite):
+    engine = engine_sqlite(f"sqlite:///{tmp_path / 'permissions.db'}")
+    with Session(engine) as db:
+        db.add_all([
+            User(email="admin@test.fr", nom_complet="Admin", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR.value),
+            User(email="formateur@test.fr", nom_complet="Formateur", mot_de_passe_hash="x", role=UserRole.FORMATEUR.value),
+        ])
+        db.commit()
+        PermissionService(db, PermissionResolver()).initialize_default_permissions()
+    return engine
+
+
+def requete(engine, resolver, user_id, resource, level) -> bool:
+    """Une requête HTTP : session neuve, vérification de permission"""
+    with Session(engine) as db:
+        return PermissionService(db, resolver).has_permission(db.get(User, user_id), resource, level)
+
+
+def test_octroi_revocation_entre_workers(engine):
+    worker_a, worker_b = PermissionResolver(), PermissionResolver()
+    ecrire = (TypeRessource.CANDIDATS, NiveauPermission.ECRITURE)
+    assert not requete(engine, worker_a, 2, *ecrire) and not requete(engine, worker_b, 2, *ecrire)
+
+    with Session(engine) as db:
+        assert PermissionService(db, worker_a).grant_permission(db.get(User, 1), 2, *ecrire)
+    assert requete(engine, worker_a, 2, *ecrire)
+    assert requete(engine, worker_b, 2, *ecrire)
+
+    with Session(engine) as db:
+        assert PermissionService(db, worker_b).revoke_permission(db.get(User, 1), 2, TypeRessource.CANDIDATS)
+    assert not requete(engine, worker_b, 2, *ecrire)
+    assert not requete(engine, worker_a, 2, *ecrire)
+
+
+def test_modification_de_role_entre_workers(engine):
+    worker_a, worker_b = PermissionResolver(), PermissionResolver()
+    juger = (TypeRessource.JURYS, NiveauPermission.ECRITURE)
+    assert not requete(engine, worker_b, 2, *juger)
+
+    with Session(engine) as db:
+        assert PermissionService(db, worker_a).update_role_permission(
+            UserRole.FORMATEUR.value, TypeRessource.JURYS, NiveauPermission.ECRITURE, db.get(User, 1)
+        )
+    assert requete(engine, worker_b, 2, *juger)
+
+    # Changement de rôle de l'utilisateur : lu sur l'utilisateur de la requête
+    with Session(engine) as db:
+        db.get(User, 2).role = UserRole.CANDIDAT.value
+        db.commit()
+    assert not requete(engine, worker_b, 2, *juger)
+
+
+def test_version_lue_une_fois_par_requete(engine):
+    resolver = PermissionResolver()
+    requete(engine, resolver, 2, TypeRessource.CANDIDATS, NiveauPermission.LECTURE)  # compilation
+
+    requetes = []
+    sa_event.listen(engine, "before_cursor_execute", lambda *args: requetes.append(args[2]))
+    with Session(engine) as db:
+        service = PermissionService(db, resolver)
+        formateur = db.get(User, 2)
+        requetes.clear()
+        for resource in TypeRessource:
+            service.has_permission(formateur, resource, NiveauPermission.LECTURE)
+    assert len(requetes) == 1 and "versionpermissions" in requetes[0]
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests du pipeline en opérations ensemblistes
+
+Le tableau kanban, les statistiques, la réinitialisation et le réordonnancement
+doivent s'exécuter en un nombre de requêtes constant, quel que soit le nombre
+de candidats du programme.
+"""
+import time
+
+import pytest
+from sqlalchemy import event as sa_event
+from sqlmodel import Session, select
+
+from app_lia_web.app.models.base import AvancementEtape, Candidat, EtapePipeline, Inscription, Programme, User
+from app_lia_web.app.models.enums import StatutEtape, UserRole
+from app_lia_web.app.services.pipeline_service import PipelineService
+
+
+def creer_pipeline(db: Session, nb_candidats: int) -> dict:
+    responsable = User(email="resp@test.fr", nom_complet="Resp", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR)
+    db.add(responsable)
+    db.flush()
+    programme = Programme(code="PIP", nom="Pipeline", responsable_id=responsable.id)
+    db.add(programme)
+    db.flush()
+    etapes = [EtapePipeline(programme_id=programme.id, code=f"etape_{i}", libelle=f"Étape {i}", ordre=i) for i in range(1, 5)]
+    db.add_all(etapes)
+    candidats = [Candidat(nom=f"Nom{i:05d}", prenom="Prénom", email=f"c{i}@test.fr") for i in range(nb_candidats)]
+    db.add_all(candidats)
+    db.flush()
+    inscriptions = [Inscription(programme_id=programme.id, candidat_id=c.id) for c in candidats]
+    db.add_all(inscriptions)
+    db.flush()
+    # Répartition : un candidat sur deux à l'étape 1, un sur quatre aux étapes 2 et 3, étape 4 vide
+    statuts = list(StatutEtape)
+    db.add_all([
+        AvancementEtape(
+            inscription_id=inscription.id,
+            etape_id=etapes[0 if i % 2 == 0 else (1 if i % 4 == 1 else 2)].id,
+            statut=statuts[i % len(statuts)],
+        )
+        for i, inscription in enumerate(inscriptions)
+    ])
+    db.commit()
+    return {"programme_id": programme.id, "etapes": [e.id for e in etapes]}
+
+
+def compter_requetes(db: Session, action):
+    requetes = []
+    ecouteur = lambda *args: requetes.append(args[2])  # noqa: E731
+    sa_event.listen(db.get_bind(), "before_cursor_execute", ecouteur)
+    debut = time.perf_counter()
+    try:
+        resultat = action()
+    finally:
+        sa_event.remove(db.get_bind(), "before_cursor_execute", ecouteur)
+    return resultat, len(requetes), time.perf_counter() - debut
+
+
+def test_board_et_statistiques(db):
+    pipeline = creer_pipeline(db, nb_candidats=40)
+    board = PipelineService.get_pipeline_board(db, pipeline["programme_id"], limite_par_etape=5)
+
+    assert [e["libelle"] for e in board] == ["Étape 1", "Étape 2", "Étape 3", "Étape 4"]
+    assert [e["candidats_count"] for e in board] == [20, 10, 10, 0]
+    assert [len(e["candidats"]) for e in board] == [5, 5, 5, 0]
+    assert board[0]["candidats"][0]["nom"] == "Nom00000"
+    assert sum(board[0]["par_statut"].values()) == 20
+
+    stats = PipelineService.get_pipeline_statistiques(db, pipeline["programme_id"])
+    assert {libelle: s["candidats_count"] for libelle, s in stats.items()} == {
+        "Étape 1": 20, "Étape 2": 10, "Étape 3": 10, "Étape 4": 0
+    }
+    candidats = PipelineService.get_candidats_par_etape(db, pipeline["etapes"][1], skip=0, limit=3)
+    assert [c["nom"] for c in candidats] == ["Nom00001", "Nom00005", "Nom00009"]
+
+
+def test_reordonner(db):
+    pipeline = creer_pipeline(db, nb_candidats=4)
+    premiere, deuxieme, troisieme, quatrieme = pipeline["etapes"]
+
+    def ordres():
+        db.expire_all()
+        return [e.id for e in db.exec(select(EtapePipeline).order_by(EtapePipeline.ordre))]
+
+    PipelineService.reordonner_etapes(db, quatrieme, 2)
+    assert ordres() == [premiere, quatrieme, deuxieme, troisieme]
+    PipelineService.reordonner_etapes(db, quatrieme, 4)
+    assert ordres() == [premiere, deuxieme, troisieme, quatrieme]
+
+    PipelineService.definir_ordre_etapes(db, pipeline["programme_id"], [troisieme, premiere, quatrieme, deuxieme])
+    assert ordres() == [troisieme, premiere, quatrieme, deuxieme]
+    with pytest.raises(ValueError):
+        PipelineService.definir_ordre_etapes(db, pipeline["programme_id"], [premiere, premiere, deuxieme, troisieme])
+
+
+@pytest.mark.parametrize("nb_candidats", [50, 3000])
+def test_nombre_de_requetes_constant(db, nb_candidats):
+    pipeline = creer_pipeline(db, nb_candidats)
+    programme_id = pipeline["programme_id"]
+
+    mesures = {
+        "board": compter_requetes(db, lambda: PipelineService.get_pipeline_board(db, programme_id, 50)),
+        "statistiques": compter_requetes(db, lambda: PipelineService.get_pipeline_statistiques(db, programme_id)),
+        "reordonner": compter_requetes(db, lambda: PipelineService.reordonner_etapes(db, pipeline["etapes"][3], 1)),
+        "reinitialiser": compter_requetes(db, lambda: PipelineService.reinitialiser_pipeline(db, programme_id)),
+    }
+    for nom, (_, requetes, duree) in mesures.items():
+        print(f"⏱️ {nb_candidats} candidats - {nom}: {requetes} requête(s) en {duree * 1000:.1f} ms")
+
+    assert mesures["board"][1] == 1
+    assert mesures["statistiques"][1] == 1
+    # Lecture de l'étape et des ordres, UPDATE unique, relecture de l'étape
+    assert mesures["reordonner"][1] == 4
+    assert mesures["reinitialiser"][1] == 1
+    assert mesures["reinitialiser"][0] == nb_candidats
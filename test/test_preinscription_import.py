@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Tests de l'import en masse de préinscriptions
+
+Fichier de 50 000 lignes chargé via la table d'import (durée affichée), nombre
+de requêtes indépendant du nombre de lignes, erreurs rapportées par ligne,
+doublons du fichier écartés, candidats existants complétés sans être écrasés,
+et traitement différé (éligibilité, géocodage) sur les préinscriptions créées.
+"""
+import csv
+import io
+import time
+from datetime import date
+
+import pytest
+from sqlalchemy import event as sa_event
+from sqlalchemy.engine import Engine
+from sqlmodel import func, select
+
+from app_lia_web.app.models.base import (
+    Candidat, Eligibilite, Entreprise, Inscription, Preinscription, Programme, StatutDossier, User,
+)
+from app_lia_web.app.models.enums import UserRole
+from app_lia_web.app.services import preinscription_import_service as service
+
+ENTETES = ["E-mail", "Nom", "Prénom", "Téléphone", "Adresse", "Raison sociale", "SIRET",
+           "Date de création", "Chiffre d'affaires", "Colonne inconnue"]
+
+
+@pytest.fixture
+def programme(db):
+    admin = User(email="admin@test.fr", nom_complet="Admin", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR)
+    db.add(admin)
+    db.flush()
+    programme = Programme(code="ACD", nom="ACD", responsable_id=admin.id, ca_seuil_min=10000, anciennete_min_annees=1)
+    db.add(programme)
+    db.commit()
+    return programme
+
+
+@pytest.fixture
+def requetes():
+    journal = []
+    ecouteur = lambda *args: journal.append(args[2])  # noqa: E731
+    sa_event.listen(Engine, "before_cursor_execute", ecouteur)
+    yield journal
+    sa_event.remove(Engine, "before_cursor_execute", ecouteur)
+
+
+def fichier_csv(lignes, separateur=";", encodage="utf-8"):
+    tampon = io.StringIO()
+    ecrivain = csv.writer(tampon, delimiter=separateur)
+    ecrivain.writerow(ENTETES)
+    ecrivain.writerows(lignes)
+    return io.BytesIO(tampon.getvalue().encode(encodage))
+
+
+def ligne(i, **valeurs):
+    return [
+        valeurs.get("email", f"Candidat{i}@Test.fr"), valeurs.get("nom", f"Nom{i}"), valeurs.get("prenom", "Léa"),
+        "0600000000", f"{i} rue de Paris", f"Société {i}", valeurs.get("siret", f"{i:014d}"),
+        valeurs.get("date_creation", "15/03/2020"), "10 000 - 50 000 €", "x",
+    ]
+
+
+def test_import_de_50000_lignes(db, programme, requetes):
+    nb = 50_000
+    fichier = fichier_csv(ligne(i) for i in range(nb))
+    debut = time.perf_counter()
+    rapport = service.importer_preinscriptions(db, programme, fichier, "candidats.csv")
+    duree = time.perf_counter() - debut
+    print(f"⏱️ import de {nb} lignes : {duree:.1f} s, {len(requetes)} requêtes")
+
+    assert rapport.erreurs == []
+    assert rapport.lignes_lues == rapport.preinscriptions_creees == rapport.candidats_crees == nb
+    assert len(rapport.preinscription_ids) == len(rapport.entreprise_ids) == nb
+    assert db.exec(select(func.count()).select_from(Preinscription)).one() == nb
+    assert db.exec(select(func.count()).select_from(Entreprise)).one() == nb
+    assert db.exec(select(Candidat.email).where(Candidat.nom == "Nom7")).one() == "candidat7@test.fr"
+    preinscription = db.exec(select(Preinscription).limit(1)).one()
+    assert preinscription.source == "import" and preinscription.statut == StatutDossier.SOUMIS
+    assert len(requetes) < 40  # indépendant du nombre de lignes
+    assert duree < 60
+
+    # Réimport du même fichier : tous déjà préinscrits, rien n'est créé
+    requetes.clear()
+    rapport = service.importer_preinscriptions(db, programme, fichier_csv(ligne(i) for i in range(nb)), "candidats.csv")
+    assert rapport.preinscriptions_creees == 0 and len(rapport.erreurs) == nb
+    assert {m for _, m in rapport.erreurs} == {service.REJET_PREINSCRIT}
+
+
+def test_erreurs_par_ligne_et_fusion(db, programme):
+    existant = Candidat(nom="Ancien", prenom="Paul", email="Paul@Test.fr", telephone="0111111111", handicap=False)
+    inscrit = Candidat(nom="Inscrit", prenom="Eve", email="eve@test.fr")
+    db.add_all([existant, inscrit])
+    db.flush()
+    db.add(Inscription(programme_id=programme.id, candidat_id=inscrit.id))
+    db.commit()
+
+    lignes = [
+        ligne(1),
+        ligne(2, email="pas-un-email"),
+        ligne(3, nom=""),
+        ligne(4, siret="123"),
+        ligne(5, date_creation="31/02/2020"),
+        ligne(6, email="CANDIDAT1@test.fr"),  # doublon de la ligne 2 du fichier
+        ligne(7, email="paul@test.fr", nom="Nouveau"),
+        ligne(8, email="eve@test.fr"),
+        [""] * len(ENTETES),  # ligne vide ignorée
+    ]
+    rapport = service.importer_preinscriptions(db, programme, fichier_csv(lignes, ",", "cp1252"), "import.csv")
+
+    assert rapport.lignes_lues == 8
+    assert rapport.preinscriptions_creees == 2 and rapport.candidats_crees == 1 and rapport.candidats_existants == 1
+    erreurs = dict(rapport.erreurs)
+    assert sorted(erreurs) == [3, 4, 5, 6, 7, 9]
+    assert "Email invalide" in erreurs[3] and "nom" in erreurs[4] and "SIRET" in erreurs[5]
+    assert "date illisible" in erreurs[6] and "ligne 2" in erreurs[7]
+    assert erreurs[9] == service.REJET_INSCRIT
+
+    db.expire_all()
+    # Candidat existant : nom conservé, champs vides complétés, entreprise créée
+    paul = db.get(Candidat, existant.id)
+    assert (paul.nom, paul.telephone, paul.adresse_personnelle) == ("Ancien", "0111111111", "7 rue de Paris")
+    entreprise = db.exec(select(Entreprise).where(Entreprise.candidat_id == paul.id)).one()
+    assert entreprise.date_creation == date(2020, 3, 15) and entreprise.siret == f"{7:014d}"
+    assert db.exec(select(func.count()).select_from(Preinscription).where(Preinscription.candidat_id == inscrit.id)).one() == 0
+
+    with pytest.raises(ValueError, match="email"):
+        service.importer_preinscriptions(db, programme, io.BytesIO(b"nom;prenom\nA;B\n"), "x.csv")
+    with pytest.raises(ValueError, match="Format"):
+        service.importer_preinscriptions(db, programme, io.BytesIO(b""), "x.pdf")
+
+
+def test_import_xlsx_et_traitement_differe(engine, db, programme, monkeypatch):
+    openpyxl = pytest.importorskip("openpyxl")
+    classeur = openpyxl.Workbook()
+    feuille = classeur.active
+    feuille.append(ENTETES)
+    feuille.append(ligne(1)[:7] + [date(2018, 1, 10), "20000", None])
+    feuille.append(ligne(2)[:6] + [12345678901234, date.today().isoformat(), "500", None])
+    fichier = io.BytesIO()
+    classeur.save(fichier)
+    fichier.seek(0)
+
+    rapport = service.importer_preinscriptions(db, programme, fichier, "import.xlsx")
+    assert rapport.erreurs == [] and rapport.preinscriptions_creees == 2
+    assert db.exec(select(Entreprise.siret).order_by(Entreprise.id)).all() == [f"{1:014d}", "12345678901234"]
+
+    adresses_geocodees = []
+
+    async def faux_geocode_many(adresses, concurrence=service.LOT_ARRIERE_PLAN):
+        adresses_geocodees.append(adresses)
+        return {cle: (48.85, 2.35) for cle in adresses}
+
+    monkeypatch.setattr(service, "engine", engine)
+    monkeypatch.setattr(service, "geocode_many", faux_geocode_many)
+    service.traiter_en_arriere_plan(rapport.preinscription_ids, rapport.entreprise_ids)
+    service.traiter_en_arriere_plan(rapport.preinscription_ids, rapport.entreprise_ids)  # rejoué sans doublon
+
+    db.expire_all()
+    verdicts = dict(db.exec(select(Eligibilite.preinscription_id, Eligibilite.anciennete_ok)).all())
+    assert len(verdicts) == 2
+    assert sorted(verdicts.values()) == [False, True]  # entreprise créée ce jour : ancienneté insuffisante
+    assert len(adresses_geocodees) == 1 and set(adresses_geocodees[0].values()) == {"1 rue de Paris", "2 rue de Paris"}
+    assert set(db.exec(select(Entreprise.lat)).all()) == {48.85}
+
+
+def test_separateur_non_detecte_sans_modifier_csv_excel():
+    # Sans séparateur détectable : point-virgule, sans toucher au dialecte global csv.excel
+    lignes = list(service._lire_csv(io.BytesIO("Nom\nDupont\n".encode("utf-8"))))
+    assert lignes == [["Nom"], ["Dupont"]]
+    assert csv.excel.delimiter == ","
+    assert list(csv.reader(io.StringIO("a,b\n"))) == [["a", "b"]]
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Tests de la liste des programmes actifs gardée en mémoire
+
+Une modification faite dans un worker (invalidate()) est vue par les autres
+workers dès la vérification suivante du compteur VersionCache, avec leurs
+fragments de menus.
+"""
+from app_lia_web.app.models.base import Programme, User
+from app_lia_web.app.models.enums import UserRole
+from app_lia_web.app.services import programme_service
+from app_lia_web.core.template_cache import fragment_cache
+
+
+def test_programmes_invalides_dans_les_autres_workers(engine, db, monkeypatch):
+    monkeypatch.setattr(programme_service, "engine", engine)
+    responsable = User(email="resp@test.fr", nom_complet="Resp", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR)
+    db.add(responsable)
+    db.flush()
+    db.add(Programme(code="ACD", nom="ACD", responsable_id=responsable.id))
+    db.commit()
+
+    worker, autre_worker = programme_service.ProgrammeRegistry(), programme_service.ProgrammeRegistry()
+    assert [p.code for p in autre_worker.active_programmes()] == ["ACD"]
+
+    db.add(Programme(code="ACI", nom="ACI", responsable_id=responsable.id))
+    db.commit()
+    worker.invalidate()
+    assert [p.code for p in autre_worker.active_programmes()] == ["ACD"]  # jusqu'à la prochaine vérification
+
+    vidages = []
+    monkeypatch.setattr(fragment_cache, "invalidate", lambda *args: vidages.append(args))
+    monkeypatch.setattr(autre_worker._version, "intervalle", 0)
+    assert [p.code for p in autre_worker.active_programmes()] == ["ACD", "ACI"]
+    assert vidages == [()]
+    assert [p.code for p in autre_worker.active_programmes()] == ["ACD", "ACI"] and len(vidages) == 1
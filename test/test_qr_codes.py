@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests des QR codes mis en cache
+
+Un lien déjà rendu sort du cache, le SVG reproduit exactement la matrice du
+QR code et le lot calculé dans un pool de processus donne les mêmes codes
+qu'un calcul sur place. Dans les emails, le QR code est joint en image inline
+(cid:). Les latences par code (avant/après) sont affichées.
+"""
+import base64
+import re
+import time
+import xml.etree.ElementTree as ET
+from io import BytesIO
+
+import pytest
+
+from app_lia_web.core import gr_code
+
+qrcode = pytest.importorskip("qrcode")
+
+LIEN = "https://lia.exemple.fr/seminaires/12/sessions/34/emargement/lien/{}"
+
+
+@pytest.fixture(autouse=True)
+def cache_vide():
+    gr_code.cache_qr.vider()
+    yield
+    gr_code.cache_qr.vider()
+
+
+def ancienne_generation(link: str) -> str:
+    """generate_qr_base64 d'avant le cache : QR, PNG et base64 à chaque appel"""
+    qr = qrcode.make(link)
+    buffer = BytesIO()
+    qr.save(buffer, format="PNG")
+    return f"data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode('utf-8')}"
+
+
+def modules_svg(svg: str):
+    """Modules noirs décrits par le <path> du SVG"""
+    chemin = ET.fromstring(svg).find("{http://www.w3.org/2000/svg}path").get("d")
+    noirs = set()
+    for x, y, largeur in re.findall(r"M(\d+) (\d+)h(\d+)v1h-\d+z", chemin):
+        noirs.update((int(x) + i, int(y)) for i in range(int(largeur)))
+    return noirs
+
+
+def latence(fonction, liens) -> float:
+    debut = time.perf_counter()
+    for lien in liens:
+        fonction(lien)
+    return (time.perf_counter() - debut) / len(liens) * 1000
+
+
+def test_latence_par_code():
+    liens = [LIEN.format(f"jeton{i:04d}") for i in range(30)]
+    avant = latence(ancienne_generation, liens)
+    png = latence(gr_code.generate_qr_base64, liens)
+    png_cache = latence(gr_code.generate_qr_base64, liens)
+    svg = latence(gr_code.generate_qr_svg, liens)
+    print(f"⏱️ par code : avant {avant:.2f} ms, PNG {png:.2f} ms, PNG en cache {png_cache:.4f} ms, SVG {svg:.2f} ms")
+    print(f"📦 taille : PNG base64 {len(gr_code.generate_qr_base64(liens[0]))} o, SVG {len(gr_code.generate_qr_svg(liens[0]))} o")
+
+    assert png_cache < avant / 50
+
+
+def test_svg_identique_a_la_matrice():
+    lien = LIEN.format("abc")
+    qr = qrcode.QRCode(border=4, error_correction=qrcode.constants.ERROR_CORRECT_M)
+    qr.add_data(lien)
+    qr.make(fit=True)
+    attendus = {(x, y) for y, ligne in enumerate(qr.get_matrix()) for x, noir in enumerate(ligne) if noir}
+
+    svg = gr_code.generate_qr_svg(lien, taille_module=3)
+    assert modules_svg(svg) == attendus
+    assert f'width="{len(qr.get_matrix()) * 3}"' in svg
+    assert gr_code.generate_qr_svg(lien, taille_module=3) is svg
+
+    with pytest.raises(ValueError):
+        gr_code.generate_qr(lien, "gif")
+
+
+def test_lot_en_pool_de_processus(monkeypatch):
+    liens = [LIEN.format(f"lot{i:03d}") for i in range(12)]
+    deja = gr_code.generate_qr_svg(liens[0])
+
+    monkeypatch.setattr(gr_code, "SEUIL_POOL", 4)
+    debut = time.perf_counter()
+    codes = gr_code.generate_qr_batch(liens + liens[:3], "svg", taille_module=4, processus=2)
+    duree = (time.perf_counter() - debut) / len(liens) * 1000
+    print(f"⏱️ lot de {len(liens)} codes en pool : {duree:.2f} ms par code (démarrage du pool compris)")
+
+    assert list(codes) == liens and codes[liens[0]] is deja
+    gr_code.cache_qr.vider()
+    assert codes == gr_code.generate_qr_batch(liens, "svg", taille_module=4, processus=0)
+    assert len(gr_code.cache_qr) == len(liens)
+
+    # Le pool du worker est réutilisé d'un lot à l'autre, puis arrêté avec l'application
+    pool = gr_code._pool
+    gr_code.cache_qr.vider()
+    assert gr_code.generate_qr_batch(liens, "svg", taille_module=4) == codes
+    assert pool is not None and gr_code._pool is pool
+    gr_code.arreter_pool()
+    assert gr_code._pool is None
+
+
+def test_qr_joint_en_image_inline(monkeypatch):
+    from app_lia_web.app.services import email_service
+
+    envoyes = []
+
+    class SMTPFactice:
+        def __init__(self, *args):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            return False
+
+        def starttls(self):
+            pass
+
+        def login(self, *args):
+            pass
+
+        def send_message(self, msg):
+            envoyes.append(msg)
+
+    monkeypatch.setattr(email_service.smtplib, "SMTP", SMTPFactice)
+    lien = LIEN.format("inline")
+    png = gr_code.png_depuis_data_url(gr_code.generate_qr_base64(lien))
+    assert png.startswith(b"\x89PNG")
+
+    assert email_service.EmailService().send_template_email(
+        "candidat@test.fr", "Lien d'émargement", "emargement_lien",
+        {"nom": "Candidat", "emargement_url": lien, "qr_cid": "qr_emargement"},
+        images={"qr_emargement": png},
+    )
+    msg = envoyes[0]
+    html, image = msg.get_payload()
+    # Gmail et Outlook bloquent les images data: : le QR code est une pièce jointe inline
+    assert msg.get_content_subtype() == "related"
+    corps = html.get_payload(decode=True).decode()
+    assert 'src="cid:qr_emargement"' in corps and "data:image" not in corps
+    assert image["Content-ID"] == "<qr_emargement>" and image.get_payload(decode=True) == png
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests des créneaux de rendez-vous
+
+Détection des chevauchements pour un conseiller, recherche des prochains
+créneaux libres et statistiques par statut et par type.
+"""
+from datetime import datetime
+
+import pytest
+
+from app_lia_web.app.models.base import Candidat, Inscription, Programme, User
+from app_lia_web.app.models.enums import StatutRDV, TypeRDV, UserRole
+from app_lia_web.app.schemas.rendez_vous_schemas import RendezVousCreate, RendezVousUpdate
+from app_lia_web.app.services.rendez_vous_service import ConflitRendezVous, RendezVousService
+
+# Lundi
+LUNDI = datetime(2025, 3, 3)
+
+
+@pytest.fixture
+def contexte(db):
+    conseillers = [
+        User(email=f"conseiller{i}@test.fr", nom_complet=f"Conseiller {i}", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR)
+        for i in range(2)
+    ]
+    db.add_all(conseillers)
+    db.flush()
+    programme = Programme(code="RDV", nom="Programme RDV", responsable_id=conseillers[0].id)
+    candidat = Candidat(nom="Nom", prenom="Prénom", email="candidat@test.fr")
+    db.add_all([programme, candidat])
+    db.flush()
+    inscription = Inscription(programme_id=programme.id, candidat_id=candidat.id)
+    db.add(inscription)
+    db.commit()
+    return {"service": RendezVousService(db), "inscription_id": inscription.id, "conseillers": [c.id for c in conseillers]}
+
+
+def planifier(contexte, conseiller, debut, fin=None, **champs):
+    return contexte["service"].create_rendez_vous(RendezVousCreate(
+        inscription_id=contexte["inscription_id"], conseiller_id=conseiller, debut=debut, fin=fin, **champs
+    ))
+
+
+def test_chevauchements(contexte):
+    service = contexte["service"]
+    premier, second = contexte["conseillers"]
+    rdv = planifier(contexte, premier, LUNDI.replace(hour=10))  # 10h-11h (durée par défaut)
+
+    with pytest.raises(ConflitRendezVous):
+        planifier(contexte, premier, LUNDI.replace(hour=10, minute=30), LUNDI.replace(hour=11, minute=30))
+    # Créneaux contigus, autre conseiller ou rendez-vous annulé : acceptés
+    planifier(contexte, premier, LUNDI.replace(hour=11))
+    planifier(contexte, second, LUNDI.replace(hour=10))
+    planifier(contexte, premier, LUNDI.replace(hour=10), statut=StatutRDV.ANNULE)
+
+    # Un rendez-vous peut être modifié sur son propre créneau, pas déplacé sur un autre
+    service.update_rendez_vous(rdv.id, RendezVousUpdate(fin=LUNDI.replace(hour=10, minute=45)))
+    with pytest.raises(ConflitRendezVous):
+        service.update_rendez_vous(rdv.id, RendezVousUpdate(
+            debut=LUNDI.replace(hour=11, minute=15), fin=LUNDI.replace(hour=12)
+        ))
+    with pytest.raises(ValueError):
+        service.verifier_disponibilite(premier, LUNDI.replace(hour=15), LUNDI.replace(hour=14))
+
+
+def test_creneaux_libres(contexte):
+    service = contexte["service"]
+    premier, second = contexte["conseillers"]
+    planifier(contexte, premier, LUNDI.replace(hour=9), LUNDI.replace(hour=10, minute=30))
+    planifier(contexte, second, LUNDI.replace(hour=9))
+
+    creneaux = service.get_creneaux_libres([premier], nombre=2, a_partir_de=LUNDI)
+    assert [c["debut"] for c in creneaux] == [LUNDI.replace(hour=10, minute=30), LUNDI.replace(hour=11)]
+
+    creneaux = service.get_creneaux_libres([premier, second], nombre=3, a_partir_de=LUNDI)
+    assert [(c["conseiller_id"], c["debut"].hour, c["debut"].minute) for c in creneaux] == [
+        (second, 10, 0), (premier, 10, 30), (second, 10, 30)
+    ]
+
+    # Vendredi après la fermeture : le prochain créneau est le lundi suivant à l'ouverture
+    creneaux = service.get_creneaux_libres([premier], nombre=1, a_partir_de=datetime(2025, 3, 7, 18, 30))
+    assert creneaux[0]["debut"] == datetime(2025, 3, 10, 9)
+
+
+def test_statistiques(contexte):
+    premier, second = contexte["conseillers"]
+    planifier(contexte, premier, LUNDI.replace(hour=9), statut=StatutRDV.TERMINE)
+    planifier(contexte, premier, LUNDI.replace(hour=10), type_rdv=TypeRDV.COACHING)
+    planifier(contexte, second, LUNDI.replace(hour=9), statut=StatutRDV.ANNULE, type_rdv=TypeRDV.SUIVI)
+
+    stats = contexte["service"].get_statistiques_rendez_vous()
+    assert stats["total"] == 3
+    assert (stats["planifies"], stats["termines"], stats["annules"]) == (1, 1, 1)
+    assert stats["par_type"] == {"entretiens": 1, "suivis": 1, "coachings": 1, "autres": 0}
+    assert round(stats["taux_realisation"]) == 33
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Tests de la liste d'émargement des séminaires (SQLite)
+
+get_presences_with_invitation_details crée en un seul INSERT ... ON CONFLICT
+les présences par défaut manquantes, et le nombre de requêtes SQL reste
+constant quel que soit le nombre d'invités. Sur une base héritée sans
+contrainte unique, la présence retenue parmi des doublons est celle que la
+migration conserve (DEDUP_KEEP_ORDER : la plus récemment modifiée).
+"""
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import MetaData, UniqueConstraint
+from sqlmodel import SQLModel, Session, create_engine, select
+
+# Modèles liés par relations : importés ici aussi, le module servant de benchmark hors pytest (sans conftest)
+import app_lia_web.app.models.event  # noqa: F401
+import app_lia_web.app.models.codev  # noqa: F401
+import app_lia_web.app.models.elearning  # noqa: F401
+from app_lia_web.app.models.base import Candidat, Inscription, Programme, User
+from app_lia_web.app.models.enums import TypeInvitation, UserRole
+from app_lia_web.app.models.seminaire import InvitationSeminaire, PresenceSeminaire, Seminaire, SessionSeminaire
+from app_lia_web.app.services.seminaire_service import SeminaireService
+from app_lia_web.core import sql_budget
+
+TAILLES = (10, 50, 200)
+
+
+def creer_engine(contrainte_unique: bool = True):
+    engine = create_engine("sqlite://")
+    tables = [t for t in SQLModel.metadata.sorted_tables if t.schema is None]
+    if contrainte_unique:
+        SQLModel.metadata.create_all(engine, tables=tables)
+        return engine
+    # Base antérieure à uq_presenceseminaire_session_inscription : doublons possibles
+    heritee = MetaData()
+    for table in tables:
+        table.to_metadata(heritee)
+    presences = heritee.tables["presenceseminaire"]
+    presences.constraints = {c for c in presences.constraints if not isinstance(c, UniqueConstraint)}
+    heritee.create_all(engine)
+    return engine
+
+
+def creer_seminaire(engine, nb_invites: int, jour: date = None, refusees: int = 0) -> tuple:
+    jour = jour or date.today() + timedelta(days=3)
+    with Session(engine) as db:
+        organisateur = User(email="orga@test.fr", nom_complet="Orga", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR)
+        db.add(organisateur)
+        db.flush()
+        programme = Programme(code="ACD", nom="ACD", responsable_id=organisateur.id)
+        db.add(programme)
+        db.flush()
+        seminaire = Seminaire(titre="Séminaire", programme_id=programme.id, organisateur_id=organisateur.id,
+                              date_debut=jour, date_fin=jour)
+        candidats = [Candidat(nom=f"Nom{i:04d}", prenom="Léa", email=f"c{i}@test.fr") for i in range(nb_invites)]
+        db.add_all([seminaire, *candidats])
+        db.flush()
+        session_seminaire = SessionSeminaire(seminaire_id=seminaire.id, titre="Matin", date_session=jour,
+                                             heure_debut=datetime.combine(jour, datetime.min.time()))
+        inscriptions = [Inscription(programme_id=programme.id, candidat_id=candidat.id) for candidat in candidats]
+        db.add_all([session_seminaire, *inscriptions])
+        db.flush()
+        db.add_all([
+            InvitationSeminaire(seminaire_id=seminaire.id, type_invitation=TypeInvitation.INDIVIDUELLE,
+                                inscription_id=inscription.id, statut="REFUSEE" if i < refusees else "ACCEPTEE",
+                                token_invitation=f"sem-{i}")
+            for i, inscription in enumerate(inscriptions)
+        ])
+        db.commit()
+        return seminaire.id, session_seminaire.id, [inscription.id for inscription in inscriptions]
+
+
+def test_presences_par_defaut(engine):
+    seminaire_id, session_id, inscriptions = creer_seminaire(engine, nb_invites=6, refusees=2)
+    service = SeminaireService()
+
+    with Session(engine) as db:
+        lignes = service.get_presences_with_invitation_details(seminaire_id, session_id, db)
+        assert [ligne["presence"].inscription_id for ligne in lignes] == inscriptions
+        assert [ligne["presence"].presence for ligne in lignes] == ["absent"] * 2 + ["en_attente"] * 4
+
+    # Une seconde ouverture concurrente (liste lue avant l'INSERT de la première) ne crée pas de doublon
+    with Session(engine) as db:
+        lignes_perimees = [(invitation, None) for invitation, _ in service._roster_rows(seminaire_id, session_id, db)]
+        assert service._create_default_presences(session_id, lignes_perimees, db)
+        assert len(db.exec(select(PresenceSeminaire)).all()) == 6
+        assert not service._create_default_presences(session_id, service._roster_rows(seminaire_id, session_id, db), db)
+
+
+def test_session_passee_tous_absents(engine):
+    seminaire_id, session_id, _ = creer_seminaire(engine, nb_invites=3, jour=date.today() - timedelta(days=1))
+    with Session(engine) as db:
+        presences = SeminaireService().get_presences_with_invitations(seminaire_id, session_id, db)
+    assert [presence.presence for presence in presences] == ["absent"] * 3
+
+
+def mesurer_emargement() -> dict:
+    """Requêtes SQL et durée par taille de séminaire, à la première ouverture puis aux suivantes"""
+    service = SeminaireService()
+    mesures = {}
+    for taille in TAILLES:
+        engine = creer_engine()
+        seminaire_id, session_id, _ = creer_seminaire(engine, taille)
+        for ouverture in ("premiere", "suivante"):
+            with Session(engine) as db, sql_budget.mesurer() as compteur:
+                debut = time.perf_counter()
+                presences = service.get_presences_with_invitation_details(seminaire_id, session_id, db)
+                for presence_data in presences:
+                    presence_data["presence"].inscription.candidat.nom
+                    presence_data["presence"].inscription.candidat.entreprise
+                assert len(presences) == taille
+            mesures[(taille, ouverture)] = {
+                "requetes": compteur.requetes,
+                "duree_ms": round((time.perf_counter() - debut) * 1000, 1),
+            }
+    return mesures
+
+
+def test_emargement_nombre_de_requetes_constant():
+    mesures = mesurer_emargement()
+    for ouverture in ("premiere", "suivante"):
+        requetes = {mesures[(taille, ouverture)]["requetes"] for taille in TAILLES}
+        assert len(requetes) == 1, f"Nombre de requêtes variable ({ouverture} ouverture): {mesures}"
+
+
+def test_doublons_herites_presence_la_plus_recente():
+    engine = creer_engine(contrainte_unique=False)
+    seminaire_id, session_id, (premiere, seconde) = creer_seminaire(engine, nb_invites=2)
+    with Session(engine) as db:
+        db.add_all([
+            PresenceSeminaire(session_id=session_id, inscription_id=premiere, presence="absent",
+                              modifie_le=datetime(2025, 1, 1)),
+            PresenceSeminaire(session_id=session_id, inscription_id=premiere, presence="present",
+                              modifie_le=datetime(2025, 1, 2)),
+            PresenceSeminaire(session_id=session_id, inscription_id=premiere, presence="excuse"),
+            PresenceSeminaire(session_id=session_id, inscription_id=seconde, presence="present"),
+            PresenceSeminaire(session_id=session_id, inscription_id=seconde, presence="excuse"),
+        ])
+        db.commit()
+
+    with Session(engine) as db:
+        presences = SeminaireService().get_presences_with_invitations(seminaire_id, session_id, db)
+    # La plus récemment modifiée, puis (sans date de modification) la plus ancienne
+    assert [presence.presence for presence in presences] == ["present", "present"]
+
+
+if __name__ == "__main__":
+    print("🔍 BENCHMARK DE LA LISTE D'ÉMARGEMENT")
+    print("=" * 50)
+    for (taille, ouverture), mesure in mesurer_emargement().items():
+        print(f"👥 {taille:>4} invités ({ouverture} ouverture): {mesure['requetes']} requêtes, {mesure['duree_ms']} ms")
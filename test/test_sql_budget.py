@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Tests du budget de requêtes SQL par route (core/sql_budget.py)
+
+Les formes de requêtes ignorent les listes de paramètres, une boucle de
+session.get est signalée comme N+1, les en-têtes de débogage portent le
+compte, et en mode strict (activé pour toute la suite par conftest.py) une
+route qui dépasse son @budget_sql fait échouer la requête. Les routes
+budgétées du tableau de bord, du pipeline et des événements sont appelées
+avec des données : leur nombre de requêtes ne dépend pas du volume.
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.staticfiles import StaticFiles
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app_lia_web.app.models.ACD.activity import ActivityLog
+from app_lia_web.app.models.base import (
+    AvancementEtape, Candidat, DecisionJuryCandidat, EtapePipeline, Inscription, Jury, Programme, User,
+)
+from app_lia_web.app.models.enums import DecisionJury, TypeInvitation, UserRole
+from app_lia_web.app.models.event import Event, InvitationEvent, StatutInvitationEvent, TypeInvitationEvent
+from app_lia_web.app.models.seminaire import InvitationSeminaire, Seminaire, SessionSeminaire
+from app_lia_web.app.routers import router_configs
+from app_lia_web.app.services import jury_decision_service
+from app_lia_web.core import sql_budget
+from app_lia_web.core.config import settings
+from app_lia_web.core.database import get_session
+from app_lia_web.core.security import get_current_user
+from app_lia_web.core.sql_budget import BudgetSQLDepasse, SQLBudgetMiddleware, budget_sql
+
+
+@pytest.fixture(autouse=True)
+def entetes_sql(monkeypatch):
+    monkeypatch.setattr(settings, "SQL_DEBUG_HEADERS", True)
+
+
+def creer_donnees(engine, nb_candidats: int) -> dict:
+    with Session(engine) as db:
+        admin = User(email="admin@test.fr", nom_complet="Admin", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR)
+        db.add(admin)
+        db.flush()
+        programme = Programme(code="ACD", nom="ACD", responsable_id=admin.id)
+        db.add(programme)
+        db.flush()
+        etapes = [EtapePipeline(programme_id=programme.id, code=f"e{i}", libelle=f"Étape {i}", ordre=i) for i in (1, 2)]
+        jour = date.today() + timedelta(days=3)
+        evenement = Event(titre="Réunion", date_debut=jour, date_fin=jour, programme_id=programme.id, organisateur_id=admin.id)
+        seminaire = Seminaire(titre="Séminaire", date_debut=jour, date_fin=jour, programme_id=programme.id, organisateur_id=admin.id)
+        jury = Jury(programme_id=programme.id, session_le=datetime(2025, 6, 1, 9, 0))
+        candidats = [Candidat(nom=f"Nom{i:04d}", prenom="Léa", email=f"c{i}@test.fr") for i in range(nb_candidats)]
+        db.add_all([*etapes, evenement, seminaire, jury, *candidats])
+        db.flush()
+        session_seminaire = SessionSeminaire(seminaire_id=seminaire.id, titre="Matin", date_session=jour,
+                                             heure_debut=datetime.combine(jour, datetime.min.time()))
+        db.add(session_seminaire)
+        for i, candidat in enumerate(candidats):
+            inscription = Inscription(programme_id=programme.id, candidat_id=candidat.id)
+            db.add(inscription)
+            db.flush()
+            db.add(AvancementEtape(inscription_id=inscription.id, etape_id=etapes[i % 2].id))
+            db.add(InvitationEvent(event_id=evenement.id, inscription_id=inscription.id,
+                                   statut=StatutInvitationEvent.ACCEPTEE,
+                                   type_invitation=TypeInvitationEvent.INDIVIDUELLE, token_invitation=f"jeton-{i}"))
+            db.add(InvitationSeminaire(seminaire_id=seminaire.id, inscription_id=inscription.id,
+                                       type_invitation=TypeInvitation.INDIVIDUELLE, token_invitation=f"sem-{i}"))
+            db.add(DecisionJuryCandidat(candidat_id=candidat.id, jury_id=jury.id, decision=DecisionJury.VALIDE))
+            db.add(ActivityLog(user_email=admin.email, action="inscription", entity="Candidat",
+                               entity_id=candidat.id, created_at=datetime(2025, 1, 1) + timedelta(minutes=i)))
+        db.commit()
+        return {"programme": programme.id, "etape": etapes[0].id, "event": evenement.id,
+                "seminaire": seminaire.id, "session": session_seminaire.id}
+
+
+def client_pour(engine) -> TestClient:
+    """Application avec tous les routeurs, comme main.py (les gabarits résolvent leurs url_for)"""
+    def session():
+        with Session(engine) as s:
+            yield s
+
+    app = FastAPI()
+    app.mount("/static", StaticFiles(directory=settings.STATIC_DIR), name="static")  # url_for des gabarits
+    for routeur, prefixe, tags in router_configs:
+        app.include_router(routeur, prefix=prefixe, tags=tags)
+    app.add_api_route("/admin/dashboard", lambda: None, name="admin_dashboard")  # route de main.py
+    app.add_middleware(SQLBudgetMiddleware)
+    app.dependency_overrides[get_session] = session
+    app.dependency_overrides[get_current_user] = lambda: User(
+        id=1, email="admin@test.fr", nom_complet="Admin", role=UserRole.ADMINISTRATEUR.value
+    )
+    return TestClient(app)
+
+
+def test_formes_et_n_plus_un(engine):
+    creer_donnees(engine, nb_candidats=12)
+    assert sql_budget.forme("SELECT *\n  FROM t WHERE id IN (?, ?,  ?)") == sql_budget.forme("SELECT * FROM t WHERE id IN (?)")
+    assert sql_budget.forme("INSERT INTO t (a, b) VALUES (%(a_m0)s, %(b_m0)s), (%(a_m1)s, %(b_m1)s)") == "INSERT INTO t (a, b) VALUES (?)"
+
+    with Session(engine) as db, sql_budget.mesurer() as compteur:
+        ids = db.exec(select(Candidat.id)).all()
+        for candidat_id in ids:
+            db.get(Candidat, candidat_id)
+        db.exec(select(Candidat).where(Candidat.id.in_(ids[:2]))).all()
+        db.exec(select(Candidat).where(Candidat.id.in_(ids[:5]))).all()
+
+    assert compteur.requetes == 1 + len(ids) + 2
+    repetees = compteur.repetitions()
+    assert list(repetees.values()) == [len(ids)] and "FROM candidat" in next(iter(repetees))
+    assert compteur.repetitions(seuil=2) == {**repetees, next(f for f in compteur.formes if " IN (" in f): 2}
+
+    # Hors bloc mesurer() : rien n'est compté
+    with Session(engine) as db:
+        db.get(Candidat, ids[0])
+    assert compteur.requetes == 1 + len(ids) + 2
+
+
+def test_en_tetes_et_budget_depasse(engine, monkeypatch):
+    creer_donnees(engine, nb_candidats=8)
+
+    def session():
+        with Session(engine) as s:
+            yield s
+
+    app = FastAPI()
+
+    @app.get("/boucle")
+    @budget_sql(3)
+    def boucle(db: Session = Depends(session)):
+        return [db.get(Candidat, i).nom for i in range(1, 9)]
+
+    @app.get("/jointure")
+    @budget_sql(1)
+    async def jointure(db: Session = Depends(session)):
+        return len(db.exec(select(Candidat.nom).join(Inscription, Inscription.candidat_id == Candidat.id)).all())
+
+    @app.get("/libre")
+    def libre(db: Session = Depends(session)):
+        return [db.get(Candidat, i).nom for i in range(1, 9)]
+
+    app.add_middleware(SQLBudgetMiddleware)
+    client = TestClient(app)
+
+    reponse = client.get("/jointure")
+    assert reponse.json() == 8
+    assert reponse.headers["x-sql-queries"] == "1" and reponse.headers["x-sql-budget"] == "1"
+    assert reponse.headers["x-sql-n-plus-one"] == "0" and float(reponse.headers["x-sql-time-ms"]) >= 0
+
+    # Sans budget déclaré : le N+1 est signalé mais la requête passe
+    reponse = client.get("/libre")
+    assert reponse.status_code == 200 and "x-sql-budget" not in reponse.headers
+    assert reponse.headers["x-sql-queries"] == "8" and reponse.headers["x-sql-n-plus-one"] == "1"
+
+    with pytest.raises(BudgetSQLDepasse, match=r"GET /boucle : 8 requêtes SQL pour un budget de 3 \(la plus répétée, 8×"):
+        client.get("/boucle")
+
+    monkeypatch.setattr(settings, "SQL_BUDGET_STRICT", False)
+    monkeypatch.setattr(settings, "SQL_DEBUG_HEADERS", False)
+    reponse = client.get("/boucle")
+    assert reponse.status_code == 200 and "x-sql-queries" not in reponse.headers
+
+
+@pytest.mark.parametrize("nb_candidats", [10, 100])
+def test_routes_budgetees(engine, nb_candidats, monkeypatch):
+    monkeypatch.setattr(jury_decision_service, "engine", engine)
+    jury_decision_service.references_jury.invalidate()
+    ids = creer_donnees(engine, nb_candidats)
+    client = client_pour(engine)
+
+    routes = {
+        "get_recent_actions": "/dashboard/dashboard/actions-recentes?limit=20",
+        "get_pipeline_board": f"/pipelines/pipelines/{ids['programme']}/board",
+        "get_candidats_par_etape": f"/pipelines/pipelines/etapes/{ids['etape']}/candidats",
+        "detail_event": f"/events/{ids['event']}",
+        "emargement_session": f"/seminaires/{ids['seminaire']}/sessions/{ids['session']}/emargement",
+        "jury_decisions_list": "/ACD/jury-decisions",
+    }
+    for nom, url in routes.items():
+        reponse = client.get(url)  # BudgetSQLDepasse en cas de dépassement
+        assert reponse.status_code == 200, nom
+        assert int(reponse.headers["x-sql-queries"]) <= int(reponse.headers["x-sql-budget"]), nom
+        assert reponse.headers["x-sql-n-plus-one"] == "0", nom
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests du rollup mensuel des suivis
+
+Les statistiques lues dans le rollup doivent être identiques à l'agrégat SQL
+calculé directement sur les suivis, y compris après modification, changement
+de mois et suppression.
+"""
+from datetime import date
+
+import pytest
+from sqlmodel import select
+
+from app_lia_web.app.models.base import Candidat, Inscription, Programme, SuiviMensuelRollup, User
+from app_lia_web.app.models.enums import UserRole
+from app_lia_web.app.schemas.suivi_mensuel_schemas import SuiviMensuelCreate, SuiviMensuelFilter, SuiviMensuelUpdate
+from app_lia_web.app.services.suivi_mensuel_service import SuiviMensuelService
+
+service = SuiviMensuelService()
+
+
+@pytest.fixture(autouse=True)
+def rollup_non_verifie(monkeypatch):
+    monkeypatch.setattr(SuiviMensuelService, "_rollup_verifie", False)
+
+
+@pytest.fixture
+def inscriptions(db):
+    responsable = User(email="resp@test.fr", nom_complet="Resp", mot_de_passe_hash="x", role=UserRole.ADMINISTRATEUR)
+    db.add(responsable)
+    db.flush()
+    programmes = [Programme(code=code, nom=f"Programme {code}", responsable_id=responsable.id) for code in ("AAA", "BBB")]
+    db.add_all(programmes)
+    db.flush()
+    ids = []
+    for i, programme in enumerate([programmes[0], programmes[0], programmes[1]]):
+        candidat = Candidat(nom=f"Nom{i}", prenom="Prénom", email=f"c{i}@test.fr")
+        db.add(candidat)
+        db.flush()
+        inscription = Inscription(programme_id=programme.id, candidat_id=candidat.id)
+        db.add(inscription)
+        db.flush()
+        ids.append(inscription.id)
+    db.commit()
+    return {"programmes": [p.id for p in programmes], "inscriptions": ids}
+
+
+def creer(db, inscription_id, mois, **metriques):
+    return service.create_suivi_mensuel(db, SuiviMensuelCreate(inscription_id=inscription_id, mois=mois, **metriques))
+
+
+@pytest.fixture
+def suivis(db, inscriptions):
+    premier, second, autre = inscriptions["inscriptions"]
+    return [
+        creer(db, premier, "2025-01", chiffre_affaires_actuel=1000, score_objectifs=60, nb_cdi=2, commentaire="ok"),
+        creer(db, second, "2025-01", chiffre_affaires_actuel=3000, score_objectifs=80, montant_dettes_encours=500),
+        creer(db, premier, "2025-02", score_objectifs=70, nb_stagiaires=1, montant_equity_effectue=10000),
+        creer(db, autre, "2025-01", chiffre_affaires_actuel=50, montant_subventions_obtenues=2000),
+    ]
+
+
+def stats_directes(db, **filtres):
+    """Agrégat calculé sur les suivis (un filtre hors rollup force ce chemin)"""
+    return service.get_suivi_mensuel_stats(db, SuiviMensuelFilter(search_candidat="Nom", **filtres))
+
+
+def verifier_rollup(db, programme_id):
+    depuis_rollup = service.get_suivi_mensuel_stats(db, SuiviMensuelFilter(programme_id=programme_id))
+    assert depuis_rollup == stats_directes(db, programme_id=programme_id)
+    return depuis_rollup
+
+
+def test_statistiques_identiques(db, inscriptions, suivis):
+    stats = verifier_rollup(db, inscriptions["programmes"][0])
+    assert stats.total_suivis == 3
+    assert stats.score_moyen == 70
+    assert stats.ca_moyen == 2000
+    assert stats.total_employes == 3
+    assert stats.suivis_avec_commentaire == 1
+    assert stats.montant_equity_total == 10000
+
+    tous = service.get_suivi_mensuel_stats(db, SuiviMensuelFilter())
+    assert tous.total_suivis == 4
+    assert tous.montant_subventions_total == 2000
+
+
+def test_modification_changement_de_mois_et_suppression(db, inscriptions, suivis):
+    programme_id = inscriptions["programmes"][0]
+    service.update_suivi_mensuel(db, suivis[0].id, SuiviMensuelUpdate(score_objectifs=90, mois=date(2025, 3, 1)))
+    stats = verifier_rollup(db, programme_id)
+    assert stats.score_moyen == 80
+
+    service.delete_suivi_mensuel(db, suivis[1].id)
+    verifier_rollup(db, programme_id)
+    # Janvier ne contient plus aucun suivi du programme : la ligne disparaît
+    mois = db.exec(select(SuiviMensuelRollup.mois).where(SuiviMensuelRollup.programme_id == programme_id)).all()
+    assert sorted(mois) == [date(2025, 2, 1), date(2025, 3, 1)]
+
+
+def test_reconstruction_et_series(db, inscriptions, suivis):
+    avant = {(r.programme_id, r.mois): r.model_dump(exclude={"maj_le"}) for r in db.exec(select(SuiviMensuelRollup))}
+    assert service.rebuild_rollup(db) == 3
+    apres = {(r.programme_id, r.mois): r.model_dump(exclude={"maj_le"}) for r in db.exec(select(SuiviMensuelRollup))}
+    assert apres == avant
+
+    series = service.get_series_mensuelles(db)
+    assert [s["mois"] for s in series] == ["2025-01", "2025-02"]
+    assert series[0]["nb_suivis"] == 3 and series[0]["ca_moyen"] == 1350
+    assert series[1]["montant_equity_total"] == 10000
+
+    series = service.get_series_mensuelles(db, inscriptions["programmes"][1], mois_debut=date(2025, 2, 15))
+    assert series == []
+    series = service.get_series_mensuelles(db, inscriptions["programmes"][1])
+    assert series[0]["montant_subventions_total"] == 2000
+
+
+def test_rollup_construit_au_premier_usage(db, inscriptions, suivis):
+    db.exec(SuiviMensuelRollup.__table__.delete())
+    db.commit()
+    SuiviMensuelService._rollup_verifie = False
+    stats = service.get_suivi_mensuel_stats(db, SuiviMensuelFilter())
+    assert stats.total_suivis == 4